@@ -0,0 +1,420 @@
+"""
+Модуль резервного копирования базы задач для менеджера задач.
+
+Таблицы выгружаются и загружаются командой COPY в двоичном формате
+PostgreSQL: строки не разбираются в Python, а передаются потоком блоков.
+Файл копии состоит из кадров "вид, длина, данные":
+
+    H  заголовок (JSON): версия формата, время создания, число шардов;
+    T  начало таблицы (JSON): шард, имя таблицы и ее столбцы;
+    D  блок данных COPY;
+    E  конец таблицы (JSON): число байт и контрольная сумма SHA-256;
+    S  конец шарда (JSON): число строк по таблицам.
+
+Заголовок и кадры E и S образуют манифест копии. restore сверяет
+контрольную сумму и число загруженных строк каждой таблицы до фиксации
+транзакции, а restore --check проверяет файл без обращения к БД, считая
+строки в данных COPY. Файл может быть целиком сжат
+gzip; при чтении сжатие определяется автоматически.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import struct
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict
+
+from storage import DatabaseConnection
+
+MAGIC = b"TMBACKUP"
+FORMAT_VERSION = 1
+FRAME = struct.Struct(">cI")
+GZIP_MAGIC = b"\x1f\x8b"
+# COPY TO передает данные построчно: строки собираются в блоки этого размера
+CHUNK_SIZE = 1 << 20
+# Начало заголовка двоичного формата COPY; за ним флаги и длина расширения
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+COPY_HEADER_SIZE = len(COPY_SIGNATURE) + 8
+
+
+class BackupFormatError(ValueError):
+    """Файл не является резервной копией или поврежден."""
+
+
+def _shards(storage) -> list:
+    """Возвращает хранилища отдельных баз: шардов или единственной базы."""
+    return getattr(storage, "shards", [storage])
+
+
+def _write_frame(stream, kind: bytes, payload: bytes):
+    """Записывает кадр."""
+    stream.write(FRAME.pack(kind, len(payload)))
+    stream.write(payload)
+
+
+def _read_frame(stream):
+    """Читает кадр и возвращает его вид и данные."""
+    header = stream.read(FRAME.size)
+    if len(header) < FRAME.size:
+        raise BackupFormatError("Файл резервной копии обрывается")
+    kind, length = FRAME.unpack(header)
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise BackupFormatError("Файл резервной копии обрывается")
+    return kind, payload
+
+
+def _write_json(stream, kind: bytes, data: dict):
+    """Записывает кадр с JSON."""
+    _write_frame(stream, kind, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+class _TableWriter:
+    """Приемник COPY TO: собирает строки в блоки и пишет их кадрами D."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buffer = bytearray()
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            chunk = bytes(self._buffer)
+            self.digest.update(chunk)
+            self.size += len(chunk)
+            _write_frame(self._stream, b"D", chunk)
+            self._buffer.clear()
+
+
+class _CopyRowCounter:
+    """Считает строки в потоке двоичного COPY, пропуская значения полей.
+
+    Строка: число полей (int16), затем для каждого поля длина (int32,
+    -1 для NULL) и данные; поток заканчивается числом полей -1.
+    """
+
+    def __init__(self, label: str):
+        self._label = label
+        self._buffer = b""
+        self._header = False
+        # Сколько полей текущей строки еще не пропущено
+        self._fields = 0
+        self.rows = 0
+        self.finished = False
+
+    def feed(self, data: bytes):
+        buffer = self._buffer + data
+        size = len(buffer)
+        offset = 0
+        if not self._header:
+            if size < COPY_HEADER_SIZE:
+                self._buffer = buffer
+                return
+            if not buffer.startswith(COPY_SIGNATURE):
+                raise BackupFormatError(f"Данные {self._label} не в двоичном формате COPY")
+            offset = COPY_HEADER_SIZE + int.from_bytes(buffer[COPY_HEADER_SIZE - 4:COPY_HEADER_SIZE], "big")
+            if size < offset:
+                self._buffer = buffer
+                return
+            self._header = True
+
+        while not self.finished:
+            if not self._fields:
+                if size - offset < 2:
+                    break
+                count = int.from_bytes(buffer[offset:offset + 2], "big", signed=True)
+                offset += 2
+                if count == -1:
+                    self.finished = True
+                    break
+                self.rows += 1
+                self._fields = count
+                continue
+            if size - offset < 4:
+                break
+            length = max(int.from_bytes(buffer[offset:offset + 4], "big", signed=True), 0)
+            if size - offset - 4 < length:
+                break
+            offset += 4 + length
+            self._fields -= 1
+        self._buffer = buffer[offset:]
+
+
+class _TableReader:
+    """Источник COPY FROM: отдает данные кадров D до кадра E.
+
+    Контрольная сумма сверяется при чтении кадра E, то есть до того, как
+    COPY завершится и транзакция будет зафиксирована.
+    """
+
+    def __init__(self, stream, label: str, count_rows: bool = False):
+        self._stream = stream
+        self._label = label
+        self._pending = b""
+        self._done = False
+        self._counter = _CopyRowCounter(label) if count_rows else None
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    @property
+    def rows(self) -> int:
+        """Число строк в прочитанных данных (только при count_rows)."""
+        return self._counter.rows
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._pending and not self._done:
+            kind, payload = _read_frame(self._stream)
+            if kind == b"D":
+                self.digest.update(payload)
+                self.size += len(payload)
+                if self._counter is not None:
+                    self._counter.feed(payload)
+                self._pending = payload
+            elif kind == b"E":
+                self._verify(json.loads(payload))
+                self._done = True
+            else:
+                raise BackupFormatError(f"Неожиданный кадр {kind!r} в данных {self._label}")
+        if size is None or size < 0 or size >= len(self._pending):
+            chunk, self._pending = self._pending, b""
+        else:
+            chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+    def _verify(self, summary: dict):
+        if summary["bytes"] != self.size or summary["sha256"] != self.digest.hexdigest():
+            raise BackupFormatError(f"Контрольная сумма {self._label} не совпадает: файл поврежден")
+        if self._counter is not None and not self._counter.finished:
+            raise BackupFormatError(f"Данные COPY {self._label} обрываются")
+
+
+def _check_rows(expected: Dict[str, int], actual: Dict[str, int], shard: int):
+    """Сверяет число строк по таблицам с манифестом (кадром S) копии."""
+    for table, count in expected.items():
+        if actual.get(table) != count:
+            raise BackupFormatError(f"Число строк {table} (шард {shard}) не совпадает с манифестом: "
+                                    f"{actual.get(table)} вместо {count}")
+
+
+class BackupReader:
+    """Последовательное чтение файла резервной копии.
+
+    Attributes:
+        header (dict): Заголовок копии.
+        shard_rows (list): Число строк по таблицам для каждого прочитанного шарда.
+    """
+
+    def __init__(self, stream, path: str, count_rows: bool = False):
+        """Проверяет сигнатуру и читает заголовок.
+
+        Args:
+            stream: Поток файла копии.
+            path (str): Путь к файлу для сообщений об ошибках.
+            count_rows (bool, optional): Считать строки в данных COPY и
+                сверять их с кадром S.
+
+        Raises:
+            BackupFormatError: Если файл не является копией этого формата.
+        """
+        self._stream = stream
+        self._count_rows = count_rows
+        if stream.read(len(MAGIC)) != MAGIC:
+            raise BackupFormatError(f"Файл {path} не является резервной копией задач")
+        kind, payload = _read_frame(stream)
+        self.header = json.loads(payload) if kind == b"H" else {}
+        if self.header.get("format") != FORMAT_VERSION:
+            raise BackupFormatError(f"Неподдерживаемый формат резервной копии в {path}")
+        self.shard_rows = []
+
+    def sections(self, shard: int):
+        """Перебирает таблицы очередного шарда.
+
+        Yields:
+            tuple: Имя таблицы, ее столбцы и источник данных для COPY FROM.
+        """
+        counted = {}
+        while True:
+            kind, payload = _read_frame(self._stream)
+            data = json.loads(payload)
+            if kind == b"S":
+                if self._count_rows:
+                    _check_rows(data["rows"], counted, shard)
+                self.shard_rows.append(data["rows"])
+                return
+            if kind != b"T" or data["shard"] != shard:
+                raise BackupFormatError(f"Нарушен порядок данных резервной копии (шард {shard})")
+            source = _TableReader(self._stream, f"{data['table']} (шард {shard})", self._count_rows)
+            yield data["table"], data["columns"], source
+            # Источник, не дочитанный потребителем, дочитывается для проверки
+            while source.read(CHUNK_SIZE):
+                pass
+            if self._count_rows:
+                counted[data["table"]] = source.rows
+
+
+@contextmanager
+def open_backup(path: str, count_rows: bool = False):
+    """Открывает файл копии на чтение, распознавая сжатие gzip.
+
+    Args:
+        path (str): Путь к файлу копии.
+        count_rows (bool, optional): Сверять число строк данных с манифестом.
+
+    Yields:
+        BackupReader: Читатель копии.
+    """
+    with open(path, "rb") as raw:
+        compressed = raw.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+        raw.seek(0)
+        if not compressed:
+            yield BackupReader(raw, path, count_rows)
+            return
+        with gzip.GzipFile(fileobj=raw, mode="rb") as stream:
+            yield BackupReader(stream, path, count_rows)
+
+
+def _summary(rows_by_shard, data_bytes: int, file_bytes: int, started: float) -> Dict[str, Any]:
+    """Собирает итоги копирования: строки по таблицам, объем и время."""
+    tables = {}
+    for rows in rows_by_shard:
+        for table, count in rows.items():
+            tables[table] = tables.get(table, 0) + count
+    return {
+        "tables": tables,
+        "rows": sum(tables.values()),
+        "bytes": data_bytes,
+        "file_bytes": file_bytes,
+        "seconds": time.monotonic() - started
+    }
+
+
+def backup_database(storage, path: str, compress_level: int = 0) -> Dict[str, Any]:
+    """Сохраняет задачи всех владельцев, их связи и правила повторения в файл.
+
+    Каждая база (шард) выгружается в своей транзакции.
+
+    Args:
+        storage: TaskStorage или ShardedTaskStorage.
+        path (str): Путь к файлу копии.
+        compress_level (int, optional): Уровень сжатия gzip от 1 до 9;
+            0 — без сжатия.
+
+    Returns:
+        Dict[str, Any]: Итоги: tables (строки по таблицам), rows, bytes
+            (данные COPY), file_bytes и seconds.
+    """
+    started = time.monotonic()
+    shards = _shards(storage)
+    rows_by_shard = []
+    data_bytes = 0
+
+    with open(path, "wb") as raw:
+        stream = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=compress_level) if compress_level else raw
+        try:
+            stream.write(MAGIC)
+            _write_json(stream, b"H", {
+                "format": FORMAT_VERSION,
+                "created_at": datetime.now().isoformat(),
+                "shards": len(shards)
+            })
+
+            for index, shard in enumerate(shards):
+                @contextmanager
+                def open_output(table, columns, index=index):
+                    nonlocal data_bytes
+                    _write_json(stream, b"T", {"shard": index, "table": table, "columns": columns})
+                    writer = _TableWriter(stream)
+                    yield writer
+                    writer.flush()
+                    _write_json(stream, b"E", {"bytes": writer.size, "sha256": writer.digest.hexdigest()})
+                    data_bytes += writer.size
+
+                with DatabaseConnection.copy_mode():
+                    rows = shard.dump_tables(open_output)
+                _write_json(stream, b"S", {"rows": rows})
+                rows_by_shard.append(rows)
+        finally:
+            if compress_level:
+                stream.close()
+        file_bytes = raw.tell()
+
+    return _summary(rows_by_shard, data_bytes, file_bytes, started)
+
+
+def restore_database(storage, path: str, replace: bool = False) -> Dict[str, Any]:
+    """Загружает копию в пустую базу (или заменяет ее содержимое).
+
+    Каждый шард загружается в своей транзакции: поврежденная таблица или
+    число загруженных строк, не совпавшее с манифестом, откатывает
+    загрузку своего шарда.
+
+    Args:
+        storage: TaskStorage или ShardedTaskStorage с тем же числом шардов,
+            что и при копировании.
+        path (str): Путь к файлу копии.
+        replace (bool, optional): Заменить существующие задачи.
+
+    Returns:
+        Dict[str, Any]: Итоги, как у backup_database.
+
+    Raises:
+        BackupFormatError: Если файл поврежден или не является копией.
+        ValueError: Если число шардов не совпадает или база не пуста.
+    """
+    started = time.monotonic()
+    shards = _shards(storage)
+    rows_by_shard = []
+    data_bytes = 0
+
+    with open_backup(path) as reader:
+        if reader.header["shards"] != len(shards):
+            raise ValueError(f"Копия сделана с {reader.header['shards']} шардов, "
+                             f"а сейчас настроено {len(shards)}")
+        for index, shard in enumerate(shards):
+            sources = []
+
+            def sections(index=index, sources=sources):
+                for table, columns, source in reader.sections(index):
+                    sources.append(source)
+                    yield table, columns, source
+
+            def verify_rows(loaded, index=index):
+                _check_rows(reader.shard_rows[-1], loaded, index)
+
+            # Перебор таблиц шарда заканчивается чтением кадра S внутри
+            # транзакции загрузки, поэтому строки сверяются до ее фиксации
+            with DatabaseConnection.copy_mode():
+                rows_by_shard.append(shard.load_tables(sections(), replace, verify_rows))
+            data_bytes += sum(source.size for source in sources)
+
+    return _summary(rows_by_shard, data_bytes, os.path.getsize(path), started)
+
+
+def verify_backup(path: str) -> Dict[str, Any]:
+    """Проверяет контрольные суммы и число строк копии без обращения к БД.
+
+    Returns:
+        Dict[str, Any]: Итоги, как у backup_database.
+
+    Raises:
+        BackupFormatError: Если файл поврежден или не является копией.
+    """
+    started = time.monotonic()
+    data_bytes = 0
+    with open_backup(path, count_rows=True) as reader:
+        for index in range(reader.header["shards"]):
+            for _, _, source in reader.sections(index):
+                while source.read(CHUNK_SIZE):
+                    pass
+                data_bytes += source.size
+    return _summary(reader.shard_rows, data_bytes, os.path.getsize(path), started)
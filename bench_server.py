@@ -0,0 +1,96 @@
+"""
+Скрипт нагрузочного теста HTTP API менеджера задач.
+
+Несколько клиентов в отдельных потоках отправляют запросы по keep-alive
+соединениям в течение заданного времени, после чего выводится
+устойчивая пропускная способность и перцентили задержки.
+
+Пример:
+    python main.py serve --workers 8
+    python bench_server.py --clients 16 --duration 10 --path /stats
+"""
+
+import argparse
+import http.client
+import threading
+import time
+
+
+def run_client(host, port, method, path, deadline, latencies, errors):
+    """Отправляет запросы по одному keep-alive соединению до наступления deadline."""
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request(method, path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+    conn.close()
+
+
+def percentile(sorted_values, fraction):
+    """Возвращает перцентиль из заранее отсортированного списка."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_benchmark(host="127.0.0.1", port=8080, clients=8, duration=10.0,
+                  method="GET", path="/stats"):
+    """Запускает нагрузочный тест и возвращает сводку.
+
+    Returns:
+        dict: Число запросов, ошибок, запросов в секунду и перцентили задержки.
+    """
+    deadline = time.perf_counter() + duration
+    results = [[] for _ in range(clients)]
+    errors = []
+    threads = [
+        threading.Thread(target=run_client,
+                         args=(host, port, method, path, deadline, results[i], errors))
+        for i in range(clients)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(value for client in results for value in client)
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--clients", type=int, default=8, help="Число параллельных клиентов")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность в секундах")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--path", default="/stats")
+    args = parser.parse_args()
+
+    summary = run_benchmark(args.host, args.port, args.clients, args.duration,
+                            args.method, args.path)
+    print(f"Запросов: {summary['requests']} | Ошибок: {summary['errors']} | "
+          f"RPS: {summary['requests_per_sec']}")
+    print(f"Задержка p50: {summary['p50_ms']} мс | p95: {summary['p95_ms']} мс | "
+          f"p99: {summary['p99_ms']} мс")
@@ -5,28 +5,96 @@
 """
 
 import argparse
+import time
+from datetime import date, datetime
 from typing import List
-from storage import TaskStorage
-from models import Task, TaskStatus, Priority
+from backup import backup_database, restore_database, verify_backup
+from config import Config
+from export import FORMATS as EXPORT_FORMATS, export_tasks
+from journal import WriteJournal
+from metrics import instrument
+import tracing
+from reminders import ReminderDaemon, run_hook
+from snapshot import TaskSnapshot
+from storage import TaskStorage, ConcurrentModificationError, retry_on_conflict
+from models import Task, TaskStatus, Priority, normalize_tags
 
 
+@instrument("task_command", exclude=("setup_argparse", "execute_command", "needs_storage", "set_owner"))
 class TaskCommands:
     """Класс для обработки команд менеджера задач.
     
     Attributes:
         storage (TaskStorage): Объект для работы с хранилищем задач.
+        journal (WriteJournal): Локальный журнал для автономного режима или None.
+        snapshot (TaskSnapshot): Локальный снимок задач для list/stats --snapshot.
     """
     
-    def __init__(self, storage: TaskStorage):
+    # Команды, которые в автономном режиме пишутся в журнал без обращения к БД
+    JOURNALED_COMMANDS = ('add', 'done', 'delete')
+    # Команды, которые в автономном режиме читают локальный снимок
+    SNAPSHOT_COMMANDS = ('list', 'stats')
+    SNAPSHOT_MISSING = "📭 Локальный снимок еще не создан: выполните list --snapshot при доступной БД"
+    
+    def __init__(self, storage: TaskStorage, journal: WriteJournal = None):
         """Инициализирует обработчик команд.
         
         Args:
             storage (TaskStorage): Объект хранилища задач.
+            journal (WriteJournal, optional): Журнал автономного режима.
         """
         self.storage = storage
+        self.journal = journal
+        self.snapshot = TaskSnapshot()
+    
+    def set_owner(self, owner: str):
+        """Переключает локальный снимок на задачи другого владельца.
+        
+        Хранилище создается для этого владельца отдельно (см. main).
+        
+        Args:
+            owner (str): Владелец задач.
+        """
+        self.snapshot = TaskSnapshot(owner=owner)
+    
+    def needs_storage(self, args) -> bool:
+        """Проверяет, нужно ли команде подключение к БД.
+        
+        Args:
+            args: Аргументы командной строки.
+            
+        Returns:
+            bool: False для команд, которые будут записаны в журнал или
+                прочитаны из локального снимка.
+        """
+        if args.command == 'restore' and args.check:
+            return False
+        if self.journal is None:
+            return True
+        if args.command in self.JOURNALED_COMMANDS:
+            return False
+        # Периодов и зависимостей между задачами в снимке нет
+        uses_snapshot = not getattr(args, 'by', None) and not getattr(args, 'ready', False)
+        return not (args.command in self.SNAPSHOT_COMMANDS and uses_snapshot)
+    
+    def _read_source(self, use_snapshot: bool):
+        """Возвращает источник для чтения задач: хранилище или локальный снимок.
+        
+        Снимок перед чтением обновляется из хранилища, если оно подключено;
+        в автономном режиме читается как есть.
+        
+        Args:
+            use_snapshot (bool): Читать из локального снимка.
+        """
+        if not use_snapshot and self.storage is not None:
+            return self.storage
+        if self.storage is not None:
+            self.snapshot.refresh(self.storage)
+        return self.snapshot
 
     def add_task(self, title: str, description: str = "", 
-                priority: str = "medium", due_date: str = None) -> str:
+                priority: str = "medium", due_date: str = None,
+                tags: List[str] = None, parent_id: int = None) -> str:
         """Добавляет новую задачу.
         
         Args:
@@ -34,6 +102,8 @@ class TaskCommands:
             description (str, optional): Описание задачи. По умолчанию "".
             priority (str, optional): Приоритет задачи. По умолчанию "medium".
             due_date (str, optional): Срок выполнения. По умолчанию None.
+            tags (List[str], optional): Теги задачи.
+            parent_id (int, optional): ID родительской задачи для подзадачи.
             
         Returns:
             str: Сообщение о результате операции.
@@ -43,34 +113,70 @@ class TaskCommands:
         except ValueError:
             return f"Ошибка: Неверный приоритет. Допустимые значения: low, medium, high"
         
-        task = Task(title, description, priority_enum, due_date)
+        if self.journal is not None:
+            # Дата проверяется сразу: при синхронизации сообщать об ошибке будет некому
+            if due_date:
+                try:
+                    date.fromisoformat(due_date)
+                except ValueError:
+                    return f"Ошибка: Неверный формат даты. Используйте ГГГГ-ММ-ДД"
+            self.journal.append('add', {
+                'title': title,
+                'description': description,
+                'priority': priority_enum.value,
+                'due_date': due_date,
+                'tags': normalize_tags(tags),
+                'parent_id': parent_id
+            })
+            return "📝 Задача записана в журнал и будет добавлена при синхронизации (sync)"
+        
+        if parent_id is not None and not self.storage.get_task_by_id(parent_id, use_primary=True):
+            return f"❌ Ошибка: Задача с ID {parent_id} не найдена"
+        
+        task = Task(title, description, priority_enum, due_date, tags, parent_id)
         saved_task = self.storage.save_task(task)
         return f"✅ Задача добавлена (ID: {saved_task.id})"
 
     def list_tasks(self, status: str = None, priority: str = None, 
-                  due_date: str = None, show_all: bool = False) -> str:
+                  due_date: str = None, show_all: bool = False,
+                  use_snapshot: bool = False, tags: List[str] = None,
+                  match_all_tags: bool = False, ready: bool = False,
+                  verbose: bool = False) -> str:
         """Показывает список задач с фильтрацией.
         
         Args:
             status (str, optional): Фильтр по статусу.
             priority (str, optional): Фильтр по приоритету.
             due_date (str, optional): Фильтр по сроку.
+            tags (List[str], optional): Фильтр по тегам.
+            match_all_tags (bool, optional): Требовать все теги, а не любой.
+            ready (bool, optional): Только задачи без незавершенных
+                блокирующих задач и подзадач.
             show_all (bool, optional): Показать все задачи.
+            use_snapshot (bool, optional): Читать из локального снимка.
+            verbose (bool, optional): Показывать описания полностью, а не
+                первые Config.LIST_DESCRIPTION_PREVIEW символов.
             
         Returns:
             str: Отформатированный список задач.
         """
-        if show_all:
-            tasks = self.storage.get_all_tasks()
+        source = self._read_source(use_snapshot)
+        if source is self.snapshot and not self.snapshot.exists():
+            return self.SNAPSHOT_MISSING
+        if ready:
+            tasks = self.storage.get_ready_tasks()
+        elif show_all:
+            tasks = source.get_all_tasks(verbose)
         else:
-            tasks = self.storage.filter_tasks(status, priority, due_date)
+            tasks = source.filter_tasks(status, priority, due_date,
+                                        normalize_tags(tags), match_all_tags, verbose)
         
         if not tasks:
             return "📭 Задачи не найдены"
         
         # Показываем статистику
         if show_all:
-            stats = self.storage.get_statistics()
+            stats = source.get_statistics()
             result = [f"📊 Статистика: Всего {stats['total_tasks']} задач | "
                      f"Выполнено: {stats['completed_tasks']} ({stats['completion_rate']}%) | "
                      f"В ожидании: {stats['pending_tasks']}"]
@@ -78,17 +184,118 @@ class TaskCommands:
         else:
             result = []
         
-        for task in tasks:
-            task_str = str(task)
-            if task.description:
-                task_str += f"\n   📝 Описание: {task.description}"
-            if task.due_date:
-                task_str += f"\n   📅 Срок: {task.due_date}"
-            if task.status == TaskStatus.COMPLETED and task.completed_at:
-                task_str += f"\n   ✅ Завершена: {task.completed_at[:10]}"
-            result.append(task_str)
+        with tracing.span("render", rows=len(tasks)) as span:
+            for task in tasks:
+                result.append(self._format_task(task))
+            output = "\n\n".join(result)
+            span.set_attribute("bytes", len(output.encode("utf-8")))
+        return output
+    
+    @staticmethod
+    def _format_task(task: Task) -> str:
+        """Форматирует задачу с подробностями для вывода."""
+        task_str = str(task)
+        if task.description:
+            task_str += f"\n   📝 Описание: {task.description}"
+            if task.description_truncated:
+                task_str += f"… (полностью: show {task.id})"
+        if task.due_date:
+            task_str += f"\n   📅 Срок: {task.due_date}"
+        if task.tags:
+            task_str += f"\n   🏷️ Теги: " + " ".join(f"#{tag}" for tag in task.tags)
+        if task.status == TaskStatus.COMPLETED and task.completed_at:
+            task_str += f"\n   ✅ Завершена: {task.completed_at[:10]}"
+        return task_str
+    
+    def show_task(self, task_id: int, tree: bool = False) -> str:
+        """Показывает задачу, а с tree — все ее подзадачи.
+        
+        Args:
+            task_id (int): ID задачи.
+            tree (bool, optional): Показать дерево подзадач и блокировки.
+            
+        Returns:
+            str: Отформатированная задача или дерево.
+        """
+        if not tree:
+            task = self.storage.get_task_by_id(task_id)
+            if not task:
+                return f"❌ Ошибка: Задача с ID {task_id} не найдена"
+            result = self._format_task(task)
+            if task.parent_id:
+                result += f"\n   ⤴️ Подзадача задачи {task.parent_id}"
+            return result
+        
+        # Все дерево загружается одним запросом
+        nodes = self.storage.get_task_tree(task_id)
+        if not nodes:
+            return f"❌ Ошибка: Задача с ID {task_id} не найдена"
+        
+        lines = []
+        for depth, task, open_blockers in nodes:
+            indent = "    " * depth
+            line = f"{indent}{'└─ ' if depth else ''}{task}"
+            if open_blockers:
+                line += " ⛔ ждет: " + ", ".join(str(blocker) for blocker in open_blockers)
+            lines.append(line)
+        return "\n".join(lines)
+    
+    def link_tasks(self, task_id: int, blocked_by: List[int] = None,
+                   parent_id: int = None) -> str:
+        """Связывает задачу с блокирующими задачами и/или родителем.
+        
+        Args:
+            task_id (int): ID задачи.
+            blocked_by (List[int], optional): ID задач, которые ее блокируют.
+            parent_id (int, optional): ID родительской задачи.
+            
+        Returns:
+            str: Сообщение о результате операции.
+        """
+        if not blocked_by and parent_id is None:
+            return "Ошибка: Укажите --blocked-by и/или --parent"
+        
+        messages = []
+        try:
+            if parent_id is not None:
+                if not self.storage.set_parent(task_id, parent_id):
+                    return f"❌ Ошибка: Задача с ID {task_id} не найдена"
+                messages.append(f"🔗 Задача {task_id} стала подзадачей {parent_id}")
+            for blocker in blocked_by or []:
+                if self.storage.add_dependency(task_id, blocker):
+                    messages.append(f"🔗 Задача {task_id} ждет задачу {blocker}")
+                else:
+                    messages.append(f"ℹ️ Задача {task_id} уже ждет задачу {blocker}")
+        except ValueError as e:
+            messages.append(f"❌ Ошибка: {e}")
+        return "\n".join(messages)
+    
+    def unlink_tasks(self, task_id: int, blocked_by: List[int] = None,
+                     parent: bool = False) -> str:
+        """Снимает блокировки задачи и/или делает ее корневой.
         
-        return "\n\n".join(result)
+        Args:
+            task_id (int): ID задачи.
+            blocked_by (List[int], optional): ID блокирующих задач.
+            parent (bool, optional): Отвязать задачу от родителя.
+            
+        Returns:
+            str: Сообщение о результате операции.
+        """
+        if not blocked_by and not parent:
+            return "Ошибка: Укажите --blocked-by и/или --parent"
+        
+        messages = []
+        if parent:
+            if not self.storage.set_parent(task_id, None):
+                return f"❌ Ошибка: Задача с ID {task_id} не найдена"
+            messages.append(f"✂️ Задача {task_id} больше не подзадача")
+        for blocker in blocked_by or []:
+            if self.storage.remove_dependency(task_id, blocker):
+                messages.append(f"✂️ Задача {task_id} больше не ждет задачу {blocker}")
+            else:
+                messages.append(f"ℹ️ Задача {task_id} не ждала задачу {blocker}")
+        return "\n".join(messages)
 
     def complete_task(self, task_id: int) -> str:
         """Отмечает задачу как выполненную.
@@ -99,16 +306,27 @@ class TaskCommands:
         Returns:
             str: Сообщение о результате операции.
         """
-        task = self.storage.get_task_by_id(task_id)
-        if not task:
-            return f"❌ Ошибка: Задача с ID {task_id} не найдена"
+        if self.journal is not None:
+            self.journal.append('done', {'task_id': task_id})
+            return f"📝 Завершение задачи {task_id} записано в журнал"
         
-        if task.status == TaskStatus.COMPLETED:
-            return f"ℹ️ Задача {task_id} уже была завершена"
+        def complete():
+            task = self.storage.get_task_by_id(task_id, use_primary=True)
+            if not task:
+                return f"❌ Ошибка: Задача с ID {task_id} не найдена"
+            
+            if task.status == TaskStatus.COMPLETED:
+                return f"ℹ️ Задача {task_id} уже была завершена"
+            
+            task.mark_completed()
+            self.storage.save_task(task)
+            return f"✅ Задача {task_id} отмечена как выполненная"
         
-        task.mark_completed()
-        self.storage.save_task(task)
-        return f"✅ Задача {task_id} отмечена как выполненная"
+        # При конкурентном изменении задача перечитывается и проверяется заново
+        try:
+            return retry_on_conflict(complete)
+        except ConcurrentModificationError as e:
+            return f"❌ Ошибка: {e}"
 
     def delete_task(self, task_id: int) -> str:
         """Удаляет задачу.
@@ -119,18 +337,136 @@ class TaskCommands:
         Returns:
             str: Сообщение о результате операции.
         """
+        if self.journal is not None:
+            self.journal.append('delete', {'task_id': task_id})
+            return f"📝 Удаление задачи {task_id} записано в журнал"
+        
         if self.storage.delete_task(task_id):
             return f"🗑️ Задача {task_id} удалена"
         else:
             return f"❌ Ошибка: Задача с ID {task_id} не найдена"
     
-    def show_stats(self) -> str:
+    def update_tasks(self, where: List[str] = None, assignments: List[str] = None,
+                     dry_run: bool = False, all_tasks: bool = False) -> str:
+        """Массово изменяет поля задач, подходящих под условия.
+        
+        Args:
+            where (List[str], optional): Условия вида поле=значение: status,
+                priority, due_date, id (список 1,2,3 или диапазон 10..20).
+            assignments (List[str], optional): Присваивания вида поле=значение:
+                title, description, status, priority, due_date (none — очистить).
+            dry_run (bool, optional): Только показать число задач, которые изменятся.
+            all_tasks (bool, optional): Разрешить изменение без условий.
+            
+        Returns:
+            str: Сообщение о результате операции.
+        """
+        try:
+            filters = self._parse_update_filters(where or [])
+            values = self._parse_update_assignments(assignments or [])
+        except ValueError as e:
+            return f"Ошибка: {e}"
+        
+        if not self._has_update_filter(filters) and not all_tasks:
+            return "Ошибка: Не заданы условия --where. Для изменения всех задач укажите --all"
+        
+        task_ids = self.storage.update_tasks(values, dry_run=dry_run, **filters)
+        if dry_run:
+            return f"🔍 Будет изменено задач: {len(task_ids)}"
+        return f"✏️ Изменено задач: {len(task_ids)}"
+    
+    @staticmethod
+    def _split_pair(item: str):
+        """Разбирает строку поле=значение."""
+        name, separator, value = item.partition('=')
+        if not separator or not name.strip():
+            raise ValueError(f"Ожидается поле=значение, получено: {item}")
+        return name.strip().replace('-', '_'), value.strip()
+    
+    @staticmethod
+    def _enum_value(enum, name: str, value: str) -> str:
+        """Проверяет значение поля-перечисления."""
+        try:
+            return enum(value.lower()).value
+        except ValueError:
+            allowed = ", ".join(member.value for member in enum)
+            raise ValueError(f"Неверное значение {name}. Допустимые значения: {allowed}")
+    
+    def _parse_update_filters(self, where: List[str]) -> dict:
+        """Преобразует условия --where в аргументы фильтра хранилища."""
+        filters = {'status': None, 'priority': None, 'due_date': None,
+                   'ids': None, 'id_range': None}
+        for item in where:
+            name, value = self._split_pair(item)
+            if name == 'status':
+                filters['status'] = self._enum_value(TaskStatus, name, value)
+            elif name == 'priority':
+                filters['priority'] = self._enum_value(Priority, name, value)
+            elif name == 'due_date':
+                filters['due_date'] = date.fromisoformat(value).isoformat()
+            elif name == 'id' and '..' in value:
+                low, high = (bound.strip() for bound in value.split('..', 1))
+                if not low and not high:
+                    raise ValueError(f"Диапазон ID без границ: {value}")
+                filters['id_range'] = (int(low) if low else None, int(high) if high else None)
+            elif name == 'id':
+                filters['ids'] = [int(task_id) for task_id in value.split(',') if task_id.strip()]
+                if not filters['ids']:
+                    raise ValueError("Пустой список ID в условии id=")
+            else:
+                raise ValueError(f"Неизвестное условие: {name}")
+        return filters
+    
+    @staticmethod
+    def _has_update_filter(filters: dict) -> bool:
+        """Проверяет, даст ли фильтр хоть одно условие SQL (см. TaskStorage._filter_clause)."""
+        if any(filters[name] for name in ('status', 'priority', 'due_date', 'ids')):
+            return True
+        return any(bound is not None for bound in filters['id_range'] or ())
+    
+    def _parse_update_assignments(self, assignments: List[str]) -> dict:
+        """Преобразует присваивания --set в значения полей."""
+        values = {}
+        for item in assignments:
+            name, value = self._split_pair(item)
+            if name == 'status':
+                values['status'] = self._enum_value(TaskStatus, name, value)
+            elif name == 'priority':
+                values['priority'] = self._enum_value(Priority, name, value)
+            elif name == 'due_date':
+                values['due_date'] = None if value.lower() in ('', 'none') else date.fromisoformat(value).isoformat()
+            elif name == 'title':
+                if not value:
+                    raise ValueError("Название задачи не может быть пустым")
+                values['title'] = value
+            elif name == 'description':
+                values['description'] = value
+            else:
+                raise ValueError(f"Поле нельзя изменить: {name}")
+        if not values:
+            raise ValueError("Не заданы изменения --set")
+        return values
+    
+    def show_stats(self, by: str = None, since: str = None, rebuild: bool = False,
+                   use_snapshot: bool = False) -> str:
         """Показывает статистику по задачам.
         
+        Args:
+            by (str, optional): Группировка по периодам: day, week или month.
+            since (str, optional): Начальная дата для статистики по периодам.
+            rebuild (bool, optional): Пересчитать агрегаты с нуля.
+            use_snapshot (bool, optional): Считать по локальному снимку.
+            
         Returns:
             str: Отформатированная статистика.
         """
-        stats = self.storage.get_statistics()
+        if by:
+            return self.show_trends(by, since, rebuild)
+        
+        source = self._read_source(use_snapshot)
+        if source is self.snapshot and not self.snapshot.exists():
+            return self.SNAPSHOT_MISSING
+        stats = source.get_statistics()
         
         return (
             f"📊 СТАТИСТИКА ЗАДАЧ\n"
@@ -144,7 +480,467 @@ class TaskCommands:
             f"  Средний: {stats['medium_priority']}\n"
             f"  Низкий: {stats['low_priority']}\n"
             f"\n⚠️  Просрочено: {stats['overdue_tasks']}"
-        )
+        ) + self._format_tag_counts(stats.get('tags'))
+    
+    @staticmethod
+    def _format_tag_counts(tags: dict) -> str:
+        """Форматирует счетчики самых частых тегов для статистики."""
+        if not tags:
+            return ""
+        lines = [f"  #{tag}: {count}" for tag, count in tags.items()]
+        return "\n\n🏷️ По тегам:\n" + "\n".join(lines)
+
+    def show_trends(self, period: str, since: str = None, rebuild: bool = False) -> str:
+        """Показывает динамику создания и выполнения задач по периодам.
+        
+        Args:
+            period (str): Период группировки: day, week или month.
+            since (str, optional): Начальная дата (ГГГГ-ММ-ДД).
+            rebuild (bool, optional): Пересчитать агрегаты с нуля.
+            
+        Returns:
+            str: Отформатированная таблица по периодам.
+        """
+        period_names = {'day': 'по дням', 'week': 'по неделям', 'month': 'по месяцам'}
+        if period not in period_names:
+            return f"Ошибка: Неверный период. Допустимые значения: day, week, month"
+        
+        if rebuild:
+            self.storage.rebuild_stats_rollup()
+        rows = self.storage.get_statistics_by_period(period, since)
+        
+        if not rows:
+            return "📭 Нет данных за выбранный период"
+        
+        result = [
+            f"📈 ДИНАМИКА ЗАДАЧ ({period_names[period]})",
+            "=" * 52,
+            f"{'Период':<12} {'Создано':>9} {'Выполнено':>10} {'Медиана, ч':>12}"
+        ]
+        for row in rows:
+            median = row['median_lead_hours']
+            median_str = f"{median:.2f}" if median is not None else "—"
+            result.append(
+                f"{row['period']:<12} {row['created_tasks']:>9} "
+                f"{row['completed_tasks']:>10} {median_str:>12}"
+            )
+        
+        return "\n".join(result)
+
+    def sync(self, interval: float = None) -> str:
+        """Переносит операции из локального журнала в БД.
+        
+        Args:
+            interval (float, optional): Повторять синхронизацию с этим
+                интервалом в секундах до Ctrl+C.
+            
+        Returns:
+            str: Сообщение о результате синхронизации.
+        """
+        journal = self.journal or WriteJournal()
+        applied = total = 0
+        rejected_before = journal.rejected_count()
+        
+        try:
+            while True:
+                with tracing.span("sync.replay", root=True) as span:
+                    batch_applied, batch_total = journal.replay(self.storage.apply_journal_batch)
+                    span.set_attribute("rows", batch_applied)
+                applied += batch_applied
+                total += batch_total
+                if not interval:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        
+        if not total:
+            return "📭 Журнал пуст, синхронизировать нечего"
+        rejected = journal.rejected_count() - rejected_before
+        skipped = total - applied - rejected
+        result = f"🔄 Синхронизировано операций: {applied}"
+        if skipped:
+            result += f" (уже примененных ранее: {skipped})"
+        if rejected:
+            result += f"\n⚠️ Отклонено БД: {rejected}, операции сохранены в {journal.rejected_path}"
+        return result
+
+    def add_recurrence(self, title: str, frequency: str, interval: int = 1,
+                       starts_on: str = None, ends_on: str = None, description: str = "",
+                       priority: str = "medium", tags: List[str] = None) -> str:
+        """Создает правило повторяющейся задачи.
+        
+        Args:
+            title (str): Название создаваемых задач.
+            frequency (str): Периодичность: daily, weekly или monthly.
+            interval (int, optional): Каждые сколько периодов повторять.
+            starts_on (str, optional): Дата первого экземпляра (ГГГГ-ММ-ДД).
+            ends_on (str, optional): Последняя возможная дата экземпляра.
+            description (str, optional): Описание создаваемых задач.
+            priority (str, optional): Приоритет создаваемых задач.
+            tags (List[str], optional): Теги создаваемых задач.
+            
+        Returns:
+            str: Сообщение о результате операции.
+        """
+        try:
+            priority_enum = Priority(priority.lower())
+        except ValueError:
+            return f"Ошибка: Неверный приоритет. Допустимые значения: low, medium, high"
+        
+        for value in (starts_on, ends_on):
+            if value:
+                try:
+                    date.fromisoformat(value)
+                except ValueError:
+                    return f"Ошибка: Неверный формат даты. Используйте ГГГГ-ММ-ДД"
+        
+        template = Task(title, description, priority_enum, tags=tags)
+        try:
+            rule_id = self.storage.add_recurrence_rule(template, frequency, interval, starts_on, ends_on)
+        except ValueError as e:
+            return f"❌ Ошибка: {e}"
+        return (f"🔁 Правило повторения добавлено (ID: {rule_id}). "
+                f"Задачи будут созданы командой materialize")
+    
+    def list_recurrences(self) -> str:
+        """Показывает правила повторения.
+        
+        Returns:
+            str: Отформатированный список правил.
+        """
+        rules = self.storage.get_recurrence_rules()
+        if not rules:
+            return "📭 Правил повторения нет"
+        
+        frequency_names = {'daily': 'дн.', 'weekly': 'нед.', 'monthly': 'мес.'}
+        lines = [f"🔁 ПРАВИЛА ПОВТОРЕНИЯ ({len(rules)}):", "=" * 50]
+        for rule in rules:
+            line = (f"{rule['title']} (ID: {rule['id']}) — каждые {rule['interval_count']} "
+                    f"{frequency_names[rule['frequency']]} с {rule['starts_on']}")
+            if rule['ends_on']:
+                line += f" по {rule['ends_on']}"
+            if rule['materialized_through']:
+                line += f"\n   📅 Задачи созданы по {rule['materialized_through']}"
+            lines.append(line)
+        return "\n".join(lines)
+    
+    def delete_recurrence(self, rule_id: int) -> str:
+        """Удаляет правило повторения, не трогая уже созданные задачи.
+        
+        Args:
+            rule_id (int): ID правила.
+            
+        Returns:
+            str: Сообщение о результате операции.
+        """
+        if self.storage.delete_recurrence_rule(rule_id):
+            return f"🗑️ Правило повторения {rule_id} удалено"
+        return f"❌ Ошибка: Правило с ID {rule_id} не найдено"
+    
+    @staticmethod
+    def _parse_horizon(value: str) -> int:
+        """Переводит горизонт вида 30d, 4w или 30 в число дней."""
+        units = {'d': 1, 'w': 7}
+        value = value.strip().lower()
+        multiplier = units.get(value[-1:], None)
+        number = value[:-1] if multiplier else value
+        if not number.isdigit():
+            raise ValueError(f"Неверный горизонт: {value}. Используйте, например, 30d или 4w")
+        return int(number) * (multiplier or 1)
+    
+    def materialize(self, horizon: str = None, interval: float = None) -> str:
+        """Создает экземпляры повторяющихся задач на горизонт вперед.
+        
+        Args:
+            horizon (str, optional): Горизонт: 30d, 4w или число дней.
+                По умолчанию Config.RECURRENCE_HORIZON_DAYS.
+            interval (float, optional): Повторять с этим интервалом в
+                секундах до Ctrl+C.
+            
+        Returns:
+            str: Сообщение о числе созданных задач.
+        """
+        try:
+            horizon_days = self._parse_horizon(horizon) if horizon else None
+        except ValueError as e:
+            return f"Ошибка: {e}"
+        
+        created = 0
+        try:
+            while True:
+                with tracing.span("materialize.run", root=True) as span:
+                    batch_created = self.storage.materialize_recurrences(horizon_days)
+                    span.set_attribute("rows", batch_created)
+                created += batch_created
+                if not interval:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        
+        if not created:
+            return "📭 Новых повторяющихся задач нет"
+        return f"🔁 Создано повторяющихся задач: {created}"
+
+    def watch(self, status: str = None, priority: str = None, timeout: float = None) -> str:
+        """Выводит изменения задач по мере их появления.
+        
+        Args:
+            status (str, optional): Только задачи с этим статусом.
+            priority (str, optional): Только задачи с этим приоритетом.
+            timeout (float, optional): Завершить после стольких секунд без изменений.
+            
+        Returns:
+            str: Итоговое сообщение после остановки.
+        """
+        received = 0
+        try:
+            for event in self.storage.iter_changes(status, priority, timeout):
+                received += 1
+                with tracing.span("watch.event", root=True, op=event['op'], task_id=event['id']):
+                    print(self._format_change(event), flush=True)
+        except KeyboardInterrupt:
+            pass
+        return f"👋 Наблюдение остановлено. Получено изменений: {received}"
+    
+    @staticmethod
+    def _format_change(event: dict) -> str:
+        """Форматирует событие изменения задачи для вывода."""
+        operations = {'insert': '➕ Добавлена', 'update': '✏️ Изменена', 'delete': '🗑️ Удалена'}
+        status_icon = "✓" if event['status'] == TaskStatus.COMPLETED.value else "○"
+        priority_icon = {'low': "⬇", 'medium': "●", 'high': "⬆"}[event['priority']]
+        line = (f"{datetime.now():%H:%M:%S} {operations[event['op']]}: "
+                f"{status_icon} [{priority_icon}] {event['title']} (ID: {event['id']})")
+        if event.get('due_date'):
+            line += f" 📅 {event['due_date']}"
+        return line
+
+    def remind(self, hook: str = None, window_days: int = None) -> str:
+        """Выводит напоминания о наступивших сроках задач до Ctrl+C.
+        
+        Args:
+            hook (str, optional): Команда, получающая каждое напоминание
+                в JSON на stdin. По умолчанию Config.REMINDER_HOOK.
+            window_days (int, optional): На сколько дней вперед держать
+                задачи в памяти.
+            
+        Returns:
+            str: Итоговое сообщение после остановки.
+        """
+        hook = hook or Config.REMINDER_HOOK
+        
+        def notify(reminder: dict):
+            print(self._format_reminder(reminder), flush=True)
+            if hook and not run_hook(hook, reminder):
+                print(f"⚠️ Команда напоминания завершилась с ошибкой: {hook}", flush=True)
+        
+        daemon = ReminderDaemon(self.storage, notify, window_days)
+        try:
+            daemon.run()
+        except KeyboardInterrupt:
+            pass
+        return f"👋 Напоминания остановлены. Отправлено: {daemon.sent}"
+    
+    @staticmethod
+    def _format_reminder(reminder: dict) -> str:
+        """Форматирует напоминание о сроке задачи для вывода."""
+        priority_icon = {'low': "⬇", 'medium': "●", 'high': "⬆"}[reminder['priority']]
+        overdue = reminder['due_date'] < date.today().isoformat()
+        label = "⚠️ Просрочена" if overdue else "⏰ Срок наступил"
+        return (f"{datetime.now():%H:%M:%S} {label}: ○ [{priority_icon}] {reminder['title']} "
+                f"(ID: {reminder['id']}) 📅 {reminder['due_date']}")
+
+    def backup(self, path: str, compress_level: int = 0) -> str:
+        """Сохраняет резервную копию задач всех владельцев в файл.
+        
+        Args:
+            path (str): Путь к файлу копии.
+            compress_level (int, optional): Уровень сжатия gzip (0 — без сжатия).
+            
+        Returns:
+            str: Сообщение с объемом и скоростью копирования.
+        """
+        summary = backup_database(self.storage, path, compress_level)
+        return self._format_copy_summary("💾 Резервная копия сохранена", path, summary)
+    
+    def restore(self, path: str, force: bool = False, check: bool = False) -> str:
+        """Восстанавливает задачи из резервной копии или только проверяет ее.
+        
+        Args:
+            path (str): Путь к файлу копии.
+            force (bool, optional): Заменить задачи, уже имеющиеся в БД.
+            check (bool, optional): Только сверить контрольные суммы.
+            
+        Returns:
+            str: Сообщение с объемом и скоростью восстановления.
+        """
+        try:
+            if check:
+                summary = verify_backup(path)
+                return self._format_copy_summary("✅ Резервная копия не повреждена", path, summary)
+            summary = restore_database(self.storage, path, replace=force)
+        except (OSError, ValueError) as e:
+            return f"❌ Ошибка: {e}"
+        return self._format_copy_summary("♻️ Задачи восстановлены", path, summary)
+    
+    def export(self, path: str, fmt: str = "jsonl", parallel: int = 1, keep_parts: bool = False) -> str:
+        """Экспортирует задачи в файл, при parallel > 1 — несколькими процессами.
+        
+        Args:
+            path (str): Путь к файлу экспорта.
+            fmt (str, optional): Формат: jsonl или csv.
+            parallel (int, optional): Число процессов.
+            keep_parts (bool, optional): Оставить отдельные файлы диапазонов ID.
+            
+        Returns:
+            str: Сообщение с числом строк и скоростью экспорта.
+        """
+        try:
+            summary = export_tasks(self.storage, path, fmt, parallel, keep_parts)
+        except (OSError, ValueError) as e:
+            return f"❌ Ошибка: {e}"
+        
+        seconds = max(summary['seconds'], 1e-6)
+        files = path if not keep_parts else f"{len(summary['parts'])} файлов {path}.part-*"
+        return (f"📤 Экспортировано задач: {summary['rows']} в {files}\n"
+                f"   Время: {seconds:.1f} с ({summary['rows'] / seconds:.0f} строк/с, "
+                f"процессов: {parallel}, ускорение x{summary['worker_seconds'] / seconds:.1f})")
+    
+    def seed(self, count: int, chunk_size: int = None, drop_indexes: bool = False) -> str:
+        """Создает синтетические задачи для нагрузочных и тестовых баз.
+        
+        Args:
+            count (int): Число задач.
+            chunk_size (int, optional): Число строк в транзакции.
+            drop_indexes (bool, optional): Перестроить индексы после вставки.
+            
+        Returns:
+            str: Сообщение с числом задач и скоростью вставки.
+        """
+        if count < 1 or (chunk_size is not None and chunk_size < 1):
+            return "❌ Ошибка: число задач и размер порции должны быть положительными"
+        
+        started = time.monotonic()
+        created = self.storage.seed_tasks(count, chunk_size, drop_indexes)
+        seconds = max(time.monotonic() - started, 1e-6)
+        return (f"🌱 Создано задач: {created}\n"
+                f"   Время: {seconds:.1f} с ({created / seconds:.0f} строк/с)")
+    
+    def maintain(self, analyze: bool = False, vacuum: bool = False, reindex: List[str] = None) -> str:
+        """Показывает состояние таблиц и индексов и выполняет обслуживание.
+        
+        Args:
+            analyze (bool, optional): Обновить статистику планировщика (ANALYZE).
+            vacuum (bool, optional): Очистить мертвые строки (VACUUM (ANALYZE)).
+            reindex (List[str], optional): Перестроить индексы без блокировки
+                записи. Пустой список — все раздутые индексы. Перед этим
+                удаляются невалидные копии, оставшиеся от прерванного
+                перестроения.
+                
+        Returns:
+            str: Отчет о таблицах и индексах и выполненных действиях.
+        """
+        shards = getattr(self.storage, "shards", [self.storage])
+        sections = []
+        for index, storage in enumerate(shards):
+            lines = [f"🗄  Шард {index}"] if len(shards) > 1 else []
+            if vacuum or analyze:
+                tables = storage.vacuum_tables(vacuum)
+                lines.append(f"🧹 {'VACUUM (ANALYZE)' if vacuum else 'ANALYZE'}: {', '.join(tables)}")
+            if reindex is not None:
+                dropped = storage.drop_invalid_indexes()
+                if dropped:
+                    lines.append(f"🗑  Удалены невалидные индексы: {', '.join(dropped)}")
+            report = storage.get_maintenance_report()
+            
+            if reindex is not None:
+                names = reindex or [item['name'] for item in report['indexes'] if item['bloated']]
+                if names:
+                    try:
+                        storage.reindex_indexes(names)
+                    except ValueError as e:
+                        return f"❌ Ошибка: {e}"
+                    lines.append(f"🔧 Перестроены индексы: {', '.join(names)}")
+                    report = storage.get_maintenance_report()
+                elif report['bloat_measured']:
+                    lines.append("🔧 Раздутых индексов нет")
+            
+            lines.append(self._format_maintenance_report(report))
+            sections.append("\n".join(lines))
+        return "\n\n".join(sections)
+    
+    @staticmethod
+    def _format_size(size: int) -> str:
+        """Форматирует размер в байтах."""
+        for unit in ("Б", "КБ", "МБ"):
+            if size < 1024:
+                return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+            size /= 1024
+        return f"{size:.1f} ГБ"
+    
+    def _format_maintenance_report(self, report: dict) -> str:
+        """Форматирует отчет о размерах таблиц и использовании индексов."""
+        since = f" (статистика с {report['stats_reset']:%Y-%m-%d %H:%M})" if report['stats_reset'] else ""
+        lines = [f"📦 Таблицы{since}:"]
+        for table in report['tables']:
+            rows = table['live_tuples'] + table['dead_tuples']
+            dead_share = table['dead_tuples'] / rows * 100 if rows else 0
+            vacuumed = f"{table['last_vacuum']:%Y-%m-%d}" if table['last_vacuum'] else "никогда"
+            analyzed = f"{table['last_analyze']:%Y-%m-%d}" if table['last_analyze'] else "никогда"
+            lines.append(f"  {table['name']:<22} {self._format_size(table['total_bytes']):>10}  "
+                         f"строк: {table['live_tuples']}, мертвых: {table['dead_tuples']} "
+                         f"({dead_share:.1f}%), vacuum: {vacuumed}, analyze: {analyzed}")
+        
+        lines.append("🔎 Индексы:")
+        for index in report['indexes']:
+            bloat = f", пустого места: {index['bloat'] * 100:.0f}%" if index['bloat'] is not None else ""
+            problems = []
+            if not index['is_valid']:
+                problems.append("невалиден (прерванное перестроение)")
+            if index['bloated']:
+                problems.append("раздут")
+            if index['unused']:
+                problems.append("не используется")
+            if index['redundant_of']:
+                problems.append(f"дублирует {index['redundant_of']}")
+            warning = f"  ⚠️  {'; '.join(problems)}" if problems else ""
+            lines.append(f"  {index['table_name'] + '.' + index['name']:<45} "
+                         f"{self._format_size(index['bytes']):>10}  "
+                         f"сканирований: {index['scans']}{bloat}{warning}")
+        
+        if not report['bloat_measured']:
+            lines.append("ℹ️  Раздутость индексов не измерена: установите расширение pgstattuple")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def _format_copy_summary(title: str, path: str, summary: dict) -> str:
+        """Форматирует итоги копирования: строки по таблицам и пропускную способность."""
+        seconds = max(summary['seconds'], 1e-6)
+        megabytes = summary['bytes'] / (1024 * 1024)
+        tables = ", ".join(f"{table}: {rows}" for table, rows in summary['tables'].items())
+        return (f"{title}: {path}\n"
+                f"   Строк: {summary['rows']} ({tables})\n"
+                f"   Данных: {megabytes:.1f} МБ, файл: {summary['file_bytes'] / (1024 * 1024):.1f} МБ\n"
+                f"   Время: {seconds:.1f} с ({summary['rows'] / seconds:.0f} строк/с, "
+                f"{megabytes / seconds:.1f} МБ/с)")
+
+    def serve(self, host: str = None, port: int = None, workers: int = None,
+              log_requests: bool = False, coalesce_writes: bool = False) -> str:
+        """Запускает HTTP JSON API поверх хранилища задач.
+        
+        Args:
+            host (str, optional): Адрес для прослушивания.
+            port (int, optional): Порт для прослушивания.
+            workers (int, optional): Число рабочих потоков.
+            log_requests (bool, optional): Писать журнал запросов.
+            coalesce_writes (bool, optional): Объединять вставки в пакеты.
+            
+        Returns:
+            str: Сообщение после остановки сервера.
+        """
+        from server import run_server
+        return run_server(self.storage, host, port, workers, log_requests, coalesce_writes)
 
     def setup_argparse(self):
         """Настраивает парсер аргументов командной строки.
@@ -159,13 +955,46 @@ class TaskCommands:
 Примеры использования:
   python main.py add --title "Купить продукты" --priority high --due-date 2024-12-01
   python main.py list --status pending
+  python main.py list --tag work --tag urgent --match all
   python main.py list --all
+  python main.py list --snapshot --status pending
   python main.py done 1
+  python main.py link 5 --blocked-by 3 --parent 1
+  python main.py show 1 --tree
+  python main.py list --ready
   python main.py delete 2
+  python main.py update --where status=pending --where id=10..500 --set priority=high
   python main.py stats
+  python main.py stats --by week --since 2024-01-01
+  python main.py serve --port 8080 --workers 8
+  python main.py watch --status pending
+  python main.py --offline add --title "Позвонить"
+  python main.py sync
+  python main.py --owner alice list
+  python main.py recur add --title "Полить цветы" --every weekly --start 2024-12-02
+  python main.py materialize --horizon 30d
+  python main.py remind --hook "notify-send Задачи"
+  python main.py export tasks.jsonl --parallel 4
+  python main.py backup tasks.bak --compress
+  python main.py restore tasks.bak --force
+  python main.py seed --count 1000000 --drop-indexes
+  python main.py maintain --vacuum --reindex
+  python main.py --metrics-file /var/lib/node_exporter/tasks.prom list
+  python main.py --trace-file traces.jsonl serve
             """
         )
         
+        parser.add_argument('--offline', action='store_true', 
+                           help='Записывать add/done/delete в локальный журнал без обращения к БД')
+        parser.add_argument('--owner', 
+                           help='Владелец задач (по умолчанию TASK_OWNER или имя пользователя ОС)')
+        parser.add_argument('--metrics-port', type=int, 
+                           help='Отдавать метрики Prometheus на http://127.0.0.1:PORT/metrics')
+        parser.add_argument('--metrics-file', 
+                           help='Записать метрики Prometheus в файл при выходе')
+        parser.add_argument('--trace-file', 
+                           help='Дописывать спаны трассировки строками JSON в файл')
+        
         subparsers = parser.add_subparsers(dest='command', help='Доступные команды')
 
         # Команда add
@@ -175,6 +1004,9 @@ class TaskCommands:
         add_parser.add_argument('--priority', choices=['low', 'medium', 'high'], 
                                default='medium', help='Приоритет задачи')
         add_parser.add_argument('--due-date', help='Срок выполнения (ГГГГ-ММ-ДД)')
+        add_parser.add_argument('--tag', action='append', dest='tags', 
+                               help='Тег задачи (можно указать несколько раз)')
+        add_parser.add_argument('--parent', type=int, help='ID родительской задачи')
 
         # Команда list
         list_parser = subparsers.add_parser('list', help='Показать список задач')
@@ -185,6 +1017,37 @@ class TaskCommands:
         list_parser.add_argument('--due-date', help='Фильтр по сроку (ГГГГ-ММ-ДД)')
         list_parser.add_argument('--all', action='store_true', 
                                 help='Показать все задачи без фильтров')
+        list_parser.add_argument('--tag', action='append', dest='tags', 
+                                help='Фильтр по тегу (можно указать несколько раз)')
+        list_parser.add_argument('--match', choices=['any', 'all'], default='any', 
+                                help='С несколькими --tag: любой из тегов или все сразу')
+        list_parser.add_argument('--ready', action='store_true', 
+                                help='Только задачи без незавершенных блокировок и подзадач')
+        list_parser.add_argument('-v', '--verbose', action='store_true', 
+                                help='Показывать описания полностью')
+        list_parser.add_argument('--snapshot', action='store_true', 
+                                help='Читать из локального снимка, подтянув только изменения')
+
+        # Команда show
+        show_parser = subparsers.add_parser('show', help='Показать задачу')
+        show_parser.add_argument('task_id', type=int, help='ID задачи')
+        show_parser.add_argument('--tree', action='store_true', 
+                                help='Показать все подзадачи и блокировки')
+
+        # Команда link
+        link_parser = subparsers.add_parser('link', help='Связать задачу с блокирующими задачами или родителем')
+        link_parser.add_argument('task_id', type=int, help='ID задачи')
+        link_parser.add_argument('--blocked-by', type=int, action='append', 
+                                help='ID задачи, которую нужно завершить раньше')
+        link_parser.add_argument('--parent', type=int, help='ID родительской задачи')
+
+        # Команда unlink
+        unlink_parser = subparsers.add_parser('unlink', help='Снять связи задачи')
+        unlink_parser.add_argument('task_id', type=int, help='ID задачи')
+        unlink_parser.add_argument('--blocked-by', type=int, action='append', 
+                                  help='ID блокирующей задачи')
+        unlink_parser.add_argument('--parent', action='store_true', 
+                                  help='Отвязать от родительской задачи')
 
         # Команда done
         done_parser = subparsers.add_parser('done', help='Отметить задачу как выполненную')
@@ -194,8 +1057,129 @@ class TaskCommands:
         delete_parser = subparsers.add_parser('delete', help='Удалить задачу')
         delete_parser.add_argument('task_id', type=int, help='ID задачи')
         
+        # Команда update
+        update_parser = subparsers.add_parser('update', help='Массово изменить поля задач')
+        update_parser.add_argument('--where', action='append', metavar='ПОЛЕ=ЗНАЧЕНИЕ', 
+                                  help='Условие: status, priority, due_date, id (1,2,3 или 10..20)')
+        update_parser.add_argument('--set', action='append', required=True, dest='assignments', 
+                                  metavar='ПОЛЕ=ЗНАЧЕНИЕ', 
+                                  help='Новое значение: title, description, status, priority, due_date')
+        update_parser.add_argument('--dry-run', action='store_true', 
+                                  help='Только показать число задач, которые изменятся')
+        update_parser.add_argument('--all', action='store_true', 
+                                  help='Разрешить изменение без условий --where')
+        
         # Команда stats
         stats_parser = subparsers.add_parser('stats', help='Показать статистику по задачам')
+        stats_parser.add_argument('--by', choices=['day', 'week', 'month'], 
+                                 help='Динамика по периодам')
+        stats_parser.add_argument('--since', help='Начальная дата для --by (ГГГГ-ММ-ДД)')
+        stats_parser.add_argument('--rebuild', action='store_true', 
+                                 help='Пересчитать агрегаты с нуля (после удаления задач)')
+        stats_parser.add_argument('--snapshot', action='store_true', 
+                                 help='Считать по локальному снимку, подтянув только изменения')
+
+        # Команда serve
+        serve_parser = subparsers.add_parser('serve', help='Запустить HTTP JSON API')
+        serve_parser.add_argument('--host', help='Адрес для прослушивания')
+        serve_parser.add_argument('--port', type=int, help='Порт для прослушивания')
+        serve_parser.add_argument('--workers', type=int, 
+                                 help='Число рабочих потоков и соединений с БД')
+        serve_parser.add_argument('--log-requests', action='store_true', 
+                                 help='Выводить журнал запросов')
+        serve_parser.add_argument('--coalesce-writes', action='store_true', 
+                                 help='Объединять конкурентные добавления в пакетные INSERT')
+
+        # Команда watch
+        watch_parser = subparsers.add_parser('watch', help='Следить за изменениями задач в реальном времени')
+        watch_parser.add_argument('--status', choices=['pending', 'completed'], 
+                                 help='Фильтр по статусу')
+        watch_parser.add_argument('--priority', choices=['low', 'medium', 'high'], 
+                                 help='Фильтр по приоритету')
+        watch_parser.add_argument('--timeout', type=float, 
+                                 help='Завершить после N секунд без изменений')
+
+        # Команда sync
+        sync_parser = subparsers.add_parser('sync', help='Перенести операции из локального журнала в БД')
+        sync_parser.add_argument('--interval', type=float, 
+                                help='Повторять синхронизацию каждые N секунд до Ctrl+C')
+
+        # Команда recur
+        recur_parser = subparsers.add_parser('recur', help='Управлять повторяющимися задачами')
+        recur_subparsers = recur_parser.add_subparsers(dest='recur_command', required=True)
+        recur_add_parser = recur_subparsers.add_parser('add', help='Добавить правило повторения')
+        recur_add_parser.add_argument('--title', required=True, help='Название задач')
+        recur_add_parser.add_argument('--description', default='', help='Описание задач')
+        recur_add_parser.add_argument('--priority', choices=['low', 'medium', 'high'], 
+                                     default='medium', help='Приоритет задач')
+        recur_add_parser.add_argument('--tag', action='append', dest='tags', 
+                                     help='Тег задач (можно указать несколько раз)')
+        recur_add_parser.add_argument('--every', required=True, choices=['daily', 'weekly', 'monthly'], 
+                                     help='Периодичность')
+        recur_add_parser.add_argument('--interval', type=int, default=1, 
+                                     help='Повторять каждые N периодов')
+        recur_add_parser.add_argument('--start', help='Дата первой задачи (ГГГГ-ММ-ДД)')
+        recur_add_parser.add_argument('--until', help='Дата окончания повторений (ГГГГ-ММ-ДД)')
+        recur_subparsers.add_parser('list', help='Показать правила повторения')
+        recur_delete_parser = recur_subparsers.add_parser('delete', help='Удалить правило повторения')
+        recur_delete_parser.add_argument('rule_id', type=int, help='ID правила')
+
+        # Команда materialize
+        materialize_parser = subparsers.add_parser('materialize', 
+                                                  help='Создать экземпляры повторяющихся задач')
+        materialize_parser.add_argument('--horizon', 
+                                       help='На сколько вперед создавать задачи: 30d, 4w (по умолчанию из Config)')
+        materialize_parser.add_argument('--interval', type=float, 
+                                       help='Повторять каждые N секунд до Ctrl+C')
+
+        # Команда remind
+        remind_parser = subparsers.add_parser('remind', help='Напоминать о наступлении сроков задач')
+        remind_parser.add_argument('--hook', 
+                                  help='Команда, получающая напоминание в JSON на stdin')
+        remind_parser.add_argument('--window', type=int, 
+                                  help='На сколько дней вперед держать задачи в памяти')
+
+        # Команда export
+        export_parser = subparsers.add_parser('export', help='Экспортировать задачи в файл')
+        export_parser.add_argument('file', help='Файл экспорта')
+        export_parser.add_argument('--format', choices=EXPORT_FORMATS, default='jsonl', 
+                                  help='Формат файла')
+        export_parser.add_argument('--parallel', type=int, default=1, metavar='N', 
+                                  help='Число процессов, выгружающих диапазоны ID')
+        export_parser.add_argument('--keep-parts', action='store_true', 
+                                  help='Оставить отдельный файл на каждый диапазон ID')
+
+        # Команды backup и restore
+        backup_parser = subparsers.add_parser('backup', help='Сохранить резервную копию задач в файл')
+        backup_parser.add_argument('file', help='Файл резервной копии')
+        backup_parser.add_argument('--compress', type=int, nargs='?', const=1, default=0, 
+                                  choices=range(0, 10), metavar='LEVEL', 
+                                  help='Сжать gzip (уровень 1-9, по умолчанию 1)')
+        restore_parser = subparsers.add_parser('restore', help='Восстановить задачи из резервной копии')
+        restore_parser.add_argument('file', help='Файл резервной копии')
+        restore_parser.add_argument('--force', action='store_true', 
+                                   help='Заменить задачи, уже имеющиеся в БД')
+        restore_parser.add_argument('--check', action='store_true', 
+                                   help='Только проверить контрольные суммы, не обращаясь к БД')
+
+        # Команда seed
+        seed_parser = subparsers.add_parser('seed', help='Создать синтетические задачи для тестов')
+        seed_parser.add_argument('--count', type=int, required=True, help='Число задач')
+        seed_parser.add_argument('--chunk-size', type=int, 
+                                help='Число строк в одной транзакции')
+        seed_parser.add_argument('--drop-indexes', action='store_true', 
+                                help='Удалить индексы на время вставки и построить их заново')
+
+        # Команда maintain
+        maintain_parser = subparsers.add_parser('maintain', 
+                                                help='Отчет о размерах таблиц и индексов и их обслуживание')
+        maintain_parser.add_argument('--analyze', action='store_true', 
+                                    help='Обновить статистику планировщика')
+        maintain_parser.add_argument('--vacuum', action='store_true', 
+                                    help='Очистить мертвые строки (VACUUM, включает ANALYZE)')
+        maintain_parser.add_argument('--reindex', nargs='*', metavar='INDEX', 
+                                    help='Перестроить индексы без блокировки записи '
+                                         '(без имен — все раздутые)')
 
         return parser
 
@@ -213,20 +1197,83 @@ class TaskCommands:
                 title=args.title,
                 description=args.description or "",
                 priority=args.priority,
-                due_date=args.due_date
+                due_date=args.due_date,
+                tags=args.tags,
+                parent_id=args.parent
             )
         elif args.command == 'list':
             return self.list_tasks(
                 status=args.status,
                 priority=args.priority,
                 due_date=args.due_date,
-                show_all=args.all
+                show_all=args.all,
+                use_snapshot=args.snapshot,
+                tags=args.tags,
+                match_all_tags=args.match == 'all',
+                ready=args.ready,
+                verbose=args.verbose
             )
+        elif args.command == 'show':
+            return self.show_task(args.task_id, tree=args.tree)
+        elif args.command == 'link':
+            return self.link_tasks(args.task_id, blocked_by=args.blocked_by, parent_id=args.parent)
+        elif args.command == 'unlink':
+            return self.unlink_tasks(args.task_id, blocked_by=args.blocked_by, parent=args.parent)
         elif args.command == 'done':
             return self.complete_task(args.task_id)
         elif args.command == 'delete':
             return self.delete_task(args.task_id)
+        elif args.command == 'update':
+            return self.update_tasks(
+                where=args.where,
+                assignments=args.assignments,
+                dry_run=args.dry_run,
+                all_tasks=args.all
+            )
         elif args.command == 'stats':
-            return self.show_stats()
+            return self.show_stats(by=args.by, since=args.since, rebuild=args.rebuild,
+                                   use_snapshot=args.snapshot)
+        elif args.command == 'watch':
+            return self.watch(status=args.status, priority=args.priority, timeout=args.timeout)
+        elif args.command == 'sync':
+            return self.sync(interval=args.interval)
+        elif args.command == 'recur':
+            if args.recur_command == 'add':
+                return self.add_recurrence(
+                    title=args.title,
+                    frequency=args.every,
+                    interval=args.interval,
+                    starts_on=args.start,
+                    ends_on=args.until,
+                    description=args.description or "",
+                    priority=args.priority,
+                    tags=args.tags
+                )
+            elif args.recur_command == 'list':
+                return self.list_recurrences()
+            return self.delete_recurrence(args.rule_id)
+        elif args.command == 'materialize':
+            return self.materialize(horizon=args.horizon, interval=args.interval)
+        elif args.command == 'remind':
+            return self.remind(hook=args.hook, window_days=args.window)
+        elif args.command == 'export':
+            return self.export(args.file, fmt=args.format, parallel=args.parallel,
+                               keep_parts=args.keep_parts)
+        elif args.command == 'backup':
+            return self.backup(args.file, compress_level=args.compress)
+        elif args.command == 'restore':
+            return self.restore(args.file, force=args.force, check=args.check)
+        elif args.command == 'seed':
+            return self.seed(args.count, chunk_size=args.chunk_size, drop_indexes=args.drop_indexes)
+        elif args.command == 'maintain':
+            return self.maintain(analyze=args.analyze, vacuum=args.vacuum, reindex=args.reindex)
+        elif args.command == 'serve':
+            return self.serve(
+                host=args.host,
+                port=args.port,
+                workers=args.workers,
+                log_requests=args.log_requests,
+                coalesce_writes=args.coalesce_writes
+            )
         else:
             return "Используйте --help для просмотра доступных команд"
\ No newline at end of file
@@ -1,3 +1,7 @@
+import getpass
+import os
+
+
 class Config:
     """Конфигурация подключения к PostgreSQL."""
     
@@ -7,6 +11,114 @@ class Config:
     DB_HOST = "localhost"
     DB_PORT = "5432"
     
+    # Владелец задач: все запросы видят только его задачи.
+    # Переопределяется глобальным параметром --owner
+    TASK_OWNER = os.environ.get("TASK_OWNER") or getpass.getuser()
+    # Дополнительно ограничивать доступ политиками row-level security.
+    # Не действует, если приложение подключается суперпользователем
+    ROW_LEVEL_SECURITY = False
+    
+    # Реплики только для чтения в формате "host:port" или "host"
+    DB_REPLICAS = []
+    # Допустимое отставание реплики; столько же секунд после записи
+    # чтение идет с основного сервера (read-your-writes)
+    REPLICA_MAX_LAG_SECONDS = 5
+    REPLICA_LAG_CHECK_INTERVAL = 2
+    
+    # Шардирование: имена баз данных шардов на основном сервере.
+    # Порядок важен: номер шарда закодирован в ID задач
+    SHARD_DATABASES = []
+    
+    # Пул соединений (используется в режиме сервера)
+    DB_POOL_MIN = 1
+    DB_POOL_MAX = 8
+    # Сколько секунд ждать свободное соединение из пула
+    DB_POOL_TIMEOUT = 10
+    
+    # Предельное время установки соединения, секунды
+    DB_CONNECT_TIMEOUT = 5
+    # Предельное время выполнения запросов по классам команд, миллисекунды
+    # (0 — без ограничения)
+    STATEMENT_TIMEOUTS_MS = {
+        "read": 5000,
+        "write": 5000,
+        "bulk": 600000
+    }
+    # Предельное время ожидания блокировки строки или таблицы, миллисекунды
+    LOCK_TIMEOUT_MS = 2000
+    
+    # Параметры HTTP API сервера
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 8080
+    SERVER_WORKERS = 8
+    SERVER_KEEPALIVE_TIMEOUT = 5
+    # Сколько принятых соединений может ждать свободный поток; сверх этого
+    # сервер сразу отвечает 503
+    SERVER_MAX_QUEUE = 64
+    # Заголовок запроса с владельцем задач; без него запрос выполняется от
+    # владельца сервера (--owner). Сервер не проверяет подлинность
+    # заголовка: его должен задавать аутентифицирующий прокси перед API
+    SERVER_OWNER_HEADER = "X-Task-Owner"
+    # Сколько хранилищ владельцев из заголовка сервер держит готовыми
+    SERVER_OWNER_CACHE_SIZE = 256
+    
+    # Объединение вставок в пакеты (serve --coalesce-writes)
+    INSERT_BATCH_SIZE = 100
+    INSERT_BATCH_DELAY_MS = 5
+    
+    # Автономный режим: add/done/delete пишутся в локальный журнал,
+    # а команда sync переносит их в БД
+    JOURNAL_ENABLED = False
+    JOURNAL_PATH = os.path.join(os.path.expanduser("~"), ".task_manager", "journal.jsonl")
+    JOURNAL_SYNC_BATCH = 500
+    
+    # Локальный снимок задач для list/stats --snapshot. Изменения
+    # запрашиваются с запасом, чтобы не пропустить транзакции, которые
+    # зафиксировались позже, чем были сделаны
+    SNAPSHOT_PATH = os.path.join(os.path.expanduser("~"), ".task_manager", "snapshot.bin")
+    SNAPSHOT_OVERLAP_SECONDS = 60
+    
+    # Сколько символов описания загружать для list без --verbose: полное
+    # описание (неограниченный TEXT) показывает show <id>
+    LIST_DESCRIPTION_PREVIEW = 80
+    
+    # Экспорт: размер порции серверного курсора и число диапазонов ID на
+    # процесс (export --parallel); мелкие диапазоны выравнивают нагрузку,
+    # если ID распределены неравномерно
+    EXPORT_BATCH_SIZE = 10000
+    EXPORT_RANGES_PER_WORKER = 4
+    
+    # Генерация тестовых задач (seed): число строк в одной транзакции
+    SEED_CHUNK_SIZE = 100000
+    
+    # Обслуживание (maintain): доля пустого места в индексе, при которой
+    # он считается раздутым и перестраивается по maintain --reindex
+    INDEX_BLOAT_THRESHOLD = 0.3
+    
+    # Метрики Prometheus: порт HTTP (--metrics-port) и файл, в который
+    # метрики записываются при выходе (--metrics-file); None — выключено
+    METRICS_PORT = None
+    METRICS_FILE = None
+    # Файл трассировки (--trace-file): спаны строками JSON в форме OTLP;
+    # None — трассировка выключена
+    TRACE_FILE = None
+    
+    # Сколько самых частых тегов показывать в статистике
+    STATS_TOP_TAGS = 10
+    
+    # На сколько дней вперед materialize создает экземпляры повторяющихся задач
+    RECURRENCE_HORIZON_DAYS = 30
+    
+    # Напоминания remind: время суток, в которое наступает срок задачи,
+    # и на сколько дней вперед загружаются задачи за один запрос
+    REMINDER_TIME = "09:00"
+    REMINDER_WINDOW_DAYS = 7
+    # Команда, которой передается напоминание в JSON на stdin (None — только вывод)
+    REMINDER_HOOK = None
+    
+    # Число попыток при конфликте версий (оптимистичные блокировки)
+    OPTIMISTIC_RETRY_ATTEMPTS = 3
+    
     @classmethod
     def get_connection_params(cls):
         """Возвращает параметры подключения."""
@@ -15,5 +127,20 @@ class Config:
             "user": cls.DB_USER,
             "password": cls.DB_PASSWORD,
             "host": cls.DB_HOST,
-            "port": cls.DB_PORT
-        }
\ No newline at end of file
+            "port": cls.DB_PORT,
+            "connect_timeout": cls.DB_CONNECT_TIMEOUT
+        }
+    
+    @classmethod
+    def get_replica_params(cls):
+        """Возвращает параметры подключения к репликам из DB_REPLICAS."""
+        replicas = []
+        for endpoint in cls.DB_REPLICAS:
+            host, _, port = endpoint.partition(":")
+            replicas.append({**cls.get_connection_params(), "host": host, "port": port or cls.DB_PORT})
+        return replicas
+    
+    @classmethod
+    def get_shard_params(cls):
+        """Возвращает параметры подключения к базам шардов из SHARD_DATABASES."""
+        return [{**cls.get_connection_params(), "dbname": name} for name in cls.SHARD_DATABASES]
@@ -0,0 +1,146 @@
+"""
+Модуль экспорта задач в файл для менеджера задач.
+
+Диапазон ID задач делится на части, и каждую часть в отдельном процессе
+читает серверный курсор своего соединения и форматирует в свой файл.
+Так экспорт большой таблицы не упирается ни в один серверный процесс
+PostgreSQL, ни в один процесс Python. Затем части склеиваются в общий
+файл в порядке ID либо остаются отдельными файлами.
+"""
+
+import csv
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+from config import Config
+from storage import TaskStorage
+
+FORMATS = ("jsonl", "csv")
+COLUMNS = ("id", "title", "description", "status", "priority", "created_at", "due_date",
+           "completed_at", "version", "tags", "parent_id")
+
+
+def _plain(value):
+    """Приводит значение столбца к виду Task.to_dict."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return str(value)
+    return value
+
+
+def export_range(job: dict) -> Dict[str, Any]:
+    """Выгружает один диапазон ID в файл части (выполняется в процессе пула).
+
+    Args:
+        job (dict): connection_params, owner, first_id, last_id, path, format
+            и header (писать ли строку заголовка CSV).
+
+    Returns:
+        Dict[str, Any]: Путь к части, число строк и время работы в секундах.
+    """
+    started = time.monotonic()
+    rows = TaskStorage.iter_id_range(job["connection_params"], job["owner"],
+                                     job["first_id"], job["last_id"])
+    count = 0
+    with open(job["path"], "w", encoding="utf-8", newline="") as f:
+        if job["format"] == "csv":
+            writer = csv.writer(f)
+            if job["header"]:
+                writer.writerow(COLUMNS)
+            for row in rows:
+                values = [_plain(row[column]) for column in COLUMNS]
+                values[COLUMNS.index("tags")] = ",".join(row["tags"] or [])
+                writer.writerow(values)
+                count += 1
+        else:
+            for row in rows:
+                record = {column: _plain(row[column]) for column in COLUMNS}
+                record["tags"] = list(row["tags"] or [])
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write("\n")
+                count += 1
+    return {"path": job["path"], "rows": count, "seconds": time.monotonic() - started}
+
+
+def _shards(storage) -> list:
+    """Возвращает хранилища отдельных баз: шардов или единственной базы."""
+    return getattr(storage, "shards", [storage])
+
+
+def export_tasks(storage, path: str, fmt: str = "jsonl", workers: int = 1,
+                 keep_parts: bool = False) -> Dict[str, Any]:
+    """Экспортирует задачи владельца в файл.
+
+    Args:
+        storage: TaskStorage или ShardedTaskStorage.
+        path (str): Путь к файлу экспорта.
+        fmt (str, optional): Формат: jsonl или csv.
+        workers (int, optional): Число процессов. При 1 экспорт идет в
+            текущем процессе.
+        keep_parts (bool, optional): Не склеивать части: оставить файлы
+            path.part-NNNN, каждый со своим диапазоном ID.
+
+    Returns:
+        Dict[str, Any]: rows, parts (пути частей или [path]), seconds и
+            worker_seconds (суммарное время работы частей).
+
+    Raises:
+        ValueError: Если формат неизвестен или workers < 1.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}. Допустимые: {', '.join(FORMATS)}")
+    if workers < 1:
+        raise ValueError("Число процессов должно быть положительным")
+
+    started = time.monotonic()
+    parts_per_shard = workers * Config.EXPORT_RANGES_PER_WORKER if workers > 1 else 1
+    jobs = []
+    # Части шарда идут по возрастанию ID; шарды следуют друг за другом
+    for shard in _shards(storage):
+        for first_id, last_id in shard.get_id_ranges(parts_per_shard):
+            jobs.append({
+                "connection_params": shard.connection_params,
+                "owner": shard.owner,
+                "first_id": first_id,
+                "last_id": last_id,
+                "path": f"{path}.part-{len(jobs):04d}",
+                "format": fmt,
+                # Заголовок CSV нужен каждой части или только первой
+                "header": keep_parts or not jobs
+            })
+
+    if workers == 1:
+        results = [export_range(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(export_range, jobs))
+
+    parts = [result["path"] for result in results]
+    if not keep_parts:
+        _merge_parts(path, parts)
+        parts = [path]
+
+    return {
+        "rows": sum(result["rows"] for result in results),
+        "parts": parts,
+        "seconds": time.monotonic() - started,
+        "worker_seconds": sum(result["seconds"] for result in results)
+    }
+
+
+def _merge_parts(path: str, parts: List[str]):
+    """Склеивает части в общий файл и удаляет их."""
+    if len(parts) == 1:
+        os.replace(parts[0], path)
+        return
+    with open(path, "wb") as output:
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, output, 1 << 20)
+            os.remove(part)
@@ -0,0 +1,253 @@
+"""
+Модуль локального журнала записи для менеджера задач.
+
+Команды add, done и delete в автономном режиме не обращаются к PostgreSQL,
+а дописывают операцию в локальный журнал (JSON Lines, fsync после каждой
+записи). Команда sync позже воспроизводит журнал в БД пакетами; ключ
+идемпотентности каждой операции гарантирует, что повторная синхронизация
+после сбоя не применит операцию дважды. Операции, которые БД отвергает
+при любой попытке (например, подзадача удаленной задачи), переносятся в
+файл отклоненных и не блокируют синхронизацию остальных.
+
+Журнал один на пользователя ОС, а каждая операция хранит владельца
+задач, от имени которого записана (--owner), и применяется от его
+имени, кто бы ни запустил sync.
+"""
+
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: между процессами журнал не блокируется
+    fcntl = None
+
+from config import Config
+
+
+def _fsync_directory(path: str):
+    """Сбрасывает на диск запись каталога (создание и переименование файлов).
+
+    На Windows каталоги нельзя открыть для fsync, там шаг пропускается.
+    """
+    if os.name == "nt":
+        return
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteJournal:
+    """Журнал операций, ожидающих записи в БД.
+
+    Новые операции дописываются в path. При синхронизации файл атомарно
+    переименовывается в path + ".syncing", так что новые записи идут в
+    свежий файл, а обрабатываемая часть не меняется. Если синхронизация
+    прервалась, файл .syncing обрабатывается первым при следующем запуске.
+
+    Запись и переименование выполняются под блокировкой файла path +
+    ".lock" (flock), поэтому команда add в одном процессе не допишет
+    операцию в файл, который sync в другом процессе уже забрал.
+
+    Attributes:
+        path (str): Путь к файлу журнала.
+        rejected_path (str): Путь к файлу операций, отклоненных БД.
+        owner (str): Владелец задач, который записывается в новые операции.
+    """
+
+    OPERATIONS = ("add", "done", "delete")
+
+    def __init__(self, path: str = None, owner: str = None):
+        """Инициализирует журнал.
+
+        Args:
+            path (str, optional): Путь к файлу журнала. По умолчанию Config.JOURNAL_PATH.
+            owner (str, optional): Владелец задач новых операций. По умолчанию
+                Config.TASK_OWNER.
+        """
+        self.path = path or Config.JOURNAL_PATH
+        self.owner = owner or Config.TASK_OWNER
+        self.syncing_path = self.path + ".syncing"
+        self.rejected_path = self.path + ".rejected"
+        self.lock_path = self.path + ".lock"
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """Блокирует журнал для потоков этого процесса и других процессов."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def append(self, op: str, payload: dict) -> str:
+        """Дописывает операцию в журнал и дожидается ее записи на диск.
+
+        Args:
+            op (str): Операция: add, done или delete.
+            payload (dict): Аргументы операции.
+
+        Returns:
+            str: Ключ идемпотентности операции.
+        """
+        if op not in self.OPERATIONS:
+            raise ValueError(f"Неизвестная операция журнала: {op}")
+
+        entry = {
+            "key": uuid.uuid4().hex,
+            "op": op,
+            "owner": self.owner,
+            "payload": payload,
+            "ts": datetime.now().isoformat()
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+
+        with self._locked():
+            self._write_durably(self.path, line)
+
+        return entry["key"]
+
+    @staticmethod
+    def _write_durably(path: str, text: str):
+        """Дописывает текст в файл и дожидается его записи на диск."""
+        directory = os.path.dirname(path)
+        created = not os.path.exists(path)
+        if created and directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if created:
+            _fsync_directory(directory)
+
+    @staticmethod
+    def _read_entries(path: str) -> Tuple[List[dict], int]:
+        """Читает записи журнала, пропуская оборванную последнюю строку.
+
+        Returns:
+            Tuple[List[dict], int]: Записи и число прочитанных байт.
+        """
+        if not os.path.exists(path):
+            return [], 0
+
+        entries = []
+        consumed = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Запись не завершилась (сбой во время append) — операция
+                    # не была подтверждена пользователю
+                    break
+                entries.append(json.loads(line))
+                consumed += len(line)
+        return entries, consumed
+
+    @classmethod
+    def _read(cls, path: str) -> List[dict]:
+        """Читает записи журнала, пропуская оборванную последнюю строку."""
+        return cls._read_entries(path)[0]
+
+    def pending_count(self) -> int:
+        """Возвращает число операций, ожидающих синхронизации."""
+        return len(self._read(self.syncing_path)) + len(self._read(self.path))
+
+    def rejected_count(self) -> int:
+        """Возвращает число операций, отклоненных БД при синхронизации."""
+        return len(self._read(self.rejected_path))
+
+    def _reject(self, entry: dict, error: Exception):
+        """Переносит операцию, которую БД не примет, в файл отклоненных."""
+        record = dict(entry, error=str(error))
+        with self._locked():
+            self._write_durably(self.rejected_path, json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _apply(self, apply_batch: Callable[[List[dict]], int], batch: List[dict]) -> int:
+        """Применяет пакет; при отказе БД применяет записи по одной.
+
+        Так отклоненной оказывается только сама неприменимая операция,
+        а не весь пакет вместе с ней.
+        """
+        try:
+            return apply_batch(batch)
+        except ValueError as e:
+            if len(batch) == 1:
+                self._reject(batch[0], e)
+                return 0
+        return sum(self._apply(apply_batch, [entry]) for entry in batch)
+
+    def _remove_processed(self, consumed: int):
+        """Удаляет из файла .syncing первые consumed байт обработанных записей.
+
+        Полные записи после них (если они есть) сохраняются для следующей
+        синхронизации; оборванная последняя строка отбрасывается.
+        """
+        with self._locked():
+            with open(self.syncing_path, "rb") as f:
+                f.seek(consumed)
+                rest = f.read()
+            rest = rest[:rest.rfind(b"\n") + 1]
+            if not rest:
+                os.remove(self.syncing_path)
+                return
+            temporary = self.syncing_path + ".tmp"
+            with open(temporary, "wb") as f:
+                f.write(rest)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.syncing_path)
+            _fsync_directory(os.path.dirname(self.path))
+
+    def replay(self, apply_batch: Callable[[List[dict]], int],
+               batch_size: int = None) -> Tuple[int, int]:
+        """Воспроизводит журнал пакетами и удаляет обработанные записи.
+
+        Args:
+            apply_batch (Callable): Функция, применяющая пакет записей в одной
+                транзакции и возвращающая число впервые примененных операций.
+                ValueError означает, что БД отвергает операцию по существу:
+                такие операции переносятся в rejected_path. Остальные
+                исключения прерывают синхронизацию, записи остаются в журнале.
+            batch_size (int, optional): Размер пакета.
+
+        Returns:
+            Tuple[int, int]: Число примененных и число прочитанных операций.
+        """
+        batch_size = batch_size or Config.JOURNAL_SYNC_BATCH
+        applied = total = 0
+
+        while True:
+            if not os.path.exists(self.syncing_path):
+                if not os.path.exists(self.path):
+                    break
+                with self._locked():
+                    if not os.path.exists(self.path):
+                        break
+                    os.replace(self.path, self.syncing_path)
+                    _fsync_directory(os.path.dirname(self.path))
+
+            entries, consumed = self._read_entries(self.syncing_path)
+            for start in range(0, len(entries), batch_size):
+                applied += self._apply(apply_batch, entries[start:start + batch_size])
+            total += len(entries)
+
+            self._remove_processed(consumed)
+
+        return applied, total
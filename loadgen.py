@@ -0,0 +1,345 @@
+"""
+Генератор нагрузки на хранилище задач.
+
+Клиенты в потоках (и, при --processes, в нескольких процессах) выполняют
+операции add, list, done, delete и stats в заданной пропорции через
+TaskStorage или TaskCommands на локальном PostgreSQL. Выводятся
+пропускная способность, перцентили задержки и число ошибок по каждой
+операции, в том числе взаимоблокировок, конфликтов версий и таймаутов.
+Через TaskCommands ошибкой считается и ответ с сообщением об ошибке.
+done и delete, пока не создано ни одной задачи, пропускаются и
+считаются отдельно.
+
+С --rate нагрузка открытая: запросы запускаются по расписанию независимо
+от ответов, и задержка считается от запланированного момента. Так
+очередь, возникшая при перегрузке, видна в перцентилях, а не прячется
+за замедлением клиентов.
+
+Пример:
+    python loadgen.py --clients 16 --duration 30 --rate 400 --mix add=40,list=30,done=15,delete=5,stats=10
+"""
+
+import argparse
+import multiprocessing
+import random
+import re
+import threading
+import time
+
+import psycopg2.errors
+
+from bench_server import percentile
+from commands import TaskCommands
+from models import Task, Priority
+from storage import (TaskStorage, DatabaseConnection, ConcurrentModificationError,
+                     DeadlineExceededError)
+
+OPERATIONS = ("add", "list", "done", "delete", "stats")
+DEFAULT_MIX = "add=40,list=30,done=15,delete=5,stats=10"
+TAGS = ("work", "home", "urgent", "later", "review")
+# Виды ошибок, которые считаются отдельно
+ERROR_KINDS = ("errors", "deadlocks", "conflicts", "timeouts")
+# Счетчики результата операции: ошибки и пропуски
+COUNTERS = ERROR_KINDS + ("skipped",)
+# Результат операции, для которой нет подходящей задачи
+SKIPPED = "skipped"
+# Начала ответов TaskCommands, сообщающих об ошибке
+COMMAND_ERROR_PREFIXES = ("❌", "Ошибка")
+
+# Процессы по очереди инициализируют схему: параллельные DDL мешают друг другу
+_init_lock = threading.Lock()
+
+
+def parse_mix(value: str) -> dict:
+    """Разбирает пропорции операций вида "add=40,list=30".
+
+    Raises:
+        ValueError: Если операция неизвестна или вес не положительное число.
+    """
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Неизвестная операция: {name}. Допустимые: {', '.join(OPERATIONS)}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f"Вес операции {name} должен быть числом: {weight}") from None
+        if not 0 < mix[name] < float("inf"):
+            raise ValueError(f"Вес операции {name} должен быть положительным: {weight}")
+    return mix
+
+
+class CommandError(Exception):
+    """TaskCommands вернул сообщение об ошибке."""
+
+
+class Workload:
+    """Операции нагрузки над общим для потоков процесса хранилищем.
+
+    ID созданных задач запоминаются, чтобы done и delete работали с
+    существующими задачами и конкурировали за них. Операция возвращает
+    SKIPPED, если такой задачи нет; ответ TaskCommands с ошибкой
+    поднимает CommandError.
+    """
+
+    def __init__(self, storage: TaskStorage, via_commands: bool = False):
+        self.storage = storage
+        self.commands = TaskCommands(storage) if via_commands else None
+        self._ids = []
+        self._lock = threading.Lock()
+
+    def _remember(self, task_id):
+        with self._lock:
+            self._ids.append(task_id)
+
+    def _pick(self, rng: random.Random, remove: bool = False):
+        with self._lock:
+            if not self._ids:
+                return None
+            index = rng.randrange(len(self._ids))
+            if remove:
+                self._ids[index], self._ids[-1] = self._ids[-1], self._ids[index]
+                return self._ids.pop()
+            return self._ids[index]
+
+    @staticmethod
+    def _check(result: str) -> str:
+        """Поднимает CommandError, если ответ TaskCommands — ошибка."""
+        if result.lstrip().startswith(COMMAND_ERROR_PREFIXES):
+            raise CommandError(result.strip())
+        return result
+
+    def run(self, name: str, rng: random.Random):
+        """Выполняет одну операцию и возвращает SKIPPED, если она пропущена."""
+        return getattr(self, f"op_{name}")(rng)
+
+    def op_add(self, rng: random.Random):
+        title = f"loadgen {rng.getrandbits(32):08x}"
+        priority = rng.choice(list(Priority))
+        tags = rng.sample(TAGS, rng.randint(0, 2))
+        if self.commands is not None:
+            result = self._check(self.commands.add_task(title, priority=priority.value, tags=tags))
+            match = re.search(r"ID: (\d+)", result)
+            if match:
+                self._remember(int(match.group(1)))
+            return
+        self._remember(self.storage.save_task(Task(title, priority=priority, tags=tags)).id)
+
+    def op_list(self, rng: random.Random):
+        status = rng.choice(("pending", "completed", None))
+        priority = rng.choice(("low", "medium", "high", None))
+        tags = [rng.choice(TAGS)] if rng.random() < 0.3 else None
+        if self.commands is not None:
+            self._check(self.commands.list_tasks(status, priority, tags=tags))
+        else:
+            self.storage.filter_tasks(status, priority, tags=tags)
+
+    def op_done(self, rng: random.Random):
+        task_id = self._pick(rng)
+        if task_id is None:
+            return SKIPPED
+        if self.commands is not None:
+            self._check(self.commands.complete_task(task_id))
+            return
+        task = self.storage.get_task_by_id(task_id, use_primary=True)
+        if task is not None:
+            task.mark_completed()
+            self.storage.save_task(task)
+
+    def op_delete(self, rng: random.Random):
+        task_id = self._pick(rng, remove=True)
+        if task_id is None:
+            return SKIPPED
+        if self.commands is not None:
+            self._check(self.commands.delete_task(task_id))
+        else:
+            self.storage.delete_task(task_id)
+
+    def op_stats(self, rng: random.Random):
+        if self.commands is not None:
+            self._check(self.commands.show_stats())
+        else:
+            self.storage.get_statistics()
+
+
+def classify_error(error: Exception) -> str:
+    """Возвращает вид ошибки из ERROR_KINDS."""
+    if isinstance(error, psycopg2.errors.DeadlockDetected):
+        return "deadlocks"
+    if isinstance(error, ConcurrentModificationError):
+        return "conflicts"
+    if isinstance(error, DeadlineExceededError):
+        return "timeouts"
+    return "errors"
+
+
+def run_client(workload, mix, interval, deadline, seed, results):
+    """Выполняет операции до deadline; при interval — по расписанию."""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    scheduled = time.perf_counter() + (rng.uniform(0, interval) if interval else 0)
+    while True:
+        if interval:
+            now = time.perf_counter()
+            if scheduled > now:
+                time.sleep(scheduled - now)
+            started = scheduled
+            scheduled += interval
+        else:
+            started = time.perf_counter()
+        if started >= deadline:
+            return
+
+        name = rng.choices(names, weights)[0]
+        stats = results.setdefault(name, {"latencies": [], **dict.fromkeys(COUNTERS, 0)})
+        try:
+            outcome = workload.run(name, rng)
+        except Exception as e:
+            stats[classify_error(e)] += 1
+            continue
+        if outcome == SKIPPED:
+            stats["skipped"] += 1
+            continue
+        stats["latencies"].append((time.perf_counter() - started) * 1000)
+
+
+def _init_process(lock):
+    """Передает процессу пула общую блокировку инициализации схемы."""
+    global _init_lock
+    _init_lock = lock
+
+
+def run_process(options: dict) -> dict:
+    """Запускает клиентов одного процесса и возвращает их результаты по операциям."""
+    if options["pool"]:
+        DatabaseConnection.init_pool(maxconn=options["clients"])
+    with _init_lock:
+        storage = TaskStorage(owner=options["owner"])
+    workload = Workload(storage, options["via_commands"])
+    clients = options["clients"]
+    interval = clients / options["rate"] if options["rate"] else 0
+    deadline = time.perf_counter() + options["duration"]
+
+    per_client = [{} for _ in range(clients)]
+    threads = [
+        threading.Thread(target=run_client,
+                         args=(workload, options["mix"], interval, deadline,
+                               f"{options['seed']}-{i}", per_client[i]))
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    storage.close()
+    DatabaseConnection.close_pool()
+    return merge_results(per_client)
+
+
+def merge_results(parts) -> dict:
+    """Объединяет результаты клиентов или процессов по операциям."""
+    merged = {}
+    for part in parts:
+        for name, stats in part.items():
+            target = merged.setdefault(name, {"latencies": [], **dict.fromkeys(COUNTERS, 0)})
+            target["latencies"].extend(stats["latencies"])
+            for kind in COUNTERS:
+                target[kind] += stats[kind]
+    return merged
+
+
+def run_loadgen(clients=8, processes=1, duration=10.0, rate=0.0, mix=DEFAULT_MIX,
+                via_commands=False, owner="loadgen", pool=True, seed=None):
+    """Запускает генератор нагрузки и возвращает сводку по операциям.
+
+    Args:
+        clients (int): Число потоков-клиентов в каждом процессе.
+        processes (int): Число процессов.
+        duration (float): Длительность в секундах.
+        rate (float): Целевое суммарное число операций в секунду (0 — без ограничения).
+        mix (str): Пропорции операций.
+        via_commands (bool): Вызывать TaskCommands, а не TaskStorage.
+        owner (str): Владелец задач нагрузки.
+        pool (bool): Использовать пул соединений.
+        seed: Начальное значение генератора случайных чисел.
+
+    Returns:
+        dict: Для каждой операции: число, операций в секунду, перцентили
+            задержки в миллисекундах, счетчики ошибок и пропусков.
+    """
+    options = {
+        "clients": clients,
+        "duration": duration,
+        "rate": rate / processes if rate else 0,
+        "mix": parse_mix(mix),
+        "via_commands": via_commands,
+        "owner": owner,
+        "pool": pool,
+        "seed": seed if seed is not None else random.randrange(1 << 30)
+    }
+
+    started = time.perf_counter()
+    if processes == 1:
+        results = run_process(options)
+    else:
+        with multiprocessing.Pool(processes, _init_process, (multiprocessing.Lock(),)) as process_pool:
+            results = merge_results(process_pool.map(
+                run_process, [{**options, "seed": f"{options['seed']}-{index}"} for index in range(processes)]
+            ))
+    elapsed = time.perf_counter() - started
+
+    summary = {}
+    for name in OPERATIONS:
+        if name not in results:
+            continue
+        latencies = sorted(results[name]["latencies"])
+        summary[name] = {
+            "count": len(latencies),
+            "ops_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0,
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+            **{kind: results[name][kind] for kind in COUNTERS}
+        }
+    return summary
+
+
+def format_summary(summary: dict) -> str:
+    """Форматирует сводку таблицей по операциям."""
+    lines = [f"{'Операция':<10} {'Число':>8} {'оп/с':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} "
+             f"{'Ошибки':>7} {'Dlock':>6} {'Конфл':>6} {'Тайм':>6} {'Пропуск':>7}"]
+    total = dict.fromkeys(("count", "ops_per_sec"), 0)
+    for name, stats in summary.items():
+        lines.append(f"{name:<10} {stats['count']:>8} {stats['ops_per_sec']:>8} {stats['p50_ms']:>8} "
+                     f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8} "
+                     f"{stats['errors']:>7} {stats['deadlocks']:>6} {stats['conflicts']:>6} "
+                     f"{stats['timeouts']:>6} {stats['skipped']:>7}")
+        total["count"] += stats["count"]
+        total["ops_per_sec"] += stats["ops_per_sec"]
+    lines.append(f"{'всего':<10} {total['count']:>8} {round(total['ops_per_sec'], 1):>8}")
+    lines.append("Задержка в мс")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генератор нагрузки на хранилище задач")
+    parser.add_argument("--clients", type=int, default=8, help="Число клиентов в каждом процессе")
+    parser.add_argument("--processes", type=int, default=1, help="Число процессов")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность в секундах")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Целевое число операций в секунду (0 — без ограничения)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Пропорции операций")
+    parser.add_argument("--via", choices=["storage", "commands"], default="storage",
+                        help="Вызывать TaskStorage или TaskCommands")
+    parser.add_argument("--owner", default="loadgen", help="Владелец задач нагрузки")
+    parser.add_argument("--no-pool", action="store_true", help="Новое соединение на каждый запрос")
+    parser.add_argument("--seed", type=int, help="Начальное значение генератора случайных чисел")
+    args = parser.parse_args()
+
+    summary = run_loadgen(args.clients, args.processes, args.duration, args.rate, args.mix,
+                          args.via == "commands", args.owner, not args.no_pool, args.seed)
+    print(format_summary(summary))
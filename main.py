@@ -5,16 +5,40 @@
 и запускает соответствующие команды.
 """
 
+import atexit
 import sys
 from commands import TaskCommands
-from storage import TaskStorage
+from config import Config
+from journal import WriteJournal
+from metrics import REGISTRY, start_http_server
+import tracing
+from storage import TaskStorage, DatabaseConnection, DeadlineExceededError
+
+
+def create_storage(owner: str = None):
+    """Создает хранилище: шардированное, если заданы базы шардов."""
+    if Config.SHARD_DATABASES:
+        from sharding import ShardedTaskStorage
+        return ShardedTaskStorage(owner=owner)
+    return TaskStorage(owner=owner)
+
+
+def dump_metrics(path: str):
+    """Записывает метрики в файл при выходе, не прерывая завершение из-за ошибки."""
+    try:
+        REGISTRY.dump(path)
+    except OSError as e:
+        print(f"Не удалось записать метрики в {path}: {e}", file=sys.stderr)
 
 
 def main():
     """Основная функция приложения."""
-    # Создаем хранилище с PostgreSQL
-    storage = TaskStorage()
-    commands = TaskCommands(storage)
+    # Ctrl+C должен отменять запрос на сервере, а не только завершать клиента
+    DatabaseConnection.enable_cancel_on_interrupt()
+    
+    # Хранилище создается после разбора аргументов: записи в журнал
+    # автономного режима не требуют подключения к PostgreSQL
+    commands = TaskCommands(None)
     
     parser = commands.setup_argparse()
     
@@ -23,13 +47,39 @@ def main():
         return
     
     args = parser.parse_args()
+    if args.offline or Config.JOURNAL_ENABLED:
+        commands.journal = WriteJournal(owner=args.owner)
+    if args.owner:
+        commands.set_owner(args.owner)
+    
+    # Разовая команда оставляет метрики в файле; долгоживущие (serve,
+    # watch, remind) можно опрашивать по HTTP
+    metrics_file = args.metrics_file or Config.METRICS_FILE
+    if metrics_file:
+        atexit.register(dump_metrics, metrics_file)
+    metrics_port = args.metrics_port or Config.METRICS_PORT
+    if metrics_port:
+        start_http_server(metrics_port)
+    trace_file = args.trace_file or Config.TRACE_FILE
+    if trace_file:
+        tracing.configure(trace_file)
+        atexit.register(tracing.configure, None)
     
     try:
-        result = commands.execute_command(args)
+        with tracing.span(f"command {args.command}", command=args.command) as span:
+            if commands.needs_storage(args):
+                with tracing.span("storage.init"):
+                    commands.storage = create_storage(args.owner)
+            result = commands.execute_command(args)
+            span.set_attribute("bytes", len(str(result).encode("utf-8")))
         print(result)
     except KeyboardInterrupt:
-        print("\n\nОперация прервана пользователем")
+        print("\n\nОперация прервана пользователем, выполнявшийся запрос к БД отменен")
         sys.exit(0)
+    except DeadlineExceededError as e:
+        print(f"\n⏱️ {e}")
+        print("Лимиты времени настраиваются в Config.STATEMENT_TIMEOUTS_MS и Config.LOCK_TIMEOUT_MS")
+        sys.exit(1)
     except Exception as e:
         print(f"\n❌ Ошибка: {e}")
         print("\nУбедитесь, что:")
@@ -0,0 +1,266 @@
+"""
+Модуль метрик менеджера задач в текстовом формате Prometheus.
+
+Реестр в памяти процесса собирает счетчики, гистограммы задержек и
+показатели (gauge): время выполнения методов TaskCommands и TaskStorage,
+загрузку пула соединений и попадания в кэши. Долгоживущие процессы
+отдают метрики по HTTP (serve — по адресу /metrics API, остальные команды
+— на порту --metrics-port), а разовые команды CLI записывают их в файл
+при выходе (--metrics-file), например для textfile collector
+node_exporter.
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Границы корзин гистограмм задержки, секунды
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    """Приводит метки к ключу, не зависящему от порядка."""
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value) -> str:
+    """Экранирует значение метки по правилам текстового формата."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    """Форматирует метки в виде {name="value",...}."""
+    items = key + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Потокобезопасный реестр метрик.
+
+    Метрика объявляется один раз (counter, gauge, histogram), после чего
+    значения обновляются по имени и меткам. Показатели, которые дешевле
+    прочитать в момент запроса (например, число свободных соединений
+    пула), задаются функцией, возвращающей значения по меткам.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._values = {}
+        self._callbacks = {}
+
+    def _declare(self, name: str, kind: str, help_text: str, buckets=None):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = (kind, help_text, buckets)
+                self._values[name] = {}
+
+    def counter(self, name: str, help_text: str):
+        """Объявляет счетчик."""
+        self._declare(name, "counter", help_text)
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], Dict[tuple, float]] = None):
+        """Объявляет показатель.
+
+        Args:
+            name (str): Имя метрики.
+            help_text (str): Описание.
+            callback (Callable, optional): Функция, возвращающая словарь
+                {кортеж пар (метка, значение): значение}; вызывается при
+                каждом формировании текста метрик.
+        """
+        self._declare(name, "gauge", help_text)
+        if callback is not None:
+            with self._lock:
+                self._callbacks[name] = callback
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        """Объявляет гистограмму."""
+        self._declare(name, "histogram", help_text, tuple(sorted(buckets)))
+
+    def inc(self, name: str, labels: dict = None, amount: float = 1):
+        """Увеличивает счетчик или показатель."""
+        key = _label_key(labels)
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0) + amount
+
+    def set(self, name: str, value: float, labels: dict = None):
+        """Устанавливает значение показателя."""
+        with self._lock:
+            self._values[name][_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, labels: dict = None):
+        """Добавляет наблюдение в гистограмму."""
+        key = _label_key(labels)
+        buckets = self._metrics[name][2]
+        with self._lock:
+            state = self._values[name].get(key)
+            if state is None:
+                state = self._values[name][key] = [[0] * len(buckets), 0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, name: str, labels: dict = None, errors: str = None):
+        """Замеряет время блока в гистограмму name.
+
+        Args:
+            name (str): Гистограмма задержки.
+            labels (dict, optional): Метки.
+            errors (str, optional): Счетчик, увеличиваемый при исключении.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            if errors is not None:
+                self.inc(errors, labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, labels)
+
+    def get(self, name: str, labels: dict = None):
+        """Возвращает значение счетчика или показателя (0, если его нет).
+
+        Для гистограммы возвращается пара (сумма, число наблюдений).
+        """
+        with self._lock:
+            value = self._values.get(name, {}).get(_label_key(labels))
+        if isinstance(value, list):
+            return value[1], value[2]
+        return value or 0
+
+    def render(self) -> str:
+        """Формирует текст метрик в формате Prometheus."""
+        callbacks = dict(self._callbacks)
+        computed = {name: callback() for name, callback in callbacks.items()}
+
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in sorted(self._metrics.items()):
+                values = dict(self._values[name])
+                values.update(computed.get(name, {}))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(values.items()):
+                    if kind != "histogram":
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                        continue
+                    counts, total, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(buckets, counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', _format_value(bound)),))} "
+                                     f"{cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """Записывает метрики в файл атомарно: читатель не увидит половину файла."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(temporary, path)
+
+    def clear(self):
+        """Обнуляет значения всех метрик, сохраняя их объявления."""
+        with self._lock:
+            for values in self._values.values():
+                values.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def instrument(component: str, exclude: Iterable[str] = ()):
+    """Декоратор класса: замеряет время и ошибки его публичных методов.
+
+    Создает гистограмму {component}_duration_seconds и счетчик
+    {component}_errors_total с меткой method. Генераторы не замеряются:
+    их вызов лишь создает итератор.
+
+    Args:
+        component (str): Префикс имен метрик.
+        exclude (Iterable[str], optional): Методы, которые не замеряются.
+    """
+    duration = f"{component}_duration_seconds"
+    errors = f"{component}_errors_total"
+    REGISTRY.histogram(duration, f"Время выполнения методов {component}, секунды")
+    REGISTRY.counter(errors, f"Число методов {component}, завершившихся исключением")
+
+    def decorate(cls):
+        for name, attribute in list(vars(cls).items()):
+            if name.startswith("_") or name in exclude:
+                continue
+            static = isinstance(attribute, staticmethod)
+            function = attribute.__func__ if static else attribute
+            if not inspect.isfunction(function) or inspect.isgeneratorfunction(function):
+                continue
+            wrapper = _timed(function, duration, errors, {"method": name})
+            setattr(cls, name, staticmethod(wrapper) if static else wrapper)
+        return cls
+
+    return decorate
+
+
+def _timed(function, duration: str, errors: str, labels: dict):
+    """Оборачивает функцию замером времени."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with REGISTRY.time(duration, labels, errors):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Отдает текст метрик по GET /metrics."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        payload = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Запускает HTTP сервер метрик в фоновом потоке.
+
+    Returns:
+        ThreadingHTTPServer: Сервер; shutdown() останавливает его.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    return server
@@ -22,9 +22,31 @@ class Priority(Enum):
     HIGH = "high"
 
 
+def normalize_tags(tags):
+    """Приводит теги к единому виду: без пробелов по краям, в нижнем
+    регистре, без пустых и повторяющихся значений (порядок сохраняется).
+    
+    Args:
+        tags (Iterable[str]): Исходные теги или None.
+        
+    Returns:
+        list: Нормализованные теги.
+    """
+    result = []
+    for tag in tags or []:
+        tag = tag.strip().lower()
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+
 class Task:
     """Класс, представляющий задачу в менеджере задач.
     
+    Задача запоминает, какие из сохраняемых полей были изменены после
+    загрузки из хранилища (dirty_fields), чтобы при обновлении записывать
+    только их.
+    
     Attributes:
         id (int): Уникальный идентификатор задачи.
         title (str): Название задачи.
@@ -34,9 +56,19 @@ class Task:
         created_at (str): Дата и время создания задачи.
         due_date (str): Срок выполнения задачи.
         completed_at (str): Дата и время завершения задачи.
+        version (int): Версия строки в БД для оптимистичных блокировок.
+        tags (list): Теги задачи.
+        parent_id (int): ID родительской задачи для подзадачи.
+        description_truncated (bool): Загружено только начало описания
+            (в списках); полное описание показывает show.
     """
     
-    def __init__(self, title, description="", priority=Priority.MEDIUM, due_date=None):
+    # Поля, изменения которых отслеживаются и записываются в БД
+    TRACKED_FIELDS = ("title", "description", "status", "priority", "due_date", "completed_at", "tags",
+                      "parent_id")
+    
+    def __init__(self, title, description="", priority=Priority.MEDIUM, due_date=None, tags=None,
+                 parent_id=None):
         """Инициализирует новую задачу.
         
         Args:
@@ -44,7 +76,11 @@ class Task:
             description (str, optional): Описание задачи. По умолчанию "".
             priority (Priority, optional): Приоритет задачи. По умолчанию Priority.MEDIUM.
             due_date (str, optional): Срок выполнения в формате ГГГГ-ММ-ДД. По умолчанию None.
+            tags (list, optional): Теги задачи. По умолчанию без тегов.
+            parent_id (int, optional): ID родительской задачи. По умолчанию None.
         """
+        # У новой задачи "изменены" все поля, пока она не сохранена
+        object.__setattr__(self, "_dirty_fields", set())
         self.id = None
         self.title = title
         self.description = description
@@ -53,6 +89,44 @@ class Task:
         self.created_at = datetime.now().isoformat()
         self.due_date = due_date
         self.completed_at = None
+        self.version = None
+        self.tags = normalize_tags(tags)
+        self.parent_id = parent_id
+        self.description_truncated = False
+
+    def __setattr__(self, name, value):
+        """Присваивает атрибут и отмечает отслеживаемое поле как измененное."""
+        if name in self.TRACKED_FIELDS:
+            if name not in self.__dict__ or self.__dict__[name] != value:
+                self._dirty_fields.add(name)
+        object.__setattr__(self, name, value)
+
+    @property
+    def dirty_fields(self):
+        """Поля, измененные после загрузки или последнего сохранения.
+        
+        Returns:
+            frozenset: Имена измененных полей.
+        """
+        return frozenset(self._dirty_fields)
+
+    def mark_clean(self):
+        """Сбрасывает отметки об изменениях (после загрузки или сохранения)."""
+        self._dirty_fields.clear()
+
+    def truncate_description(self, length):
+        """Оставляет от описания первые length символов для вывода в списке.
+        
+        Усечение не считается изменением: при сохранении задачи описание
+        в БД не перезаписывается.
+        
+        Args:
+            length (int): Длина превью описания.
+        """
+        # Описание NULL в БД (например, из резервной копии или импорта)
+        if self.description is not None and len(self.description) > length:
+            object.__setattr__(self, "description", self.description[:length])
+            self.description_truncated = True
 
     def to_dict(self):
         """Преобразует объект задачи в словарь для сериализации.
@@ -68,7 +142,10 @@ class Task:
             "priority": self.priority.value,
             "created_at": self.created_at,
             "due_date": self.due_date,
-            "completed_at": self.completed_at
+            "completed_at": self.completed_at,
+            "version": self.version,
+            "tags": list(self.tags),
+            "parent_id": self.parent_id
         }
 
     @classmethod
@@ -89,6 +166,10 @@ class Task:
         task.created_at = data["created_at"]
         task.due_date = data.get("due_date")
         task.completed_at = data.get("completed_at")
+        task.version = data.get("version")
+        task.tags = list(data.get("tags") or [])
+        task.parent_id = data.get("parent_id")
+        task.mark_clean()
         return task
 
     def mark_completed(self):
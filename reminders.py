@@ -0,0 +1,202 @@
+"""
+Модуль напоминаний о сроках задач для менеджера задач.
+
+Демон remind один раз загружает невыполненные задачи с ближайшими сроками
+(диапазон индекса по due_date), держит их в min-куче по моменту наступления
+срока и спит до ближайшего из них. Изменения задач приходят через
+LISTEN/NOTIFY и обновляют кучу на месте, поэтому периодических запросов к
+таблице нет: раз в сутки дозагружается только один новый день диапазона.
+"""
+
+import heapq
+import itertools
+import json
+import shlex
+import subprocess
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, List, Optional
+
+import tracing
+from config import Config
+from models import Task, TaskStatus
+
+
+def reminder_from_task(task: Task) -> dict:
+    """Собирает напоминание из задачи в формате события ChangeListener."""
+    return {
+        'id': task.id,
+        'title': task.title,
+        'status': task.status.value,
+        'priority': task.priority.value,
+        'due_date': task.due_date
+    }
+
+
+def run_hook(command: str, reminder: dict) -> bool:
+    """Передает напоминание внешней команде в JSON на stdin.
+
+    Args:
+        command (str): Команда с аргументами.
+        reminder (dict): Напоминание.
+
+    Returns:
+        bool: True если команда завершилась успешно.
+    """
+    try:
+        result = subprocess.run(shlex.split(command), input=json.dumps(reminder, ensure_ascii=False),
+                                text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0
+
+
+class ReminderQueue:
+    """Очередь напоминаний: min-куча по моменту наступления срока.
+
+    Измененные и удаленные задачи не ищутся в куче: у каждой задачи
+    запоминается ее актуальная запись, а устаревшие записи пропускаются
+    при извлечении. Выданное напоминание запоминается, чтобы правка
+    других полей задачи не выдала его повторно.
+
+    Attributes:
+        at (time): Время суток, в которое наступает срок задачи.
+    """
+
+    def __init__(self, at: time = None):
+        """Инициализирует пустую очередь.
+
+        Args:
+            at (time, optional): Время наступления срока. По умолчанию
+                Config.REMINDER_TIME.
+        """
+        self.at = at or time.fromisoformat(Config.REMINDER_TIME)
+        self._heap = []
+        self._current: Dict[int, tuple] = {}
+        self._fired: Dict[int, str] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    def deadline_for(self, due_date: str) -> datetime:
+        """Возвращает момент наступления срока для даты ГГГГ-ММ-ДД."""
+        return datetime.combine(date.fromisoformat(due_date), self.at)
+
+    def schedule(self, reminder: dict):
+        """Добавляет или переносит напоминание о задаче.
+
+        Args:
+            reminder (dict): Поля id, title, status, priority и due_date.
+        """
+        task_id = reminder['id']
+        if self._fired.get(task_id) == reminder['due_date']:
+            # О задаче с этим сроком уже напомнили
+            self._current.pop(task_id, None)
+            return
+        entry = (self.deadline_for(reminder['due_date']), next(self._counter), reminder)
+        self._current[task_id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def cancel(self, task_id: int):
+        """Отменяет напоминание о задаче (задача выполнена или удалена)."""
+        self._current.pop(task_id, None)
+        self._fired.pop(task_id, None)
+
+    def apply_change(self, event: dict, loaded_until: date):
+        """Учитывает событие изменения задачи.
+
+        Args:
+            event (dict): Событие ChangeListener.
+            loaded_until (date): Конец загруженного диапазона сроков: задачи
+                с более поздним сроком загрузятся вместе со своим днем.
+        """
+        if (event['op'] == 'delete' or event['status'] != TaskStatus.PENDING.value or
+                not event['due_date']):
+            self.cancel(event['id'])
+        elif date.fromisoformat(event['due_date']) > loaded_until:
+            self._current.pop(event['id'], None)
+        else:
+            self.schedule(event)
+
+    def _drop_stale(self):
+        """Убирает с вершины кучи записи, замененные или отмененные позже."""
+        while self._heap and self._current.get(self._heap[0][2]['id']) is not self._heap[0]:
+            heapq.heappop(self._heap)
+
+    def next_deadline(self) -> Optional[datetime]:
+        """Возвращает ближайший момент наступления срока или None."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> List[dict]:
+        """Извлекает напоминания, срок которых наступил к моменту now."""
+        due = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, _, reminder = heapq.heappop(self._heap)
+            del self._current[reminder['id']]
+            self._fired[reminder['id']] = reminder['due_date']
+            due.append(reminder)
+
+
+class ReminderDaemon:
+    """Демон напоминаний поверх хранилища задач.
+
+    Attributes:
+        storage: TaskStorage или ShardedTaskStorage.
+        queue (ReminderQueue): Очередь напоминаний.
+        sent (int): Число выданных напоминаний.
+    """
+
+    def __init__(self, storage, notify: Callable[[dict], None], window_days: int = None,
+                 at: time = None):
+        """Инициализирует демон.
+
+        Args:
+            storage: Хранилище с методами change_listener и get_pending_due_tasks.
+            notify (Callable[[dict], None]): Получатель наступивших напоминаний.
+            window_days (int, optional): На сколько дней вперед держать задачи
+                в очереди. По умолчанию Config.REMINDER_WINDOW_DAYS.
+            at (time, optional): Время суток наступления срока.
+        """
+        self.storage = storage
+        self.notify = notify
+        self.window_days = window_days or Config.REMINDER_WINDOW_DAYS
+        self.queue = ReminderQueue(at)
+        self.sent = 0
+        self._loaded_until = None
+        self._loaded_on = None
+
+    def _load(self, today: date):
+        """Загружает задачи, чьи сроки вошли в окно с прошлой загрузки."""
+        until = today + timedelta(days=self.window_days)
+        with tracing.span("reminders.load", root=True, until=until.isoformat()):
+            for task in self.storage.get_pending_due_tasks(until, self._loaded_until):
+                self.queue.schedule(reminder_from_task(task))
+        self._loaded_until = until
+        self._loaded_on = today
+
+    def run(self):
+        """Выдает напоминания до прерывания (KeyboardInterrupt)."""
+        with self.storage.change_listener() as listener:
+            # Подписка оформлена до запроса: изменения, сделанные во время
+            # загрузки, придут уведомлениями и не потеряются
+            self._load(date.today())
+            while True:
+                now = datetime.now()
+                if now.date() > self._loaded_on:
+                    self._load(now.date())
+                for reminder in self.queue.pop_due(now):
+                    self.notify(reminder)
+                    self.sent += 1
+
+                wake_at = datetime.combine(self._loaded_on + timedelta(days=1), time.min)
+                deadline = self.queue.next_deadline()
+                if deadline is not None:
+                    wake_at = min(wake_at, deadline)
+                timeout = max((wake_at - datetime.now()).total_seconds(), 0)
+
+                for event in listener.wait(timeout):
+                    self.queue.apply_change(event, self._loaded_until)
@@ -14,7 +14,17 @@ def run_all_tests():
         'test_models',
         'test_storage',
         'test_commands',
-        'test_main'
+        'test_main',
+        'test_server',
+        'test_sharding',
+        'test_journal',
+        'test_snapshot',
+        'test_reminders',
+        'test_backup',
+        'test_export',
+        'test_metrics',
+        'test_tracing',
+        'test_loadgen'
     ]
     
     # Загружаем тесты из каждого модуля
@@ -0,0 +1,472 @@
+"""
+Модуль HTTP JSON API для менеджера задач.
+
+Предоставляет операции add/list/get/done/delete/stats поверх TaskStorage
+и метрики процесса в формате Prometheus (GET /metrics).
+Запросы обрабатываются ограниченным пулом рабочих потоков, а соединения
+с PostgreSQL берутся из общего пула DatabaseConnection. Очередь соединений,
+ждущих поток, ограничена, а keep-alive соединение отпускает поток, как
+только его ждут другие.
+
+Запрос видит задачи владельца из заголовка Config.SERVER_OWNER_HEADER,
+а без заголовка — задачи владельца, для которого запущен сервер.
+Подлинность заголовка не проверяется: у API без прокси, который
+аутентифицирует клиентов и сам задает заголовок, владелец один.
+"""
+
+import contextvars
+import json
+from collections import OrderedDict
+import re
+import select
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from datetime import date
+from urllib.parse import urlsplit, parse_qs
+
+from config import Config
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+import tracing
+from models import Task, TaskStatus, Priority, normalize_tags
+from storage import TaskStorage, DatabaseConnection, ConcurrentModificationError, retry_on_conflict
+
+
+class ApiError(Exception):
+    """Ошибка запроса, которая возвращается клиенту с HTTP кодом."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+REGISTRY.histogram("http_request_duration_seconds", "Время обработки запросов API, секунды")
+REGISTRY.counter("http_requests_total", "Запросы API по маршруту и коду ответа")
+REGISTRY.counter("http_rejected_connections_total", "Соединения, отклоненные из-за переполнения очереди")
+
+# Наибольшая длина владельца (столбец owner VARCHAR(64))
+OWNER_MAX_LENGTH = 64
+# Ответ соединению, которому не хватило места в очереди
+_OVERLOADED_BODY = json.dumps({"error": "Сервер перегружен, повторите запрос позже"},
+                              ensure_ascii=False).encode("utf-8")
+_OVERLOADED_RESPONSE = (b"HTTP/1.1 503 Service Unavailable\r\n"
+                        b"Content-Type: application/json; charset=utf-8\r\n"
+                        b"Content-Length: " + str(len(_OVERLOADED_BODY)).encode() + b"\r\n"
+                        b"Retry-After: 1\r\nConnection: close\r\n\r\n" + _OVERLOADED_BODY)
+
+
+class TaskRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик HTTP запросов к API задач.
+
+    Использует HTTP/1.1, поэтому клиент может держать keep-alive соединение
+    и отправлять несколько запросов подряд без повторного рукопожатия.
+    Пока соединение простаивает, оно занимает рабочий поток, поэтому
+    простой ограничен keepalive_timeout, а если другие соединения ждут
+    поток, текущее закрывается после ответа.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "TaskManagerAPI/1.0"
+    # Заголовки и тело уходят отдельными записями; без TCP_NODELAY
+    # keep-alive клиенты ловят задержку Nagle + delayed ACK (~40 мс)
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ("GET", re.compile(r"^/tasks$"), "list_tasks"),
+        ("POST", re.compile(r"^/tasks$"), "add_task"),
+        ("GET", re.compile(r"^/tasks/(\d+)$"), "get_task"),
+        ("POST", re.compile(r"^/tasks/(\d+)/done$"), "complete_task"),
+        ("DELETE", re.compile(r"^/tasks/(\d+)$"), "delete_task"),
+        ("GET", re.compile(r"^/stats$"), "get_stats"),
+    ]
+    # Период проверки очереди во время простоя keep-alive соединения, секунды
+    IDLE_POLL_INTERVAL = 0.05
+
+    def setup(self):
+        """Ограничивает время простоя keep-alive соединения."""
+        self.timeout = self.server.keepalive_timeout
+        super().setup()
+
+    def handle(self):
+        """Обслуживает запросы соединения, пока клиент их присылает."""
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._wait_next_request():
+            self.handle_one_request()
+
+    def _wait_next_request(self) -> bool:
+        """Ждет следующий запрос keep-alive соединения.
+
+        Returns:
+            bool: False, если время простоя истекло или поток ждут другие
+                соединения; тогда соединение закрывается.
+        """
+        deadline = time.monotonic() + self.server.keepalive_timeout
+        while not self.server.has_waiting_connections():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([self.connection], [], [],
+                                           min(remaining, self.IDLE_POLL_INTERVAL))
+            if readable:
+                return True
+        return False
+
+    def end_headers(self):
+        """Просит клиента закрыть соединение, если поток ждут другие."""
+        if not self.close_connection and self.server.has_waiting_connections():
+            self.send_header("Connection", "close")
+        super().end_headers()
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str):
+        """Находит обработчик маршрута, выполняет его и замеряет время."""
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        if method == "GET" and url.path == "/metrics":
+            self._send_metrics()
+            return
+        status, body = 404, {"error": "Маршрут не найден"}
+        route = "unknown"
+
+        with tracing.span("http.request", kind="server", **{"http.method": method,
+                                                            "http.target": self.path}) as span:
+            try:
+                self.storage = self._owner_storage()
+                for route_method, pattern, handler_name in self.ROUTES:
+                    match = pattern.match(url.path)
+                    if match and route_method == method:
+                        route = handler_name
+                        handler = getattr(self, handler_name)
+                        status, body = handler(*match.groups(), query=parse_qs(url.query))
+                        break
+                    if match:
+                        status, body = 405, {"error": "Метод не поддерживается"}
+            except ApiError as e:
+                status, body = e.status, {"error": e.message}
+            except Exception as e:
+                # Текст исключения может раскрыть детали БД: он пишется в
+                # журнал сервера, а клиент получает общее сообщение
+                print(f"Ошибка обработки {method} {url.path}: {type(e).__name__}: {e}", file=sys.stderr)
+                status, body = 500, {"error": "Внутренняя ошибка сервера"}
+            span.set_attribute("http.route", route)
+            span.set_attribute("http.status_code", status)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.server.record_request(elapsed_ms)
+            REGISTRY.observe("http_request_duration_seconds", elapsed_ms / 1000, {"route": route})
+            REGISTRY.inc("http_requests_total", {"route": route, "status": status})
+            self._send_json(status, body, elapsed_ms)
+
+    def _send_metrics(self):
+        """Отдает метрики процесса в текстовом формате Prometheus."""
+        payload = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_json(self, status: int, body, elapsed_ms: float):
+        """Отправляет JSON ответ с заголовками длины и времени обработки."""
+        with tracing.span("render") as span:
+            payload = b"" if body is None else json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+            span.set_attribute("bytes", len(payload))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        # По ID трассы медленный ответ находится в файле трассировки
+        trace_id = tracing.current_trace_id()
+        if trace_id is not None:
+            self.send_header("X-Trace-Id", trace_id)
+        self.send_header("Server-Timing", f"app;dur={elapsed_ms:.2f}")
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+    def _owner_storage(self):
+        """Возвращает хранилище владельца из заголовка запроса."""
+        owner = self.headers.get(Config.SERVER_OWNER_HEADER)
+        if owner is None:
+            return self.server.storage
+        owner = owner.strip()
+        if not owner or len(owner) > OWNER_MAX_LENGTH:
+            raise ApiError(400, f"Заголовок {Config.SERVER_OWNER_HEADER} должен содержать "
+                                f"от 1 до {OWNER_MAX_LENGTH} символов")
+        return self.server.storage_for(owner)
+
+    def _read_json(self) -> dict:
+        """Читает и разбирает JSON тело запроса."""
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            data = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ApiError(400, "Некорректный JSON")
+        if not isinstance(data, dict):
+            raise ApiError(400, "Ожидается JSON объект")
+        return data
+
+    def list_tasks(self, query):
+        """GET /tasks — список задач с фильтрами status, priority, due_date, tag.
+
+        Параметр tag можно повторять; match=all требует все теги сразу.
+        """
+        storage = self.storage
+        if query.get("all", ["0"])[0] in ("1", "true"):
+            tasks = storage.get_all_tasks(verbose=True)
+        else:
+            tasks = storage.filter_tasks(
+                status=query.get("status", [None])[0],
+                priority=query.get("priority", [None])[0],
+                due_date=query.get("due_date", [None])[0],
+                tags=normalize_tags(query.get("tag", [])),
+                match_all_tags=query.get("match", ["any"])[0] == "all",
+                verbose=True
+            )
+        return 200, [task.to_dict() for task in tasks]
+
+    def add_task(self, query):
+        """POST /tasks — создание новой задачи."""
+        data = self._read_json()
+        title = data.get("title")
+        if not title:
+            raise ApiError(400, "Поле title обязательно")
+        try:
+            priority = Priority(str(data.get("priority", "medium")).lower())
+        except ValueError:
+            raise ApiError(400, "Неверный приоритет. Допустимые значения: low, medium, high")
+
+        tags = data.get("tags") or []
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            raise ApiError(400, "Поле tags должно быть списком строк")
+
+        due_date = data.get("due_date")
+        if due_date is not None:
+            try:
+                due_date = date.fromisoformat(due_date).isoformat()
+            except (TypeError, ValueError):
+                raise ApiError(400, "Неверный формат due_date. Используйте ГГГГ-ММ-ДД")
+
+        task = Task(title, data.get("description") or "", priority, due_date, tags)
+        saved_task = self.storage.save_task(task)
+        return 201, saved_task.to_dict()
+
+    def get_task(self, task_id, query):
+        """GET /tasks/<id> — получение задачи."""
+        task = self.storage.get_task_by_id(int(task_id))
+        if not task:
+            raise ApiError(404, f"Задача с ID {task_id} не найдена")
+        return 200, task.to_dict()
+
+    def complete_task(self, task_id, query):
+        """POST /tasks/<id>/done — отметка задачи как выполненной."""
+        storage = self.storage
+
+        def complete():
+            task = storage.get_task_by_id(int(task_id), use_primary=True)
+            if not task:
+                raise ApiError(404, f"Задача с ID {task_id} не найдена")
+            if task.status != TaskStatus.COMPLETED:
+                task.mark_completed()
+                storage.save_task(task)
+            return task
+
+        try:
+            task = retry_on_conflict(complete)
+        except ConcurrentModificationError as e:
+            raise ApiError(409, str(e))
+        return 200, task.to_dict()
+
+    def delete_task(self, task_id, query):
+        """DELETE /tasks/<id> — удаление задачи."""
+        if not self.storage.delete_task(int(task_id)):
+            raise ApiError(404, f"Задача с ID {task_id} не найдена")
+        return 204, None
+
+    def get_stats(self, query):
+        """GET /stats — статистика по задачам."""
+        return 200, self.storage.get_statistics()
+
+    def log_message(self, format, *args):
+        """Пишет журнал запросов только если он включен на сервере."""
+        if self.server.log_requests:
+            super().log_message(format, *args)
+
+
+class TaskAPIServer(HTTPServer):
+    """HTTP сервер, обрабатывающий соединения ограниченным пулом потоков.
+
+    В отличие от ThreadingHTTPServer, который создает поток на каждое
+    соединение, здесь число одновременно работающих обработчиков не
+    превышает workers, а значит и число занятых соединений с БД. Соединения
+    сверх workers ждут в очереди не длиннее max_queue; остальным сразу
+    отвечается 503.
+
+    Attributes:
+        storage (TaskStorage): Хранилище задач владельца сервера, общее
+            для всех потоков; хранилища других владельцев создаются из
+            него (storage_for) и делят с ним соединения и очередь вставок.
+        keepalive_timeout (float): Время простоя keep-alive соединения в секундах.
+        max_queue (int): Наибольшее число соединений, ждущих поток.
+        log_requests (bool): Писать ли журнал запросов в stderr.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, address, storage: TaskStorage, workers: int = None,
+                 keepalive_timeout: float = None, log_requests: bool = False,
+                 max_queue: int = None):
+        """Инициализирует сервер.
+
+        Args:
+            address (tuple): Пара (host, port) для прослушивания.
+            storage (TaskStorage): Хранилище задач.
+            workers (int, optional): Размер пула рабочих потоков.
+            keepalive_timeout (float, optional): Таймаут простоя соединения.
+            log_requests (bool, optional): Включить журнал запросов.
+            max_queue (int, optional): Длина очереди соединений.
+        """
+        super().__init__(address, TaskRequestHandler)
+        self.storage = storage
+        self.workers = workers or Config.SERVER_WORKERS
+        self.keepalive_timeout = keepalive_timeout or Config.SERVER_KEEPALIVE_TIMEOUT
+        self.log_requests = log_requests
+        self.max_queue = Config.SERVER_MAX_QUEUE if max_queue is None else max_queue
+        self.executor = ThreadPoolExecutor(max_workers=self.workers,
+                                           thread_name_prefix="task-api")
+        self._stats_lock = threading.Lock()
+        # Последние использованные хранилища владельцев; вытесненное
+        # хранилище своих ресурсов не держит, и его просто забывают
+        self._owner_storages = OrderedDict()
+        self._owner_storages_lock = threading.Lock()
+        # Соединения, принятые, но еще не взятые рабочим потоком
+        self._queued = 0
+        self._active = 0
+        self.request_count = 0
+        self.total_request_ms = 0.0
+
+    def process_request(self, request, client_address):
+        """Передает принятое соединение в пул рабочих потоков.
+
+        Если все потоки заняты и очередь заполнена, соединение получает
+        503 и закрывается, не дожидаясь потока.
+        """
+        with self._stats_lock:
+            overloaded = self._active >= self.workers and self._queued >= self.max_queue
+            if not overloaded:
+                self._queued += 1
+        if overloaded:
+            REGISTRY.inc("http_rejected_connections_total")
+            try:
+                request.sendall(_OVERLOADED_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self.executor.submit(self._process_request_worker, request, client_address)
+
+    def has_waiting_connections(self) -> bool:
+        """Проверяет, ждут ли принятые соединения свободный поток."""
+        with self._stats_lock:
+            return self._queued > 0 and self._active >= self.workers
+
+    def _process_request_worker(self, request, client_address):
+        """Обслуживает соединение в рабочем потоке."""
+        with self._stats_lock:
+            self._queued -= 1
+            self._active += 1
+        try:
+            # Свой контекст на соединение: read-your-writes хранилища и
+            # текущий спан не переходят к соединениям, которые поток
+            # обслужит следом
+            contextvars.Context().run(self.finish_request, request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._stats_lock:
+                self._active -= 1
+
+    def storage_for(self, owner: str):
+        """Возвращает хранилище задач владельца, создавая его при первом запросе.
+
+        Число запомненных хранилищ ограничено Config.SERVER_OWNER_CACHE_SIZE:
+        значения заголовка задает клиент.
+        """
+        if owner == self.storage.owner:
+            return self.storage
+        with self._owner_storages_lock:
+            storage = self._owner_storages.get(owner)
+            if storage is not None:
+                self._owner_storages.move_to_end(owner)
+                return storage
+            storage = self._owner_storages[owner] = self.storage.for_owner(owner)
+            while len(self._owner_storages) > Config.SERVER_OWNER_CACHE_SIZE:
+                self._owner_storages.popitem(last=False)
+        return storage
+
+    def record_request(self, elapsed_ms: float):
+        """Учитывает время обработки запроса в общей статистике."""
+        with self._stats_lock:
+            self.request_count += 1
+            self.total_request_ms += elapsed_ms
+
+    def server_close(self):
+        """Останавливает прием соединений и дожидается рабочих потоков."""
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+def run_server(storage: TaskStorage, host: str = None, port: int = None,
+               workers: int = None, log_requests: bool = False,
+               coalesce_writes: bool = False) -> str:
+    """Запускает HTTP API и блокируется до Ctrl+C.
+
+    Args:
+        storage (TaskStorage): Хранилище задач.
+        host (str, optional): Адрес для прослушивания.
+        port (int, optional): Порт для прослушивания.
+        workers (int, optional): Число рабочих потоков и соединений с БД.
+        log_requests (bool, optional): Включить журнал запросов.
+        coalesce_writes (bool, optional): Объединять конкурентные вставки в пакеты.
+
+    Returns:
+        str: Итоговое сообщение после остановки сервера.
+    """
+    host = host or Config.SERVER_HOST
+    port = port or Config.SERVER_PORT
+    workers = workers or Config.SERVER_WORKERS
+
+    # Каждому рабочему потоку достаточно одного соединения
+    DatabaseConnection.init_pool(minconn=1, maxconn=workers)
+    if coalesce_writes:
+        storage.enable_write_coalescing()
+    server = TaskAPIServer((host, port), storage, workers, log_requests=log_requests)
+    print(f"🌐 API сервер запущен на http://{host}:{server.server_address[1]} "
+          f"(потоков: {workers})", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        storage.close()
+        DatabaseConnection.close_pool()
+
+    average = server.total_request_ms / server.request_count if server.request_count else 0
+    return (f"🛑 Сервер остановлен. Обработано запросов: {server.request_count}, "
+            f"среднее время: {average:.2f} мс")
@@ -0,0 +1,401 @@
+"""
+Модуль шардированного хранилища задач.
+
+Задачи распределяются по нескольким базам PostgreSQL. ID задачи кодирует
+номер шарда (id % число_шардов), поэтому операции над одной задачей идут
+прямо в нужную базу, а списки и статистика собираются параллельно со всех
+шардов и сливаются с сохранением порядка, который дает SQL.
+"""
+
+import copy
+import heapq
+import statistics
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import List, Optional, Dict, Any
+
+from config import Config
+from models import Task, TaskStatus, Priority
+from storage import TaskStorage, DatabaseConnection, ChangeListener
+
+
+# Ранги для слияния в порядке ORDER BY из TaskStorage.get_all_tasks
+STATUS_RANK = {TaskStatus.PENDING: 1, TaskStatus.COMPLETED: 2}
+PRIORITY_RANK = {Priority.HIGH: 1, Priority.MEDIUM: 2, Priority.LOW: 3}
+
+
+def created_desc_key(task: Task):
+    """Ключ сортировки, повторяющий ORDER BY created_at DESC.
+
+    В PostgreSQL при DESC значения NULL идут первыми.
+    """
+    if not task.created_at:
+        return (0, 0.0)
+    return (1, -datetime.fromisoformat(task.created_at).timestamp())
+
+
+def all_tasks_key(task: Task):
+    """Ключ сортировки, повторяющий порядок TaskStorage.get_all_tasks."""
+    return (STATUS_RANK[task.status], PRIORITY_RANK[task.priority]) + created_desc_key(task)
+
+
+def ready_key(task: Task):
+    """Ключ сортировки, повторяющий порядок TaskStorage.get_ready_tasks."""
+    due = (0, task.due_date) if task.due_date else (1, "")
+    created = datetime.fromisoformat(task.created_at).timestamp() if task.created_at else float("inf")
+    return (PRIORITY_RANK[task.priority],) + due + (created,)
+
+
+def configure_shard_sequence(connection_params: dict, shard_index: int, shard_count: int,
+                             table: str = "tasks"):
+    """Настраивает последовательность ID так, чтобы id % shard_count == shard_index.
+
+    Шаг последовательности становится равным числу шардов, а текущее
+    значение сдвигается вперед на ближайшее не меньшее число с нужным
+    остатком. Если последовательность уже настроена, выполняется только
+    чтение: DDL нужен лишь при первом запуске или смене числа шардов и
+    выполняется под рекомендательной блокировкой схемы. Значение
+    последовательности никогда не уменьшается. Строки, созданные до
+    включения шардирования, должны быть перенесены в свои шарды отдельно.
+
+    Args:
+        connection_params (dict): Параметры подключения к базе шарда.
+        shard_index (int): Номер шарда.
+        shard_count (int): Общее число шардов.
+        table (str, optional): Таблица, чья последовательность настраивается.
+    """
+    sequence = f"{table}_id_seq"
+    state_sql = f"""
+        SELECT s.increment_by, q.last_value, q.is_called
+        FROM pg_sequences s, {sequence} q
+        WHERE s.schemaname = current_schema() AND s.sequencename = %s
+    """
+    with DatabaseConnection.get_cursor(connection_params) as cursor:
+        cursor.execute(state_sql, (sequence,))
+        if _sequence_aligned(cursor.fetchone(), shard_index, shard_count):
+            return
+
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (TaskStorage.SCHEMA_LOCK_KEY,))
+        # Другой процесс мог настроить последовательность, пока мы ждали блокировку
+        cursor.execute(state_sql, (sequence,))
+        if _sequence_aligned(cursor.fetchone(), shard_index, shard_count):
+            return
+
+        # ALTER SEQUENCE держит до конца транзакции блокировку, с которой
+        # конфликтует nextval: значение не изменится между чтением и setval
+        cursor.execute(
+            f"ALTER SEQUENCE {sequence} INCREMENT BY {int(shard_count)} MINVALUE 0"
+        )
+        cursor.execute(f"""
+            SELECT GREATEST(
+                (SELECT COALESCE(MAX(id), 0) FROM {table}),
+                (SELECT last_value FROM {sequence})
+            ) AS base
+        """)
+        base = cursor.fetchone()['base']
+        aligned = base + (shard_index - base) % shard_count
+        # Только вперед: выданное значение не должно выдаться повторно
+        cursor.execute(f"""
+            SELECT setval('{sequence}', %(aligned)s, true)
+            FROM {sequence}
+            WHERE last_value < %(aligned)s OR NOT is_called
+        """, {'aligned': aligned})
+
+
+def _sequence_aligned(state: Optional[dict], shard_index: int, shard_count: int) -> bool:
+    """Проверяет, что последовательность уже выдает ID только своего шарда."""
+    return (state is not None and state['increment_by'] == shard_count and state['is_called']
+            and state['last_value'] % shard_count == shard_index)
+
+
+class ShardedTaskStorage:
+    """Хранилище задач, распределенное по нескольким базам данных.
+
+    Поддерживает основной интерфейс TaskStorage: сохранение, получение и
+    удаление задачи, списки с фильтрами и общую статистику.
+
+    Attributes:
+        shards (List[TaskStorage]): Хранилища отдельных шардов.
+    """
+
+    # Таблицы, ID которых определяют шард строки
+    SHARDED_TABLES = ("tasks", "recurrence_rules")
+
+    def __init__(self, shard_params: List[dict] = None, owner: str = None):
+        """Подключается к шардам и настраивает в них последовательности ID.
+
+        Args:
+            shard_params (List[dict], optional): Параметры подключения к базам
+                шардов. По умолчанию берутся из Config.SHARD_DATABASES.
+            owner (str, optional): Владелец задач. По умолчанию Config.TASK_OWNER.
+        """
+        shard_params = shard_params or Config.get_shard_params()
+        if not shard_params:
+            raise ValueError("Не заданы базы данных шардов (Config.SHARD_DATABASES)")
+
+        self.owner = owner or Config.TASK_OWNER
+        self._shard_params = shard_params
+        self.shards = [TaskStorage(connection_params=params, owner=self.owner) for params in shard_params]
+        # ID правил повторения, как и ID задач, кодируют номер шарда
+        for index, params in enumerate(shard_params):
+            for table in self.SHARDED_TABLES:
+                configure_shard_sequence(params, index, len(shard_params), table)
+
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards),
+                                            thread_name_prefix="task-shard")
+        self._owns_executor = True
+
+    def shard_for_id(self, task_id: int) -> TaskStorage:
+        """Возвращает шард, которому принадлежит задача с данным ID."""
+        return self.shards[task_id % len(self.shards)]
+
+    def shard_for_new_task(self, task: Task) -> TaskStorage:
+        """Выбирает шард для новой задачи по хэшу ее содержимого.
+
+        Подзадача создается в шарде родителя: связи между задачами
+        поддерживаются только внутри одного шарда.
+        """
+        if task.parent_id is not None:
+            return self.shard_for_id(task.parent_id)
+        key = f"{task.created_at}|{task.title}".encode("utf-8")
+        return self.shards[zlib.crc32(key) % len(self.shards)]
+
+    def _fan_out(self, method: str, *args) -> list:
+        """Параллельно вызывает метод на всех шардах и собирает результаты."""
+        futures = [self._executor.submit(getattr(shard, method), *args) for shard in self.shards]
+        return [future.result() for future in futures]
+
+    def enable_write_coalescing(self, max_batch: int = None, max_delay: float = None):
+        """Включает объединение вставок на каждом шарде."""
+        for shard in self.shards:
+            shard.enable_write_coalescing(max_batch, max_delay)
+
+    def for_owner(self, owner: str) -> "ShardedTaskStorage":
+        """Возвращает хранилище тех же шардов для задач другого владельца.
+
+        Пул потоков обхода шардов и очереди вставок шардов общие с этим
+        хранилищем, поэтому закрывать его не нужно.
+        """
+        storage = copy.copy(self)
+        storage.owner = owner
+        storage.shards = [shard.for_owner(owner) for shard in self.shards]
+        storage._owns_executor = False
+        return storage
+
+    def close(self):
+        """Освобождает ресурсы всех шардов."""
+        for shard in self.shards:
+            shard.close()
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    def save_task(self, task: Task) -> Task:
+        """Сохраняет задачу в ее шард (новую — в шард по хэшу)."""
+        if task.id is None:
+            return self.shard_for_new_task(task).save_task(task)
+        return self.shard_for_id(task.id).save_task(task)
+
+    def get_task_by_id(self, task_id: int, use_primary: bool = False) -> Optional[Task]:
+        """Находит задачу в ее шарде."""
+        return self.shard_for_id(task_id).get_task_by_id(task_id, use_primary)
+
+    def delete_task(self, task_id: int) -> bool:
+        """Удаляет задачу из ее шарда."""
+        return self.shard_for_id(task_id).delete_task(task_id)
+
+    def _same_shard(self, task_id: int, other_id: int) -> TaskStorage:
+        """Возвращает общий шард двух задач или сообщает, что связь невозможна."""
+        shard = self.shard_for_id(task_id)
+        if shard is not self.shard_for_id(other_id):
+            raise ValueError(f"Задачи {task_id} и {other_id} хранятся в разных шардах "
+                             f"и не могут быть связаны")
+        return shard
+
+    def set_parent(self, task_id: int, parent_id: Optional[int]) -> bool:
+        """Меняет родителя задачи внутри ее шарда."""
+        if parent_id is None:
+            return self.shard_for_id(task_id).set_parent(task_id, None)
+        return self._same_shard(task_id, parent_id).set_parent(task_id, parent_id)
+
+    def add_dependency(self, task_id: int, blocked_by: int) -> bool:
+        """Добавляет связь блокировки внутри шарда."""
+        return self._same_shard(task_id, blocked_by).add_dependency(task_id, blocked_by)
+
+    def remove_dependency(self, task_id: int, blocked_by: int) -> bool:
+        """Удаляет связь блокировки."""
+        return self.shard_for_id(task_id).remove_dependency(task_id, blocked_by)
+
+    def get_task_tree(self, root_id: int):
+        """Загружает дерево задачи из ее шарда."""
+        return self.shard_for_id(root_id).get_task_tree(root_id)
+
+    def get_ready_tasks(self) -> List[Task]:
+        """Собирает готовые задачи всех шардов в порядке TaskStorage.get_ready_tasks."""
+        results = self._fan_out("get_ready_tasks")
+        return list(heapq.merge(*results, key=ready_key))
+
+    def get_all_tasks(self, verbose: bool = False) -> List[Task]:
+        """Возвращает задачи всех шардов в порядке TaskStorage.get_all_tasks."""
+        results = self._fan_out("get_all_tasks", verbose)
+        return list(heapq.merge(*results, key=all_tasks_key))
+
+    def filter_tasks(self, status: str = None, priority: str = None,
+                    due_date: str = None, tags: List[str] = None,
+                    match_all_tags: bool = False, verbose: bool = False) -> List[Task]:
+        """Фильтрует задачи на всех шардах, сохраняя порядок по created_at DESC."""
+        results = self._fan_out("filter_tasks", status, priority, due_date, tags, match_all_tags,
+                                verbose)
+        return list(heapq.merge(*results, key=created_desc_key))
+
+    def update_tasks(self, assignments: Dict[str, Any], status: str = None,
+                     priority: str = None, due_date: str = None, ids: List[int] = None,
+                     id_range=None, dry_run: bool = False) -> List[int]:
+        """Выполняет массовое изменение на шардах.
+
+        Со списком ID запрос уходит только в шарды этих задач. Каждый шард
+        изменяется в своей транзакции.
+        """
+        if ids:
+            per_shard = {}
+            for task_id in ids:
+                per_shard.setdefault(task_id % len(self.shards), []).append(task_id)
+            futures = [
+                self._executor.submit(self.shards[index].update_tasks, assignments, status,
+                                      priority, due_date, shard_ids, id_range, dry_run)
+                for index, shard_ids in per_shard.items()
+            ]
+            results = [future.result() for future in futures]
+        else:
+            results = self._fan_out("update_tasks", assignments, status, priority,
+                                    due_date, None, id_range, dry_run)
+        return [task_id for shard_ids in results for task_id in shard_ids]
+
+    def add_recurrence_rule(self, template: Task, frequency: str, interval: int = 1,
+                            starts_on: str = None, ends_on: str = None) -> int:
+        """Создает правило в шарде по хэшу шаблона; там же будут его экземпляры."""
+        return self.shard_for_new_task(template).add_recurrence_rule(
+            template, frequency, interval, starts_on, ends_on)
+
+    def get_recurrence_rules(self) -> List[Dict[str, Any]]:
+        """Собирает правила повторения всех шардов в порядке ID."""
+        results = self._fan_out("get_recurrence_rules")
+        return list(heapq.merge(*results, key=lambda rule: rule['id']))
+
+    def delete_recurrence_rule(self, rule_id: int) -> bool:
+        """Удаляет правило из его шарда."""
+        return self.shard_for_id(rule_id).delete_recurrence_rule(rule_id)
+
+    def materialize_recurrences(self, horizon_days: int = None) -> int:
+        """Создает экземпляры повторяющихся задач параллельно во всех шардах."""
+        return sum(self._fan_out("materialize_recurrences", horizon_days))
+
+    def seed_tasks(self, count: int, chunk_size: int = None, drop_indexes: bool = False) -> int:
+        """Создает синтетические задачи параллельно во всех шардах поровну."""
+        per_shard, extra = divmod(count, len(self.shards))
+        futures = [
+            self._executor.submit(shard.seed_tasks, per_shard + (1 if index < extra else 0),
+                                  chunk_size, drop_indexes)
+            for index, shard in enumerate(self.shards)
+        ]
+        return sum(future.result() for future in futures)
+
+    def get_changes_since(self, since: datetime = None):
+        """Собирает изменения всех шардов для локального снимка."""
+        results = self._fan_out("get_changes_since", since)
+        tasks = [task for shard_tasks, _, _ in results for task in shard_tasks]
+        deleted_ids = [task_id for _, shard_deleted, _ in results for task_id in shard_deleted]
+        watermarks = [watermark for _, _, watermark in results if watermark is not None]
+        return tasks, deleted_ids, max(watermarks) if watermarks else since
+
+    def iter_changes(self, status: str = None, priority: str = None,
+                     idle_timeout: float = None):
+        """Перебирает события изменения задач всех шардов."""
+        with self.change_listener() as listener:
+            yield from listener.iter_changes(status, priority, idle_timeout)
+
+    def change_listener(self) -> ChangeListener:
+        """Создает слушателя изменений, подписанного на все шарды."""
+        return ChangeListener(self._shard_params, self.owner)
+
+    def get_pending_due_tasks(self, until: date, after: date = None) -> List[Task]:
+        """Собирает невыполненные задачи со сроком в диапазоне со всех шардов."""
+        results = self._fan_out("get_pending_due_tasks", until, after)
+        return list(heapq.merge(*results, key=lambda task: (task.due_date, task.id)))
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Суммирует статистику всех шардов."""
+        results = self._fan_out("get_statistics")
+
+        stats = {}
+        tags = {}
+        for shard_stats in results:
+            for key, value in shard_stats.items():
+                if key == 'tags':
+                    for tag, count in value.items():
+                        tags[tag] = tags.get(tag, 0) + count
+                elif key != 'completion_rate':
+                    stats[key] = stats.get(key, 0) + (value or 0)
+
+        if stats.get('total_tasks', 0) > 0:
+            stats['completion_rate'] = round((stats['completed_tasks'] / stats['total_tasks']) * 100, 2)
+        else:
+            stats['completion_rate'] = 0
+
+        # У каждого шарда свой список самых частых тегов, общий собирается из них
+        top_tags = sorted(tags.items(), key=lambda item: (-item[1], item[0]))[:Config.STATS_TOP_TAGS]
+        stats['tags'] = dict(top_tags)
+
+        return stats
+
+    def apply_journal_batch(self, entries: List[dict]) -> int:
+        """Применяет операции журнала в шардах, которым они принадлежат."""
+        per_shard = {}
+        for entry in entries:
+            payload = entry['payload']
+            if entry['op'] == 'add':
+                task = Task(payload['title'], parent_id=payload.get('parent_id'))
+                task.created_at = entry['ts']
+                shard = self.shard_for_new_task(task)
+            else:
+                shard = self.shard_for_id(payload['task_id'])
+            per_shard.setdefault(id(shard), (shard, []))[1].append(entry)
+
+        return sum(shard.apply_journal_batch(shard_entries)
+                   for shard, shard_entries in per_shard.values())
+
+    def refresh_stats_rollup(self) -> int:
+        """Досчитывает дневные агрегаты на всех шардах; возвращает число пересчитанных дней."""
+        return sum(self._fan_out("refresh_stats_rollup"))
+
+    def rebuild_stats_rollup(self) -> int:
+        """Полностью пересчитывает дневные агрегаты на всех шардах."""
+        return sum(self._fan_out("rebuild_stats_rollup"))
+
+    def get_statistics_by_period(self, period: str = "day", since: str = None) -> List[Dict[str, Any]]:
+        """Складывает агрегаты периодов всех шардов.
+
+        Медиана не складывается, поэтому шарды отдают все времена
+        выполнения периода, и медиана считается по их объединению.
+        """
+        results = self._fan_out("get_period_rollup", period, since)
+
+        merged = {}
+        for rows in results:
+            for row in rows:
+                total = merged.setdefault(row['period'], {'created_tasks': 0, 'completed_tasks': 0,
+                                                          'lead_times': []})
+                total['created_tasks'] += row['created_tasks']
+                total['completed_tasks'] += row['completed_tasks']
+                total['lead_times'].extend(row['lead_times'])
+
+        return [
+            {
+                'period': str(period_start),
+                'created_tasks': total['created_tasks'],
+                'completed_tasks': total['completed_tasks'],
+                'median_lead_hours': (round(statistics.median(total['lead_times']) / 3600, 2)
+                                      if total['lead_times'] else None)
+            }
+            for period_start, total in sorted(merged.items())
+        ]
@@ -0,0 +1,333 @@
+"""
+Модуль локального снимка задач для менеджера задач.
+
+Снимок — файл с компактными записями фиксированного размера, который
+читается через mmap. Команды list и stats с --snapshot читают задачи из
+него, а из PostgreSQL запрашивают только строки, измененные после
+сохраненной отметки времени (водяного знака), и удаленные ID.
+
+Формат файла:
+    заголовок   — сигнатура, версия формата, число записей, водяной знак;
+    записи      — поля фиксированной длины и ссылки на строки;
+    строки      — названия, описания и теги в UTF-8 подряд.
+
+Записи хранятся в порядке created_at DESC, поэтому фильтрация идет одним
+проходом по полям фиксированной длины, а строки декодируются только у
+подошедших задач.
+"""
+
+import mmap
+import os
+import re
+import struct
+from datetime import datetime, date, timedelta
+from typing import List, Optional, Dict, Any
+
+from config import Config
+from journal import _fsync_directory
+from models import Task, TaskStatus, Priority
+
+
+MAGIC = b"TSNP"
+FORMAT_VERSION = 3
+
+# Сигнатура, версия формата, число записей, водяной знак
+HEADER = struct.Struct("<4sHIq")
+# id, статус, приоритет, created_at, due_date, completed_at, version,
+# смещения и длины названия, описания и тегов, ID родителя (0 — нет)
+RECORD = struct.Struct("<iBBqiqiIIIIIIi")
+
+# Разделитель тегов в строке тегов записи
+TAG_SEPARATOR = "\x1f"
+
+# Отсутствующие значения времени и даты
+NO_TIMESTAMP = -2 ** 63
+NO_DATE = 0
+
+EPOCH = datetime(1970, 1, 1)
+STATUSES = list(TaskStatus)
+PRIORITIES = list(Priority)
+
+# Ранги для порядка TaskStorage.get_all_tasks
+STATUS_RANK = {TaskStatus.PENDING: 1, TaskStatus.COMPLETED: 2}
+PRIORITY_RANK = {Priority.HIGH: 1, Priority.MEDIUM: 2, Priority.LOW: 3}
+
+
+def _to_micros(value) -> int:
+    """Переводит дату и время в микросекунды от эпохи (без часового пояса)."""
+    if value is None:
+        return NO_TIMESTAMP
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int) -> Optional[datetime]:
+    """Обратное преобразование для _to_micros."""
+    if value == NO_TIMESTAMP:
+        return None
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _created_desc_key(record) -> tuple:
+    """Ключ порядка ORDER BY created_at DESC (NULL идут первыми)."""
+    created_at = record[3]
+    return (0, 0) if created_at == NO_TIMESTAMP else (1, -created_at)
+
+
+class TaskSnapshot:
+    """Локальный снимок задач с инкрементальным обновлением.
+
+    Поддерживает методы чтения TaskStorage: get_all_tasks, filter_tasks и
+    get_statistics, поэтому может подменять хранилище в командах чтения.
+
+    Attributes:
+        path (str): Путь к файлу снимка.
+    """
+
+    def __init__(self, path: str = None, owner: str = None):
+        """Инициализирует снимок.
+
+        У каждого владельца свой файл снимка: в нем только его задачи.
+
+        Args:
+            path (str, optional): Путь к файлу. По умолчанию Config.SNAPSHOT_PATH
+                с именем владельца перед расширением.
+            owner (str, optional): Владелец задач. По умолчанию Config.TASK_OWNER.
+        """
+        if path is None:
+            base, extension = os.path.splitext(Config.SNAPSHOT_PATH)
+            owner = re.sub(r"[^\w.-]", "_", owner or Config.TASK_OWNER)
+            path = f"{base}-{owner}{extension}"
+        self.path = path
+
+    def exists(self) -> bool:
+        """Проверяет, создан ли снимок текущего формата."""
+        data = self._open()
+        if data is None:
+            return False
+        data.close()
+        return True
+
+    def _open(self):
+        """Отображает файл снимка в память.
+
+        Возвращает None, если снимка нет или он записан в старом формате:
+        такой снимок при обновлении строится заново.
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, _ = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            data.close()
+            raise ValueError(f"Файл {self.path} не является снимком задач")
+        if version != FORMAT_VERSION:
+            data.close()
+            return None
+        return data
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        """Отметка времени последнего учтенного изменения."""
+        data = self._open()
+        if data is None:
+            return None
+        with data:
+            return _from_micros(HEADER.unpack_from(data, 0)[3])
+
+    def _records(self, data):
+        """Перебирает распакованные записи снимка."""
+        count = HEADER.unpack_from(data, 0)[2]
+        return RECORD.iter_unpack(data[HEADER.size:HEADER.size + count * RECORD.size])
+
+    @staticmethod
+    def _record_to_task(data, record, strings_offset: int) -> Task:
+        """Собирает задачу из записи, декодируя ее строки."""
+        (task_id, status, priority, created_at, due_date, completed_at, version,
+         title_offset, title_length, description_offset, description_length) = record[:11]
+
+        title_start = strings_offset + title_offset
+        description_start = strings_offset + description_offset
+        created = _from_micros(created_at)
+        completed = _from_micros(completed_at)
+        return Task.from_dict({
+            'id': task_id,
+            'title': data[title_start:title_start + title_length].decode("utf-8"),
+            'description': data[description_start:description_start + description_length].decode("utf-8"),
+            'status': STATUSES[status].value,
+            'priority': PRIORITIES[priority].value,
+            'created_at': created.isoformat() if created else None,
+            'due_date': date.fromordinal(due_date).isoformat() if due_date != NO_DATE else None,
+            'completed_at': completed.isoformat() if completed else None,
+            'version': version or None,
+            'tags': TaskSnapshot._record_tags(data, record, strings_offset),
+            'parent_id': record[13] or None
+        })
+
+    @staticmethod
+    def _record_tags(data, record, strings_offset: int) -> List[str]:
+        """Декодирует теги записи."""
+        tags_offset, tags_length = record[11:13]
+        if not tags_length:
+            return []
+        start = strings_offset + tags_offset
+        return data[start:start + tags_length].decode("utf-8").split(TAG_SEPARATOR)
+
+    def _select(self, predicate=None, tags: List[str] = None,
+                match_all_tags: bool = False, verbose: bool = True) -> List[Task]:
+        """Возвращает задачи, записи которых удовлетворяют условию и тегам."""
+        data = self._open()
+        if data is None:
+            return []
+        wanted = set(tags or [])
+        with data:
+            count = HEADER.unpack_from(data, 0)[2]
+            strings_offset = HEADER.size + count * RECORD.size
+            tasks = []
+            for record in self._records(data):
+                if predicate is not None and not predicate(record):
+                    continue
+                if wanted:
+                    record_tags = set(self._record_tags(data, record, strings_offset))
+                    if match_all_tags and not wanted <= record_tags:
+                        continue
+                    if not match_all_tags and not wanted & record_tags:
+                        continue
+                task = self._record_to_task(data, record, strings_offset)
+                if not verbose:
+                    task.truncate_description(Config.LIST_DESCRIPTION_PREVIEW)
+                tasks.append(task)
+            return tasks
+
+    def get_all_tasks(self, verbose: bool = False) -> List[Task]:
+        """Возвращает все задачи в порядке TaskStorage.get_all_tasks."""
+        tasks = self._select(verbose=verbose)
+        # Сортировка устойчива, внутри групп сохраняется порядок created_at DESC
+        tasks.sort(key=lambda task: (STATUS_RANK[task.status], PRIORITY_RANK[task.priority]))
+        return tasks
+
+    def filter_tasks(self, status: str = None, priority: str = None,
+                     due_date: str = None, tags: List[str] = None,
+                     match_all_tags: bool = False, verbose: bool = False) -> List[Task]:
+        """Фильтрует задачи по полям записи, не декодируя строки остальных."""
+        status_index = STATUSES.index(TaskStatus(status)) if status else None
+        priority_index = PRIORITIES.index(Priority(priority)) if priority else None
+        due_ordinal = date.fromisoformat(due_date).toordinal() if due_date else None
+
+        def matches(record):
+            return ((status_index is None or record[1] == status_index) and
+                    (priority_index is None or record[2] == priority_index) and
+                    (due_ordinal is None or record[4] == due_ordinal))
+
+        return self._select(matches, tags, match_all_tags, verbose)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Считает статистику как TaskStorage.get_statistics по полям записей."""
+        stats = dict.fromkeys(('total_tasks', 'completed_tasks', 'pending_tasks',
+                               'high_priority', 'medium_priority', 'low_priority',
+                               'overdue_tasks'), 0)
+        priority_keys = {Priority.HIGH: 'high_priority', Priority.MEDIUM: 'medium_priority',
+                         Priority.LOW: 'low_priority'}
+        today = date.today().toordinal()
+        tags = {}
+
+        data = self._open()
+        if data is not None:
+            with data:
+                strings_offset = HEADER.size + HEADER.unpack_from(data, 0)[2] * RECORD.size
+                for record in self._records(data):
+                    for tag in self._record_tags(data, record, strings_offset):
+                        tags[tag] = tags.get(tag, 0) + 1
+                    status = STATUSES[record[1]]
+                    stats['total_tasks'] += 1
+                    stats['completed_tasks' if status == TaskStatus.COMPLETED else 'pending_tasks'] += 1
+                    stats[priority_keys[PRIORITIES[record[2]]]] += 1
+                    if status == TaskStatus.PENDING and record[4] != NO_DATE and record[4] < today:
+                        stats['overdue_tasks'] += 1
+
+        if stats['total_tasks'] > 0:
+            stats['completion_rate'] = round((stats['completed_tasks'] / stats['total_tasks']) * 100, 2)
+        else:
+            stats['completion_rate'] = 0
+        top_tags = sorted(tags.items(), key=lambda item: (-item[1], item[0]))[:Config.STATS_TOP_TAGS]
+        stats['tags'] = dict(top_tags)
+        return stats
+
+    def refresh(self, storage) -> int:
+        """Подтягивает изменения из хранилища и перезаписывает снимок.
+
+        Запрашиваются строки, измененные после водяного знака минус
+        Config.SNAPSHOT_OVERLAP_SECONDS; повторно полученные строки просто
+        заменяют свои записи.
+
+        Args:
+            storage: TaskStorage или ShardedTaskStorage.
+
+        Returns:
+            int: Число полученных измененных и удаленных задач.
+        """
+        watermark = self.watermark
+        since = None
+        if watermark is not None:
+            since = watermark - timedelta(seconds=Config.SNAPSHOT_OVERLAP_SECONDS)
+
+        changed, deleted_ids, new_watermark = storage.get_changes_since(since)
+        if since is not None and not changed and not deleted_ids:
+            return 0
+
+        tasks = {} if since is None else {task.id: task for task in self._select()}
+        for task_id in deleted_ids:
+            tasks.pop(task_id, None)
+        for task in changed:
+            tasks[task.id] = task
+
+        if watermark is not None and (new_watermark is None or new_watermark < watermark):
+            new_watermark = watermark
+        self._write(tasks.values(), new_watermark)
+        return len(changed) + len(deleted_ids)
+
+    def _write(self, tasks, watermark: Optional[datetime]):
+        """Атомарно записывает снимок: во временный файл и переименованием."""
+        records = []
+        strings = bytearray()
+        for task in tasks:
+            title = task.title.encode("utf-8")
+            description = (task.description or "").encode("utf-8")
+            tags = TAG_SEPARATOR.join(task.tags).encode("utf-8")
+            title_offset = len(strings)
+            strings += title
+            description_offset = len(strings)
+            strings += description
+            tags_offset = len(strings)
+            strings += tags
+            records.append((
+                task.id,
+                STATUSES.index(task.status),
+                PRIORITIES.index(task.priority),
+                _to_micros(task.created_at),
+                date.fromisoformat(task.due_date).toordinal() if task.due_date else NO_DATE,
+                _to_micros(task.completed_at),
+                task.version or 0,
+                title_offset, len(title), description_offset, len(description),
+                tags_offset, len(tags),
+                task.parent_id or 0
+            ))
+        records.sort(key=_created_desc_key)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(records), _to_micros(watermark)))
+            for record in records:
+                f.write(RECORD.pack(*record))
+            f.write(strings)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        _fsync_directory(directory)
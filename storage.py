@@ -5,25 +5,246 @@
 """
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from typing import List, Optional, Dict, Any
+import psycopg2.errors
+import psycopg2.extensions
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from typing import List, Optional, Dict, Any, Tuple, Callable
+from concurrent.futures import Future
 from contextlib import contextmanager
+from datetime import date, datetime
+import contextvars
+import copy
+import itertools
+import json
 import os
+import queue
+import random
+import select
+import threading
+import time
 
 from models import Task, TaskStatus, Priority
 from config import Config
+from metrics import REGISTRY, instrument
+import tracing
+
+
+class ConcurrentModificationError(Exception):
+    """Задача была изменена или удалена другим клиентом после загрузки."""
+    
+    def __init__(self, task_id: int):
+        super().__init__(
+            f"Задача {task_id} была изменена или удалена другим пользователем. "
+            f"Загрузите ее заново и повторите операцию"
+        )
+        self.task_id = task_id
+
+
+def retry_on_conflict(operation, attempts: int = None):
+    """Повторяет операцию "загрузить-изменить-сохранить" при конфликте версий.
+    
+    Args:
+        operation (callable): Функция без аргументов, которая заново загружает
+            задачу, изменяет и сохраняет ее.
+        attempts (int, optional): Максимальное число попыток.
+        
+    Returns:
+        Результат последнего вызова operation.
+        
+    Raises:
+        ConcurrentModificationError: Если все попытки завершились конфликтом.
+    """
+    attempts = attempts or Config.OPTIMISTIC_RETRY_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            return operation()
+        except ConcurrentModificationError:
+            if attempt == attempts:
+                raise
+            # Небольшая случайная пауза разводит конкурирующих клиентов
+            time.sleep(random.uniform(0, 0.005 * attempt))
+
+
+class DeadlineExceededError(TimeoutError):
+    """Запрос не уложился в отведенное время и был отменен сервером."""
+    
+    def __init__(self, deadline: str, timeout_ms: int, reason: str):
+        super().__init__(
+            f"Превышено время ожидания для операции класса '{deadline}' "
+            f"({timeout_ms} мс): {reason}"
+        )
+        self.deadline = deadline
+        self.timeout_ms = timeout_ms
+
+
+# Отмечает поток, в котором Ctrl+C прервал ожидание ответа сервера
+_cancel_state = threading.local()
+
+# Параметр транзакции с владельцем задач для политик row-level security
+OWNER_SETTING = "task_manager.owner"
+
+# Момент последней записи в текущем сеансе (контексте выполнения) для
+# read-your-writes. Сервер обслуживает каждое соединение в своем контексте,
+# поэтому запись одного клиента не переводит чтение других на основной сервер
+_last_write_at = contextvars.ContextVar("task_storage_last_write_at", default=None)
+
+
+def _wait_select_interruptible(conn):
+    """Ожидает ответ сервера так, чтобы Ctrl+C отменял запрос на сервере.
+    
+    Повторяет psycopg2.extras.wait_select, но запоминает, что отмена
+    вызвана пользователем, чтобы отличить ее от statement_timeout.
+    """
+    while True:
+        try:
+            state = conn.poll()
+            if state == psycopg2.extensions.POLL_OK:
+                break
+            elif state == psycopg2.extensions.POLL_READ:
+                select.select([conn.fileno()], [], [])
+            elif state == psycopg2.extensions.POLL_WRITE:
+                select.select([], [conn.fileno()], [])
+            else:
+                raise conn.OperationalError(f"Неизвестное состояние poll: {state}")
+        except KeyboardInterrupt:
+            # Просим сервер прервать запрос и ждем, пока он вернет ошибку
+            _cancel_state.interrupted = True
+            conn.cancel()
+
+
+class TracedCursor(RealDictCursor):
+    """Курсор RealDictCursor, записывающий каждый запрос в спан трассы.
+    
+    Используется вместо RealDictCursor, только пока трассировка включена.
+    """
+    
+    # Длина текста запроса в атрибуте спана
+    STATEMENT_PREVIEW = 500
+    
+    def _statement_span(self, query):
+        text = query.as_string(self) if isinstance(query, sql.Composable) else str(query)
+        return tracing.span("db.statement", kind="client", **{
+            "db.system": "postgresql",
+            "db.statement": " ".join(text.split())[:self.STATEMENT_PREVIEW]
+        })
+    
+    def execute(self, query, vars=None):
+        with self._statement_span(query) as span:
+            result = super().execute(query, vars)
+            span.set_attribute("rows", self.rowcount)
+            return result
+    
+    def executemany(self, query, vars_list):
+        with self._statement_span(query) as span:
+            result = super().executemany(query, vars_list)
+            span.set_attribute("rows", self.rowcount)
+            return result
+    
+    def copy_expert(self, sql, file, size=8192):
+        with self._statement_span(sql) as span:
+            result = super().copy_expert(sql, file, size)
+            span.set_attribute("rows", self.rowcount)
+            return result
 
 
 class DatabaseConnection:
-    """Класс для управления подключением к PostgreSQL."""
+    """Класс для управления подключением к PostgreSQL.
+    
+    По умолчанию каждое обращение открывает новое соединение. После вызова
+    init_pool() соединения берутся из потокобезопасных пулов (отдельный пул
+    на каждый сервер: основной и реплики), что позволяет долгоживущим
+    процессам (например, HTTP серверу) не платить за установку соединения
+    на каждый запрос.
+    """
+    
+    _pools = {}
+    _pool_size = None
+    _pools_lock = threading.Lock()
+    
+    @classmethod
+    def init_pool(cls, minconn: int = None, maxconn: int = None):
+        """Включает пулы соединений и создает пул основного сервера.
+        
+        Args:
+            minconn (int, optional): Минимальное число открытых соединений.
+            maxconn (int, optional): Максимальное число соединений на сервер.
+        """
+        if cls._pool_size is not None:
+            return
+        minconn = minconn if minconn is not None else Config.DB_POOL_MIN
+        maxconn = maxconn if maxconn is not None else Config.DB_POOL_MAX
+        cls._pool_size = (minconn, maxconn)
+        cls._get_pool(Config.get_connection_params())
+    
+    @staticmethod
+    def enable_cancel_on_interrupt():
+        """Включает отмену выполняющегося запроса на сервере по Ctrl+C.
+        
+        Без этого KeyboardInterrupt приходит только после ответа сервера,
+        а прерванный клиент оставляет запрос работать на сервере.
+        """
+        psycopg2.extensions.set_wait_callback(_wait_select_interruptible)
+    
+    @staticmethod
+    @contextmanager
+    def copy_mode():
+        """Временно отключает ожидание с отменой по Ctrl+C для команд COPY.
+        
+        psycopg2 не выполняет COPY при установленном wait callback. Прерванный
+        COPY все равно завершается на сервере: соединение закрывается.
+        """
+        callback = psycopg2.extensions.get_wait_callback()
+        psycopg2.extensions.set_wait_callback(None)
+        try:
+            yield
+        finally:
+            psycopg2.extensions.set_wait_callback(callback)
+    
+    @classmethod
+    def close_pool(cls):
+        """Закрывает все соединения всех пулов."""
+        with cls._pools_lock:
+            for pool, _ in cls._pools.values():
+                pool.closeall()
+            cls._pools = {}
+            cls._pool_size = None
+    
+    @classmethod
+    def _get_pool(cls, params: dict):
+        """Возвращает пул и семафор для сервера, создавая их при первом обращении."""
+        key = (params.get("host"), str(params.get("port")), params.get("dbname"))
+        with cls._pools_lock:
+            if key not in cls._pools:
+                minconn, maxconn = cls._pool_size
+                # ThreadedConnectionPool не ждет освобождения соединения, а бросает
+                # PoolError, поэтому ограничиваем число одновременных выдач семафором
+                cls._pools[key] = (ThreadedConnectionPool(minconn, maxconn, **params),
+                                   threading.BoundedSemaphore(maxconn))
+            return cls._pools[key]
     
     @staticmethod
     @contextmanager
-    def get_connection():
-        """Контекстный менеджер для получения соединения с БД."""
+    def get_connection(params: dict = None):
+        """Контекстный менеджер для получения соединения с БД.
+        
+        Args:
+            params (dict, optional): Параметры подключения. По умолчанию
+                основной сервер из Config.
+        """
+        if params is None:
+            params = Config.get_connection_params()
+        
+        if DatabaseConnection._pool_size is not None:
+            with DatabaseConnection._get_pooled_connection(params) as conn:
+                yield conn
+            return
+        
         conn = None
         try:
-            conn = psycopg2.connect(**Config.get_connection_params())
+            with tracing.span("db.connect", kind="client", server=DatabaseConnection._server_label(params)):
+                conn = psycopg2.connect(**params)
             yield conn
         except psycopg2.Error as e:
             print(f"Ошибка подключения к БД: {e}")
@@ -34,29 +255,597 @@ class DatabaseConnection:
     
     @staticmethod
     @contextmanager
-    def get_cursor():
-        """Контекстный менеджер для получения курсора."""
-        with DatabaseConnection.get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                yield cursor
-                conn.commit()
+    def _get_pooled_connection(params: dict):
+        """Берет соединение из пула и возвращает его обратно после работы."""
+        pool, slots = DatabaseConnection._get_pool(params)
+        server = DatabaseConnection._server_label(params)
+        with tracing.span("db.pool.checkout", server=server):
+            started = time.perf_counter()
+            acquired = slots.acquire(timeout=Config.DB_POOL_TIMEOUT)
+            REGISTRY.observe("db_pool_wait_seconds", time.perf_counter() - started, {"server": server})
+            if not acquired:
+                REGISTRY.inc("db_pool_timeouts_total", {"server": server})
+                raise DeadlineExceededError(
+                    "pool", Config.DB_POOL_TIMEOUT * 1000, "нет свободных соединений в пуле"
+                )
+        conn = None
+        try:
+            with tracing.span("db.pool.getconn", server=server):
+                conn = pool.getconn()
+            yield conn
+        finally:
+            # putconn сам откатывает незавершенную транзакцию
+            if conn is not None:
+                pool.putconn(conn, close=bool(conn.closed))
+            slots.release()
+    
+    @staticmethod
+    def _server_label(params: dict) -> str:
+        """Возвращает метку сервера и базы для метрик пула."""
+        return f"{params.get('host')}:{params.get('port')}/{params.get('dbname')}"
+    
+    @classmethod
+    def pool_connection_counts(cls) -> Dict[tuple, int]:
+        """Считает занятые и свободные соединения пулов для метрик."""
+        with cls._pools_lock:
+            pools = list(cls._pools.items())
+        counts = {}
+        for (host, port, dbname), (pool, _) in pools:
+            server = cls._server_label({"host": host, "port": port, "dbname": dbname})
+            counts[(("server", server), ("state", "idle"))] = len(pool._pool)
+            counts[(("server", server), ("state", "in_use"))] = len(pool._used)
+        return counts
+    
+    @staticmethod
+    @contextmanager
+    def get_cursor(params: dict = None, deadline: str = None, owner: str = None, name: str = None):
+        """Контекстный менеджер для получения курсора.
+        
+        Args:
+            params (dict, optional): Параметры подключения. По умолчанию
+                основной сервер из Config.
+            deadline (str, optional): Класс операции (read, write, bulk) из
+                Config.STATEMENT_TIMEOUTS_MS. Ограничения действуют только
+                в пределах транзакции курсора.
+            owner (str, optional): Владелец задач. При Config.ROW_LEVEL_SECURITY
+                записывается в параметр транзакции для политик RLS.
+            name (str, optional): Имя серверного курсора. Такой курсор
+                получает строки результата порциями по itersize, а не все
+                сразу; выполнить на нем можно только один запрос.
+                
+        Raises:
+            DeadlineExceededError: Если сервер отменил запрос по таймауту.
+            KeyboardInterrupt: Если запрос отменен по Ctrl+C.
+        """
+        cursor_factory = TracedCursor if tracing.enabled() else RealDictCursor
+        with DatabaseConnection.get_connection(params) as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cursor:
+                try:
+                    if deadline is not None:
+                        DatabaseConnection._set_deadline(cursor, deadline)
+                    if owner is not None and Config.ROW_LEVEL_SECURITY:
+                        cursor.execute("SELECT set_config(%s, %s, true)", (OWNER_SETTING, owner))
+                    if name is None:
+                        yield cursor
+                    else:
+                        with conn.cursor(name=name, cursor_factory=cursor_factory) as named_cursor:
+                            yield named_cursor
+                    conn.commit()
+                except psycopg2.errors.LockNotAvailable as e:
+                    raise DeadlineExceededError(
+                        deadline, Config.LOCK_TIMEOUT_MS, "не удалось дождаться блокировки"
+                    ) from e
+                except psycopg2.errors.QueryCanceled as e:
+                    if getattr(_cancel_state, "interrupted", False):
+                        _cancel_state.interrupted = False
+                        raise KeyboardInterrupt from e
+                    raise DeadlineExceededError(
+                        deadline, Config.STATEMENT_TIMEOUTS_MS.get(deadline, 0),
+                        "запрос выполнялся слишком долго"
+                    ) from e
+    
+    @staticmethod
+    @contextmanager
+    def get_autocommit_cursor(params: dict = None):
+        """Контекстный менеджер для курсора вне транзакции.
+        
+        Нужен командам, которые нельзя выполнить в блоке транзакции:
+        VACUUM и REINDEX CONCURRENTLY. Таймауты операций на них не
+        действуют: такие команды не блокируют чтение и запись задач.
+        
+        Args:
+            params (dict, optional): Параметры подключения. По умолчанию
+                основной сервер из Config.
+        """
+        with DatabaseConnection.get_connection(params) as conn:
+            conn.autocommit = True
+            try:
+                cursor_factory = TracedCursor if tracing.enabled() else RealDictCursor
+                with conn.cursor(cursor_factory=cursor_factory) as cursor:
+                    yield cursor
+            finally:
+                # Соединение из пула должно вернуться в обычный режим
+                if not conn.closed:
+                    conn.autocommit = False
+    
+    @staticmethod
+    def _set_deadline(cursor, deadline: str):
+        """Устанавливает statement_timeout и lock_timeout для текущей транзакции."""
+        cursor.execute(
+            "SELECT set_config('statement_timeout', %s, true), "
+            "set_config('lock_timeout', %s, true)",
+            (str(Config.STATEMENT_TIMEOUTS_MS[deadline]), str(Config.LOCK_TIMEOUT_MS))
+        )
+
+
+REGISTRY.histogram("db_pool_wait_seconds", "Ожидание свободного соединения пула, секунды")
+REGISTRY.counter("db_pool_timeouts_total", "Число отказов в соединении из-за исчерпания пула")
+REGISTRY.gauge("db_pool_connections", "Соединения пулов по состоянию (in_use, idle)",
+               callback=DatabaseConnection.pool_connection_counts)
+REGISTRY.counter("cache_requests_total", "Обращения к кэшам по результату (hit, miss)")
+
+
+class ReplicaRouter:
+    """Выбирает реплику для чтения по кругу с учетом отставания.
+    
+    Отставание каждой реплики проверяется не чаще, чем раз в
+    REPLICA_LAG_CHECK_INTERVAL секунд. Реплика, которая отстает больше
+    max_lag секунд или недоступна, пропускается; если подходящих реплик
+    нет, чтение выполняется на основном сервере.
+    """
+    
+    LAG_QUERY = """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END AS lag_seconds
+    """
+    
+    def __init__(self, replicas: List[dict], max_lag: float = None, check_interval: float = None):
+        """Инициализирует маршрутизатор.
+        
+        Args:
+            replicas (List[dict]): Параметры подключения к репликам.
+            max_lag (float, optional): Допустимое отставание в секундах.
+            check_interval (float, optional): Период повторной проверки отставания.
+        """
+        self.replicas = replicas
+        self.max_lag = max_lag if max_lag is not None else Config.REPLICA_MAX_LAG_SECONDS
+        self.check_interval = (check_interval if check_interval is not None
+                               else Config.REPLICA_LAG_CHECK_INTERVAL)
+        self._counter = itertools.count()
+        self._health = {}
+    
+    def choose(self) -> Optional[dict]:
+        """Возвращает параметры следующей пригодной реплики.
+        
+        Returns:
+            Optional[dict]: Параметры подключения или None, если читать
+            нужно с основного сервера.
+        """
+        for _ in range(len(self.replicas)):
+            index = next(self._counter) % len(self.replicas)
+            if self._is_healthy(index):
+                return self.replicas[index]
+        return None
+    
+    def _is_healthy(self, index: int) -> bool:
+        """Проверяет отставание реплики, используя кэшированный результат."""
+        checked_at, healthy = self._health.get(index, (None, False))
+        now = time.monotonic()
+        if checked_at is not None and now - checked_at < self.check_interval:
+            REGISTRY.inc("cache_requests_total", {"cache": "replica_health", "result": "hit"})
+            return healthy
+        REGISTRY.inc("cache_requests_total", {"cache": "replica_health", "result": "miss"})
+        
+        try:
+            with DatabaseConnection.get_cursor(self.replicas[index], deadline="read") as cursor:
+                cursor.execute(self.LAG_QUERY)
+                healthy = float(cursor.fetchone()['lag_seconds']) <= self.max_lag
+        except (psycopg2.Error, DeadlineExceededError):
+            # Реплика, не ответившая вовремя, считается непригодной до
+            # следующей проверки, а чтение уходит на другую или на основной
+            healthy = False
+        
+        self._health[index] = (now, healthy)
+        return healthy
+
+
+class ChangeListener:
+    """Получает события изменения задач через LISTEN/NOTIFY.
+    
+    Для каждой базы открывается отдельное соединение вне пула: подписка
+    LISTEN живет, пока открыто соединение. В ожидании событий клиент
+    блокируется на сокетах соединений и не выполняет запросов.
+    
+    Использование:
+        with ChangeListener() as listener:
+            for event in listener.iter_changes(status="pending"):
+                ...
+    """
+    
+    CHANNEL = "task_changes"
+    
+    def __init__(self, connection_params: List[dict] = None, owner: str = None):
+        """Инициализирует слушателя.
+        
+        Args:
+            connection_params (List[dict], optional): Параметры подключения
+                к базам. По умолчанию основной сервер из Config.
+            owner (str, optional): Передавать только события задач этого
+                владельца. По умолчанию — всех.
+        """
+        self._params = connection_params or [Config.get_connection_params()]
+        self._owner = owner
+        self._connections = []
+    
+    def __enter__(self):
+        self.open()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def open(self):
+        """Подключается к базам и подписывается на канал изменений."""
+        for params in self._params:
+            conn = psycopg2.connect(**params)
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.CHANNEL}")
+            self._connections.append(conn)
+    
+    def close(self):
+        """Закрывает соединения подписки."""
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+    
+    def wait(self, timeout: float = None) -> List[dict]:
+        """Ждет событий изменения задач.
+        
+        Args:
+            timeout (float, optional): Максимальное время ожидания в секундах.
+            
+        Returns:
+            List[dict]: Полученные события (пустой список по таймауту).
+        """
+        ready, _, _ = select.select(self._connections, [], [], timeout)
+        events = []
+        for conn in ready:
+            conn.poll()
+            while conn.notifies:
+                event = json.loads(conn.notifies.pop(0).payload)
+                if self._owner is None or event.get('owner') == self._owner:
+                    events.append(event)
+        return events
+    
+    def iter_changes(self, status: str = None, priority: str = None,
+                     idle_timeout: float = None):
+        """Перебирает события изменения задач по мере их поступления.
+        
+        Args:
+            status (str, optional): Только задачи с этим статусом.
+            priority (str, optional): Только задачи с этим приоритетом.
+            idle_timeout (float, optional): Завершить перебор, если событий
+                не было столько секунд. По умолчанию ждать бесконечно.
+            
+        Yields:
+            dict: Событие с полями op (insert, update, delete), id, title,
+                status, priority, due_date и version.
+        """
+        while True:
+            events = self.wait(idle_timeout)
+            if not events and idle_timeout is not None:
+                return
+            for event in events:
+                if status and event['status'] != status:
+                    continue
+                if priority and event['priority'] != priority:
+                    continue
+                yield event
+
+
+class InsertBatcher:
+    """Очередь отложенной записи, объединяющая вставки задач в пакеты.
+    
+    Вызывающие потоки ставят задачу в очередь и ждут результата, а фоновый
+    поток собирает накопившиеся задачи (не больше max_batch и не дольше
+    max_delay секунд с момента первой) и записывает их одним многострочным
+    INSERT ... RETURNING id в одной транзакции. Задачи разных владельцев
+    записываются отдельными транзакциями (для политик RLS). Если пакет
+    отклонен из-за данных одной из строк, строки записываются по одной, и
+    ошибку получает только вызывающий с неверной задачей.
+    """
+    
+    INSERT_SQL = """
+        INSERT INTO tasks (title, description, status, priority, due_date, completed_at, created_at, tags,
+                           parent_id, owner)
+        VALUES %s
+        RETURNING id, created_at, version
+    """
+    
+    def __init__(self, max_batch: int = None, max_delay: float = None,
+                 connection_params: dict = None, owner: str = None):
+        """Запускает фоновый поток записи.
+        
+        Args:
+            max_batch (int, optional): Максимальный размер пакета.
+            max_delay (float, optional): Максимальная добавочная задержка в секундах.
+            connection_params (dict, optional): Параметры подключения к БД.
+            owner (str, optional): Владелец задач, для которых он не указан
+                в submit. По умолчанию Config.TASK_OWNER.
+        """
+        self.connection_params = connection_params
+        self.owner = owner or Config.TASK_OWNER
+        self.max_batch = max_batch or Config.INSERT_BATCH_SIZE
+        self.max_delay = max_delay if max_delay is not None else Config.INSERT_BATCH_DELAY_MS / 1000
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="task-insert-batcher", daemon=True)
+        self._thread.start()
+    
+    def submit(self, task: Task, owner: str = None) -> Future:
+        """Ставит задачу в очередь на вставку.
+        
+        Args:
+            task (Task): Новая задача без ID.
+            owner (str, optional): Владелец задачи. По умолчанию владелец очереди.
+            
+        Returns:
+            Future: Результат с той же задачей после присвоения ID.
+            
+        Raises:
+            RuntimeError: Если очередь уже закрыта: задача не была бы записана.
+        """
+        future = Future()
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("Очередь вставок закрыта")
+            self._queue.put((task, owner or self.owner, future))
+        return future
+    
+    def close(self):
+        """Записывает оставшиеся задачи и останавливает фоновый поток."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+    
+    def _run(self):
+        """Цикл фонового потока: собирает пакеты и записывает их."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            self._flush(batch)
+    
+    def _flush(self, batch):
+        """Записывает пакет задач и раздает вызывающим присвоенные ID."""
+        per_owner = {}
+        for item in batch:
+            per_owner.setdefault(item[1], []).append(item)
+        for owner, items in per_owner.items():
+            self._insert(owner, items)
+    
+    def _insert(self, owner: str, batch):
+        """Записывает задачи одного владельца одним INSERT."""
+        rows = [
+            (task.title, task.description, task.status.value, task.priority.value,
+             task.due_date, task.completed_at, task.created_at, task.tags, task.parent_id, owner)
+            for task, _, _ in batch
+        ]
+        try:
+            with DatabaseConnection.get_cursor(self.connection_params, deadline="write",
+                                               owner=owner) as cursor:
+                # Строки RETURNING идут в порядке списка VALUES
+                results = execute_values(cursor, self.INSERT_SQL, rows,
+                                         page_size=len(rows), fetch=True)
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+                return
+            # Неверная строка откатила весь пакет: остальные не должны
+            # получить ее ошибку
+            for item in batch:
+                self._insert(owner, [item])
+            return
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        
+        for (task, _, future), result in zip(batch, results):
+            task.id = result['id']
+            task.version = result['version']
+            if not task.created_at:
+                task.created_at = result['created_at'].isoformat()
+            task.mark_clean()
+            future.set_result(task)
 
 
+@instrument("task_storage")
 class TaskStorage:
     """Класс для работы с хранилищем задач в PostgreSQL."""
     
-    def __init__(self):
-        """Инициализирует хранилище задач и создает таблицу если необходимо."""
+    # Периоды группировки для статистики по времени
+    STATS_PERIODS = ("day", "week", "month")
+    # Ключ advisory-блокировки для изменения связей между задачами
+    TASK_LINKS_LOCK = 0x7461736B
+    # Поля, которые можно массово изменить через update_tasks
+    UPDATABLE_FIELDS = ("title", "description", "status", "priority", "due_date")
+    # Периодичность правил повторения задач
+    RECURRENCE_FREQUENCIES = ("daily", "weekly", "monthly")
+    # Таблицы, строки которых принадлежат владельцу
+    OWNED_TABLES = ("tasks", "recurrence_rules")
+    # Версия схемы: увеличивается при каждом изменении DDL в _init_database
+    SCHEMA_VERSION = 3
+    # Ключ рекомендательной блокировки, под которой схема обновляется
+    SCHEMA_LOCK_KEY = 7307240035
+    # Таблицы резервной копии в порядке загрузки; счетчики тегов, агрегаты
+    # статистики и журнал удалений после восстановления строятся заново
+    BACKUP_TABLES = ("recurrence_rules", "tasks", "task_dependencies", "journal_applied")
+    DERIVED_TABLES = ("tag_counts", "tag_count_deltas", "task_stats_daily", "task_stats_watermark",
+                      "task_deletions")
+    # Заполнение страниц B-tree индекса по умолчанию, процентов: от него
+    # отсчитывается раздутость индекса
+    INDEX_FILLFACTOR = 90
+    # Слова названий и теги синтетических задач (seed_tasks)
+    SEED_WORDS = ("отчет", "встреча", "релиз", "счет", "звонок", "план", "обзор", "ремонт",
+                  "договор", "тест", "покупки", "письмо")
+    SEED_TAGS = ("work", "home", "urgent", "later", "review")
+    # Случайные величины строки вычисляются во вложенном запросе, чтобы ее
+    # поля были согласованы: статус и дата выполнения, дата создания и срок.
+    # Счетчики тегов обновляются одним запросом на порцию.
+    SEED_SQL = """
+        WITH inserted AS (
+            INSERT INTO tasks (owner, title, description, status, priority, 
+                               created_at, due_date, completed_at, tags)
+            SELECT 
+                %(owner)s,
+                initcap(words[1 + word1]) || ' ' || words[1 + word2] || ' #' || g,
+                CASE WHEN r_text < 0.3 THEN '' 
+                     ELSE repeat(md5(g::text) || ' ', 1 + floor(r_text * 10)::int) END,
+                CASE WHEN r_status < 0.4 THEN 'completed' ELSE 'pending' END,
+                CASE WHEN r_priority < 0.3 THEN 'low' WHEN r_priority < 0.8 THEN 'medium' ELSE 'high' END,
+                created,
+                CASE WHEN r_due < 0.7 THEN created::date + floor(r_due * 60)::int END,
+                CASE WHEN r_status < 0.4 
+                     THEN LEAST(created + r_done * interval '30 days', LOCALTIMESTAMP) END,
+                CASE WHEN r_tags < 0.4 THEN '{}'::text[]
+                     WHEN r_tags < 0.8 THEN ARRAY[tags[1 + tag1]]
+                     ELSE ARRAY[tags[1 + tag1], tags[1 + (tag1 + 1 + tag_step) %% cardinality(tags)]]
+                END
+            FROM (
+                SELECT g, words, tags,
+                       floor(random() * cardinality(words))::int AS word1,
+                       floor(random() * cardinality(words))::int AS word2,
+                       floor(random() * cardinality(tags))::int AS tag1,
+                       floor(random() * (cardinality(tags) - 1))::int AS tag_step,
+                       random() AS r_text, random() AS r_status, random() AS r_priority, 
+                       random() AS r_due, random() AS r_done, random() AS r_tags,
+                       LOCALTIMESTAMP - random() * interval '365 days' AS created
+                FROM generate_series(%(first)s, %(last)s) AS g,
+                     (SELECT %(words)s::text[] AS words, %(tags)s::text[] AS tags) AS params
+            ) AS s
+            RETURNING owner, tags
+        ), counted AS (
+            INSERT INTO tag_count_deltas (owner, tag, delta)
+            SELECT owner, tag, COUNT(*)
+            FROM inserted, unnest(tags) AS tag
+            GROUP BY owner, tag
+        )
+        SELECT COUNT(*) AS created FROM inserted
+    """
+    
+    def __init__(self, connection_params: dict = None, owner: str = None):
+        """Инициализирует хранилище задач и создает таблицу если необходимо.
+        
+        Все запросы хранилища видят и изменяют только задачи его владельца.
+        
+        Args:
+            connection_params (dict, optional): Параметры подключения к БД.
+                По умолчанию основной сервер из Config (с репликами для чтения).
+            owner (str, optional): Владелец задач. По умолчанию Config.TASK_OWNER.
+        """
+        self.owner = owner or Config.TASK_OWNER
+        self._connection_params = connection_params
+        self._insert_batcher = None
+        # Хранилище из for_owner: очередь вставок принадлежит исходному
+        self._shares_resources = False
+        # Реплики из Config описывают основную БД, а не явно заданную
+        replicas = Config.get_replica_params() if connection_params is None else []
+        self._replica_router = ReplicaRouter(replicas) if replicas else None
         self._init_database()
     
+    @property
+    def connection_params(self) -> dict:
+        """Параметры подключения к основному серверу хранилища."""
+        return self._connection_params or Config.get_connection_params()
+    
+    def enable_write_coalescing(self, max_batch: int = None, max_delay: float = None):
+        """Включает объединение конкурентных вставок в многострочные INSERT.
+        
+        Имеет смысл в многопоточном режиме (serve), где одновременно
+        создается много задач: вместо транзакции на каждую задачу
+        выполняется одна транзакция на пакет.
+        
+        Args:
+            max_batch (int, optional): Максимальный размер пакета.
+            max_delay (float, optional): Максимальная добавочная задержка в секундах.
+        """
+        if self._insert_batcher is None:
+            self._insert_batcher = InsertBatcher(max_batch, max_delay, self._connection_params, self.owner)
+    
+    def for_owner(self, owner: str) -> "TaskStorage":
+        """Возвращает хранилище той же базы для задач другого владельца.
+        
+        Схема уже проверена при создании этого хранилища, поэтому новое
+        создается без запросов к БД. Маршрутизатор реплик и очередь
+        вставок у них общие, так что хранилище владельца не держит своих
+        потоков и соединений, а закрывать его не нужно: ресурсы
+        освобождает close() исходного хранилища.
+        
+        Args:
+            owner (str): Владелец задач.
+            
+        Returns:
+            TaskStorage: Хранилище владельца.
+        """
+        storage = copy.copy(self)
+        storage.owner = owner
+        storage._shares_resources = True
+        return storage
+    
+    def close(self):
+        """Дописывает отложенные вставки и освобождает ресурсы хранилища."""
+        if self._shares_resources:
+            return
+        if self._insert_batcher is not None:
+            self._insert_batcher.close()
+            self._insert_batcher = None
+    
     def _init_database(self):
-        """Инициализирует базу данных, создает таблицы если их нет."""
+        """Инициализирует базу данных, создает таблицы если их нет.
+        
+        DDL (пересоздание триггеров и политик, ALTER TABLE) берет
+        блокировки ACCESS EXCLUSIVE, поэтому выполняется только при смене
+        SCHEMA_VERSION или Config.ROW_LEVEL_SECURITY, записанных в таблице
+        schema_version. Обычный запуск лишь читает эту таблицу. Ожидание
+        блокировок ограничено Config.LOCK_TIMEOUT_MS: при долгой транзакции
+        на таблице запуск завершается DeadlineExceededError, а не вешает
+        очередь запросов за собой.
+        """
         try:
             # Сначала проверяем/создаем базу данных
             self._create_database_if_not_exists()
             
-            # Создаем таблицу tasks
-            with DatabaseConnection.get_cursor() as cursor:
+            with DatabaseConnection.get_cursor(self._connection_params, deadline="bulk") as cursor:
+                # Одновременно запущенные клиенты обновляют схему по очереди
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (self.SCHEMA_LOCK_KEY,))
+                if self._schema_is_current(cursor):
+                    return
+                
+                # Создаем таблицу tasks
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS tasks (
                         id SERIAL PRIMARY KEY,
@@ -67,31 +856,40 @@ class TaskStorage:
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         due_date DATE,
                         completed_at TIMESTAMP,
+                        version INTEGER NOT NULL DEFAULT 1,
                         CONSTRAINT valid_status CHECK (status IN ('pending', 'completed')),
                         CONSTRAINT valid_priority CHECK (priority IN ('low', 'medium', 'high'))
                     )
                 """)
                 
-                # Создаем индексы для оптимизации запросов
+                # Версия строки для оптимистичных блокировок в существующих БД
                 cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_tasks_status 
-                    ON tasks(status)
+                    ALTER TABLE tasks 
+                    ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1
                 """)
                 
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_tasks_priority 
-                    ON tasks(priority)
-                """)
+                self._create_ownership(cursor)
+                self._create_stats_rollup_tables(cursor)
+                self._create_tags(cursor)
+                self._create_task_links(cursor)
+                self._create_change_tracking(cursor)
+                self._create_recurrence(cursor)
                 
+                # Ключи идемпотентности операций, перенесенных из локального журнала
                 cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_tasks_due_date 
-                    ON tasks(due_date)
+                    CREATE TABLE IF NOT EXISTS journal_applied (
+                        key VARCHAR(32) PRIMARY KEY,
+                        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    )
                 """)
                 
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_tasks_created_at 
-                    ON tasks(created_at DESC)
-                """)
+                self._configure_row_level_security(cursor)
+                
+                cursor.execute("DELETE FROM schema_version")
+                cursor.execute(
+                    "INSERT INTO schema_version (version, row_level_security) VALUES (%s, %s)",
+                    (self.SCHEMA_VERSION, Config.ROW_LEVEL_SECURITY)
+                )
                 
                 print("База данных инициализирована успешно")
                 
@@ -99,10 +897,438 @@ class TaskStorage:
             print(f"Ошибка при инициализации БД: {e}")
             raise
     
+    def _schema_is_current(self, cursor) -> bool:
+        """Проверяет, что схема уже обновлена до текущей версии и режима RLS."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER NOT NULL,
+                row_level_security BOOLEAN NOT NULL
+            )
+        """)
+        cursor.execute("SELECT version, row_level_security FROM schema_version")
+        row = cursor.fetchone()
+        return (row is not None and row['version'] == self.SCHEMA_VERSION
+                and row['row_level_security'] == Config.ROW_LEVEL_SECURITY)
+    
+    @staticmethod
+    def _column_exists(cursor, table: str, column: str) -> bool:
+        """Проверяет, есть ли столбец в таблице текущей схемы."""
+        cursor.execute("""
+            SELECT 1 
+            FROM information_schema.columns 
+            WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s
+        """, (table, column))
+        return cursor.fetchone() is not None
+    
+    def _add_owner_column(self, cursor, table: str):
+        """Добавляет столбец владельца; существующие строки получают владельца
+        хранилища, которое первым обновило схему.
+        """
+        if self._column_exists(cursor, table, "owner"):
+            return
+        # Добавление столбца с постоянным значением по умолчанию не
+        # переписывает таблицу; новые строки всегда указывают владельца явно
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN owner VARCHAR(64) NOT NULL DEFAULT %s",
+                       (self.owner,))
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN owner DROP DEFAULT")
+    
+    def _create_ownership(self, cursor):
+        """Создает владельца задач и индексы с владельцем в начале ключа.
+        
+        Все запросы фильтруются по владельцу, поэтому индексы по статусу,
+        приоритету, сроку и времени создания заменены составными
+        (owner, ...): запрос пользователя читает только его часть индекса.
+        
+        Args:
+            cursor: Курсор открытой транзакции инициализации.
+        """
+        self._add_owner_column(cursor, "tasks")
+        
+        for column in ("status", "priority", "due_date", "created_at"):
+            cursor.execute(f"DROP INDEX IF EXISTS idx_tasks_{column}")
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_owner_status 
+            ON tasks(owner, status)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_owner_priority 
+            ON tasks(owner, priority)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_owner_due_date 
+            ON tasks(owner, due_date)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_owner_created_at 
+            ON tasks(owner, created_at DESC)
+        """)
+    
+    def _configure_row_level_security(self, cursor):
+        """Включает или выключает политики RLS по Config.ROW_LEVEL_SECURITY.
+        
+        Политика пропускает только строки владельца из параметра транзакции
+        task_manager.owner, который задает DatabaseConnection.get_cursor.
+        Это страховка на случай запроса без фильтра по владельцу; роль
+        суперпользователя и роли с BYPASSRLS политики не ограничивают.
+        
+        Args:
+            cursor: Курсор открытой транзакции инициализации.
+        """
+        for table in self.OWNED_TABLES:
+            if not Config.ROW_LEVEL_SECURITY:
+                cursor.execute(f"ALTER TABLE {table} NO FORCE ROW LEVEL SECURITY")
+                cursor.execute(f"ALTER TABLE {table} DISABLE ROW LEVEL SECURITY")
+                continue
+            cursor.execute(f"DROP POLICY IF EXISTS {table}_owner ON {table}")
+            cursor.execute(f"""
+                CREATE POLICY {table}_owner ON {table} 
+                USING (owner = current_setting('{OWNER_SETTING}', true)) 
+                WITH CHECK (owner = current_setting('{OWNER_SETTING}', true))
+            """)
+            cursor.execute(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY")
+            # Без FORCE политики не действуют на владельца таблицы
+            cursor.execute(f"ALTER TABLE {table} FORCE ROW LEVEL SECURITY")
+    
+    def _create_stats_rollup_tables(self, cursor):
+        """Создает таблицы дневных агрегатов для статистики по периодам.
+        
+        Args:
+            cursor: Курсор открытой транзакции инициализации.
+        """
+        # Агрегаты, посчитанные до появления владельцев, пересчитываются заново
+        if not self._column_exists(cursor, "task_stats_daily", "owner"):
+            cursor.execute("DROP TABLE IF EXISTS task_stats_daily, task_stats_watermark")
+        
+        # Дневные агрегаты владельца: созданные и выполненные задачи, а также
+        # время выполнения каждой задачи, чтобы считать медиану за любой период
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_stats_daily (
+                owner VARCHAR(64) NOT NULL,
+                day DATE NOT NULL,
+                created_count INTEGER NOT NULL DEFAULT 0,
+                completed_count INTEGER NOT NULL DEFAULT 0,
+                lead_times DOUBLE PRECISION[] NOT NULL DEFAULT '{}',
+                PRIMARY KEY (owner, day)
+            )
+        """)
+        
+        # Водяной знак: до какого времени изменения (updated_at) задачи
+        # владельца уже учтены в агрегатах
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_stats_watermark (
+                owner VARCHAR(64) PRIMARY KEY,
+                last_updated_at TIMESTAMP NOT NULL DEFAULT '-infinity'
+            )
+        """)
+        # Прежний водяной знак по id и completed_at пропускал задачи,
+        # выполненные задним числом; агрегаты таких владельцев пересчитываются
+        # заново со значения по умолчанию
+        cursor.execute("""
+            ALTER TABLE task_stats_watermark 
+            ADD COLUMN IF NOT EXISTS last_updated_at TIMESTAMP NOT NULL DEFAULT '-infinity'
+        """)
+        cursor.execute("""
+            ALTER TABLE task_stats_watermark 
+            DROP COLUMN IF EXISTS last_task_id,
+            DROP COLUMN IF EXISTS last_completed_at
+        """)
+        
+        cursor.execute("DROP INDEX IF EXISTS idx_tasks_completed_at")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_owner_completed_at 
+            ON tasks(owner, completed_at)
+        """)
+    
+    def _create_tags(self, cursor):
+        """Создает столбец тегов с GIN индексом и счетчики задач по тегам.
+        
+        Триггер не обновляет счетчики tag_counts на месте: строка счетчика
+        популярного тега стала бы общей блокировкой для всех пишущих
+        транзакций, а транзакции с несколькими тегами могли бы взаимно
+        блокироваться. Вместо этого он дописывает изменения (+1/-1) в
+        tag_count_deltas, которые fold_tag_count_deltas при обслуживании
+        сворачивает в tag_counts. Статистика по тегам складывает обе
+        таблицы и не требует просмотра tasks.
+        
+        Args:
+            cursor: Курсор открытой транзакции инициализации.
+        """
+        cursor.execute("""
+            ALTER TABLE tasks 
+            ADD COLUMN IF NOT EXISTS tags TEXT[] NOT NULL DEFAULT '{}'
+        """)
+        
+        # GIN индекс обслуживает операторы && (любой тег) и @> (все теги);
+        # условие по владельцу проверяется для найденных по тегам строк
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_tags 
+            ON tasks USING GIN (tags)
+        """)
+        
+        # Счетчики без владельца заменяются пересчитанными по задачам
+        backfill = not self._column_exists(cursor, "tag_counts", "owner")
+        if backfill:
+            cursor.execute("DROP TABLE IF EXISTS tag_counts")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tag_counts (
+                owner VARCHAR(64) NOT NULL,
+                tag TEXT NOT NULL,
+                task_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (owner, tag)
+            )
+        """)
+        
+        # Журнал изменений счетчиков: только вставки, без конфликтов строк
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tag_count_deltas (
+                owner VARCHAR(64) NOT NULL,
+                tag TEXT NOT NULL,
+                delta INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tag_count_deltas_owner 
+            ON tag_count_deltas (owner)
+        """)
+        
+        if backfill:
+            self._rebuild_tag_counts(cursor)
+        
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION tasks_count_tags() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE' AND OLD.tags IS NOT DISTINCT FROM NEW.tags THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    INSERT INTO tag_count_deltas (owner, tag, delta)
+                    SELECT DISTINCT OLD.owner, unnest(OLD.tags), -1;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO tag_count_deltas (owner, tag, delta)
+                    SELECT DISTINCT NEW.owner, unnest(NEW.tags), 1;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        
+        cursor.execute("DROP TRIGGER IF EXISTS tasks_count_tags ON tasks")
+        cursor.execute("""
+            CREATE TRIGGER tasks_count_tags 
+            AFTER INSERT OR DELETE OR UPDATE OF tags ON tasks 
+            FOR EACH ROW EXECUTE FUNCTION tasks_count_tags()
+        """)
+    
+    @staticmethod
+    def _rebuild_tag_counts(cursor):
+        """Пересчитывает пустую таблицу tag_counts по задачам (при пустой tag_count_deltas)."""
+        cursor.execute("""
+            INSERT INTO tag_counts (owner, tag, task_count)
+            SELECT owner, tag, COUNT(DISTINCT id)
+            FROM tasks, unnest(tags) AS tag
+            GROUP BY owner, tag
+        """)
+    
+    def _create_task_links(self, cursor):
+        """Создает связи задач: родитель подзадачи и блокирующие задачи.
+        
+        Args:
+            cursor: Курсор открытой транзакции инициализации.
+        """
+        # При удалении родителя подзадачи остаются и становятся корневыми
+        cursor.execute("""
+            ALTER TABLE tasks 
+            ADD COLUMN IF NOT EXISTS parent_id INTEGER REFERENCES tasks(id) ON DELETE SET NULL
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_parent_id 
+            ON tasks(parent_id)
+        """)
+        
+        # Ребро "task_id заблокирована задачей blocked_by"
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_dependencies (
+                task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+                blocked_by INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+                PRIMARY KEY (task_id, blocked_by),
+                CONSTRAINT no_self_dependency CHECK (task_id <> blocked_by)
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_task_dependencies_blocked_by 
+            ON task_dependencies(blocked_by)
+        """)
+    
+    def _create_recurrence(self, cursor):
+        """Создает правила повторения и связь задач с ними.
+        
+        Правило хранит шаблон задачи (название, описание, приоритет, теги)
+        и расписание. Экземпляр правила — обычная задача с заполненными
+        recurrence_rule_id и occurrence; уникальный ключ по этой паре не
+        дает создать один экземпляр дважды.
+        
+        Args:
+            cursor: Курсор открытой транзакции инициализации.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS recurrence_rules (
+                id SERIAL PRIMARY KEY,
+                owner VARCHAR(64) NOT NULL,
+                title VARCHAR(255) NOT NULL,
+                description TEXT,
+                priority VARCHAR(20) NOT NULL DEFAULT 'medium',
+                tags TEXT[] NOT NULL DEFAULT '{}',
+                frequency VARCHAR(10) NOT NULL,
+                interval_count INTEGER NOT NULL DEFAULT 1,
+                starts_on DATE NOT NULL DEFAULT CURRENT_DATE,
+                ends_on DATE,
+                materialized_through DATE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                CONSTRAINT valid_frequency CHECK (frequency IN ('daily', 'weekly', 'monthly')),
+                CONSTRAINT valid_rule_priority CHECK (priority IN ('low', 'medium', 'high')),
+                CONSTRAINT positive_interval CHECK (interval_count > 0)
+            )
+        """)
+        self._add_owner_column(cursor, "recurrence_rules")
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_recurrence_rules_owner 
+            ON recurrence_rules(owner)
+        """)
+        
+        # При удалении правила созданные задачи остаются обычными задачами
+        cursor.execute("""
+            ALTER TABLE tasks 
+            ADD COLUMN IF NOT EXISTS recurrence_rule_id INTEGER 
+                REFERENCES recurrence_rules(id) ON DELETE SET NULL,
+            ADD COLUMN IF NOT EXISTS occurrence DATE
+        """)
+        
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_recurrence_occurrence 
+            ON tasks(recurrence_rule_id, occurrence)
+        """)
+    
+    def _create_change_tracking(self, cursor):
+        """Создает учет изменений для локального снимка и команды watch.
+        
+        Время изменения строки (updated_at), журнал удалений (task_deletions)
+        и уведомления NOTIFY ведутся триггерами, поэтому учитываются любые
+        изменения, в том числе сделанные в обход TaskStorage.
+        
+        Args:
+            cursor: Курсор открытой транзакции инициализации.
+        """
+        cursor.execute("""
+            ALTER TABLE tasks 
+            ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT clock_timestamp()
+        """)
+        
+        cursor.execute("DROP INDEX IF EXISTS idx_tasks_updated_at")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_owner_updated_at 
+            ON tasks(owner, updated_at)
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_deletions (
+                task_id INTEGER PRIMARY KEY,
+                deleted_at TIMESTAMP NOT NULL DEFAULT clock_timestamp()
+            )
+        """)
+        
+        # У удалений, записанных до появления владельцев, владельца нет
+        cursor.execute("""
+            ALTER TABLE task_deletions 
+            ADD COLUMN IF NOT EXISTS owner VARCHAR(64)
+        """)
+        
+        cursor.execute("DROP INDEX IF EXISTS idx_task_deletions_deleted_at")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_task_deletions_owner_deleted_at 
+            ON task_deletions(owner, deleted_at)
+        """)
+        
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION tasks_touch_updated_at() RETURNS trigger AS $$
+            BEGIN
+                NEW.updated_at := clock_timestamp();
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION tasks_record_deletion() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO task_deletions (task_id, owner) VALUES (OLD.id, OLD.owner)
+                ON CONFLICT (task_id) DO UPDATE 
+                SET deleted_at = clock_timestamp(), owner = EXCLUDED.owner;
+                RETURN OLD;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        
+        cursor.execute("DROP TRIGGER IF EXISTS tasks_touch_updated_at ON tasks")
+        cursor.execute("""
+            CREATE TRIGGER tasks_touch_updated_at 
+            BEFORE UPDATE ON tasks 
+            FOR EACH ROW EXECUTE FUNCTION tasks_touch_updated_at()
+        """)
+        
+        # Компактное событие об изменении для ChangeListener; NOTIFY
+        # доставляется подписчикам только после фиксации транзакции
+        cursor.execute(f"""
+            CREATE OR REPLACE FUNCTION tasks_notify_change() RETURNS trigger AS $$
+            DECLARE
+                changed tasks%ROWTYPE;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    changed := OLD;
+                ELSE
+                    changed := NEW;
+                END IF;
+                PERFORM pg_notify('{ChangeListener.CHANNEL}', json_build_object(
+                    'op', lower(TG_OP),
+                    'id', changed.id,
+                    'owner', changed.owner,
+                    'title', left(changed.title, 200),
+                    'status', changed.status,
+                    'priority', changed.priority,
+                    'due_date', changed.due_date,
+                    'version', changed.version
+                )::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        
+        cursor.execute("DROP TRIGGER IF EXISTS tasks_notify_change ON tasks")
+        cursor.execute("""
+            CREATE TRIGGER tasks_notify_change 
+            AFTER INSERT OR UPDATE OR DELETE ON tasks 
+            FOR EACH ROW EXECUTE FUNCTION tasks_notify_change()
+        """)
+        
+        cursor.execute("DROP TRIGGER IF EXISTS tasks_record_deletion ON tasks")
+        cursor.execute("""
+            CREATE TRIGGER tasks_record_deletion 
+            AFTER DELETE ON tasks 
+            FOR EACH ROW EXECUTE FUNCTION tasks_record_deletion()
+        """)
+    
     def _create_database_if_not_exists(self):
         """Создает базу данных, если она не существует."""
         # Подключаемся к системной базе данных postgres
-        conn_params = Config.get_connection_params()
+        conn_params = dict(self._connection_params or Config.get_connection_params())
         db_name = conn_params.pop('dbname')  # Убираем имя БД из параметров
         
         # Подключаемся к postgres чтобы создать БД если нужно
@@ -133,13 +1359,22 @@ class TaskStorage:
         Returns:
             Task: Сохраненная задача с присвоенным ID.
         """
-        with DatabaseConnection.get_cursor() as cursor:
+        if task.id is not None and not task.dirty_fields:
+            # Задача не менялась после загрузки — обращаться к БД не нужно
+            return task
+        
+        self._mark_write()
+        if task.id is None and self._insert_batcher is not None:
+            return self._insert_batcher.submit(task, self.owner).result()
+        
+        with self._primary_cursor("write") as cursor:
             if task.id is None:
                 # Вставка новой задачи
                 cursor.execute("""
-                    INSERT INTO tasks (title, description, status, priority, due_date, completed_at, created_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id, created_at
+                    INSERT INTO tasks (title, description, status, priority, due_date, completed_at, created_at, tags,
+                                       parent_id, owner)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id, created_at, version
                 """, (
                     task.title,
                     task.description,
@@ -147,45 +1382,155 @@ class TaskStorage:
                     task.priority.value,
                     task.due_date,
                     task.completed_at,
-                    task.created_at
+                    task.created_at,
+                    task.tags,
+                    task.parent_id,
+                    self.owner
                 ))
                 
                 result = cursor.fetchone()
                 task.id = result['id']
+                task.version = result['version']
                 # Если created_at не был передан, используем значение из БД
                 if not task.created_at:
                     task.created_at = result['created_at'].isoformat()
                     
             else:
-                # Обновление существующей задачи
-                cursor.execute("""
+                # Обновление существующей задачи: записываем только измененные
+                # поля, чтобы не переписывать большое описание и не трогать
+                # индексированные столбцы без необходимости (HOT обновления)
+                changed = [name for name in Task.TRACKED_FIELDS if name in task.dirty_fields]
+                assignments = [f"{name} = %s" for name in changed]
+                params = [self._column_value(task, name) for name in changed]
+                
+                # Если версия известна, запись проходит только когда строку
+                # никто не изменил после загрузки
+                query = f"""
                     UPDATE tasks 
-                    SET title = %s, description = %s, status = %s, 
-                        priority = %s, due_date = %s, completed_at = %s
-                    WHERE id = %s
-                """, (
-                    task.title,
-                    task.description,
-                    task.status.value,
-                    task.priority.value,
-                    task.due_date,
-                    task.completed_at,
-                    task.id
-                ))
+                    SET {', '.join(assignments)}, version = version + 1
+                    WHERE id = %s AND owner = %s"""
+                params += [task.id, self.owner]
+                if task.version is not None:
+                    query += " AND version = %s"
+                    params.append(task.version)
+                cursor.execute(query, params)
+                
+                if task.version is not None:
+                    if cursor.rowcount == 0:
+                        raise ConcurrentModificationError(task.id)
+                    task.version += 1
         
+        task.mark_clean()
         return task
     
-    def get_all_tasks(self) -> List[Task]:
+    def _read_cursor(self, use_primary: bool = False):
+        """Возвращает курсор для чтения: с реплики, если это допустимо.
+        
+        Сразу после записи в текущем сеансе чтение идет с основного
+        сервера, пока любая пригодная реплика гарантированно не догонит
+        запись. Чтения других сеансов (соединений API) продолжают идти
+        на реплики.
+        
+        Args:
+            use_primary (bool, optional): Всегда читать с основного сервера.
+        """
+        params = None
+        router = self._replica_router
+        if router is not None and not use_primary:
+            last_write_at = _last_write_at.get()
+            recently_written = (last_write_at is not None and
+                                time.monotonic() - last_write_at < router.max_lag)
+            if not recently_written:
+                params = router.choose()
+        return DatabaseConnection.get_cursor(params or self._connection_params, deadline="read",
+                                             owner=self.owner)
+    
+    def _primary_cursor(self, deadline: str):
+        """Возвращает курсор основного сервера для операции класса deadline."""
+        return DatabaseConnection.get_cursor(self._connection_params, deadline=deadline, owner=self.owner)
+    
+    def _mark_write(self):
+        """Запоминает момент записи сеанса для гарантии read-your-writes."""
+        _last_write_at.set(time.monotonic())
+    
+    @staticmethod
+    def _column_value(task: Task, name: str):
+        """Возвращает значение поля задачи в виде, пригодном для записи в БД."""
+        value = getattr(task, name)
+        if isinstance(value, (TaskStatus, Priority)):
+            return value.value
+        return value
+    
+    @staticmethod
+    def _row_to_task(data) -> Task:
+        """Преобразует строку результата запроса в объект задачи.
+        
+        Args:
+            data (dict): Строка из RealDictCursor.
+            
+        Returns:
+            Task: Объект задачи.
+        """
+        # Конвертируем данные из БД в словарь
+        task_dict = {
+            'id': data['id'],
+            'title': data['title'],
+            'description': data['description'],
+            'status': data['status'],
+            'priority': data['priority'],
+            'created_at': data['created_at'].isoformat() if data['created_at'] else None,
+            'due_date': str(data['due_date']) if data['due_date'] else None,
+            'completed_at': data['completed_at'].isoformat() if data['completed_at'] else None,
+            'version': data.get('version'),
+            'tags': data.get('tags') or [],
+            'parent_id': data.get('parent_id')
+        }
+        return Task.from_dict(task_dict)
+    
+    def _rows_to_tasks(self, rows) -> List[Task]:
+        """Преобразует строки результата запроса в задачи (спан task.hydrate)."""
+        with tracing.span("task.hydrate", rows=len(rows)):
+            return [self._row_to_task(data) for data in rows]
+    
+    @staticmethod
+    def _list_columns(verbose: bool) -> Tuple[str, list]:
+        """Возвращает столбцы запроса списка задач и их параметры.
+        
+        Без verbose из описания читается только превью: left() на символ
+        длиннее, чтобы отличить усеченное описание от описания ровно
+        этой длины. Длинные описания хранятся в TOAST и не передаются
+        целиком ради одной строки списка.
+        """
+        if verbose:
+            description, params = "description", []
+        else:
+            description, params = "left(description, %s) AS description", [Config.LIST_DESCRIPTION_PREVIEW + 1]
+        return (f"id, title, {description}, status, priority, "
+                "created_at, due_date, completed_at, version, tags, parent_id"), params
+    
+    def _list_rows_to_tasks(self, rows, verbose: bool) -> List[Task]:
+        """Преобразует строки запроса списка в задачи, усекая превью описаний."""
+        tasks = self._rows_to_tasks(rows)
+        if not verbose:
+            for task in tasks:
+                task.truncate_description(Config.LIST_DESCRIPTION_PREVIEW)
+        return tasks
+    
+    def get_all_tasks(self, verbose: bool = False) -> List[Task]:
         """Возвращает все задачи из хранилища.
         
+        Args:
+            verbose (bool, optional): Загружать описания полностью, а не превью.
+        
         Returns:
             List[Task]: Список всех задач.
         """
-        with DatabaseConnection.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT id, title, description, status, priority, 
-                       created_at, due_date, completed_at
+        columns, params = self._list_columns(verbose)
+        with self._read_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT {columns}
                 FROM tasks 
+                WHERE owner = %s
                 ORDER BY 
                     CASE WHEN status = 'pending' THEN 1 ELSE 2 END,
                     CASE priority 
@@ -194,58 +1539,35 @@ class TaskStorage:
                         WHEN 'low' THEN 3 
                     END,
                     created_at DESC
-            """)
+            """, params + [self.owner])
             
             tasks_data = cursor.fetchall()
         
-        tasks = []
-        for data in tasks_data:
-            # Конвертируем данные из БД в словарь
-            task_dict = {
-                'id': data['id'],
-                'title': data['title'],
-                'description': data['description'],
-                'status': data['status'],
-                'priority': data['priority'],
-                'created_at': data['created_at'].isoformat() if data['created_at'] else None,
-                'due_date': str(data['due_date']) if data['due_date'] else None,
-                'completed_at': data['completed_at'].isoformat() if data['completed_at'] else None
-            }
-            tasks.append(Task.from_dict(task_dict))
-        
-        return tasks
+        return self._list_rows_to_tasks(tasks_data, verbose)
     
-    def get_task_by_id(self, task_id: int) -> Optional[Task]:
+    def get_task_by_id(self, task_id: int, use_primary: bool = False) -> Optional[Task]:
         """Находит задачу по ID.
         
         Args:
             task_id (int): ID искомой задачи.
+            use_primary (bool, optional): Читать с основного сервера, например
+                перед изменением задачи, чтобы не получить устаревшую версию.
             
         Returns:
             Optional[Task]: Найденная задача или None.
         """
-        with DatabaseConnection.get_cursor() as cursor:
+        with self._read_cursor(use_primary) as cursor:
             cursor.execute("""
                 SELECT id, title, description, status, priority, 
-                       created_at, due_date, completed_at
+                       created_at, due_date, completed_at, version, tags, parent_id
                 FROM tasks 
-                WHERE id = %s
-            """, (task_id,))
+                WHERE id = %s AND owner = %s
+            """, (task_id, self.owner))
             
             data = cursor.fetchone()
         
         if data:
-            task_dict = {
-                'id': data['id'],
-                'title': data['title'],
-                'description': data['description'],
-                'status': data['status'],
-                'priority': data['priority'],
-                'created_at': data['created_at'].isoformat() if data['created_at'] else None,
-                'due_date': str(data['due_date']) if data['due_date'] else None,
-                'completed_at': data['completed_at'].isoformat() if data['completed_at'] else None
-            }
-            return Task.from_dict(task_dict)
+            return self._row_to_task(data)
         
         return None
     
@@ -258,71 +1580,640 @@ class TaskStorage:
         Returns:
             bool: True если задача удалена, False если не найдена.
         """
-        with DatabaseConnection.get_cursor() as cursor:
-            cursor.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
+        self._mark_write()
+        with self._primary_cursor("write") as cursor:
+            cursor.execute("DELETE FROM tasks WHERE id = %s AND owner = %s", (task_id, self.owner))
             return cursor.rowcount > 0
     
     def filter_tasks(self, status: str = None, priority: str = None, 
-                    due_date: str = None) -> List[Task]:
+                    due_date: str = None, tags: List[str] = None,
+                    match_all_tags: bool = False, verbose: bool = False) -> List[Task]:
         """Фильтрует задачи по различным критериям.
         
         Args:
             status (str, optional): Статус для фильтрации.
             priority (str, optional): Приоритет для фильтрации.
             due_date (str, optional): Дата для фильтрации.
+            tags (List[str], optional): Теги для фильтрации.
+            match_all_tags (bool, optional): Требовать все теги, а не любой из них.
+            verbose (bool, optional): Загружать описания полностью, а не превью.
             
         Returns:
             List[Task]: Отфильтрованный список задач.
         """
-        query = """
-            SELECT id, title, description, status, priority, 
-                   created_at, due_date, completed_at
+        where, params = self._filter_clause(status, priority, due_date,
+                                            tags=tags, match_all_tags=match_all_tags)
+        columns, column_params = self._list_columns(verbose)
+        query = f"""
+            SELECT {columns}
             FROM tasks 
-            WHERE 1=1
+        """ + where
+        
+        query += " ORDER BY created_at DESC"
+        
+        with self._read_cursor() as cursor:
+            cursor.execute(query, column_params + params)
+            tasks_data = cursor.fetchall()
+        
+        return self._list_rows_to_tasks(tasks_data, verbose)
+    
+    def _filter_clause(self, status: str = None, priority: str = None, due_date: str = None,
+                       ids: List[int] = None, id_range: Tuple[Optional[int], Optional[int]] = None,
+                       tags: List[str] = None, match_all_tags: bool = False):
+        """Собирает условие WHERE из критериев фильтрации задач владельца.
+        
+        Владелец идет первым условием, поэтому запрос использует составные
+        индексы (owner, ...).
+        
+        Args:
+            status (str, optional): Статус.
+            priority (str, optional): Приоритет.
+            due_date (str, optional): Срок выполнения.
+            ids (List[int], optional): Список ID.
+            id_range (Tuple, optional): Границы ID включительно (любая может быть None).
+            tags (List[str], optional): Теги.
+            match_all_tags (bool, optional): Требовать все теги, а не любой из них.
+            
+        Returns:
+            Tuple[str, list]: Текст условия и его параметры.
         """
-        params = []
+        where = "WHERE owner = %s"
+        params = [self.owner]
         
         if status:
-            query += " AND status = %s"
+            where += " AND status = %s"
             params.append(status)
         
         if priority:
-            query += " AND priority = %s"
+            where += " AND priority = %s"
             params.append(priority)
         
         if due_date:
-            query += " AND due_date = %s"
+            where += " AND due_date = %s"
             params.append(due_date)
         
-        query += " ORDER BY created_at DESC"
+        if ids:
+            where += " AND id = ANY(%s)"
+            params.append(list(ids))
+        
+        if id_range:
+            low, high = id_range
+            if low is not None:
+                where += " AND id >= %s"
+                params.append(low)
+            if high is not None:
+                where += " AND id <= %s"
+                params.append(high)
+        
+        if tags:
+            where += " AND tags @> %s::text[]" if match_all_tags else " AND tags && %s::text[]"
+            params.append(list(tags))
+        
+        return where, params
+    
+    def update_tasks(self, assignments: Dict[str, Any], status: str = None,
+                     priority: str = None, due_date: str = None, ids: List[int] = None,
+                     id_range: Tuple[Optional[int], Optional[int]] = None,
+                     dry_run: bool = False) -> List[int]:
+        """Изменяет поля всех задач, подходящих под фильтр, одним запросом.
+        
+        Строки, в которых поля уже имеют нужные значения, не изменяются.
+        При смене статуса на completed заполняется completed_at, при смене
+        на pending он сбрасывается.
+        
+        Args:
+            assignments (Dict[str, Any]): Новые значения полей из UPDATABLE_FIELDS.
+            status, priority, due_date, ids, id_range: Критерии фильтрации,
+                как в _filter_clause.
+            dry_run (bool, optional): Только посчитать задачи, которые изменятся.
+            
+        Returns:
+            List[int]: ID измененных задач (при dry_run — задач, которые
+                были бы изменены).
+        """
+        unknown = set(assignments) - set(self.UPDATABLE_FIELDS)
+        if unknown or not assignments:
+            raise ValueError(f"Недопустимые поля для изменения: {', '.join(sorted(unknown)) or 'не заданы'}")
+        
+        where, where_params = self._filter_clause(status, priority, due_date, ids, id_range)
+        columns = [name for name in self.UPDATABLE_FIELDS if name in assignments]
+        values = [assignments[name] for name in columns]
+        
+        # Изменяются только строки, где хотя бы одно поле отличается
+        where += " AND (" + " OR ".join(f"{name} IS DISTINCT FROM %s" for name in columns) + ")"
+        where_params += values
+        
+        if dry_run:
+            with self._read_cursor(use_primary=True) as cursor:
+                cursor.execute(f"SELECT id FROM tasks {where}", where_params)
+                return [row['id'] for row in cursor.fetchall()]
+        
+        set_clause = ", ".join(f"{name} = %s" for name in columns)
+        if 'status' in assignments:
+            set_clause += (", completed_at = CASE WHEN %s = 'completed' "
+                           "THEN COALESCE(completed_at, CURRENT_TIMESTAMP) END")
+            values.append(assignments['status'])
+        
+        self._mark_write()
+        with self._primary_cursor("bulk") as cursor:
+            cursor.execute(
+                f"UPDATE tasks SET {set_clause}, version = version + 1 {where} RETURNING id",
+                values + where_params
+            )
+            return [row['id'] for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _lock_task_links(cursor):
+        """Сериализует изменения связей, чтобы проверка циклов была надежной.
+        
+        Без блокировки две параллельные транзакции могут каждая пройти
+        проверку и вместе образовать цикл.
+        """
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (TaskStorage.TASK_LINKS_LOCK,))
+    
+    def set_parent(self, task_id: int, parent_id: Optional[int]) -> bool:
+        """Делает задачу подзадачей другой задачи или снимает эту связь.
+        
+        Args:
+            task_id (int): ID задачи.
+            parent_id (int, optional): ID родителя; None делает задачу корневой.
+            
+        Returns:
+            bool: True если задача найдена.
+            
+        Raises:
+            ValueError: Если родитель не найден или связь образует цикл.
+        """
+        self._mark_write()
+        with self._primary_cursor("write") as cursor:
+            if parent_id is not None:
+                self._lock_task_links(cursor)
+                # Родитель не может быть самой задачей или ее потомком
+                cursor.execute("""
+                    WITH RECURSIVE ancestors AS (
+                        SELECT id, parent_id FROM tasks WHERE id = %(parent_id)s AND owner = %(owner)s
+                        UNION
+                        SELECT t.id, t.parent_id 
+                        FROM tasks t 
+                        JOIN ancestors a ON t.id = a.parent_id
+                    )
+                    SELECT EXISTS (SELECT 1 FROM ancestors) AS parent_found,
+                           EXISTS (SELECT 1 FROM ancestors WHERE id = %(task_id)s) AS cycle
+                """, {'task_id': task_id, 'parent_id': parent_id, 'owner': self.owner})
+                check = cursor.fetchone()
+                if not check['parent_found']:
+                    raise ValueError(f"Задача с ID {parent_id} не найдена")
+                if check['cycle']:
+                    raise ValueError(f"Задача {parent_id} является подзадачей {task_id}, связь образует цикл")
+            
+            cursor.execute("""
+                UPDATE tasks SET parent_id = %s, version = version + 1
+                WHERE id = %s AND owner = %s AND parent_id IS DISTINCT FROM %s
+            """, (parent_id, task_id, self.owner, parent_id))
+            if cursor.rowcount:
+                return True
+            cursor.execute("SELECT 1 FROM tasks WHERE id = %s AND owner = %s", (task_id, self.owner))
+            return cursor.fetchone() is not None
+    
+    def add_dependency(self, task_id: int, blocked_by: int) -> bool:
+        """Отмечает, что задача не может быть начата до завершения другой.
+        
+        Args:
+            task_id (int): ID блокируемой задачи.
+            blocked_by (int): ID блокирующей задачи.
+            
+        Returns:
+            bool: True если связь добавлена, False если уже была.
+            
+        Raises:
+            ValueError: Если задача не найдена или связь образует цикл.
+        """
+        if task_id == blocked_by:
+            raise ValueError("Задача не может блокировать сама себя")
+        
+        self._mark_write()
+        try:
+            with self._primary_cursor("write") as cursor:
+                self._lock_task_links(cursor)
+                # Цикл возникает, если blocked_by уже (транзитивно) ждет task_id
+                cursor.execute("""
+                    WITH RECURSIVE blockers AS (
+                        SELECT blocked_by AS id FROM task_dependencies WHERE task_id = %(blocked_by)s
+                        UNION
+                        SELECT d.blocked_by 
+                        FROM task_dependencies d 
+                        JOIN blockers b ON d.task_id = b.id
+                    )
+                    SELECT EXISTS (SELECT 1 FROM blockers WHERE id = %(task_id)s) AS cycle,
+                           (SELECT COUNT(*) FROM tasks 
+                            WHERE id IN (%(task_id)s, %(blocked_by)s) AND owner = %(owner)s) AS owned
+                """, {'task_id': task_id, 'blocked_by': blocked_by, 'owner': self.owner})
+                check = cursor.fetchone()
+                if check['owned'] < 2:
+                    raise ValueError(f"Задача с ID {task_id} или {blocked_by} не найдена")
+                if check['cycle']:
+                    raise ValueError(f"Задача {blocked_by} уже ждет задачу {task_id}, связь образует цикл")
+                
+                cursor.execute("""
+                    INSERT INTO task_dependencies (task_id, blocked_by) VALUES (%s, %s)
+                    ON CONFLICT DO NOTHING
+                """, (task_id, blocked_by))
+                return cursor.rowcount > 0
+        except psycopg2.errors.ForeignKeyViolation as e:
+            raise ValueError(f"Задача с ID {task_id} или {blocked_by} не найдена") from e
+    
+    def remove_dependency(self, task_id: int, blocked_by: int) -> bool:
+        """Удаляет связь блокировки.
+        
+        Returns:
+            bool: True если связь была и удалена.
+        """
+        self._mark_write()
+        with self._primary_cursor("write") as cursor:
+            cursor.execute("""
+                DELETE FROM task_dependencies d 
+                USING tasks t 
+                WHERE d.task_id = %s AND d.blocked_by = %s AND t.id = d.task_id AND t.owner = %s
+            """, (task_id, blocked_by, self.owner))
+            return cursor.rowcount > 0
+    
+    def get_task_tree(self, root_id: int) -> List[Tuple[int, Task, List[int]]]:
+        """Загружает задачу со всеми подзадачами одним рекурсивным запросом.
         
-        with DatabaseConnection.get_cursor() as cursor:
-            cursor.execute(query, params)
+        Args:
+            root_id (int): ID корневой задачи дерева.
+            
+        Returns:
+            List[Tuple[int, Task, List[int]]]: Задачи в порядке обхода в глубину:
+                глубина, задача и ID ее незавершенных блокирующих задач.
+                Пустой список, если задача не найдена.
+        """
+        with self._read_cursor() as cursor:
+            cursor.execute("""
+                WITH RECURSIVE tree AS (
+                    SELECT id, 0 AS depth, ARRAY[id] AS path
+                    FROM tasks 
+                    WHERE id = %(root_id)s AND owner = %(owner)s
+                    UNION ALL
+                    SELECT c.id, tree.depth + 1, tree.path || c.id
+                    FROM tasks c 
+                    JOIN tree ON c.parent_id = tree.id
+                    WHERE c.owner = %(owner)s AND NOT c.id = ANY(tree.path)
+                )
+                SELECT t.id, t.title, t.description, t.status, t.priority, 
+                       t.created_at, t.due_date, t.completed_at, t.version, t.tags, t.parent_id,
+                       tree.depth,
+                       ARRAY(
+                           SELECT d.blocked_by 
+                           FROM task_dependencies d 
+                           JOIN tasks b ON b.id = d.blocked_by
+                           WHERE d.task_id = t.id AND b.status = 'pending'
+                           ORDER BY d.blocked_by
+                       ) AS open_blockers
+                FROM tree 
+                JOIN tasks t ON t.id = tree.id
+                ORDER BY tree.path
+            """, {'root_id': root_id, 'owner': self.owner})
+            rows = cursor.fetchall()
+        
+        return [(row['depth'], self._row_to_task(row), list(row['open_blockers'])) for row in rows]
+    
+    def get_ready_tasks(self) -> List[Task]:
+        """Возвращает задачи, которые можно делать прямо сейчас.
+        
+        Готова невыполненная задача, у которой нет незавершенных
+        блокирующих задач и незавершенных подзадач на любом уровне.
+        
+        Returns:
+            List[Task]: Готовые задачи по приоритету и сроку.
+        """
+        with self._read_cursor() as cursor:
+            cursor.execute("""
+                WITH RECURSIVE unfinished_ancestors AS (
+                    SELECT parent_id AS id 
+                    FROM tasks 
+                    WHERE owner = %(owner)s AND status = 'pending' AND parent_id IS NOT NULL
+                    UNION
+                    SELECT t.parent_id 
+                    FROM tasks t 
+                    JOIN unfinished_ancestors a ON t.id = a.id
+                    WHERE t.parent_id IS NOT NULL
+                )
+                SELECT id, title, description, status, priority, 
+                       created_at, due_date, completed_at, version, tags, parent_id
+                FROM tasks t
+                WHERE t.owner = %(owner)s AND t.status = 'pending'
+                  AND NOT EXISTS (
+                      SELECT 1 
+                      FROM task_dependencies d 
+                      JOIN tasks b ON b.id = d.blocked_by
+                      WHERE d.task_id = t.id AND b.status = 'pending'
+                  )
+                  AND t.id NOT IN (SELECT id FROM unfinished_ancestors)
+                ORDER BY 
+                    CASE priority 
+                        WHEN 'high' THEN 1 
+                        WHEN 'medium' THEN 2 
+                        WHEN 'low' THEN 3 
+                    END,
+                    due_date NULLS LAST,
+                    created_at
+            """, {'owner': self.owner})
             tasks_data = cursor.fetchall()
         
-        tasks = []
-        for data in tasks_data:
-            task_dict = {
-                'id': data['id'],
-                'title': data['title'],
-                'description': data['description'],
-                'status': data['status'],
-                'priority': data['priority'],
-                'created_at': data['created_at'].isoformat() if data['created_at'] else None,
-                'due_date': str(data['due_date']) if data['due_date'] else None,
-                'completed_at': data['completed_at'].isoformat() if data['completed_at'] else None
-            }
-            tasks.append(Task.from_dict(task_dict))
+        return self._rows_to_tasks(tasks_data)
+    
+    def add_recurrence_rule(self, template: Task, frequency: str, interval: int = 1,
+                            starts_on: str = None, ends_on: str = None) -> int:
+        """Создает правило повторения задачи.
         
-        return tasks
+        Args:
+            template (Task): Шаблон задачи: название, описание, приоритет и теги.
+            frequency (str): Периодичность: daily, weekly или monthly.
+            interval (int, optional): Каждые сколько периодов повторять.
+            starts_on (str, optional): Дата первого экземпляра (ГГГГ-ММ-ДД).
+                По умолчанию сегодня.
+            ends_on (str, optional): Дата, после которой экземпляры не создаются.
+            
+        Returns:
+            int: ID правила.
+            
+        Raises:
+            ValueError: Если периодичность или интервал недопустимы.
+        """
+        if frequency not in self.RECURRENCE_FREQUENCIES:
+            raise ValueError(f"Неверная периодичность. Допустимые значения: "
+                             f"{', '.join(self.RECURRENCE_FREQUENCIES)}")
+        if interval < 1:
+            raise ValueError("Интервал повторения должен быть положительным")
+        
+        self._mark_write()
+        with self._primary_cursor("write") as cursor:
+            cursor.execute("""
+                INSERT INTO recurrence_rules (owner, title, description, priority, tags, frequency, 
+                                              interval_count, starts_on, ends_on)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, COALESCE(%s::date, CURRENT_DATE), %s)
+                RETURNING id
+            """, (self.owner, template.title, template.description, template.priority.value,
+                  template.tags, frequency, interval, starts_on, ends_on))
+            return cursor.fetchone()['id']
+    
+    def get_recurrence_rules(self) -> List[Dict[str, Any]]:
+        """Возвращает все правила повторения.
+        
+        Returns:
+            List[Dict[str, Any]]: Правила в порядке ID.
+        """
+        with self._read_cursor() as cursor:
+            cursor.execute("""
+                SELECT id, title, description, priority, tags, frequency, interval_count, 
+                       starts_on, ends_on, materialized_through
+                FROM recurrence_rules
+                WHERE owner = %s
+                ORDER BY id
+            """, (self.owner,))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def delete_recurrence_rule(self, rule_id: int) -> bool:
+        """Удаляет правило повторения; созданные по нему задачи остаются.
+        
+        Returns:
+            bool: True если правило было удалено.
+        """
+        self._mark_write()
+        with self._primary_cursor("write") as cursor:
+            cursor.execute("DELETE FROM recurrence_rules WHERE id = %s AND owner = %s",
+                           (rule_id, self.owner))
+            return cursor.rowcount > 0
+    
+    def materialize_recurrences(self, horizon_days: int = None) -> int:
+        """Создает экземпляры повторяющихся задач на горизонт вперед.
+        
+        Все экземпляры всех правил создаются одним INSERT ... SELECT из
+        generate_series. Правило запоминает дату, до которой экземпляры
+        уже созданы (materialized_through), поэтому повторный запуск
+        рассматривает только новые даты, а удаленный пользователем
+        экземпляр не появляется снова. Параллельные запуски ждут друг
+        друга на блокировке правил, а уникальный ключ
+        (recurrence_rule_id, occurrence) исключает дубликаты в любом случае.
+        
+        Месячные даты считаются от даты начала (starts_on + k месяцев),
+        поэтому правило с 31-го числа в коротких месяцах дает последний
+        день месяца и не смещается.
+        
+        Args:
+            horizon_days (int, optional): Горизонт в днях от сегодняшнего дня.
+                По умолчанию Config.RECURRENCE_HORIZON_DAYS.
+            
+        Returns:
+            int: Количество созданных задач.
+        """
+        if horizon_days is None:
+            horizon_days = Config.RECURRENCE_HORIZON_DAYS
+        
+        self._mark_write()
+        with self._primary_cursor("bulk") as cursor:
+            cursor.execute("""
+                WITH due_rules AS (
+                    SELECT r.id, r.owner, r.title, r.description, r.priority, r.tags, r.starts_on,
+                           GREATEST(CURRENT_DATE, r.starts_on, r.materialized_through + 1) AS from_date,
+                           LEAST(CURRENT_DATE + %(horizon)s, r.ends_on) AS to_date,
+                           r.interval_count * CASE r.frequency 
+                               WHEN 'daily' THEN interval '1 day' 
+                               WHEN 'weekly' THEN interval '1 week' 
+                               ELSE interval '1 month' 
+                           END AS step,
+                           -- Самый короткий и самый длинный шаг в днях: по ним
+                           -- ограничивается диапазон номеров экземпляров
+                           r.interval_count * CASE r.frequency 
+                               WHEN 'daily' THEN 1 WHEN 'weekly' THEN 7 ELSE 28 
+                           END AS min_days,
+                           r.interval_count * CASE r.frequency 
+                               WHEN 'daily' THEN 1 WHEN 'weekly' THEN 7 ELSE 31 
+                           END AS max_days
+                    FROM recurrence_rules r
+                    WHERE r.owner = %(owner)s 
+                      AND (r.materialized_through IS NULL 
+                           OR r.materialized_through < CURRENT_DATE + %(horizon)s)
+                    FOR UPDATE
+                ),
+                advanced AS (
+                    UPDATE recurrence_rules r 
+                    SET materialized_through = CURRENT_DATE + %(horizon)s
+                    FROM due_rules d 
+                    WHERE r.id = d.id
+                )
+                INSERT INTO tasks (owner, title, description, priority, due_date, tags, 
+                                   recurrence_rule_id, occurrence)
+                SELECT d.owner, d.title, d.description, d.priority, o.occurrence, d.tags, d.id, o.occurrence
+                FROM due_rules d
+                CROSS JOIN LATERAL generate_series(
+                    GREATEST(0, (d.from_date - d.starts_on) / d.max_days),
+                    (d.to_date - d.starts_on) / d.min_days
+                ) AS k
+                CROSS JOIN LATERAL (SELECT (d.starts_on + k * d.step)::date AS occurrence) o
+                WHERE o.occurrence BETWEEN d.from_date AND d.to_date
+                ON CONFLICT (recurrence_rule_id, occurrence) DO NOTHING
+            """, {'horizon': horizon_days, 'owner': self.owner})
+            return cursor.rowcount
+    
+    def get_changes_since(self, since: Optional[datetime] = None) -> Tuple[List[Task], List[int], Optional[datetime]]:
+        """Возвращает задачи, измененные или удаленные после отметки времени.
+        
+        Args:
+            since (datetime, optional): Отметка времени. None — все задачи.
+            
+        Returns:
+            Tuple[List[Task], List[int], Optional[datetime]]: Измененные задачи,
+                ID удаленных задач и наибольшая встреченная отметка времени
+                (since, если изменений нет).
+        """
+        watermark = since
+        with self._read_cursor() as cursor:
+            if since is None:
+                cursor.execute("""
+                    SELECT id, title, description, status, priority, 
+                           created_at, due_date, completed_at, version, tags, parent_id, updated_at
+                    FROM tasks
+                    WHERE owner = %s
+                """, (self.owner,))
+            else:
+                cursor.execute("""
+                    SELECT id, title, description, status, priority, 
+                           created_at, due_date, completed_at, version, tags, parent_id, updated_at
+                    FROM tasks 
+                    WHERE owner = %s AND updated_at > %s
+                """, (self.owner, since))
+            rows = cursor.fetchall()
+            
+            deletions = []
+            if since is not None:
+                cursor.execute("""
+                    SELECT task_id, deleted_at 
+                    FROM task_deletions 
+                    WHERE owner = %s AND deleted_at > %s
+                """, (self.owner, since))
+                deletions = cursor.fetchall()
+        
+        for moment in [row['updated_at'] for row in rows] + [row['deleted_at'] for row in deletions]:
+            if watermark is None or moment > watermark:
+                watermark = moment
+        
+        return (self._rows_to_tasks(rows),
+                [row['task_id'] for row in deletions],
+                watermark)
+    
+    def iter_changes(self, status: str = None, priority: str = None,
+                     idle_timeout: float = None):
+        """Перебирает события изменения задач по мере их поступления.
+        
+        Args:
+            status (str, optional): Только задачи с этим статусом.
+            priority (str, optional): Только задачи с этим приоритетом.
+            idle_timeout (float, optional): Завершить перебор после стольких
+                секунд без событий.
+            
+        Yields:
+            dict: События изменения (см. ChangeListener.iter_changes).
+        """
+        with self.change_listener() as listener:
+            yield from listener.iter_changes(status, priority, idle_timeout)
+    
+    def change_listener(self) -> ChangeListener:
+        """Создает (еще не открытого) слушателя изменений этой базы."""
+        params = [self._connection_params] if self._connection_params else None
+        return ChangeListener(params, self.owner)
+    
+    def get_pending_due_tasks(self, until: date, after: date = None) -> List[Task]:
+        """Возвращает невыполненные задачи со сроком в диапазоне (after, until].
+        
+        Запрос читает диапазон индекса idx_tasks_owner_due_date, а не всю таблицу.
+        Чтение идет с основного сервера: уведомления об изменениях, которые
+        дополняют результат, приходят тоже с него.
+        
+        Args:
+            until (date): Последняя дата диапазона включительно.
+            after (date, optional): Дата перед началом диапазона. По умолчанию
+                включаются и все просроченные задачи.
+            
+        Returns:
+            List[Task]: Задачи в порядке срока.
+        """
+        with self._read_cursor(use_primary=True) as cursor:
+            cursor.execute("""
+                SELECT id, title, description, status, priority, 
+                       created_at, due_date, completed_at, version, tags, parent_id
+                FROM tasks 
+                WHERE owner = %s AND due_date > COALESCE(%s::date, '-infinity'::date) AND due_date <= %s 
+                  AND status = 'pending'
+                ORDER BY due_date, id
+            """, (self.owner, after, until))
+            tasks_data = cursor.fetchall()
+        
+        return self._rows_to_tasks(tasks_data)
+    
+    def get_id_ranges(self, count: int) -> List[Tuple[int, int]]:
+        """Делит диапазон ID задач владельца на count равных частей.
+        
+        Args:
+            count (int): Число частей.
+            
+        Returns:
+            List[Tuple[int, int]]: Непустые диапазоны (первый ID, последний ID)
+                по возрастанию.
+        """
+        with self._read_cursor() as cursor:
+            cursor.execute("SELECT MIN(id) AS first_id, MAX(id) AS last_id FROM tasks WHERE owner = %s",
+                           (self.owner,))
+            bounds = cursor.fetchone()
+        if bounds['first_id'] is None:
+            return []
+        first_id, last_id = bounds['first_id'], bounds['last_id']
+        step = max((last_id - first_id + count) // count, 1)
+        return [(start, min(start + step - 1, last_id)) for start in range(first_id, last_id + 1, step)]
+    
+    @staticmethod
+    def iter_id_range(connection_params: dict, owner: str, first_id: int, last_id: int,
+                      batch_size: int = None):
+        """Перебирает задачи владельца с ID в диапазоне по возрастанию ID.
+        
+        Строки читаются серверным курсором порциями по batch_size, поэтому
+        диапазон любого размера не загружается в память целиком. Метод
+        статический: его вызывают процессы параллельного экспорта, которым
+        не нужна инициализация хранилища.
+        
+        Args:
+            connection_params (dict): Параметры подключения к БД.
+            owner (str): Владелец задач.
+            first_id (int): Первый ID диапазона.
+            last_id (int): Последний ID диапазона.
+            batch_size (int, optional): Размер порции. По умолчанию Config.EXPORT_BATCH_SIZE.
+            
+        Yields:
+            dict: Строка задачи.
+        """
+        with DatabaseConnection.get_cursor(connection_params, deadline="bulk", owner=owner,
+                                           name="task_export") as cursor:
+            cursor.itersize = batch_size or Config.EXPORT_BATCH_SIZE
+            cursor.execute("""
+                SELECT id, title, description, status, priority, 
+                       created_at, due_date, completed_at, version, tags, parent_id
+                FROM tasks 
+                WHERE owner = %s AND id BETWEEN %s AND %s
+                ORDER BY id
+            """, (owner, first_id, last_id))
+            yield from cursor
     
     def get_statistics(self) -> Dict[str, Any]:
         """Возвращает статистику по задачам.
         
+        Только читает: счетчики тегов складываются с еще не свернутыми
+        изменениями в запросе, а сворачивает их обслуживание (vacuum_tables).
+        
         Returns:
             Dict[str, Any]: Словарь со статистикой.
         """
-        with DatabaseConnection.get_cursor() as cursor:
+        with self._read_cursor() as cursor:
             cursor.execute("""
                 SELECT 
                     COUNT(*) as total_tasks,
@@ -333,15 +2224,772 @@ class TaskStorage:
                     SUM(CASE WHEN priority = 'low' THEN 1 ELSE 0 END) as low_priority,
                     SUM(CASE WHEN due_date < CURRENT_DATE AND status = 'pending' THEN 1 ELSE 0 END) as overdue_tasks
                 FROM tasks
-            """)
+                WHERE owner = %s
+            """, (self.owner,))
             
             result = cursor.fetchone()
             
+            # Счетчики тегов ведутся триггером, поэтому читаются без просмотра
+            # tasks; еще не свернутые изменения прибавляются к ним
+            cursor.execute("""
+                SELECT tag, SUM(task_count) AS task_count 
+                FROM (
+                    SELECT tag, task_count FROM tag_counts WHERE owner = %(owner)s 
+                    UNION ALL 
+                    SELECT tag, delta FROM tag_count_deltas WHERE owner = %(owner)s
+                ) AS counts 
+                GROUP BY tag 
+                HAVING SUM(task_count) > 0 
+                ORDER BY task_count DESC, tag 
+                LIMIT %(limit)s
+            """, {'owner': self.owner, 'limit': Config.STATS_TOP_TAGS})
+            tag_rows = cursor.fetchall()
+            
             # Добавляем вычисляемые поля
             stats = dict(result)
             if stats['total_tasks'] > 0:
                 stats['completion_rate'] = round((stats['completed_tasks'] / stats['total_tasks']) * 100, 2)
             else:
                 stats['completion_rate'] = 0
+            stats['tags'] = {row['tag']: row['task_count'] for row in tag_rows}
+            
+            return stats
+    
+    def fold_tag_count_deltas(self):
+        """Сворачивает накопленные изменения счетчиков тегов в tag_counts.
+        
+        Изменения удаляются и прибавляются к счетчикам одним запросом.
+        Одновременный вызов ждет только строки изменений, уже забранные
+        первым, а не пишущие транзакции; счетчики обновляются в порядке
+        ключа, поэтому два вызова не блокируют друг друга взаимно.
+        """
+        with self._primary_cursor("write") as cursor:
+            cursor.execute("""
+                WITH folded AS (
+                    DELETE FROM tag_count_deltas 
+                    RETURNING owner, tag, delta
+                )
+                INSERT INTO tag_counts (owner, tag, task_count)
+                SELECT owner, tag, SUM(delta)
+                FROM folded
+                GROUP BY owner, tag
+                ORDER BY owner, tag
+                ON CONFLICT (owner, tag) DO UPDATE 
+                SET task_count = tag_counts.task_count + EXCLUDED.task_count
+            """)
+    
+    def refresh_stats_rollup(self) -> int:
+        """Досчитывает дневные агрегаты владельца по изменениям после водяного знака.
+        
+        Пересчитываются дни создания и выполнения задач, измененных после
+        запомненного времени (updated_at выставляет триггер при каждом
+        изменении, в том числе при воспроизведении журнала с прошлой датой
+        выполнения), а также текущий день. Удаления задач и дни, с которых
+        задача перестала считаться выполненной, в агрегатах не отражаются
+        до полного пересчета (rebuild_stats_rollup).
+        
+        Returns:
+            int: Количество пересчитанных дней.
+        """
+        with self._primary_cursor("bulk") as cursor:
+            cursor.execute("""
+                INSERT INTO task_stats_watermark (owner) VALUES (%s)
+                ON CONFLICT (owner) DO NOTHING
+            """, (self.owner,))
+            
+            # Блокируем водяной знак, чтобы параллельные обновления не пересекались
+            cursor.execute("""
+                SELECT last_updated_at
+                FROM task_stats_watermark
+                WHERE owner = %s
+                FOR UPDATE
+            """, (self.owner,))
+            watermark = cursor.fetchone()
+            
+            # Новые границы фиксируем до пересчета: все, что появится позже,
+            # попадет в следующее обновление
+            cursor.execute("""
+                SELECT MAX(updated_at) AS max_updated_at
+                FROM tasks
+                WHERE owner = %s
+            """, (self.owner,))
+            bounds = cursor.fetchone()
+            
+            cursor.execute("""
+                WITH changed AS (
+                    SELECT created_at, completed_at FROM tasks
+                    WHERE owner = %(owner)s 
+                      AND updated_at > %(last_updated_at)s AND updated_at <= %(max_updated_at)s
+                ),
+                affected AS (
+                    SELECT created_at::date AS day FROM changed WHERE created_at IS NOT NULL
+                    UNION
+                    SELECT completed_at::date FROM changed WHERE completed_at IS NOT NULL
+                    UNION
+                    SELECT CURRENT_DATE
+                )
+                INSERT INTO task_stats_daily (owner, day, created_count, completed_count, lead_times)
+                SELECT 
+                    %(owner)s,
+                    a.day,
+                    (SELECT COUNT(*) FROM tasks t
+                     WHERE t.owner = %(owner)s AND t.created_at >= a.day AND t.created_at < a.day + 1),
+                    (SELECT COUNT(*) FROM tasks t
+                     WHERE t.owner = %(owner)s AND t.completed_at >= a.day AND t.completed_at < a.day + 1),
+                    COALESCE((SELECT array_agg(EXTRACT(EPOCH FROM t.completed_at - t.created_at))
+                              FROM tasks t
+                              WHERE t.owner = %(owner)s 
+                                AND t.completed_at >= a.day AND t.completed_at < a.day + 1), '{}')
+                FROM affected a
+                ON CONFLICT (owner, day) DO UPDATE SET 
+                    created_count = EXCLUDED.created_count,
+                    completed_count = EXCLUDED.completed_count,
+                    lead_times = EXCLUDED.lead_times
+            """, {
+                'owner': self.owner,
+                'last_updated_at': watermark['last_updated_at'],
+                'max_updated_at': bounds['max_updated_at']
+            })
+            refreshed_days = cursor.rowcount
+            
+            cursor.execute("""
+                UPDATE task_stats_watermark 
+                SET last_updated_at = GREATEST(last_updated_at, COALESCE(%s, last_updated_at))
+                WHERE owner = %s
+            """, (bounds['max_updated_at'], self.owner))
+        
+        return refreshed_days
+    
+    def rebuild_stats_rollup(self) -> int:
+        """Полностью пересчитывает дневные агрегаты (например, после удалений).
+        
+        Returns:
+            int: Количество пересчитанных дней.
+        """
+        with self._primary_cursor("bulk") as cursor:
+            cursor.execute("DELETE FROM task_stats_daily WHERE owner = %s", (self.owner,))
+            cursor.execute("""
+                UPDATE task_stats_watermark 
+                SET last_updated_at = '-infinity'
+                WHERE owner = %s
+            """, (self.owner,))
+        
+        return self.refresh_stats_rollup()
+    
+    def get_statistics_by_period(self, period: str = "day", since: str = None) -> List[Dict[str, Any]]:
+        """Возвращает динамику создания и выполнения задач по периодам.
+        
+        Перед запросом агрегаты досчитываются инкрементально, а сам запрос
+        читает только таблицу дневных агрегатов, а не tasks.
+        
+        Args:
+            period (str, optional): Период группировки: day, week или month.
+            since (str, optional): Начальная дата (ГГГГ-ММ-ДД).
+            
+        Returns:
+            List[Dict[str, Any]]: Строки с полями period, created_tasks,
+            completed_tasks и median_lead_hours.
+            
+        Raises:
+            ValueError: Если период не поддерживается.
+        """
+        if period not in self.STATS_PERIODS:
+            raise ValueError(f"Неверный период. Допустимые значения: {', '.join(self.STATS_PERIODS)}")
+        
+        self.refresh_stats_rollup()
+        
+        with self._primary_cursor("read") as cursor:
+            cursor.execute("""
+                WITH periods AS (
+                    SELECT date_trunc(%(period)s, day)::date AS period,
+                           SUM(created_count) AS created_tasks,
+                           SUM(completed_count) AS completed_tasks
+                    FROM task_stats_daily
+                    WHERE owner = %(owner)s AND day >= COALESCE(%(since)s::date, '-infinity'::date)
+                    GROUP BY 1
+                ),
+                lead AS (
+                    SELECT date_trunc(%(period)s, d.day)::date AS period,
+                           percentile_cont(0.5) WITHIN GROUP (ORDER BY lead_time) AS median_lead_seconds
+                    FROM task_stats_daily d, unnest(d.lead_times) AS lead_time
+                    WHERE d.owner = %(owner)s AND d.day >= COALESCE(%(since)s::date, '-infinity'::date)
+                    GROUP BY 1
+                )
+                SELECT p.period, p.created_tasks, p.completed_tasks, l.median_lead_seconds
+                FROM periods p
+                LEFT JOIN lead l USING (period)
+                WHERE p.created_tasks > 0 OR p.completed_tasks > 0
+                ORDER BY p.period
+            """, {'period': period, 'since': since, 'owner': self.owner})
             
-            return stats
\ No newline at end of file
+            rows = cursor.fetchall()
+        
+        return [
+            {
+                'period': str(row['period']),
+                'created_tasks': int(row['created_tasks']),
+                'completed_tasks': int(row['completed_tasks']),
+                'median_lead_hours': (round(row['median_lead_seconds'] / 3600, 2)
+                                      if row['median_lead_seconds'] is not None else None)
+            }
+            for row in rows
+        ]
+    
+    def get_period_rollup(self, period: str = "day", since: str = None) -> List[Dict[str, Any]]:
+        """Возвращает агрегаты по периодам вместе со всеми временами выполнения.
+        
+        В отличие от get_statistics_by_period медиана не считается: строки
+        разных баз (шардов) складываются, а медиана считается по
+        объединенным временам выполнения.
+        
+        Args:
+            period (str, optional): Период группировки: day, week или month.
+            since (str, optional): Начальная дата (ГГГГ-ММ-ДД).
+            
+        Returns:
+            List[Dict[str, Any]]: Строки с полями period (date), created_tasks,
+            completed_tasks и lead_times (секунды).
+            
+        Raises:
+            ValueError: Если период не поддерживается.
+        """
+        if period not in self.STATS_PERIODS:
+            raise ValueError(f"Неверный период. Допустимые значения: {', '.join(self.STATS_PERIODS)}")
+        
+        self.refresh_stats_rollup()
+        
+        with self._primary_cursor("read") as cursor:
+            cursor.execute("""
+                WITH periods AS (
+                    SELECT date_trunc(%(period)s, day)::date AS period,
+                           SUM(created_count) AS created_tasks,
+                           SUM(completed_count) AS completed_tasks
+                    FROM task_stats_daily
+                    WHERE owner = %(owner)s AND day >= COALESCE(%(since)s::date, '-infinity'::date)
+                    GROUP BY 1
+                ),
+                lead AS (
+                    SELECT date_trunc(%(period)s, d.day)::date AS period,
+                           array_agg(lead_time) AS lead_times
+                    FROM task_stats_daily d, unnest(d.lead_times) AS lead_time
+                    WHERE d.owner = %(owner)s AND d.day >= COALESCE(%(since)s::date, '-infinity'::date)
+                    GROUP BY 1
+                )
+                SELECT p.period, p.created_tasks, p.completed_tasks, l.lead_times
+                FROM periods p
+                LEFT JOIN lead l USING (period)
+                WHERE p.created_tasks > 0 OR p.completed_tasks > 0
+                ORDER BY p.period
+            """, {'period': period, 'since': since, 'owner': self.owner})
+            
+            rows = cursor.fetchall()
+        
+        return [
+            {
+                'period': row['period'],
+                'created_tasks': int(row['created_tasks']),
+                'completed_tasks': int(row['completed_tasks']),
+                'lead_times': list(row['lead_times'] or [])
+            }
+            for row in rows
+        ]
+    
+    def apply_journal_batch(self, entries: List[dict]) -> int:
+        """Применяет пакет операций из локального журнала в одной транзакции.
+        
+        Ключ каждой операции сохраняется в journal_applied в той же
+        транзакции, поэтому повторно присланные операции пропускаются.
+        Операция применяется от имени владельца из записи (owner), а не
+        того, кто запустил синхронизацию; операции каждого владельца идут
+        в своей транзакции. Записи без владельца (из журнала прежней
+        версии) принадлежат владельцу хранилища.
+        
+        Args:
+            entries (List[dict]): Записи журнала с полями key, op, owner, payload, ts.
+            
+        Returns:
+            int: Количество впервые примененных операций.
+            
+        Raises:
+            ValueError: Если БД отвергла операцию по существу (нарушение
+                ограничения, неверное значение): повтор не поможет.
+        """
+        if not entries:
+            return 0
+        
+        per_owner = {}
+        for entry in entries:
+            per_owner.setdefault(entry.get('owner') or self.owner, []).append(entry)
+        
+        self._mark_write()
+        applied = 0
+        for owner, owner_entries in per_owner.items():
+            storage = self if owner == self.owner else self.for_owner(owner)
+            try:
+                applied += storage._apply_journal_entries(owner_entries)
+            except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+                raise ValueError(f"БД отклонила операцию журнала: {e}") from e
+        return applied
+    
+    def _apply_journal_entries(self, entries: List[dict]) -> int:
+        """Применяет записи журнала в одной транзакции (см. apply_journal_batch)."""
+        with self._primary_cursor("bulk") as cursor:
+            cursor.execute("""
+                INSERT INTO journal_applied (key)
+                SELECT unnest(%s::varchar[])
+                ON CONFLICT (key) DO NOTHING
+                RETURNING key
+            """, ([entry['key'] for entry in entries],))
+            fresh_keys = {row['key'] for row in cursor.fetchall()}
+            
+            for entry in entries:
+                if entry['key'] not in fresh_keys:
+                    continue
+                payload = entry['payload']
+                
+                if entry['op'] == 'add':
+                    cursor.execute("""
+                        INSERT INTO tasks (title, description, priority, due_date, created_at, tags, parent_id,
+                                           owner)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    """, (payload['title'], payload.get('description', ''), payload['priority'],
+                          payload.get('due_date'), entry['ts'], payload.get('tags', []),
+                          payload.get('parent_id'), self.owner))
+                elif entry['op'] == 'done':
+                    cursor.execute("""
+                        UPDATE tasks 
+                        SET status = 'completed', completed_at = %s, version = version + 1
+                        WHERE id = %s AND owner = %s AND status = 'pending'
+                    """, (entry['ts'], payload['task_id'], self.owner))
+                elif entry['op'] == 'delete':
+                    cursor.execute("DELETE FROM tasks WHERE id = %s AND owner = %s",
+                                   (payload['task_id'], self.owner))
+                else:
+                    raise ValueError(f"Неизвестная операция журнала: {entry['op']}")
+        
+        return len(fresh_keys)
+    
+    def dump_tables(self, open_output: Callable[[str, List[str]], Any]) -> Dict[str, int]:
+        """Выгружает таблицы BACKUP_TABLES всех владельцев в двоичном формате COPY.
+        
+        Все таблицы читаются в одной транзакции REPEATABLE READ, поэтому
+        копия согласована: связи и правила соответствуют задачам. Столбцы
+        перечисляются явно: в базах, обновленных с разных версий, порядок
+        столбцов может отличаться.
+        
+        При включенном Config.ROW_LEVEL_SECURITY выгружать можно только
+        ролью с BYPASSRLS или суперпользователем: под политиками COPY
+        молча пропустил бы строки всех владельцев, и копия вышла бы пустой.
+        
+        Args:
+            open_output (Callable[[str, List[str]], Any]): Возвращает для
+                имени таблицы и ее столбцов контекстный менеджер с
+                файлоподобным объектом (метод write).
+                
+        Returns:
+            Dict[str, int]: Число выгруженных строк по таблицам.
+            
+        Raises:
+            ValueError: Если политики RLS скрыли бы строки от роли.
+        """
+        rows = {}
+        with DatabaseConnection.get_cursor(self._connection_params) as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            DatabaseConnection._set_deadline(cursor, "bulk")
+            if Config.ROW_LEVEL_SECURITY:
+                cursor.execute("""
+                    SELECT rolsuper OR rolbypassrls AS bypass_rls 
+                    FROM pg_roles 
+                    WHERE rolname = current_user
+                """)
+                if not cursor.fetchone()['bypass_rls']:
+                    raise ValueError("При включенном ROW_LEVEL_SECURITY резервную копию может снять "
+                                     "только роль с BYPASSRLS или суперпользователь")
+            for table in self.BACKUP_TABLES:
+                cursor.execute("""
+                    SELECT column_name 
+                    FROM information_schema.columns 
+                    WHERE table_schema = current_schema() AND table_name = %s
+                    ORDER BY ordinal_position
+                """, (table,))
+                columns = [row['column_name'] for row in cursor.fetchall()]
+                with open_output(table, columns) as output:
+                    cursor.copy_expert(self._copy_statement(table, columns, "TO STDOUT"), output)
+                rows[table] = cursor.rowcount
+        return rows
+    
+    @staticmethod
+    def _copy_statement(table: str, columns: List[str], direction: str) -> sql.Composed:
+        """Собирает команду COPY таблицы в двоичном формате."""
+        return sql.SQL("COPY {} ({}) {} (FORMAT binary)").format(
+            sql.Identifier(table),
+            sql.SQL(", ").join(sql.Identifier(column) for column in columns),
+            sql.SQL(direction)
+        )
+    
+    def load_tables(self, sections, replace: bool = False,
+                    verify_rows: Callable[[Dict[str, int]], None] = None) -> Dict[str, int]:
+        """Загружает таблицы, выгруженные dump_tables, в одной транзакции.
+        
+        Перед загрузкой удаляются индексы, первичные и внешние ключи
+        таблиц и отключаются пользовательские триггеры: строки пишутся без
+        поддержки индексов и построчных проверок. После загрузки индексы
+        строятся заново, ключи проверяются одним проходом, счетчики тегов
+        пересчитываются, а последовательности ID сдвигаются за максимальный
+        ID. Агрегаты статистики досчитаются при следующем обращении.
+        
+        При включенном Config.ROW_LEVEL_SECURITY загружать можно только
+        ролью с BYPASSRLS: COPY FROM не работает под политиками RLS.
+        
+        Args:
+            sections: Таблицы в порядке загрузки: тройки (имя таблицы,
+                столбцы, файлоподобный объект с методом read), например
+                генератор, читающий файл резервной копии.
+            replace (bool, optional): Заменить существующие задачи.
+            verify_rows (Callable, optional): Проверка числа загруженных
+                строк по таблицам; вызывается до фиксации транзакции и
+                откатывает загрузку исключением.
+                
+        Returns:
+            Dict[str, int]: Число загруженных строк по таблицам.
+            
+        Raises:
+            ValueError: Если в копии неизвестная таблица или база не пуста,
+                а replace не указан. Транзакция при этом откатывается.
+        """
+        loaded = {}
+        with self._primary_cursor("bulk") as cursor:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM tasks) OR EXISTS (SELECT 1 FROM recurrence_rules) "
+                           "AS has_data")
+            if cursor.fetchone()['has_data'] and not replace:
+                raise ValueError("База данных уже содержит задачи. Используйте --force, чтобы заменить их")
+            
+            # TRUNCATE берет исключительные блокировки на все время загрузки
+            cursor.execute(f"TRUNCATE {', '.join(self.BACKUP_TABLES + self.DERIVED_TABLES)}")
+            
+            constraints, indexes = self._drop_table_indexes(cursor)
+            for table in self.BACKUP_TABLES:
+                cursor.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+            
+            for table, columns, source in sections:
+                if table not in self.BACKUP_TABLES:
+                    raise ValueError(f"Неизвестная таблица в резервной копии: {table}")
+                cursor.copy_expert(self._copy_statement(table, columns, "FROM STDIN"), source, size=1 << 20)
+                loaded[table] = cursor.rowcount
+            if verify_rows is not None:
+                verify_rows(loaded)
+            
+            # Сначала уникальные ключи и индексы, затем ссылающиеся на них внешние ключи
+            for table, name, definition in constraints:
+                if not definition.startswith("FOREIGN KEY"):
+                    cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+            for definition in indexes:
+                cursor.execute(definition)
+            for table, name, definition in constraints:
+                if definition.startswith("FOREIGN KEY"):
+                    cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+            
+            for table in self.BACKUP_TABLES:
+                cursor.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+            
+            self._rebuild_tag_counts(cursor)
+            # Шаг последовательности шарда сохраняется, поэтому следующий ID
+            # после setval остается в своем шарде
+            for table in ("recurrence_rules", "tasks"):
+                cursor.execute(f"""
+                    SELECT setval(pg_get_serial_sequence('{table}', 'id'), MAX(id)) 
+                    FROM {table} 
+                    HAVING MAX(id) IS NOT NULL
+                """)
+            for table in self.BACKUP_TABLES:
+                cursor.execute(f"ANALYZE {table}")
+        
+        self._mark_write()
+        return loaded
+    
+    def _drop_table_indexes(self, cursor) -> Tuple[List[Tuple[str, str, str]], List[str]]:
+        """Удаляет ключи и индексы таблиц BACKUP_TABLES, возвращая их определения.
+        
+        Returns:
+            Tuple: Ключи (таблица, имя, определение) и команды создания индексов.
+        """
+        tables = list(self.BACKUP_TABLES)
+        indexes = self._drop_indexes(cursor, tables)
+        
+        cursor.execute("""
+            SELECT conrelid::regclass::text AS table_name, quote_ident(conname) AS name,
+                   pg_get_constraintdef(oid) AS definition
+            FROM pg_constraint
+            WHERE conrelid = ANY(%s::regclass[]) AND contype IN ('p', 'u', 'f')
+            ORDER BY contype = 'f' DESC
+        """, (tables,))
+        constraints = [(row['table_name'], row['name'], row['definition']) for row in cursor.fetchall()]
+        
+        # Внешние ключи удаляются первыми: они зависят от первичных
+        for table, name, _ in constraints:
+            cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+        return constraints, indexes
+    
+    @staticmethod
+    def _drop_indexes(cursor, tables: List[str]) -> List[str]:
+        """Удаляет индексы таблиц, кроме индексов ключей, и возвращает команды их создания."""
+        # Индексы ключей удаляются вместе с ключами и восстанавливаются ими же
+        cursor.execute("""
+            SELECT i.indexrelid::regclass::text AS name, pg_get_indexdef(i.indexrelid) AS definition
+            FROM pg_index i
+            WHERE i.indrelid = ANY(%s::regclass[])
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+        """, (tables,))
+        index_rows = cursor.fetchall()
+        for row in index_rows:
+            cursor.execute(f"DROP INDEX {row['name']}")
+        return [row['definition'] for row in index_rows]
+    
+    def seed_tasks(self, count: int, chunk_size: int = None, drop_indexes: bool = False) -> int:
+        """Создает count синтетических задач владельца средствами SQL.
+        
+        Строки генерируются на сервере запросом INSERT ... SELECT FROM
+        generate_series порциями по chunk_size, каждая в своей транзакции.
+        Распределения приближены к реальным: около 40% задач выполнены,
+        приоритеты low/medium/high — 30/50/20%, у 70% задач есть срок, у
+        задачи от нуля до двух тегов, даты создания — за последний год.
+        
+        На время вставки порции пользовательские триггеры tasks отключаются:
+        изменения счетчиков тегов дописываются одним запросом на порцию, а
+        подписчики изменений (watch) о созданных задачах не уведомляются.
+        Агрегаты статистики пересчитываются при следующем обращении.
+        
+        Args:
+            count (int): Число задач.
+            chunk_size (int, optional): Число строк в транзакции. По
+                умолчанию Config.SEED_CHUNK_SIZE.
+            drop_indexes (bool, optional): Удалить вторичные индексы tasks
+                перед вставкой и построить их заново после нее.
+                
+        Returns:
+            int: Число созданных задач.
+        """
+        chunk_size = chunk_size or Config.SEED_CHUNK_SIZE
+        indexes = []
+        if drop_indexes:
+            with self._primary_cursor("bulk") as cursor:
+                indexes = self._drop_indexes(cursor, ["tasks"])
+        
+        created = 0
+        try:
+            for first in range(1, count + 1, chunk_size):
+                with self._primary_cursor("bulk") as cursor:
+                    cursor.execute("ALTER TABLE tasks DISABLE TRIGGER USER")
+                    cursor.execute(self.SEED_SQL, {
+                        'owner': self.owner,
+                        'first': first,
+                        'last': min(first + chunk_size - 1, count),
+                        'words': list(self.SEED_WORDS),
+                        'tags': list(self.SEED_TAGS)
+                    })
+                    created += cursor.fetchone()['created']
+                    cursor.execute("ALTER TABLE tasks ENABLE TRIGGER USER")
+        finally:
+            # Индексы восстанавливаются и после ошибки: строки прошлых порций
+            # уже зафиксированы
+            with self._primary_cursor("bulk") as cursor:
+                for definition in indexes:
+                    cursor.execute(definition)
+                # Задачи с прошлыми датами создания и выполнения меняют уже
+                # посчитанные дни: агрегаты владельца пересчитываются целиком
+                cursor.execute("""
+                    UPDATE task_stats_watermark 
+                    SET last_updated_at = '-infinity'
+                    WHERE owner = %s
+                """, (self.owner,))
+                cursor.execute("ANALYZE tasks")
+        
+        self._mark_write()
+        return created
+    
+    def get_maintenance_report(self) -> Dict[str, Any]:
+        """Собирает размеры, мертвые строки и использование индексов таблиц.
+        
+        Таблицы общие для всех владельцев, поэтому отчет охватывает всю
+        базу. Число сканирований индекса считается с момента сброса
+        статистики сервера (stats_reset). Раздутость B-tree индексов
+        измеряется функцией pgstatindex, если установлено расширение
+        pgstattuple; она читает индекс целиком.
+        
+        Returns:
+            Dict[str, Any]: stats_reset, bloat_measured (доступно ли
+                измерение раздутости), tables и indexes. Для индекса:
+                table_name, name, bytes, scans, is_unique, is_valid, bloat
+                (доля пустого места или None), bloated, unused и
+                redundant_of (имя покрывающего индекса или None).
+        """
+        tables = list(self.BACKUP_TABLES + self.DERIVED_TABLES)
+        with DatabaseConnection.get_cursor(self._connection_params, deadline="bulk") as cursor:
+            cursor.execute("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()")
+            row = cursor.fetchone()
+            stats_reset = row['stats_reset'] if row else None
+            
+            cursor.execute("""
+                SELECT relname AS name, pg_total_relation_size(relid) AS total_bytes,
+                       pg_relation_size(relid) AS table_bytes, n_live_tup AS live_tuples,
+                       n_dead_tup AS dead_tuples, 
+                       GREATEST(last_vacuum, last_autovacuum) AS last_vacuum,
+                       GREATEST(last_analyze, last_autoanalyze) AS last_analyze
+                FROM pg_stat_user_tables
+                WHERE relid = ANY(%s::regclass[])
+                ORDER BY total_bytes DESC
+            """, (tables,))
+            table_rows = cursor.fetchall()
+            
+            cursor.execute("""
+                SELECT s.relname AS table_name, s.indexrelname AS name, 
+                       pg_relation_size(s.indexrelid) AS bytes, s.idx_scan AS scans,
+                       i.indisunique AS is_unique, i.indisvalid AS is_valid, am.amname AS method,
+                       i.indkey::text AS columns, i.indclass::text AS opclasses,
+                       i.indpred IS NOT NULL OR i.indexprs IS NOT NULL AS special
+                FROM pg_stat_user_indexes s
+                JOIN pg_index i ON i.indexrelid = s.indexrelid
+                JOIN pg_class c ON c.oid = s.indexrelid
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE s.relid = ANY(%s::regclass[])
+                ORDER BY s.relname, s.indexrelname
+            """, (tables,))
+            index_rows = cursor.fetchall()
+            
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple') AS found")
+            bloat_measured = cursor.fetchone()['found']
+            
+            indexes = []
+            for row in index_rows:
+                index = dict(row)
+                index['bloat'] = None
+                if bloat_measured and index['method'] == 'btree' and index['is_valid']:
+                    cursor.execute("SELECT avg_leaf_density FROM pgstatindex(%s::regclass)",
+                                   (index['name'],))
+                    density = cursor.fetchone()['avg_leaf_density']
+                    # У пустого индекса плотность не определена (NaN)
+                    if density == density:
+                        index['bloat'] = round(max(0.0, 1 - density / self.INDEX_FILLFACTOR), 3)
+                indexes.append(index)
+        
+        self._mark_index_problems(indexes)
+        return {
+            'stats_reset': stats_reset,
+            'bloat_measured': bloat_measured,
+            'tables': [dict(row) for row in table_rows],
+            'indexes': indexes
+        }
+    
+    @staticmethod
+    def _mark_index_problems(indexes: List[Dict[str, Any]]):
+        """Отмечает раздутые, неиспользуемые и избыточные индексы.
+        
+        Индекс избыточен, если другой индекс той же таблицы и того же
+        метода начинается с тех же столбцов и классов операторов. Из двух
+        одинаковых индексов избыточным считается второй по имени.
+        Уникальные индексы поддерживают ограничения и не отмечаются.
+        """
+        for index in indexes:
+            index['bloated'] = index['bloat'] is not None and index['bloat'] >= Config.INDEX_BLOAT_THRESHOLD
+            index['unused'] = not index['scans'] and not index['is_unique']
+            index['redundant_of'] = None
+            if index['is_unique'] or index['special']:
+                continue
+            columns = index['columns'].split()
+            opclasses = index['opclasses'].split()
+            for other in indexes:
+                if (other is index or other['table_name'] != index['table_name'] or other['special']
+                        or other['method'] != index['method'] or not other['is_valid']):
+                    continue
+                other_columns = other['columns'].split()
+                if (other_columns[:len(columns)] != columns
+                        or other['opclasses'].split()[:len(opclasses)] != opclasses):
+                    continue
+                if (len(other_columns) == len(columns) and not other['is_unique']
+                        and other['name'] > index['name']):
+                    continue
+                index['redundant_of'] = other['name']
+                break
+    
+    def vacuum_tables(self, vacuum: bool = True) -> List[str]:
+        """Выполняет VACUUM (ANALYZE) или только ANALYZE таблиц задач.
+        
+        Обычный VACUUM не блокирует чтение и запись; VACUUM FULL, который
+        переписывает таблицу под исключительной блокировкой, не выполняется.
+        Перед этим изменения счетчиков тегов сворачиваются в tag_counts,
+        чтобы удаленные строки tag_count_deltas очистил тот же VACUUM.
+        
+        Args:
+            vacuum (bool, optional): Очистить мертвые строки, а не только
+                обновить статистику планировщика.
+                
+        Returns:
+            List[str]: Обработанные таблицы.
+        """
+        self.fold_tag_count_deltas()
+        
+        tables = list(self.BACKUP_TABLES + self.DERIVED_TABLES)
+        command = "VACUUM (ANALYZE) {}" if vacuum else "ANALYZE {}"
+        with DatabaseConnection.get_autocommit_cursor(self._connection_params) as cursor:
+            for table in tables:
+                cursor.execute(sql.SQL(command).format(sql.Identifier(table)))
+        return tables
+    
+    def drop_invalid_indexes(self) -> List[str]:
+        """Удаляет невалидные копии индексов, оставленные прерванным REINDEX CONCURRENTLY.
+        
+        Удаляются только невалидные индексы таблиц задач с суффиксом
+        _ccnew (или _ccnew1, _ccnew2...); DROP INDEX CONCURRENTLY не
+        блокирует запись.
+        
+        Returns:
+            List[str]: Удаленные индексы.
+        """
+        tables = list(self.BACKUP_TABLES + self.DERIVED_TABLES)
+        with DatabaseConnection.get_autocommit_cursor(self._connection_params) as cursor:
+            cursor.execute("""
+                SELECT c.relname AS name 
+                FROM pg_index i 
+                JOIN pg_class c ON c.oid = i.indexrelid 
+                WHERE i.indrelid = ANY(%s::regclass[]) AND NOT i.indisvalid 
+                  AND c.relname ~ '_ccnew[0-9]*$'
+                ORDER BY c.relname
+            """, (tables,))
+            names = [row['name'] for row in cursor.fetchall()]
+            for name in names:
+                cursor.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name)))
+        return names
+    
+    def reindex_indexes(self, names: List[str]) -> List[str]:
+        """Перестраивает индексы таблиц задач без блокировки записи.
+        
+        REINDEX CONCURRENTLY (PostgreSQL 12+) строит новую копию индекса
+        рядом со старой и подменяет ее. Если перестроение прервано,
+        остается невалидный индекс с суффиксом _ccnew: отчет
+        get_maintenance_report показывает его. Повторный REINDEX его не
+        убирает, а строит еще одну копию рядом; удаляет такие индексы
+        drop_invalid_indexes.
+        
+        Args:
+            names (List[str]): Имена индексов.
+            
+        Returns:
+            List[str]: Перестроенные индексы.
+            
+        Raises:
+            ValueError: Если индекс не принадлежит таблицам задач.
+        """
+        tables = list(self.BACKUP_TABLES + self.DERIVED_TABLES)
+        with DatabaseConnection.get_autocommit_cursor(self._connection_params) as cursor:
+            cursor.execute("""
+                SELECT indexrelname AS name 
+                FROM pg_stat_user_indexes 
+                WHERE relid = ANY(%s::regclass[])
+            """, (tables,))
+            known = {row['name'] for row in cursor.fetchall()}
+            unknown = [name for name in names if name not in known]
+            if unknown:
+                raise ValueError(f"Индексы не найдены среди индексов таблиц задач: {', '.join(unknown)}")
+            for name in names:
+                cursor.execute(sql.SQL("REINDEX INDEX CONCURRENTLY {}").format(sql.Identifier(name)))
+        return list(names)
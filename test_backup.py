@@ -0,0 +1,175 @@
+"""
+Тесты для модуля backup.py
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+from backup import (BackupFormatError, CHUNK_SIZE, COPY_SIGNATURE, backup_database,
+                    restore_database, verify_backup)
+
+# Размер строки copy_data: число полей, длина поля и его данные
+ROW_SIZE = 100
+
+
+def copy_data(count, fill=None):
+    """Собирает данные двоичного COPY из count строк с одним полем."""
+    width = ROW_SIZE - 6
+    rows = b"".join(struct.pack(">hi", 1, width) + (fill * width if fill else os.urandom(width))
+                    for _ in range(count))
+    return COPY_SIGNATURE + struct.pack(">ii", 0, 0) + rows + struct.pack(">h", -1)
+
+
+def copy_rows(data):
+    """Возвращает число строк в данных copy_data."""
+    return (len(data) - len(COPY_SIGNATURE) - 10) // ROW_SIZE
+
+
+class FakeStorage:
+    """Хранилище, выгружающее и загружающее таблицы в памяти."""
+
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+        self.loaded = {}
+        # Поправка к числу строк, которое сообщают выгрузка и загрузка
+        self.dump_row_error = 0
+        self.load_row_error = 0
+
+    def dump_tables(self, open_output):
+        rows = {}
+        for table, data in self.tables.items():
+            with open_output(table, ['id', 'title']) as output:
+                # COPY TO пишет данные построчно
+                for offset in range(0, len(data), 1000):
+                    output.write(data[offset:offset + 1000])
+            rows[table] = copy_rows(data) + self.dump_row_error
+        return rows
+
+    def load_tables(self, sections, replace=False, verify_rows=None):
+        rows = {}
+        for table, columns, source in sections:
+            chunks = []
+            while True:
+                chunk = source.read(8192)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            self.loaded[table] = (columns, b"".join(chunks))
+            rows[table] = copy_rows(self.loaded[table][1]) + self.load_row_error
+        if verify_rows is not None:
+            verify_rows(rows)
+        return rows
+
+
+class TestBackup(unittest.TestCase):
+    """Тесты резервного копирования и восстановления."""
+
+    def setUp(self):
+        """Создает временный файл копии и таблицы с данными."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "tasks.bak")
+        self.source = FakeStorage({
+            'tasks': copy_data(11000),
+            'task_dependencies': copy_data(0),
+            'journal_applied': copy_data(5, b"k")
+        })
+
+    def tearDown(self):
+        """Удаляет временный каталог."""
+        shutil.rmtree(self.directory)
+
+    @patch('backup.DatabaseConnection.copy_mode')
+    def test_round_trip(self, mock_copy_mode):
+        """Тест восстановления тех же данных и итогов по строкам."""
+        summary = backup_database(self.source, self.path)
+        target = FakeStorage()
+        restored = restore_database(target, self.path)
+
+        self.assertEqual({table: data for table, (_, data) in target.loaded.items()}, self.source.tables)
+        self.assertEqual(target.loaded['tasks'][0], ['id', 'title'])
+        self.assertEqual(summary['tables'], restored['tables'])
+        self.assertEqual(summary['bytes'], restored['bytes'])
+        self.assertGreater(len(self.source.tables['tasks']), CHUNK_SIZE)
+        self.assertEqual(summary['rows'], 11000 + 5)
+        # COPY выполняется без wait callback
+        self.assertEqual(mock_copy_mode.call_count, 2)
+
+    @patch('backup.DatabaseConnection.copy_mode')
+    def test_compressed_copy_detected(self, mock_copy_mode):
+        """Тест сжатой копии: сжатие распознается при чтении."""
+        self.source.tables['tasks'] = copy_data(4000, b"t")
+        summary = backup_database(self.source, self.path, compress_level=1)
+
+        self.assertLess(summary['file_bytes'], summary['bytes'] / 10)
+        self.assertEqual(verify_backup(self.path)['tables'], summary['tables'])
+
+    @patch('backup.DatabaseConnection.copy_mode')
+    def test_corruption_detected(self, mock_copy_mode):
+        """Тест: поврежденные данные таблицы не проходят проверку."""
+        backup_database(self.source, self.path)
+        with open(self.path, "r+b") as f:
+            f.seek(CHUNK_SIZE // 2)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+        with self.assertRaisesRegex(BackupFormatError, "Контрольная сумма tasks"):
+            verify_backup(self.path)
+        with self.assertRaises(BackupFormatError):
+            restore_database(FakeStorage(), self.path)
+
+    @patch('backup.DatabaseConnection.copy_mode')
+    def test_manifest_row_count_checked(self, mock_copy_mode):
+        """Тест: --check сверяет строки данных COPY с манифестом."""
+        backup_database(self.source, self.path)
+        self.assertEqual(verify_backup(self.path)['tables']['tasks'], 11000)
+
+        self.source.dump_row_error = 1
+        backup_database(self.source, self.path)
+
+        with self.assertRaisesRegex(BackupFormatError, "Число строк tasks"):
+            verify_backup(self.path)
+
+    @patch('backup.DatabaseConnection.copy_mode')
+    def test_restore_checks_loaded_rows(self, mock_copy_mode):
+        """Тест: restore сверяет загруженные строки с манифестом до фиксации."""
+        backup_database(self.source, self.path)
+        target = FakeStorage()
+        target.load_row_error = -1
+
+        with self.assertRaisesRegex(BackupFormatError, "не совпадает с манифестом"):
+            restore_database(target, self.path)
+
+    @patch('backup.DatabaseConnection.copy_mode')
+    def test_truncated_file(self, mock_copy_mode):
+        """Тест оборванного файла копии."""
+        backup_database(self.source, self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 10)
+
+        with self.assertRaisesRegex(BackupFormatError, "обрывается"):
+            verify_backup(self.path)
+
+    @patch('backup.DatabaseConnection.copy_mode')
+    def test_shard_count_mismatch(self, mock_copy_mode):
+        """Тест восстановления в другое число шардов."""
+        backup_database(self.source, self.path)
+        sharded = Mock(shards=[FakeStorage(), FakeStorage()])
+
+        with self.assertRaisesRegex(ValueError, "1 шардов"):
+            restore_database(sharded, self.path)
+
+    def test_not_a_backup(self):
+        """Тест файла, не являющегося резервной копией."""
+        with open(self.path, "wb") as f:
+            f.write(b"id,title\n")
+
+        with self.assertRaisesRegex(BackupFormatError, "не является резервной копией"):
+            verify_backup(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,10 @@
 """
 
 import unittest
+from datetime import datetime
 from unittest.mock import Mock, patch, MagicMock
 from commands import TaskCommands
+from storage import ConcurrentModificationError
 from models import Task, TaskStatus, Priority
 
 
@@ -60,6 +62,7 @@ class TestTaskCommands(unittest.TestCase):
         mock_task.priority = Priority.HIGH
         mock_task.due_date = "2024-12-31"
         mock_task.completed_at = None
+        mock_task.tags = []
         mock_task.__str__ = Mock(return_value="○ [⬆] Test Task (ID: 1)")
         
         self.mock_storage.filter_tasks.return_value = [mock_task]
@@ -79,6 +82,17 @@ class TestTaskCommands(unittest.TestCase):
             due_date="2024-12-31"
         )
     
+    def test_list_tasks_by_tags(self):
+        """Тест фильтрации списка по тегам."""
+        self.mock_storage.filter_tasks.return_value = []
+        parser = self.commands.setup_argparse()
+        args = parser.parse_args(['list', '--tag', 'Work', '--tag', 'urgent', '--match', 'all'])
+        
+        self.commands.execute_command(args)
+        
+        self.mock_storage.filter_tasks.assert_called_once_with(
+            None, None, None, ['work', 'urgent'], True, False)
+    
     def test_list_tasks_show_all(self):
         """Тест отображения всех задач со статистикой."""
         mock_task = Mock()
@@ -89,6 +103,7 @@ class TestTaskCommands(unittest.TestCase):
         mock_task.priority = Priority.MEDIUM
         mock_task.due_date = None
         mock_task.completed_at = "2024-01-01T10:00:00"
+        mock_task.tags = ["work"]
         mock_task.__str__ = Mock(return_value="✓ [●] Test Task (ID: 1)")
         
         self.mock_storage.get_all_tasks.return_value = [mock_task]
@@ -105,6 +120,7 @@ class TestTaskCommands(unittest.TestCase):
         self.assertIn("Всего 5 задач", result)
         self.assertIn("Выполнено: 3 (60.0%)", result)
         self.assertIn("Test Task", result)
+        self.assertIn("🏷️ Теги: #work", result)
     
     def test_complete_task_success(self):
         """Тест успешного завершения задачи."""
@@ -120,6 +136,22 @@ class TestTaskCommands(unittest.TestCase):
         mock_task.mark_completed.assert_called_once()
         self.mock_storage.save_task.assert_called_once_with(mock_task)
     
+    def test_complete_task_retries_on_conflict(self):
+        """Тест повторной загрузки задачи при конфликте версий."""
+        stale_task = Mock()
+        stale_task.status = TaskStatus.PENDING
+        fresh_task = Mock()
+        fresh_task.status = TaskStatus.PENDING
+        
+        self.mock_storage.get_task_by_id.side_effect = [stale_task, fresh_task]
+        self.mock_storage.save_task.side_effect = [ConcurrentModificationError(1), fresh_task]
+        
+        result = self.commands.complete_task(1)
+        
+        self.assertIn("✅ Задача 1 отмечена как выполненная", result)
+        self.assertEqual(self.mock_storage.get_task_by_id.call_count, 2)
+        self.mock_storage.save_task.assert_called_with(fresh_task)
+    
     def test_complete_task_not_found(self):
         """Тест завершения несуществующей задачи."""
         self.mock_storage.get_task_by_id.return_value = None
@@ -156,6 +188,113 @@ class TestTaskCommands(unittest.TestCase):
         
         self.assertIn("❌ Ошибка: Задача с ID 999 не найдена", result)
     
+    def test_update_tasks(self):
+        """Тест разбора условий и присваиваний команды update."""
+        self.mock_storage.update_tasks.return_value = [1, 2, 3]
+        parser = self.commands.setup_argparse()
+        args = parser.parse_args(['update', '--where', 'status=pending', '--where', 'id=10..',
+                                  '--set', 'priority=HIGH', '--set', 'due-date=none'])
+        
+        result = self.commands.execute_command(args)
+        
+        self.assertEqual(result, "✏️ Изменено задач: 3")
+        self.mock_storage.update_tasks.assert_called_once_with(
+            {'priority': 'high', 'due_date': None}, dry_run=False, status='pending',
+            priority=None, due_date=None, ids=None, id_range=(10, None)
+        )
+    
+    def test_update_tasks_dry_run_with_ids(self):
+        """Тест пробного запуска по списку ID."""
+        self.mock_storage.update_tasks.return_value = [4, 7]
+        
+        result = self.commands.update_tasks(['id=4,7'], ['title=Renamed'], dry_run=True)
+        
+        self.assertEqual(result, "🔍 Будет изменено задач: 2")
+        kwargs = self.mock_storage.update_tasks.call_args[1]
+        self.assertEqual(kwargs['ids'], [4, 7])
+        self.assertTrue(kwargs['dry_run'])
+    
+    def test_update_tasks_requires_where_or_all(self):
+        """Тест защиты от изменения всех задач без --all."""
+        result = self.commands.update_tasks([], ['priority=low'])
+        
+        self.assertIn("--all", result)
+        self.mock_storage.update_tasks.assert_not_called()
+    
+    def test_update_tasks_rejects_empty_id_filters(self):
+        """Тест: пустой список ID и диапазон без границ не считаются условием."""
+        self.assertIn("Пустой список ID", self.commands.update_tasks(['id='], ['priority=high']))
+        self.assertIn("Пустой список ID", self.commands.update_tasks(['id=,'], ['priority=high']))
+        self.assertIn("без границ", self.commands.update_tasks(['id=..'], ['priority=high']))
+        self.mock_storage.update_tasks.assert_not_called()
+        
+        self.mock_storage.update_tasks.return_value = [5]
+        self.assertEqual(self.commands.update_tasks(['id=..5'], ['priority=high']), "✏️ Изменено задач: 1")
+        self.assertEqual(self.mock_storage.update_tasks.call_args[1]['id_range'], (None, 5))
+    
+    def test_update_tasks_invalid_values(self):
+        """Тест сообщений о неверных условиях и значениях."""
+        self.assertIn("Допустимые значения", self.commands.update_tasks(['status=done'], ['priority=low']))
+        self.assertIn("Поле нельзя изменить", self.commands.update_tasks(['status=pending'], ['version=2']))
+        self.assertIn("поле=значение", self.commands.update_tasks(['pending'], ['priority=low']))
+        self.mock_storage.update_tasks.assert_not_called()
+    
+    def test_add_task_with_tags(self):
+        """Тест добавления задачи с тегами."""
+        self.mock_storage.save_task.side_effect = lambda task: task
+        
+        self.commands.add_task("Tagged", tags=[" Work ", "work", "home"])
+        
+        saved = self.mock_storage.save_task.call_args[0][0]
+        self.assertEqual(saved.tags, ["work", "home"])
+    
+    def test_add_subtask_parent_not_found(self):
+        """Тест отказа при добавлении подзадачи к несуществующей задаче."""
+        self.mock_storage.get_task_by_id.return_value = None
+        
+        result = self.commands.add_task("Child", parent_id=42)
+        
+        self.assertIn("42 не найдена", result)
+        self.mock_storage.save_task.assert_not_called()
+    
+    def test_show_task_tree(self):
+        """Тест вывода дерева задачи, загруженного одним вызовом."""
+        root = Task("Root")
+        root.id = 1
+        child = Task("Child", parent_id=1)
+        child.id = 2
+        self.mock_storage.get_task_tree.return_value = [(0, root, []), (1, child, [7])]
+        
+        result = self.commands.show_task(1, tree=True)
+        
+        self.mock_storage.get_task_tree.assert_called_once_with(1)
+        self.mock_storage.get_task_by_id.assert_not_called()
+        lines = result.split("\n")
+        self.assertEqual(lines[0], "○ [●] Root (ID: 1)")
+        self.assertEqual(lines[1], "    └─ ○ [●] Child (ID: 2) ⛔ ждет: 7")
+    
+    def test_link_tasks(self):
+        """Тест связывания задач и сообщения о цикле."""
+        self.mock_storage.set_parent.return_value = True
+        self.mock_storage.add_dependency.side_effect = [True, ValueError("связь образует цикл")]
+        
+        result = self.commands.link_tasks(5, blocked_by=[3, 4], parent_id=1)
+        
+        self.mock_storage.set_parent.assert_called_once_with(5, 1)
+        self.assertIn("Задача 5 ждет задачу 3", result)
+        self.assertIn("❌ Ошибка: связь образует цикл", result)
+    
+    def test_list_ready(self):
+        """Тест списка готовых к работе задач."""
+        self.mock_storage.get_ready_tasks.return_value = [Task("Ready")]
+        parser = self.commands.setup_argparse()
+        
+        result = self.commands.execute_command(parser.parse_args(['list', '--ready']))
+        
+        self.assertIn("Ready", result)
+        self.mock_storage.filter_tasks.assert_not_called()
+        self.assertTrue(TaskCommands(None, Mock()).needs_storage(parser.parse_args(['list', '--ready'])))
+    
     def test_show_stats(self):
         """Тест отображения статистики."""
         stats_data = {
@@ -183,6 +322,22 @@ class TestTaskCommands(unittest.TestCase):
         self.assertIn("Низкий: 3", result)
         self.assertIn("Просрочено: 1", result)
     
+    def test_show_stats_by_period(self):
+        """Тест отображения динамики задач по периодам."""
+        self.mock_storage.get_statistics_by_period.return_value = [
+            {'period': '2024-01-01', 'created_tasks': 5, 'completed_tasks': 3,
+             'median_lead_hours': 1.5}
+        ]
+        
+        result = self.commands.show_stats(by='week', since='2024-01-01')
+        
+        self.assertIn("ДИНАМИКА ЗАДАЧ (по неделям)", result)
+        self.assertIn("2024-01-01", result)
+        self.assertIn("1.50", result)
+        self.mock_storage.get_statistics_by_period.assert_called_once_with('week', '2024-01-01')
+        self.mock_storage.get_statistics.assert_not_called()
+        self.mock_storage.rebuild_stats_rollup.assert_not_called()
+    
     def test_execute_command_add(self):
         """Тест выполнения команды добавления."""
         mock_args = Mock()
@@ -191,6 +346,8 @@ class TestTaskCommands(unittest.TestCase):
         mock_args.description = 'Test Description'
         mock_args.priority = 'high'
         mock_args.due_date = '2024-12-31'
+        mock_args.tags = ['work']
+        mock_args.parent = None
         
         with patch.object(self.commands, 'add_task') as mock_add_task:
             mock_add_task.return_value = "Task added successfully"
@@ -201,7 +358,9 @@ class TestTaskCommands(unittest.TestCase):
                 title='Test Task',
                 description='Test Description',
                 priority='high',
-                due_date='2024-12-31'
+                due_date='2024-12-31',
+                tags=['work'],
+                parent_id=None
             )
     
     def test_execute_command_invalid(self):
@@ -223,6 +382,274 @@ class TestTaskCommands(unittest.TestCase):
         self.assertIn('done', parser._subparsers._group_actions[0].choices)
         self.assertIn('delete', parser._subparsers._group_actions[0].choices)
         self.assertIn('stats', parser._subparsers._group_actions[0].choices)
+        self.assertIn('serve', parser._subparsers._group_actions[0].choices)
+    
+    def test_offline_add_writes_journal(self):
+        """Тест записи add в журнал без обращения к хранилищу."""
+        journal = Mock()
+        commands = TaskCommands(None, journal)
+        
+        result = commands.add_task("Offline", priority="high", due_date="2024-12-01")
+        
+        self.assertIn("записана в журнал", result)
+        journal.append.assert_called_once_with('add', {
+            'title': 'Offline', 'description': '', 'priority': 'high', 'due_date': '2024-12-01',
+            'tags': [], 'parent_id': None
+        })
+    
+    def test_offline_add_invalid_date(self):
+        """Тест проверки даты до записи в журнал."""
+        journal = Mock()
+        commands = TaskCommands(None, journal)
+        
+        result = commands.add_task("Offline", due_date="01.12.2024")
+        
+        self.assertIn("Неверный формат даты", result)
+        journal.append.assert_not_called()
+    
+    def test_offline_done_and_delete(self):
+        """Тест записи done и delete в журнал."""
+        journal = Mock()
+        commands = TaskCommands(None, journal)
+        
+        commands.complete_task(3)
+        commands.delete_task(4)
+        
+        journal.append.assert_any_call('done', {'task_id': 3})
+        journal.append.assert_any_call('delete', {'task_id': 4})
+    
+    def test_needs_storage(self):
+        """Тест определения команд, которым нужна БД."""
+        parser = self.commands.setup_argparse()
+        offline = TaskCommands(None, Mock())
+        
+        self.assertTrue(self.commands.needs_storage(parser.parse_args(['done', '1'])))
+        self.assertFalse(offline.needs_storage(parser.parse_args(['done', '1'])))
+        self.assertFalse(offline.needs_storage(parser.parse_args(['list'])))
+        self.assertTrue(offline.needs_storage(parser.parse_args(['stats', '--by', 'day'])))
+        self.assertTrue(offline.needs_storage(parser.parse_args(['sync'])))
+    
+    def test_sync(self):
+        """Тест синхронизации журнала."""
+        journal = Mock()
+        journal.replay.return_value = (3, 4)
+        journal.rejected_count.return_value = 0
+        commands = TaskCommands(self.mock_storage, journal)
+        
+        result = commands.sync()
+        
+        journal.replay.assert_called_once_with(self.mock_storage.apply_journal_batch)
+        self.assertIn("Синхронизировано операций: 3", result)
+        self.assertIn("уже примененных ранее: 1", result)
+        self.assertNotIn("Отклонено", result)
+    
+    def test_sync_reports_rejected(self):
+        """Тест: операции, отклоненные БД, указываются в результате."""
+        journal = Mock()
+        journal.replay.return_value = (3, 5)
+        journal.rejected_count.side_effect = [1, 3]
+        journal.rejected_path = "journal.jsonl.rejected"
+        commands = TaskCommands(self.mock_storage, journal)
+        
+        result = commands.sync()
+        
+        self.assertNotIn("уже примененных", result)
+        self.assertIn("Отклонено БД: 2", result)
+        self.assertIn("journal.jsonl.rejected", result)
+    
+    def test_add_recurrence(self):
+        """Тест добавления правила повторения из аргументов командной строки."""
+        self.mock_storage.add_recurrence_rule.return_value = 3
+        parser = self.commands.setup_argparse()
+        args = parser.parse_args(['recur', 'add', '--title', 'Water plants', '--every', 'weekly',
+                                  '--interval', '2', '--start', '2024-12-02', '--tag', 'Home'])
+        
+        result = self.commands.execute_command(args)
+        
+        template, frequency, interval, starts_on, ends_on = \
+            self.mock_storage.add_recurrence_rule.call_args[0]
+        self.assertEqual(template.title, 'Water plants')
+        self.assertEqual(template.tags, ['home'])
+        self.assertEqual((frequency, interval, starts_on, ends_on), ('weekly', 2, '2024-12-02', None))
+        self.assertIn("ID: 3", result)
+    
+    def test_materialize_horizon(self):
+        """Тест разбора горизонта и создания экземпляров."""
+        self.mock_storage.materialize_recurrences.return_value = 4
+        
+        result = self.commands.materialize(horizon='2w')
+        
+        self.mock_storage.materialize_recurrences.assert_called_once_with(14)
+        self.assertIn("Создано повторяющихся задач: 4", result)
+        self.assertIn("Неверный горизонт", self.commands.materialize(horizon='month'))
+    
+    @patch('commands.backup_database')
+    def test_backup_reports_throughput(self, mock_backup):
+        """Тест вывода объема и скорости резервного копирования."""
+        mock_backup.return_value = {'tables': {'tasks': 2000000, 'task_dependencies': 0}, 'rows': 2000000,
+                                    'bytes': 200 * 1024 * 1024, 'file_bytes': 50 * 1024 * 1024, 'seconds': 4.0}
+        parser = self.commands.setup_argparse()
+        
+        result = self.commands.execute_command(parser.parse_args(['backup', 'tasks.bak', '--compress']))
+        
+        mock_backup.assert_called_once_with(self.mock_storage, 'tasks.bak', 1)
+        self.assertIn("tasks: 2000000", result)
+        self.assertIn("500000 строк/с, 50.0 МБ/с", result)
+        self.assertIn("файл: 50.0 МБ", result)
+    
+    @patch('commands.export_tasks')
+    def test_export_reports_speedup(self, mock_export):
+        """Тест вывода скорости экспорта и ускорения от процессов."""
+        mock_export.return_value = {'rows': 1000000, 'parts': ['tasks.jsonl'], 'seconds': 2.0,
+                                    'worker_seconds': 7.0}
+        parser = self.commands.setup_argparse()
+        
+        result = self.commands.execute_command(parser.parse_args(['export', 'tasks.jsonl', '--parallel', '4']))
+        
+        mock_export.assert_called_once_with(self.mock_storage, 'tasks.jsonl', 'jsonl', 4, False)
+        self.assertIn("Экспортировано задач: 1000000 в tasks.jsonl", result)
+        self.assertIn("500000 строк/с, процессов: 4, ускорение x3.5", result)
+    
+    def test_seed_reports_rate(self):
+        """Тест генерации задач с выводом скорости вставки."""
+        self.mock_storage.seed_tasks.return_value = 1000
+        parser = self.commands.setup_argparse()
+        
+        result = self.commands.execute_command(
+            parser.parse_args(['seed', '--count', '1000', '--chunk-size', '500', '--drop-indexes']))
+        
+        self.mock_storage.seed_tasks.assert_called_once_with(1000, 500, True)
+        self.assertIn("Создано задач: 1000", result)
+        self.assertIn("строк/с", result)
+        self.assertIn("❌", self.commands.seed(0))
+    
+    def test_maintain_reindexes_bloated(self):
+        """Тест перестроения раздутых индексов и отчета по ним."""
+        storage = Mock(spec=['vacuum_tables', 'get_maintenance_report', 'reindex_indexes',
+                             'drop_invalid_indexes'])
+        storage.vacuum_tables.return_value = ['tasks']
+        storage.drop_invalid_indexes.return_value = ['idx_tasks_status_ccnew']
+        storage.get_maintenance_report.return_value = {
+            'stats_reset': None, 'bloat_measured': True,
+            'tables': [{'name': 'tasks', 'total_bytes': 3 * 1024 * 1024, 'live_tuples': 90, 'dead_tuples': 10,
+                        'last_vacuum': datetime(2024, 1, 2), 'last_analyze': None}],
+            'indexes': [
+                {'table_name': 'tasks', 'name': 'idx_tasks_status', 'bytes': 2048, 'scans': 0,
+                 'is_valid': True, 'bloat': 0.5, 'bloated': True, 'unused': True,
+                 'redundant_of': 'idx_tasks_status_priority'},
+                {'table_name': 'tasks', 'name': 'tasks_pkey', 'bytes': 2048, 'scans': 9,
+                 'is_valid': True, 'bloat': 0.1, 'bloated': False, 'unused': False, 'redundant_of': None}
+            ]
+        }
+        commands = TaskCommands(storage)
+        parser = commands.setup_argparse()
+        
+        result = commands.execute_command(parser.parse_args(['maintain', '--vacuum', '--reindex']))
+        
+        storage.vacuum_tables.assert_called_once_with(True)
+        storage.drop_invalid_indexes.assert_called_once_with()
+        storage.reindex_indexes.assert_called_once_with(['idx_tasks_status'])
+        self.assertIn("Удалены невалидные индексы: idx_tasks_status_ccnew", result)
+        self.assertIn("Перестроены индексы: idx_tasks_status", result)
+        self.assertIn("3.0 МБ", result)
+        self.assertIn("мертвых: 10 (10.0%), vacuum: 2024-01-02, analyze: никогда", result)
+        self.assertIn("раздут; не используется; дублирует idx_tasks_status_priority", result)
+    
+    @patch('commands.verify_backup', side_effect=ValueError("Файл резервной копии обрывается"))
+    def test_restore_check_without_database(self, mock_verify):
+        """Тест проверки копии без подключения к БД."""
+        parser = self.commands.setup_argparse()
+        args = parser.parse_args(['restore', 'tasks.bak', '--check'])
+        
+        self.assertFalse(self.commands.needs_storage(args))
+        self.assertIn("❌ Ошибка: Файл резервной копии обрывается", self.commands.execute_command(args))
+    
+    @patch('commands.run_hook', return_value=False)
+    @patch('commands.ReminderDaemon')
+    def test_remind_prints_and_runs_hook(self, mock_daemon_class, mock_run_hook):
+        """Тест вывода напоминаний и вызова внешней команды."""
+        reminder = {'id': 5, 'title': 'Pay rent', 'status': 'pending',
+                    'priority': 'high', 'due_date': '2000-01-01'}
+        
+        def run():
+            notify = mock_daemon_class.call_args[0][1]
+            notify(reminder)
+            raise KeyboardInterrupt
+        mock_daemon_class.return_value.run.side_effect = run
+        mock_daemon_class.return_value.sent = 1
+        
+        with patch('builtins.print') as mock_print:
+            result = self.commands.remind(hook='notify-send')
+        
+        lines = [call[0][0] for call in mock_print.call_args_list]
+        self.assertIn("⚠️ Просрочена: ○ [⬆] Pay rent (ID: 5) 📅 2000-01-01", lines[0])
+        self.assertIn("завершилась с ошибкой", lines[1])
+        mock_run_hook.assert_called_once_with('notify-send', reminder)
+        self.assertIn("Отправлено: 1", result)
+    
+    def test_list_tasks_marks_truncated_description(self):
+        """Тест отметки усеченного описания и подсказки show."""
+        task = Task("Long", "Начало описания")
+        task.id = 7
+        task.description_truncated = True
+        self.mock_storage.filter_tasks.return_value = [task]
+        
+        result = self.commands.list_tasks()
+        
+        self.assertIn("Начало описания… (полностью: show 7)", result)
+    
+    def test_list_tasks_from_snapshot(self):
+        """Тест чтения списка из локального снимка после его обновления."""
+        self.commands.snapshot = Mock()
+        self.commands.snapshot.filter_tasks.return_value = [Task("Cached")]
+        
+        result = self.commands.list_tasks(status='pending', use_snapshot=True)
+        
+        self.commands.snapshot.refresh.assert_called_once_with(self.mock_storage)
+        self.commands.snapshot.filter_tasks.assert_called_once_with('pending', None, None, [], False, False)
+        self.mock_storage.filter_tasks.assert_not_called()
+        self.assertIn("Cached", result)
+    
+    def test_offline_list_without_snapshot(self):
+        """Тест автономного чтения, когда снимок еще не создан."""
+        commands = TaskCommands(None, Mock())
+        commands.snapshot = Mock()
+        commands.snapshot.exists.return_value = False
+        
+        result = commands.list_tasks()
+        
+        commands.snapshot.refresh.assert_not_called()
+        self.assertIn("снимок еще не создан", result)
+    
+    def test_watch_prints_changes(self):
+        """Тест вывода изменений командой watch."""
+        self.mock_storage.iter_changes.return_value = iter([
+            {'op': 'insert', 'id': 5, 'title': 'New', 'status': 'pending',
+             'priority': 'high', 'due_date': '2024-12-01', 'version': 1},
+            {'op': 'update', 'id': 5, 'title': 'New', 'status': 'completed',
+             'priority': 'high', 'due_date': None, 'version': 2}
+        ])
+        
+        with patch('builtins.print') as mock_print:
+            result = self.commands.watch(status=None, priority='high', timeout=5)
+        
+        self.mock_storage.iter_changes.assert_called_once_with(None, 'high', 5)
+        lines = [call[0][0] for call in mock_print.call_args_list]
+        self.assertIn("➕ Добавлена: ○ [⬆] New (ID: 5) 📅 2024-12-01", lines[0])
+        self.assertIn("✏️ Изменена: ✓ [⬆] New (ID: 5)", lines[1])
+        self.assertIn("Получено изменений: 2", result)
+    
+    @patch('server.run_server')
+    def test_execute_command_serve(self, mock_run_server):
+        """Тест запуска HTTP API командой serve."""
+        mock_run_server.return_value = "🛑 Сервер остановлен"
+        parser = self.commands.setup_argparse()
+        args = parser.parse_args(['serve', '--port', '9000', '--workers', '4', '--coalesce-writes'])
+        
+        result = self.commands.execute_command(args)
+        
+        self.assertEqual(result, "🛑 Сервер остановлен")
+        mock_run_server.assert_called_once_with(self.mock_storage, None, 9000, 4, False, True)
 
 
 if __name__ == '__main__':
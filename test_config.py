@@ -3,6 +3,7 @@
 """
 
 import unittest
+from unittest.mock import patch
 from config import Config
 
 
@@ -26,11 +27,23 @@ class TestConfig(unittest.TestCase):
             "user": "postgres",
             "password": "12",
             "host": "localhost",
-            "port": "5432"
+            "port": "5432",
+            "connect_timeout": Config.DB_CONNECT_TIMEOUT
         }
         
         self.assertEqual(params, expected_params)
     
+    @patch.object(Config, 'DB_REPLICAS', ['replica1:5433', 'replica2'])
+    def test_get_replica_params(self):
+        """Тест параметров подключения к репликам."""
+        replicas = Config.get_replica_params()
+        
+        self.assertEqual(len(replicas), 2)
+        self.assertEqual(replicas[0]['host'], 'replica1')
+        self.assertEqual(replicas[0]['port'], '5433')
+        self.assertEqual(replicas[1]['port'], Config.DB_PORT)
+        self.assertEqual(replicas[1]['dbname'], Config.DB_NAME)
+    
     def test_class_method(self):
         """Проверка, что метод является классовым методом."""
         # Метод должен работать без создания экземпляра класса
@@ -0,0 +1,99 @@
+"""
+Тесты для модуля export.py
+"""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from unittest.mock import Mock, patch
+from export import export_tasks
+
+
+def make_row(task_id):
+    """Создает строку задачи в формате RealDictCursor."""
+    return {'id': task_id, 'title': f'Task {task_id}', 'description': '', 'status': 'pending',
+            'priority': 'medium', 'created_at': datetime(2024, 1, 1, 10, 0), 'due_date': date(2024, 1, 5),
+            'completed_at': None, 'version': 1, 'tags': ['work', 'home'], 'parent_id': None}
+
+
+def fake_iter_id_range(connection_params, owner, first_id, last_id, batch_size=None):
+    """Отдает строки с ID диапазона, как серверный курсор."""
+    return (make_row(task_id) for task_id in range(first_id, last_id + 1))
+
+
+@patch('export.TaskStorage.iter_id_range', side_effect=fake_iter_id_range)
+class TestExportTasks(unittest.TestCase):
+    """Тесты для функции export_tasks."""
+
+    def setUp(self):
+        """Создает временный каталог и хранилище с ID от 1 до 10."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "tasks.jsonl")
+        self.storage = Mock(spec=['get_id_ranges', 'connection_params', 'owner'])
+        self.storage.connection_params = {'dbname': 'tasks'}
+        self.storage.owner = 'alice'
+        self.storage.get_id_ranges.side_effect = lambda count: [(1, 10)] if count == 1 else [
+            (1, 3), (4, 6), (7, 9), (10, 10)]
+
+    def tearDown(self):
+        """Удаляет временный каталог."""
+        shutil.rmtree(self.directory)
+
+    def test_single_process_jsonl(self, mock_iter):
+        """Тест экспорта одним процессом в формате Task.to_dict."""
+        summary = export_tasks(self.storage, self.path)
+
+        self.storage.get_id_ranges.assert_called_once_with(1)
+        self.assertEqual(summary['rows'], 10)
+        self.assertEqual(summary['parts'], [self.path])
+        with open(self.path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['id'] for record in records], list(range(1, 11)))
+        self.assertEqual(records[0]['created_at'], '2024-01-01T10:00:00')
+        self.assertEqual(records[0]['due_date'], '2024-01-05')
+        self.assertEqual(os.listdir(self.directory), ["tasks.jsonl"])
+
+    @patch('export.Config.EXPORT_RANGES_PER_WORKER', 2)
+    @patch('export.ProcessPoolExecutor', side_effect=ThreadPoolExecutor)
+    def test_parallel_merge_in_id_order(self, mock_pool, mock_iter):
+        """Тест параллельного экспорта: части склеиваются по возрастанию ID."""
+        path = os.path.join(self.directory, "tasks.csv")
+
+        summary = export_tasks(self.storage, path, fmt="csv", workers=2)
+
+        mock_pool.assert_called_once_with(max_workers=2)
+        self.storage.get_id_ranges.assert_called_once_with(4)
+        self.assertEqual(mock_iter.call_count, 4)
+        with open(path, encoding="utf-8", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0][0], 'id')
+        self.assertEqual([int(row[0]) for row in rows[1:]], list(range(1, 11)))
+        self.assertEqual(rows[1][9], 'work,home')
+        self.assertEqual(summary['rows'], 10)
+        self.assertEqual(os.listdir(self.directory), ["tasks.csv"])
+
+    @patch('export.ProcessPoolExecutor', side_effect=ThreadPoolExecutor)
+    def test_keep_parts(self, mock_pool, mock_iter):
+        """Тест сохранения отдельного файла на каждый диапазон ID."""
+        summary = export_tasks(self.storage, self.path, workers=2, keep_parts=True)
+
+        self.assertEqual([os.path.basename(part) for part in summary['parts']],
+                         [f"tasks.jsonl.part-000{index}" for index in range(4)])
+        with open(summary['parts'][1], encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)['id'] for line in f], [4, 5, 6])
+
+    def test_invalid_arguments(self, mock_iter):
+        """Тест неизвестного формата и числа процессов."""
+        with self.assertRaisesRegex(ValueError, "формат"):
+            export_tasks(self.storage, self.path, fmt="xml")
+        with self.assertRaisesRegex(ValueError, "положительным"):
+            export_tasks(self.storage, self.path, workers=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
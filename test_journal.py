@@ -0,0 +1,152 @@
+"""
+Тесты для модуля journal.py
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+from journal import WriteJournal
+
+
+class TestWriteJournal(unittest.TestCase):
+    """Тесты для класса WriteJournal."""
+    
+    def setUp(self):
+        """Создает журнал во временном каталоге."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "nested", "journal.jsonl")
+        self.journal = WriteJournal(self.path)
+    
+    def tearDown(self):
+        """Удаляет временный каталог."""
+        shutil.rmtree(self.directory)
+    
+    def test_append_writes_and_fsyncs(self):
+        """Тест записи операции с fsync до возврата."""
+        with patch('journal.os.fsync', wraps=os.fsync) as mock_fsync:
+            key = self.journal.append('add', {'title': 'Offline'})
+        
+        # Файл и (при создании) каталог
+        self.assertGreaterEqual(mock_fsync.call_count, 1)
+        with open(self.path, encoding="utf-8") as f:
+            entry = json.loads(f.readline())
+        self.assertEqual(entry['key'], key)
+        self.assertEqual(entry['op'], 'add')
+        self.assertEqual(entry['payload'], {'title': 'Offline'})
+        self.assertEqual(entry['owner'], self.journal.owner)
+        self.assertIn('ts', entry)
+    
+    def test_append_records_owner(self):
+        """Тест: операция хранит владельца, от имени которого записана."""
+        WriteJournal(self.path, owner='alice').append('delete', {'task_id': 3})
+        
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(json.loads(f.readline())['owner'], 'alice')
+    
+    def test_append_unknown_operation(self):
+        """Тест отказа для неизвестной операции."""
+        with self.assertRaises(ValueError):
+            self.journal.append('rename', {})
+    
+    def test_torn_last_line_ignored(self):
+        """Тест пропуска оборванной при сбое последней записи."""
+        self.journal.append('done', {'task_id': 1})
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"key": "abc", "op": "do')
+        
+        self.assertEqual(self.journal.pending_count(), 1)
+    
+    def test_replay_in_batches(self):
+        """Тест воспроизведения журнала пакетами и его очистки."""
+        for task_id in range(5):
+            self.journal.append('done', {'task_id': task_id})
+        apply_batch = Mock(side_effect=lambda entries: len(entries))
+        
+        applied, total = self.journal.replay(apply_batch, batch_size=2)
+        
+        self.assertEqual((applied, total), (5, 5))
+        self.assertEqual([len(call[0][0]) for call in apply_batch.call_args_list], [2, 2, 1])
+        ids = [entry['payload']['task_id'] for call in apply_batch.call_args_list for entry in call[0][0]]
+        self.assertEqual(ids, [0, 1, 2, 3, 4])
+        self.assertEqual(self.journal.pending_count(), 0)
+        self.assertFalse(os.path.exists(self.path))
+    
+    def test_replay_resumes_after_failure(self):
+        """Тест повторной синхронизации после сбоя: записи не теряются."""
+        first_key = self.journal.append('add', {'title': 'A'})
+        self.journal.append('add', {'title': 'B'})
+        
+        with self.assertRaises(ConnectionError):
+            self.journal.replay(Mock(side_effect=ConnectionError), batch_size=1)
+        
+        # Новая операция после сбоя идет в свежий файл
+        self.journal.append('delete', {'task_id': 7})
+        self.assertEqual(self.journal.pending_count(), 3)
+        
+        apply_batch = Mock(side_effect=lambda entries: len(entries))
+        applied, total = self.journal.replay(apply_batch)
+        
+        self.assertEqual((applied, total), (3, 3))
+        # Сначала дообрабатывается прерванная часть, порядок сохраняется
+        self.assertEqual(apply_batch.call_args_list[0][0][0][0]['key'], first_key)
+        self.assertEqual(apply_batch.call_args_list[1][0][0][0]['op'], 'delete')
+    
+    def test_rejected_entry_moved_aside(self):
+        """Тест: операция, отклоненная БД, уходит в файл отклоненных."""
+        for title in ("A", "bad", "C"):
+            self.journal.append('add', {'title': title})
+        
+        def apply_batch(entries):
+            if any(entry['payload']['title'] == "bad" for entry in entries):
+                raise ValueError("нарушено ограничение")
+            return len(entries)
+        
+        applied, total = self.journal.replay(apply_batch, batch_size=3)
+        
+        self.assertEqual((applied, total), (2, 3))
+        self.assertEqual(self.journal.pending_count(), 0)
+        rejected, = WriteJournal._read(self.journal.rejected_path)
+        self.assertEqual(rejected['payload'], {'title': 'bad'})
+        self.assertEqual(rejected['error'], "нарушено ограничение")
+        self.assertEqual(self.journal.rejected_count(), 1)
+    
+    def test_unread_entries_kept(self):
+        """Тест: записи, появившиеся после чтения, не удаляются вместе с прочитанными."""
+        self.journal.append('done', {'task_id': 1})
+        late = {'key': 'late', 'op': 'done', 'payload': {'task_id': 2}, 'ts': '2024-01-01T00:00:00'}
+        
+        def apply_batch(entries):
+            if entries[0]['key'] != 'late':
+                with open(self.journal.syncing_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(late) + "\n")
+            return len(entries)
+        
+        applied, total = self.journal.replay(apply_batch)
+        
+        # Запись, дописанная во время применения, обработана следующим проходом
+        self.assertEqual((applied, total), (2, 2))
+        self.assertEqual(self.journal.pending_count(), 0)
+    
+    def test_lock_file_used(self):
+        """Тест: запись и переименование берут блокировку файла."""
+        with patch('journal.fcntl.flock') as mock_flock:
+            self.journal.append('done', {'task_id': 1})
+            self.journal.replay(Mock(return_value=1))
+        
+        self.assertTrue(os.path.exists(self.journal.lock_path))
+        # append, переименование и удаление обработанных: захват и освобождение
+        self.assertEqual(mock_flock.call_count, 6)
+    
+    def test_replay_empty(self):
+        """Тест синхронизации пустого журнала."""
+        apply_batch = Mock()
+        
+        self.assertEqual(self.journal.replay(apply_batch), (0, 0))
+        apply_batch.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
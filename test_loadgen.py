@@ -0,0 +1,147 @@
+"""
+Тесты для модуля loadgen.py
+"""
+
+import random
+import time
+import unittest
+from unittest.mock import Mock
+
+import psycopg2.errors
+
+from loadgen import (parse_mix, merge_results, classify_error, run_client, Workload,
+                     CommandError, SKIPPED, COUNTERS)
+from storage import ConcurrentModificationError, DeadlineExceededError
+
+
+class TestParseMix(unittest.TestCase):
+    """Тесты для функции parse_mix."""
+
+    def test_parse_mix(self):
+        """Тест разбора пропорций; вес по умолчанию 1."""
+        self.assertEqual(parse_mix("add=40, list=2.5,stats"), {'add': 40.0, 'list': 2.5, 'stats': 1.0})
+
+    def test_unknown_operation(self):
+        """Тест неизвестной операции."""
+        with self.assertRaises(ValueError):
+            parse_mix("add=1,update=1")
+
+    def test_non_positive_weight(self):
+        """Тест отказа при нулевом или отрицательном весе, даже если сумма положительна."""
+        for value in ("add=0", "add=10,list=-1", "add=10,list=0", "add=nan", "add=inf"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_mix(value)
+
+    def test_bad_weight(self):
+        """Тест веса, который не является числом."""
+        with self.assertRaises(ValueError) as context:
+            parse_mix("add=много")
+        self.assertIn("add", str(context.exception))
+
+
+class TestResults(unittest.TestCase):
+    """Тесты для classify_error и merge_results."""
+
+    def test_classify_error(self):
+        """Тест отнесения ошибок к видам."""
+        self.assertEqual(classify_error(psycopg2.errors.DeadlockDetected()), "deadlocks")
+        self.assertEqual(classify_error(ConcurrentModificationError("версия")), "conflicts")
+        self.assertEqual(classify_error(DeadlineExceededError("read", 5000, "таймаут")), "timeouts")
+        self.assertEqual(classify_error(CommandError("❌ Ошибка")), "errors")
+        self.assertEqual(classify_error(RuntimeError()), "errors")
+
+    def test_merge_results(self):
+        """Тест объединения задержек и счетчиков по операциям."""
+        first = {'add': {'latencies': [1.0], **dict.fromkeys(COUNTERS, 0), 'errors': 1}}
+        second = {
+            'add': {'latencies': [2.0, 3.0], **dict.fromkeys(COUNTERS, 0), 'deadlocks': 2},
+            'done': {'latencies': [], **dict.fromkeys(COUNTERS, 0), 'skipped': 4}
+        }
+
+        merged = merge_results([first, second])
+
+        self.assertEqual(merged['add']['latencies'], [1.0, 2.0, 3.0])
+        self.assertEqual(merged['add']['errors'], 1)
+        self.assertEqual(merged['add']['deadlocks'], 2)
+        self.assertEqual(merged['done']['skipped'], 4)
+
+
+class TestWorkload(unittest.TestCase):
+    """Тесты для класса Workload."""
+
+    def setUp(self):
+        """Создает нагрузку над mock хранилищем через TaskCommands."""
+        self.storage = Mock()
+        self.workload = Workload(self.storage, via_commands=True)
+        self.workload.commands = Mock()
+        self.rng = random.Random(1)
+
+    def test_command_error_raises(self):
+        """Тест: ответ TaskCommands с ошибкой считается ошибкой операции."""
+        self.workload.commands.show_stats.return_value = "❌ Ошибка: нет соединения"
+        with self.assertRaises(CommandError):
+            self.workload.run('stats', self.rng)
+
+        self.workload.commands.list_tasks.return_value = "Ошибка: Неверный приоритет"
+        with self.assertRaises(CommandError):
+            self.workload.run('list', self.rng)
+
+    def test_add_remembers_id(self):
+        """Тест: ID созданной задачи используется в done."""
+        self.workload.commands.add_task.return_value = "✅ Задача добавлена (ID: 7)"
+        self.workload.commands.complete_task.return_value = "✅ Задача 7 выполнена"
+
+        self.workload.run('add', self.rng)
+        self.assertIsNone(self.workload.run('done', self.rng))
+
+        self.workload.commands.complete_task.assert_called_once_with(7)
+
+    def test_done_and_delete_skipped_without_tasks(self):
+        """Тест: без созданных задач done и delete пропускаются, а не добавляют задачу."""
+        self.assertEqual(self.workload.run('done', self.rng), SKIPPED)
+        self.assertEqual(self.workload.run('delete', self.rng), SKIPPED)
+        self.workload.commands.add_task.assert_not_called()
+        self.storage.save_task.assert_not_called()
+
+
+class TestRunClient(unittest.TestCase):
+    """Тесты для функции run_client."""
+
+    def test_open_loop_latency_from_schedule(self):
+        """Тест: при interval задержка считается от запланированного момента."""
+        workload = Mock()
+        workload.run.side_effect = lambda name, rng: time.sleep(0.03)
+        results = {}
+
+        run_client(workload, {'list': 1}, 0.01, time.perf_counter() + 0.1, 1, results)
+
+        latencies = results['list']['latencies']
+        self.assertGreaterEqual(len(latencies), 2)
+        # Операции дольше интервала: каждая следующая ждет в очереди дольше
+        self.assertGreater(latencies[-1], latencies[0] + 20)
+
+    def test_counts_errors_and_skips(self):
+        """Тест учета ошибок и пропусков без записи задержки."""
+        outcomes = iter([SKIPPED, psycopg2.errors.DeadlockDetected(), CommandError("❌")])
+
+        def run(name, rng):
+            outcome = next(outcomes, None)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        workload = Mock()
+        workload.run.side_effect = run
+        results = {}
+
+        run_client(workload, {'done': 1}, 0.001, time.perf_counter() + 0.05, 1, results)
+
+        stats = results['done']
+        self.assertEqual(stats['skipped'], 1)
+        self.assertEqual(stats['deadlocks'], 1)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(len(stats['latencies']), workload.run.call_count - 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
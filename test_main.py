@@ -21,11 +21,26 @@ class TestMainModule(unittest.TestCase):
         
         self.mock_commands_instance = Mock()
         self.mock_commands.return_value = self.mock_commands_instance
+        
+        self.patcher_connection = patch('main.DatabaseConnection')
+        self.mock_connection = self.patcher_connection.start()
+        
+        # Метрики не должны открывать порт и регистрировать запись при выходе
+        self.patcher_metrics_server = patch('main.start_http_server')
+        self.mock_metrics_server = self.patcher_metrics_server.start()
+        self.patcher_atexit = patch('main.atexit')
+        self.mock_atexit = self.patcher_atexit.start()
+        self.patcher_tracing = patch('main.tracing.configure')
+        self.mock_tracing_configure = self.patcher_tracing.start()
     
     def tearDown(self):
         """Очистка тестового окружения."""
         self.patcher_storage.stop()
         self.patcher_commands.stop()
+        self.patcher_connection.stop()
+        self.patcher_metrics_server.stop()
+        self.patcher_atexit.stop()
+        self.patcher_tracing.stop()
     
     @patch('main.sys.argv', ['main.py', '--help'])
     @patch('main.TaskCommands.setup_argparse')
@@ -111,6 +126,83 @@ class TestMainModule(unittest.TestCase):
             self.assertIn("❌ Ошибка: Test error", output)
             self.assertIn("Убедитесь, что:", output)
 
+    
+    @patch('main.sys.argv', ['main.py', 'list', '--all'])
+    def test_main_deadline_exceeded(self):
+        """Тест сообщения о превышении времени запроса."""
+        from main import main
+        from storage import DeadlineExceededError
+        
+        self.mock_commands_instance.execute_command.side_effect = DeadlineExceededError(
+            "read", 5000, "запрос выполнялся слишком долго")
+        
+        with patch('sys.stdout', new=StringIO()) as fake_output:
+            with self.assertRaises(SystemExit):
+                main()
+            
+            output = fake_output.getvalue()
+            self.assertIn("Превышено время ожидания", output)
+            self.assertNotIn("PostgreSQL установлен", output)
+        
+        self.mock_connection.enable_cancel_on_interrupt.assert_called_once()
+
+    
+    @patch('main.sys.argv', ['main.py', '--offline', 'add', '--title', 'Offline'])
+    @patch('main.WriteJournal')
+    @patch('main.create_storage')
+    def test_main_offline_skips_storage(self, mock_create_storage, mock_journal):
+        """Тест автономного режима: хранилище не создается."""
+        self.mock_commands_instance.needs_storage.return_value = False
+        self.mock_commands_instance.execute_command.return_value = "📝 Задача записана в журнал"
+        
+        from main import main
+        
+        with patch('sys.stdout', new=StringIO()) as fake_output:
+            main()
+            self.assertIn("записана в журнал", fake_output.getvalue())
+        
+        mock_create_storage.assert_not_called()
+        self.assertIs(self.mock_commands_instance.journal, mock_journal.return_value)
+
+    
+    @patch('main.sys.argv', ['main.py', '--metrics-file', 'tasks.prom', 'list'])
+    @patch('main.create_storage')
+    def test_main_dumps_metrics_at_exit(self, mock_create_storage):
+        """Тест записи метрик в файл при выходе из разовой команды."""
+        mock_args = Mock(metrics_file='tasks.prom', metrics_port=None, trace_file=None, offline=False,
+                         owner=None)
+        self.mock_commands_instance.setup_argparse.return_value.parse_args.return_value = mock_args
+        
+        from main import main, dump_metrics
+        
+        with patch('sys.stdout', new=StringIO()):
+            main()
+        
+        self.mock_atexit.register.assert_called_once_with(dump_metrics, 'tasks.prom')
+        self.mock_metrics_server.assert_not_called()
+        self.mock_tracing_configure.assert_not_called()
+    
+    @patch('main.sys.argv', ['main.py', '--owner', 'alice', 'list'])
+    @patch('main.create_storage')
+    def test_main_owner(self, mock_create_storage):
+        """Тест: --owner задает владельца хранилища и локального снимка."""
+        from commands import TaskCommands
+        args = TaskCommands(None).setup_argparse().parse_args(['--owner', 'alice', 'list'])
+        self.assertEqual(args.owner, 'alice')
+        args.metrics_file = args.metrics_port = args.trace_file = None
+        self.mock_commands_instance.setup_argparse.return_value.parse_args.return_value = args
+        self.mock_commands_instance.needs_storage.return_value = True
+        self.mock_commands_instance.execute_command.return_value = ""
+        
+        from main import main
+        
+        with patch('main.Config.METRICS_FILE', None), patch('main.Config.METRICS_PORT', None), \
+                patch('main.Config.TRACE_FILE', None), patch('sys.stdout', new=StringIO()):
+            main()
+        
+        self.mock_commands_instance.set_owner.assert_called_once_with('alice')
+        mock_create_storage.assert_called_once_with('alice')
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
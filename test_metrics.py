@@ -0,0 +1,116 @@
+"""
+Тесты для модуля metrics.py
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import urllib.request
+from unittest.mock import patch
+from metrics import MetricsRegistry, instrument, start_http_server
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Тесты реестра метрик и текстового формата."""
+
+    def setUp(self):
+        """Создает пустой реестр."""
+        self.registry = MetricsRegistry()
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Тест накопительных корзин, суммы и числа наблюдений."""
+        self.registry.histogram("op_seconds", "Время", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            self.registry.observe("op_seconds", value, {"method": "add"})
+
+        text = self.registry.render()
+
+        self.assertIn('op_seconds_bucket{method="add",le="0.1"} 1', text)
+        self.assertIn('op_seconds_bucket{method="add",le="1.0"} 3', text)
+        self.assertIn('op_seconds_bucket{method="add",le="+Inf"} 4', text)
+        self.assertIn('op_seconds_sum{method="add"} 4.25', text)
+        self.assertIn('op_seconds_count{method="add"} 4', text)
+
+    def test_counter_and_gauge_callback(self):
+        """Тест счетчика с экранированием меток и показателя из функции."""
+        self.registry.counter("hits_total", "Попадания")
+        self.registry.gauge("pool_connections", "Соединения",
+                            callback=lambda: {(("state", "idle"),): 3})
+        self.registry.inc("hits_total", {"cache": 'a"b'})
+        self.registry.inc("hits_total", {"cache": 'a"b'}, 2)
+
+        text = self.registry.render()
+
+        self.assertIn("# TYPE hits_total counter", text)
+        self.assertIn('hits_total{cache="a\\"b"} 3', text)
+        self.assertIn('pool_connections{state="idle"} 3', text)
+        self.assertEqual(self.registry.get("hits_total", {"cache": 'a"b'}), 3)
+
+    def test_dump_and_http(self):
+        """Тест записи метрик в файл и выдачи по HTTP."""
+        self.registry.counter("runs_total", "Запуски")
+        self.registry.inc("runs_total")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "tasks.prom")
+
+        self.registry.dump(path)
+
+        with open(path, encoding="utf-8") as f:
+            self.assertIn("runs_total 1\n", f.read())
+        self.assertEqual(os.listdir(directory), ["tasks.prom"])
+
+        with patch('metrics.REGISTRY', self.registry):
+            server = start_http_server(0)
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                self.assertIn("runs_total 1", response.read().decode("utf-8"))
+
+
+class TestInstrument(unittest.TestCase):
+    """Тесты декоратора instrument."""
+
+    def setUp(self):
+        """Подменяет общий реестр пустым."""
+        self.patcher = patch('metrics.REGISTRY', MetricsRegistry())
+        self.registry = self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+
+    def test_public_methods_timed(self):
+        """Тест замера публичных и статических методов; ошибки считаются отдельно."""
+        @instrument("demo", exclude=("skipped",))
+        class Demo:
+            def work(self, value):
+                return value * 2
+
+            @staticmethod
+            def fail():
+                raise ValueError("boom")
+
+            def skipped(self):
+                return None
+
+            def items(self):
+                yield 1
+
+            def _private(self):
+                return None
+
+        demo = Demo()
+        self.assertEqual(demo.work(2), 4)
+        with self.assertRaises(ValueError):
+            Demo.fail()
+        demo.skipped()
+        list(demo.items())
+
+        self.assertEqual(self.registry.get("demo_duration_seconds", {"method": "work"})[1], 1)
+        self.assertEqual(self.registry.get("demo_errors_total", {"method": "fail"}), 1)
+        self.assertEqual(self.registry.get("demo_duration_seconds", {"method": "skipped"}), 0)
+        self.assertEqual(self.registry.get("demo_duration_seconds", {"method": "items"}), 0)
+        self.assertEqual(Demo.work.__name__, "work")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,7 @@
 
 import unittest
 from datetime import datetime
-from models import Task, TaskStatus, Priority
+from models import Task, TaskStatus, Priority, normalize_tags
 
 
 class TestTaskStatusEnum(unittest.TestCase):
@@ -76,12 +76,14 @@ class TestTaskClass(unittest.TestCase):
             "priority": "low",
             "created_at": "2024-01-01T10:00:00",
             "due_date": "2024-12-31",
-            "completed_at": "2024-01-02T10:00:00"
+            "completed_at": "2024-01-02T10:00:00",
+            "version": 4
         }
         
         task = Task.from_dict(task_data)
         
         self.assertEqual(task.id, 1)
+        self.assertEqual(task.version, 4)
         self.assertEqual(task.title, "Task from dict")
         self.assertEqual(task.description, "Description from dict")
         self.assertEqual(task.status, TaskStatus.COMPLETED)
@@ -109,6 +111,35 @@ class TestTaskClass(unittest.TestCase):
         self.assertEqual(task.priority, Priority.MEDIUM)
         self.assertIsNone(task.due_date)
         self.assertIsNone(task.completed_at)
+        self.assertIsNone(task.version)
+    
+    def test_dirty_fields_tracking(self):
+        """Тест отслеживания измененных полей."""
+        # У новой задачи изменены все сохраняемые поля
+        self.assertEqual(self.task.dirty_fields, frozenset(Task.TRACKED_FIELDS))
+        
+        self.task.mark_clean()
+        self.assertEqual(self.task.dirty_fields, frozenset())
+        
+        self.task.priority = Priority.HIGH  # то же значение
+        self.assertEqual(self.task.dirty_fields, frozenset())
+        
+        self.task.mark_completed()
+        self.assertEqual(self.task.dirty_fields, {"status", "completed_at"})
+    
+    def test_from_dict_is_clean(self):
+        """Тест отсутствия изменений у загруженной задачи."""
+        task = Task.from_dict({
+            "id": 1,
+            "title": "Loaded",
+            "status": "pending",
+            "priority": "medium",
+            "created_at": "2024-01-01T10:00:00"
+        })
+        
+        self.assertEqual(task.dirty_fields, frozenset())
+        task.title = "Renamed"
+        self.assertEqual(task.dirty_fields, {"title"})
     
     def test_mark_completed_method(self):
         """Тест отметки задачи как выполненной."""
@@ -117,6 +148,20 @@ class TestTaskClass(unittest.TestCase):
         self.assertEqual(self.task.status, TaskStatus.COMPLETED)
         self.assertIsNotNone(self.task.completed_at)
     
+    def test_truncate_description(self):
+        """Тест усечения описания для превью, в том числе пустого (None)."""
+        task = Task("Task", "abcdef")
+        task.mark_clean()
+        task.truncate_description(3)
+        self.assertEqual(task.description, "abc")
+        self.assertTrue(task.description_truncated)
+        self.assertEqual(task.dirty_fields, frozenset())
+        
+        task = Task("Task", None)
+        task.truncate_description(3)
+        self.assertIsNone(task.description)
+        self.assertFalse(task.description_truncated)
+    
     def test_str_representation(self):
         """Тест строкового представления задачи."""
         task_str = str(self.task)
@@ -155,6 +200,21 @@ class TestTaskClass(unittest.TestCase):
         
         with self.assertRaises(ValueError):
             Task.from_dict(task_data)
+    
+    def test_tags(self):
+        """Тест нормализации тегов и отслеживания их изменения."""
+        task = Task.from_dict({
+            "id": 1, "title": "Tagged", "status": "pending", "priority": "medium",
+            "created_at": "2024-01-01T10:00:00", "tags": ["work"]
+        })
+        self.assertEqual(task.to_dict()["tags"], ["work"])
+        self.assertEqual(task.dirty_fields, frozenset())
+        
+        task.tags = task.tags + ["home"]
+        self.assertEqual(task.dirty_fields, frozenset({"tags"}))
+        
+        self.assertEqual(normalize_tags([" Work", "work", "", "Дом "]), ["work", "дом"])
+        self.assertEqual(Task("Untagged").tags, [])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,122 @@
+"""
+Тесты для модуля reminders.py
+"""
+
+import unittest
+from datetime import date, datetime, time, timedelta
+from unittest.mock import MagicMock, Mock, patch
+from models import Task
+from reminders import ReminderQueue, ReminderDaemon, run_hook
+
+
+def make_reminder(task_id, due_date, status='pending', op='update'):
+    """Создает событие изменения задачи."""
+    return {'op': op, 'id': task_id, 'title': f'Task {task_id}', 'status': status,
+            'priority': 'medium', 'due_date': due_date, 'version': 1}
+
+
+class TestReminderQueue(unittest.TestCase):
+    """Тесты для класса ReminderQueue."""
+
+    def setUp(self):
+        """Создает очередь со сроком в 09:00."""
+        self.queue = ReminderQueue(time(9, 0))
+        self.loaded_until = date(2024, 12, 31)
+
+    def test_pop_due_in_deadline_order(self):
+        """Тест выдачи наступивших напоминаний по возрастанию срока."""
+        self.queue.schedule(make_reminder(1, '2024-12-03'))
+        self.queue.schedule(make_reminder(2, '2024-12-01'))
+        self.queue.schedule(make_reminder(3, '2024-12-02'))
+
+        self.assertEqual(self.queue.next_deadline(), datetime(2024, 12, 1, 9, 0))
+        due = self.queue.pop_due(datetime(2024, 12, 2, 10, 0))
+
+        self.assertEqual([reminder['id'] for reminder in due], [2, 3])
+        self.assertEqual(len(self.queue), 1)
+
+    def test_change_reschedules_and_cancels(self):
+        """Тест переноса срока и отмены после выполнения задачи."""
+        self.queue.schedule(make_reminder(1, '2024-12-01'))
+        self.queue.schedule(make_reminder(2, '2024-12-01'))
+
+        self.queue.apply_change(make_reminder(1, '2024-12-05'), self.loaded_until)
+        self.queue.apply_change(make_reminder(2, '2024-12-01', status='completed'), self.loaded_until)
+
+        self.assertEqual(self.queue.pop_due(datetime(2024, 12, 2)), [])
+        self.assertEqual(self.queue.next_deadline(), datetime(2024, 12, 5, 9, 0))
+
+    def test_change_beyond_window_dropped(self):
+        """Тест отложенной загрузки задач со сроком за пределами окна."""
+        self.queue.schedule(make_reminder(1, '2024-12-01'))
+
+        self.queue.apply_change(make_reminder(1, '2025-02-01'), self.loaded_until)
+
+        self.assertIsNone(self.queue.next_deadline())
+
+    def test_fired_reminder_not_repeated(self):
+        """Тест: правка задачи без смены срока не повторяет напоминание."""
+        self.queue.schedule(make_reminder(1, '2024-12-01'))
+        self.queue.pop_due(datetime(2024, 12, 1, 9, 0))
+
+        self.queue.apply_change(make_reminder(1, '2024-12-01'), self.loaded_until)
+        self.assertIsNone(self.queue.next_deadline())
+
+        self.queue.apply_change(make_reminder(1, '2024-12-02'), self.loaded_until)
+        self.assertEqual(self.queue.next_deadline(), datetime(2024, 12, 2, 9, 0))
+
+
+class TestReminderDaemon(unittest.TestCase):
+    """Тесты для класса ReminderDaemon."""
+
+    def test_run_loads_once_and_follows_changes(self):
+        """Тест однократной загрузки и обновления по уведомлениям."""
+        today = date.today()
+        overdue = Task("Overdue", due_date=(today - timedelta(days=1)).isoformat())
+        overdue.id = 1
+        later = Task("Later", due_date=(today + timedelta(days=3)).isoformat())
+        later.id = 2
+
+        storage = MagicMock()
+        storage.get_pending_due_tasks.return_value = [overdue, later]
+        listener = MagicMock()
+        storage.change_listener.return_value.__enter__.return_value = listener
+        listener.wait.side_effect = [
+            [make_reminder(3, today.isoformat(), op='insert')],
+            KeyboardInterrupt
+        ]
+        notify = Mock()
+        daemon = ReminderDaemon(storage, notify, window_days=7, at=time(0, 0))
+
+        with self.assertRaises(KeyboardInterrupt):
+            daemon.run()
+
+        storage.get_pending_due_tasks.assert_called_once_with(today + timedelta(days=7), None)
+        self.assertEqual([call[0][0]['id'] for call in notify.call_args_list], [1, 3])
+        self.assertEqual(daemon.sent, 2)
+        # Ожидание длится не дольше, чем до следующего срока
+        self.assertLessEqual(listener.wait.call_args_list[0][0][0], 3 * 24 * 3600)
+
+
+class TestRunHook(unittest.TestCase):
+    """Тесты для функции run_hook."""
+
+    @patch('reminders.subprocess.run')
+    def test_hook_receives_json(self, mock_run):
+        """Тест передачи напоминания команде через stdin."""
+        mock_run.return_value.returncode = 0
+
+        self.assertTrue(run_hook('notify --urgent', make_reminder(1, '2024-12-01')))
+
+        args, kwargs = mock_run.call_args
+        self.assertEqual(args[0], ['notify', '--urgent'])
+        self.assertIn('"due_date": "2024-12-01"', kwargs['input'])
+
+    @patch('reminders.subprocess.run', side_effect=FileNotFoundError)
+    def test_missing_hook(self, mock_run):
+        """Тест ненайденной команды."""
+        self.assertFalse(run_hook('missing-command', make_reminder(1, '2024-12-01')))
+
+
+if __name__ == '__main__':
+    unittest.main()
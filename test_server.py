@@ -0,0 +1,286 @@
+"""
+Тесты для модуля server.py
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import http.client
+from unittest.mock import Mock, patch
+
+import tracing
+from server import TaskAPIServer
+from models import Task, TaskStatus, Priority
+
+
+class TestTaskAPIServer(unittest.TestCase):
+    """Тесты HTTP API поверх замоканного хранилища."""
+
+    def setUp(self):
+        """Запускает сервер на свободном порту."""
+        self.mock_storage = Mock()
+        self.server = TaskAPIServer(("127.0.0.1", 0), self.mock_storage, workers=2)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.conn = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+
+    def tearDown(self):
+        """Останавливает сервер."""
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, method, path, body=None, headers=None):
+        """Отправляет запрос и возвращает статус, заголовки и разобранное тело."""
+        payload = json.dumps(body) if body is not None else None
+        self.conn.request(method, path, body=payload, headers=headers or {})
+        response = self.conn.getresponse()
+        raw = response.read()
+        return response.status, response, json.loads(raw) if raw else None
+
+    def make_task(self, task_id=1):
+        """Создает тестовую задачу."""
+        task = Task("Test Task", "Description", Priority.HIGH)
+        task.id = task_id
+        return task
+
+    def test_add_task(self):
+        """Тест создания задачи через POST /tasks."""
+        self.mock_storage.save_task.side_effect = lambda task: setattr(task, 'id', 7) or task
+
+        status, _, body = self.request("POST", "/tasks", {"title": "New", "priority": "high",
+                                                          "tags": ["work"]})
+
+        self.assertEqual(status, 201)
+        self.assertEqual(body["id"], 7)
+        self.assertEqual(body["priority"], "high")
+        self.assertEqual(body["tags"], ["work"])
+
+    def test_add_task_validation(self):
+        """Тест ошибок валидации при создании задачи."""
+        status, _, body = self.request("POST", "/tasks", {"title": "New", "priority": "urgent"})
+        self.assertEqual(status, 400)
+        self.assertIn("Неверный приоритет", body["error"])
+
+        status, _, _ = self.request("POST", "/tasks", {})
+        self.assertEqual(status, 400)
+
+        status, _, body = self.request("POST", "/tasks", {"title": "New", "tags": "work"})
+        self.assertEqual(status, 400)
+        self.assertIn("tags", body["error"])
+
+        for due_date in ("31.12.2024", 20241231):
+            status, _, body = self.request("POST", "/tasks", {"title": "New", "due_date": due_date})
+            self.assertEqual(status, 400)
+            self.assertIn("due_date", body["error"])
+        self.mock_storage.save_task.assert_not_called()
+
+    def test_list_tasks_with_filters(self):
+        """Тест списка задач с фильтрами из строки запроса."""
+        self.mock_storage.filter_tasks.return_value = [self.make_task()]
+
+        status, _, body = self.request("GET", "/tasks?status=pending&priority=high&tag=Work&tag=home&match=all")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body), 1)
+        self.mock_storage.filter_tasks.assert_called_once_with(
+            status="pending", priority="high", due_date=None,
+            tags=["work", "home"], match_all_tags=True, verbose=True
+        )
+
+    def test_get_task_not_found(self):
+        """Тест получения несуществующей задачи."""
+        self.mock_storage.get_task_by_id.return_value = None
+
+        status, _, body = self.request("GET", "/tasks/999")
+
+        self.assertEqual(status, 404)
+        self.assertIn("999", body["error"])
+
+    def test_complete_task(self):
+        """Тест завершения задачи через POST /tasks/<id>/done."""
+        self.mock_storage.get_task_by_id.return_value = self.make_task()
+
+        status, _, body = self.request("POST", "/tasks/1/done")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body["status"], TaskStatus.COMPLETED.value)
+        self.mock_storage.save_task.assert_called_once()
+
+    def test_delete_task(self):
+        """Тест удаления задачи."""
+        self.mock_storage.delete_task.return_value = True
+
+        status, _, body = self.request("DELETE", "/tasks/1")
+
+        self.assertEqual(status, 204)
+        self.assertIsNone(body)
+
+    def test_owner_header(self):
+        """Тест: запрос с заголовком владельца идет в хранилище этого владельца."""
+        alice_storage = Mock()
+        alice_storage.get_statistics.return_value = {"total_tasks": 5}
+        self.mock_storage.owner = "server"
+        self.mock_storage.for_owner.return_value = alice_storage
+
+        for _ in range(2):
+            status, _, body = self.request("GET", "/stats", headers={"X-Task-Owner": "alice"})
+            self.assertEqual(status, 200)
+            self.assertEqual(body["total_tasks"], 5)
+
+        # Хранилище владельца создается один раз
+        self.mock_storage.for_owner.assert_called_once_with("alice")
+        self.mock_storage.get_statistics.assert_not_called()
+
+        status, _, _ = self.request("GET", "/stats", headers={"X-Task-Owner": "server"})
+        self.assertEqual(status, 200)
+        self.mock_storage.get_statistics.assert_called_once()
+
+        status, _, body = self.request("GET", "/stats", headers={"X-Task-Owner": "x" * 65})
+        self.assertEqual(status, 400)
+        self.assertIn("X-Task-Owner", body["error"])
+
+    @patch('server.Config.SERVER_OWNER_CACHE_SIZE', 2)
+    def test_owner_storages_bounded(self):
+        """Тест: хранилищ владельцев не больше предела, вытесняется давно не использованное."""
+        self.mock_storage.owner = "server"
+        self.mock_storage.for_owner.side_effect = lambda owner: Mock(name=owner)
+
+        first = self.server.storage_for("a")
+        self.server.storage_for("b")
+        self.assertIs(self.server.storage_for("a"), first)
+        self.server.storage_for("c")
+
+        self.assertEqual(list(self.server._owner_storages), ["a", "c"])
+        self.assertIs(self.server.storage_for("a"), first)
+        self.assertEqual(self.mock_storage.for_owner.call_count, 3)
+
+    def test_keep_alive_and_timing(self):
+        """Тест повторного использования соединения и заголовка времени."""
+        self.mock_storage.get_statistics.return_value = {"total_tasks": 3}
+
+        for _ in range(3):
+            status, response, body = self.request("GET", "/stats")
+            self.assertEqual(status, 200)
+            self.assertEqual(body["total_tasks"], 3)
+            self.assertIn("app;dur=", response.getheader("Server-Timing"))
+
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_unknown_route_and_method(self):
+        """Тест неизвестного маршрута и неподдерживаемого метода."""
+        status, _, _ = self.request("GET", "/unknown")
+        self.assertEqual(status, 404)
+
+        status, _, _ = self.request("DELETE", "/stats")
+        self.assertEqual(status, 405)
+
+    def test_storage_error(self):
+        """Тест ответа 500 при ошибке хранилища."""
+        self.mock_storage.get_statistics.side_effect = Exception("Database error")
+
+        with patch('sys.stderr'):
+            status, _, body = self.request("GET", "/stats")
+
+        self.assertEqual(status, 500)
+        self.assertEqual(body["error"], "Внутренняя ошибка сервера")
+
+    def test_metrics_endpoint(self):
+        """Тест GET /metrics: время и коды ответов по маршрутам в формате Prometheus."""
+        self.mock_storage.get_statistics.return_value = {"total_tasks": 0}
+        self.request("GET", "/stats")
+
+        self.conn.request("GET", "/metrics")
+        response = self.conn.getresponse()
+        text = response.read().decode("utf-8")
+
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.getheader("Content-Type").startswith("text/plain; version=0.0.4"))
+        self.assertIn("# TYPE http_request_duration_seconds histogram", text)
+        self.assertIn('http_requests_total{route="get_stats",status="200"}', text)
+
+    def test_trace_id_header(self):
+        """Тест: при включенной трассировке ответ несет ID трассы запроса."""
+        self.mock_storage.get_task_by_id.return_value = self.make_task(3)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        tracing.configure(os.path.join(directory, "traces.jsonl"))
+        self.addCleanup(tracing.configure, None)
+
+        status, response, _ = self.request("GET", "/tasks/3")
+
+        self.assertEqual(status, 200)
+        # Корневой спан завершается после отправки ответа
+        path = os.path.join(directory, "traces.jsonl")
+        deadline = time.monotonic() + 2
+        spans = []
+        while len(spans) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+            with open(path, encoding="utf-8") as f:
+                spans = [json.loads(line) for line in f]
+        self.assertEqual([span['name'] for span in spans], ["render", "http.request"])
+        self.assertEqual(response.getheader("X-Trace-Id"), spans[-1]['traceId'])
+
+
+class TestConnectionLimits(unittest.TestCase):
+    """Тесты очереди соединений и keep-alive при занятых потоках."""
+
+    def start_server(self, **kwargs):
+        """Запускает сервер с одним рабочим потоком."""
+        self.mock_storage = Mock()
+        self.server = TaskAPIServer(("127.0.0.1", 0), self.mock_storage, workers=1, **kwargs)
+        thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def connect(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_full_queue_rejected(self):
+        """Тест: соединение сверх очереди сразу получает 503."""
+        self.start_server(max_queue=0)
+        release = threading.Event()
+        self.mock_storage.get_statistics.side_effect = lambda: release.wait(5) and {"total_tasks": 0}
+        busy = self.connect()
+        busy.request("GET", "/stats")
+        deadline = time.monotonic() + 2
+        while self.server._active == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        rejected = self.connect()
+        rejected.request("GET", "/stats")
+        response = rejected.getresponse()
+        response.read()
+        release.set()
+
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.getheader("Retry-After"), "1")
+        self.assertEqual(busy.getresponse().status, 200)
+
+    def test_idle_keepalive_released_for_waiting_connection(self):
+        """Тест: простаивающее keep-alive соединение уступает поток ждущему."""
+        self.start_server(keepalive_timeout=30)
+        self.mock_storage.get_statistics.return_value = {"total_tasks": 0}
+        idle = self.connect()
+        idle.request("GET", "/stats")
+        idle.getresponse().read()
+
+        started = time.monotonic()
+        waiting = self.connect()
+        waiting.request("GET", "/stats")
+        response = waiting.getresponse()
+        response.read()
+
+        self.assertEqual(response.status, 200)
+        self.assertLess(time.monotonic() - started, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,284 @@
+"""
+Тесты для модуля sharding.py
+"""
+
+import unittest
+from datetime import date
+from unittest.mock import Mock, patch, MagicMock
+from sharding import ShardedTaskStorage, configure_shard_sequence
+from models import Task
+
+
+def make_task(task_id, created_at, status="pending", priority="medium"):
+    """Создает задачу с заданными полями."""
+    return Task.from_dict({
+        "id": task_id,
+        "title": f"Task {task_id}",
+        "status": status,
+        "priority": priority,
+        "created_at": created_at
+    })
+
+
+class TestShardedTaskStorage(unittest.TestCase):
+    """Тесты для класса ShardedTaskStorage."""
+    
+    def setUp(self):
+        """Создает хранилище из трех замоканных шардов."""
+        self.patcher_storage = patch('sharding.TaskStorage')
+        mock_storage_class = self.patcher_storage.start()
+        self.shard_mocks = [Mock(name=f"shard{i}") for i in range(3)]
+        mock_storage_class.side_effect = self.shard_mocks
+        
+        self.patcher_sequence = patch('sharding.configure_shard_sequence')
+        self.mock_configure = self.patcher_sequence.start()
+        
+        self.storage = ShardedTaskStorage([{'dbname': f'tasks_{i}'} for i in range(3)])
+    
+    def tearDown(self):
+        """Очистка тестового окружения."""
+        self.storage.close()
+        self.patcher_storage.stop()
+        self.patcher_sequence.stop()
+    
+    def test_statistics_by_period_merged(self):
+        """Тест сложения периодов шардов и медианы по объединенным временам."""
+        self.shard_mocks[0].get_period_rollup.return_value = [
+            {'period': date(2024, 1, 1), 'created_tasks': 2, 'completed_tasks': 1, 'lead_times': [3600.0]},
+            {'period': date(2024, 1, 8), 'created_tasks': 1, 'completed_tasks': 0, 'lead_times': []}
+        ]
+        self.shard_mocks[1].get_period_rollup.return_value = [
+            {'period': date(2024, 1, 1), 'created_tasks': 1, 'completed_tasks': 2,
+             'lead_times': [7200.0, 36000.0]}
+        ]
+        self.shard_mocks[2].get_period_rollup.return_value = []
+        
+        rows = self.storage.get_statistics_by_period("week", "2024-01-01")
+        
+        self.assertEqual(rows, [
+            {'period': '2024-01-01', 'created_tasks': 3, 'completed_tasks': 3, 'median_lead_hours': 2.0},
+            {'period': '2024-01-08', 'created_tasks': 1, 'completed_tasks': 0, 'median_lead_hours': None}
+        ])
+        self.shard_mocks[0].get_period_rollup.assert_called_once_with("week", "2024-01-01")
+    
+    def test_stats_rollup_maintenance_fanned_out(self):
+        """Тест пересчета агрегатов статистики на всех шардах."""
+        for index, shard in enumerate(self.shard_mocks):
+            shard.rebuild_stats_rollup.return_value = index + 1
+            shard.refresh_stats_rollup.return_value = 1
+        
+        self.assertEqual(self.storage.rebuild_stats_rollup(), 6)
+        self.assertEqual(self.storage.refresh_stats_rollup(), 3)
+        for shard in self.shard_mocks:
+            shard.rebuild_stats_rollup.assert_called_once_with()
+            shard.refresh_stats_rollup.assert_called_once_with()
+    
+    def test_sequences_configured(self):
+        """Тест настройки последовательностей ID во всех шардах."""
+        self.assertEqual(self.mock_configure.call_count, 6)
+        self.mock_configure.assert_any_call({'dbname': 'tasks_2'}, 2, 3, 'tasks')
+        self.mock_configure.assert_any_call({'dbname': 'tasks_2'}, 2, 3, 'recurrence_rules')
+    
+    def test_routing_by_id(self):
+        """Тест направления операций над задачей в шард по ID."""
+        self.storage.get_task_by_id(7)
+        self.storage.delete_task(9)
+        
+        self.shard_mocks[1].get_task_by_id.assert_called_once_with(7, False)
+        self.shard_mocks[0].delete_task.assert_called_once_with(9)
+        self.shard_mocks[2].get_task_by_id.assert_not_called()
+    
+    def test_save_new_task_to_single_shard(self):
+        """Тест записи новой задачи ровно в один шард."""
+        task = Task("New Task")
+        
+        self.storage.save_task(task)
+        
+        calls = [shard.save_task.call_count for shard in self.shard_mocks]
+        self.assertEqual(sorted(calls), [0, 0, 1])
+        self.assertIs(self.storage.shard_for_new_task(task), 
+                      self.shard_mocks[calls.index(1)])
+    
+    def test_filter_tasks_merge_preserves_order(self):
+        """Тест слияния отсортированных результатов шардов по created_at DESC."""
+        self.shard_mocks[0].filter_tasks.return_value = [
+            make_task(3, "2024-01-05T10:00:00"), make_task(0, "2024-01-01T10:00:00")]
+        self.shard_mocks[1].filter_tasks.return_value = [make_task(4, "2024-01-04T10:00:00")]
+        self.shard_mocks[2].filter_tasks.return_value = [
+            make_task(5, "2024-01-06T10:00:00"), make_task(2, "2024-01-02T10:00:00")]
+        
+        tasks = self.storage.filter_tasks(status="pending")
+        
+        self.assertEqual([task.id for task in tasks], [5, 3, 4, 2, 0])
+        for shard in self.shard_mocks:
+            shard.filter_tasks.assert_called_once_with("pending", None, None, None, False, False)
+    
+    def test_get_all_tasks_merge_preserves_order(self):
+        """Тест слияния в порядке статус, приоритет, дата создания."""
+        self.shard_mocks[0].get_all_tasks.return_value = [
+            make_task(3, "2024-01-01T10:00:00", priority="high"),
+            make_task(6, "2024-01-09T10:00:00", status="completed", priority="high")]
+        self.shard_mocks[1].get_all_tasks.return_value = [
+            make_task(1, "2024-01-03T10:00:00", priority="high"),
+            make_task(4, "2024-01-05T10:00:00", priority="low")]
+        self.shard_mocks[2].get_all_tasks.return_value = [
+            make_task(2, "2024-01-02T10:00:00", priority="medium")]
+        
+        tasks = self.storage.get_all_tasks()
+        
+        self.assertEqual([task.id for task in tasks], [1, 3, 2, 4, 6])
+    
+    def test_get_statistics_summed(self):
+        """Тест суммирования статистики шардов."""
+        for shard, (total, completed) in zip(self.shard_mocks, [(4, 2), (3, 1), (3, 3)]):
+            shard.get_statistics.return_value = {
+                'total_tasks': total, 'completed_tasks': completed,
+                'pending_tasks': total - completed, 'overdue_tasks': 0,
+                'completion_rate': 0
+            }
+        
+        stats = self.storage.get_statistics()
+        
+        self.assertEqual(stats['total_tasks'], 10)
+        self.assertEqual(stats['completed_tasks'], 6)
+        self.assertEqual(stats['pending_tasks'], 4)
+        self.assertEqual(stats['completion_rate'], 60.0)
+    
+    def test_get_statistics_merges_tags(self):
+        """Тест объединения счетчиков тегов шардов."""
+        for shard, tags in zip(self.shard_mocks, [{'work': 2, 'home': 1}, {'work': 1}, {}]):
+            shard.get_statistics.return_value = {'total_tasks': 1, 'completed_tasks': 0, 'tags': tags}
+        
+        stats = self.storage.get_statistics()
+        
+        self.assertEqual(list(stats['tags'].items()), [('work', 3), ('home', 1)])
+    
+    def test_apply_journal_batch_routes_by_id(self):
+        """Тест распределения операций журнала по шардам с сохранением порядка."""
+        for shard in self.shard_mocks:
+            shard.apply_journal_batch.side_effect = lambda entries: len(entries)
+        entries = [
+            {'key': 'a', 'op': 'done', 'ts': '2024-01-01T10:00:00', 'payload': {'task_id': 4}},
+            {'key': 'b', 'op': 'delete', 'ts': '2024-01-01T10:01:00', 'payload': {'task_id': 5}},
+            {'key': 'c', 'op': 'done', 'ts': '2024-01-01T10:02:00', 'payload': {'task_id': 7}}
+        ]
+        
+        applied = self.storage.apply_journal_batch(entries)
+        
+        self.assertEqual(applied, 3)
+        self.shard_mocks[1].apply_journal_batch.assert_called_once_with([entries[0], entries[2]])
+        self.shard_mocks[2].apply_journal_batch.assert_called_once_with([entries[1]])
+        self.shard_mocks[0].apply_journal_batch.assert_not_called()
+
+    def test_get_changes_since_merges_shards(self):
+        """Тест объединения изменений шардов для локального снимка."""
+        from datetime import datetime
+        self.shard_mocks[0].get_changes_since.return_value = ([make_task(3, "2024-01-01T10:00:00")], [], datetime(2024, 1, 2))
+        self.shard_mocks[1].get_changes_since.return_value = ([], [4], datetime(2024, 1, 3))
+        self.shard_mocks[2].get_changes_since.return_value = ([], [], None)
+        
+        tasks, deleted_ids, watermark = self.storage.get_changes_since(datetime(2024, 1, 1))
+        
+        self.assertEqual([task.id for task in tasks], [3])
+        self.assertEqual(deleted_ids, [4])
+        self.assertEqual(watermark, datetime(2024, 1, 3))
+
+    def test_update_tasks_routes_ids(self):
+        """Тест массового изменения по ID только в нужных шардах."""
+        self.shard_mocks[1].update_tasks.return_value = [4]
+        self.shard_mocks[2].update_tasks.return_value = [5]
+        
+        task_ids = self.storage.update_tasks({'priority': 'high'}, ids=[4, 5])
+        
+        self.assertEqual(sorted(task_ids), [4, 5])
+        self.shard_mocks[0].update_tasks.assert_not_called()
+        self.shard_mocks[1].update_tasks.assert_called_once_with(
+            {'priority': 'high'}, None, None, None, [4], None, False)
+
+    def test_subtask_created_in_parent_shard(self):
+        """Тест размещения подзадачи в шарде родителя."""
+        child = Task("Child", parent_id=5)
+        
+        self.storage.save_task(child)
+        
+        self.shard_mocks[2].save_task.assert_called_once_with(child)
+    
+    def test_links_across_shards_rejected(self):
+        """Тест запрета связей между задачами разных шардов."""
+        with self.assertRaises(ValueError):
+            self.storage.add_dependency(4, 5)
+        
+        self.storage.add_dependency(4, 7)
+        self.shard_mocks[1].add_dependency.assert_called_once_with(4, 7)
+
+    def test_recurrence_rules_routed_by_id(self):
+        """Тест маршрутизации правил повторения и суммирования экземпляров."""
+        for index, shard in enumerate(self.shard_mocks):
+            shard.materialize_recurrences.return_value = index + 1
+        
+        self.assertEqual(self.storage.materialize_recurrences(30), 6)
+        self.storage.delete_recurrence_rule(4)
+        
+        self.shard_mocks[1].delete_recurrence_rule.assert_called_once_with(4)
+        self.shard_mocks[0].materialize_recurrences.assert_called_once_with(30)
+
+    def test_seed_tasks_split_across_shards(self):
+        """Тест деления синтетических задач между шардами поровну."""
+        for shard in self.shard_mocks:
+            shard.seed_tasks.side_effect = lambda count, chunk_size, drop_indexes: count
+        
+        self.assertEqual(self.storage.seed_tasks(10, 1000, True), 10)
+        
+        self.assertEqual([shard.seed_tasks.call_args[0][0] for shard in self.shard_mocks], [4, 3, 3])
+        self.shard_mocks[2].seed_tasks.assert_called_once_with(3, 1000, True)
+
+class TestConfigureShardSequence(unittest.TestCase):
+    """Тесты для настройки последовательности ID шарда."""
+    
+    def _configure(self, mock_get_cursor, states, base=10):
+        """Вызывает configure_shard_sequence для шарда 1 из 4; states — ответы чтения состояния."""
+        mock_cursor = MagicMock()
+        mock_cursor.fetchone.side_effect = list(states) + [{'base': base}]
+        mock_get_cursor.return_value.__enter__.return_value = mock_cursor
+        
+        configure_shard_sequence({'dbname': 'tasks_1'}, 1, 4)
+        
+        return mock_cursor, [call[0][0] for call in mock_cursor.execute.call_args_list]
+    
+    @patch('sharding.DatabaseConnection.get_cursor')
+    def test_sequence_aligned_to_shard(self, mock_get_cursor):
+        """Тест сдвига последовательности вперед на значение с остатком шарда."""
+        state = {'increment_by': 1, 'last_value': 10, 'is_called': True}
+        mock_cursor, queries = self._configure(mock_get_cursor, [state, state])
+        
+        self.assertIn("pg_advisory_xact_lock", queries[1])
+        alter = next(query for query in queries if "ALTER SEQUENCE" in query)
+        self.assertIn("tasks_id_seq INCREMENT BY 4", alter)
+        # 13 — ближайшее число >= 10 с остатком 1 по модулю 4
+        setval_sql, params = mock_cursor.execute.call_args_list[-1][0]
+        self.assertIn("setval", setval_sql)
+        self.assertIn("WHERE last_value < %(aligned)s", setval_sql)
+        self.assertEqual(params, {'aligned': 13})
+    
+    @patch('sharding.DatabaseConnection.get_cursor')
+    def test_configured_sequence_not_altered(self, mock_get_cursor):
+        """Тест: уже настроенная последовательность только читается."""
+        state = {'increment_by': 4, 'last_value': 21, 'is_called': True}
+        _, queries = self._configure(mock_get_cursor, [state])
+        
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("ALTER", queries[0])
+    
+    @patch('sharding.DatabaseConnection.get_cursor')
+    def test_configured_while_waiting_for_lock(self, mock_get_cursor):
+        """Тест: настройка другим процессом за время ожидания блокировки не повторяется."""
+        _, queries = self._configure(mock_get_cursor, [
+            {'increment_by': 1, 'last_value': 10, 'is_called': True},
+            {'increment_by': 4, 'last_value': 13, 'is_called': True}
+        ])
+        
+        self.assertFalse(any("ALTER SEQUENCE" in query or "setval" in query for query in queries))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Тесты для модуля snapshot.py
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, date, timedelta
+from unittest.mock import Mock, patch
+from snapshot import TaskSnapshot, RECORD
+from models import Task
+
+
+def make_task(task_id, created_at, status="pending", priority="medium", due_date=None,
+              description="", tags=None):
+    """Создает задачу в том виде, в каком ее возвращает хранилище."""
+    return Task.from_dict({
+        "id": task_id,
+        "title": f"Задача {task_id}",
+        "description": description,
+        "status": status,
+        "priority": priority,
+        "created_at": created_at,
+        "due_date": due_date,
+        "completed_at": "2024-01-03T12:30:00.250000" if status == "completed" else None,
+        "version": 2,
+        "tags": tags or []
+    })
+
+
+class TestTaskSnapshot(unittest.TestCase):
+    """Тесты для класса TaskSnapshot."""
+    
+    def setUp(self):
+        """Создает снимок во временном каталоге и мок хранилища."""
+        self.directory = tempfile.mkdtemp()
+        self.snapshot = TaskSnapshot(os.path.join(self.directory, "snapshot.bin"))
+        self.storage = Mock()
+        self.watermark = datetime(2024, 1, 5, 10, 0, 0)
+        self.tasks = [
+            make_task(1, "2024-01-01T09:00:00", priority="low", due_date="2024-01-02",
+                      tags=["work", "отчет"]),
+            make_task(2, "2024-01-02T09:00:00", status="completed", priority="high", tags=["work"]),
+            make_task(3, "2024-01-03T09:00:00", priority="high", description="Подробности")
+        ]
+        self.tasks[2].parent_id = 1
+        self.tasks[2].mark_clean()
+        self.storage.get_changes_since.return_value = (self.tasks, [], self.watermark)
+        self.snapshot.refresh(self.storage)
+    
+    def tearDown(self):
+        """Удаляет временный каталог."""
+        shutil.rmtree(self.directory)
+    
+    def test_round_trip(self):
+        """Тест сохранения всех полей задачи."""
+        self.storage.get_changes_since.assert_called_once_with(None)
+        tasks = {task.id: task for task in self.snapshot.filter_tasks()}
+        
+        for original in self.tasks:
+            self.assertEqual(tasks[original.id].to_dict(), original.to_dict())
+        self.assertEqual(self.snapshot.watermark, self.watermark)
+    
+    def test_compact_records(self):
+        """Тест размера файла: записи фиксированной длины и строки."""
+        strings = sum(len(t.title.encode()) + len(t.description.encode()) +
+                      len("\x1f".join(t.tags).encode()) for t in self.tasks)
+        size = os.path.getsize(self.snapshot.path)
+        
+        self.assertLess(size, 32 + len(self.tasks) * RECORD.size + strings)
+    
+    def test_filter_order_and_fields(self):
+        """Тест фильтрации и порядка created_at DESC."""
+        pending = self.snapshot.filter_tasks(status="pending")
+        self.assertEqual([task.id for task in pending], [3, 1])
+        
+        by_date = self.snapshot.filter_tasks(due_date="2024-01-02")
+        self.assertEqual([task.id for task in by_date], [1])
+    
+    def test_filter_by_tags(self):
+        """Тест фильтрации по тегам с семантикой любого и всех тегов."""
+        any_tag = self.snapshot.filter_tasks(tags=["отчет", "home"])
+        all_tags = self.snapshot.filter_tasks(tags=["work", "отчет"], match_all_tags=True)
+        
+        self.assertEqual([task.id for task in any_tag], [1])
+        self.assertEqual([task.id for task in all_tags], [1])
+        self.assertEqual(len(self.snapshot.filter_tasks(tags=["work"])), 2)
+    
+    def test_get_all_tasks_order(self):
+        """Тест порядка get_all_tasks: статус, приоритет, created_at DESC."""
+        self.assertEqual([task.id for task in self.snapshot.get_all_tasks()], [3, 1, 2])
+    
+    def test_get_statistics(self):
+        """Тест статистики по локальному снимку."""
+        stats = self.snapshot.get_statistics()
+        
+        self.assertEqual(stats['total_tasks'], 3)
+        self.assertEqual(stats['completed_tasks'], 1)
+        self.assertEqual(stats['pending_tasks'], 2)
+        self.assertEqual(stats['high_priority'], 2)
+        self.assertEqual(stats['low_priority'], 1)
+        self.assertEqual(stats['overdue_tasks'], 1)
+        self.assertEqual(stats['completion_rate'], 33.33)
+        self.assertEqual(stats['tags'], {'work': 2, 'отчет': 1})
+    
+    @patch('snapshot.Config.SNAPSHOT_OVERLAP_SECONDS', 30)
+    def test_incremental_refresh(self):
+        """Тест обновления: только изменения после водяного знака с запасом."""
+        later = self.watermark + timedelta(minutes=1)
+        changed = make_task(3, "2024-01-03T09:00:00", status="completed", priority="high")
+        new = make_task(4, "2024-01-06T09:00:00")
+        self.storage.get_changes_since.return_value = ([changed, new], [1], later)
+        
+        received = self.snapshot.refresh(self.storage)
+        
+        self.assertEqual(received, 3)
+        self.storage.get_changes_since.assert_called_with(self.watermark - timedelta(seconds=30))
+        tasks = {task.id: task for task in self.snapshot.filter_tasks()}
+        self.assertEqual(sorted(tasks), [2, 3, 4])
+        self.assertEqual(tasks[3].status.value, "completed")
+        self.assertEqual(self.snapshot.watermark, later)
+    
+    def test_refresh_without_changes_keeps_file(self):
+        """Тест обновления без изменений: файл не перезаписывается."""
+        mtime = os.stat(self.snapshot.path).st_mtime_ns
+        self.storage.get_changes_since.return_value = ([], [], self.watermark)
+        
+        self.assertEqual(self.snapshot.refresh(self.storage), 0)
+        self.assertEqual(os.stat(self.snapshot.path).st_mtime_ns, mtime)
+    
+    def test_missing_snapshot(self):
+        """Тест чтения несозданного снимка."""
+        snapshot = TaskSnapshot(os.path.join(self.directory, "missing.bin"))
+        
+        self.assertFalse(snapshot.exists())
+        self.assertEqual(snapshot.get_all_tasks(), [])
+        self.assertIsNone(snapshot.watermark)
+        self.assertEqual(snapshot.get_statistics()['total_tasks'], 0)
+    
+    def test_path_per_owner(self):
+        """Тест: у каждого владельца свой файл снимка."""
+        base = os.path.join(self.directory, "snapshot.bin")
+        with patch('snapshot.Config.SNAPSHOT_PATH', base), \
+                patch('snapshot.Config.TASK_OWNER', 'alice'):
+            self.assertEqual(TaskSnapshot().path, os.path.join(self.directory, "snapshot-alice.bin"))
+            self.assertEqual(TaskSnapshot(owner="bob").path, os.path.join(self.directory, "snapshot-bob.bin"))
+            # Символы, недопустимые в имени файла, заменяются
+            self.assertEqual(TaskSnapshot(owner="../eve").path,
+                             os.path.join(self.directory, "snapshot-.._eve.bin"))
+            # Явный путь не меняется
+            self.assertEqual(TaskSnapshot(base, owner="bob").path, base)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,20 @@
 Тесты для модуля storage.py
 """
 
+import contextvars
+import json
 import unittest
 from unittest.mock import Mock, patch, MagicMock
-from datetime import datetime
-from storage import TaskStorage, DatabaseConnection
+from datetime import date, datetime
+from storage import (TaskStorage, DatabaseConnection, InsertBatcher, ReplicaRouter,
+                     ChangeListener, ConcurrentModificationError, DeadlineExceededError,
+                     retry_on_conflict)
+import storage
 from models import Task, TaskStatus, Priority
 from config import Config
+import psycopg2
 import psycopg2.extras
+import threading
 
 
 class TestDatabaseConnection(unittest.TestCase):
@@ -58,6 +65,179 @@ class TestDatabaseConnection(unittest.TestCase):
         # Проверяем, что был создан курсор с правильными параметрами
         mock_conn.cursor.assert_called_once_with(cursor_factory=psycopg2.extras.RealDictCursor)
         mock_conn.commit.assert_called_once()
+    
+    def _mock_connection(self, mock_get_connection):
+        """Настраивает замоканное соединение и возвращает (соединение, курсор)."""
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value.__enter__.return_value = mock_conn
+        return mock_conn, mock_cursor
+    
+    @patch('storage.DatabaseConnection.get_connection')
+    def test_get_cursor_sets_deadline(self, mock_get_connection):
+        """Тест установки таймаутов для класса операции."""
+        mock_conn, mock_cursor = self._mock_connection(mock_get_connection)
+        
+        with DatabaseConnection.get_cursor(deadline="write"):
+            pass
+        
+        sql_query, params = mock_cursor.execute.call_args[0]
+        self.assertIn("set_config('statement_timeout', %s, true)", sql_query)
+        self.assertIn("set_config('lock_timeout', %s, true)", sql_query)
+        self.assertEqual(params, (str(Config.STATEMENT_TIMEOUTS_MS["write"]),
+                                  str(Config.LOCK_TIMEOUT_MS)))
+    
+    @patch('storage.DatabaseConnection.get_connection')
+    def test_get_cursor_sets_owner_for_rls(self, mock_get_connection):
+        """Тест: владелец записывается в параметр транзакции только при RLS."""
+        mock_conn, mock_cursor = self._mock_connection(mock_get_connection)
+        
+        with patch('storage.Config.ROW_LEVEL_SECURITY', False):
+            with DatabaseConnection.get_cursor(owner="alice"):
+                pass
+        mock_cursor.execute.assert_not_called()
+        
+        with patch('storage.Config.ROW_LEVEL_SECURITY', True):
+            with DatabaseConnection.get_cursor(owner="alice"):
+                pass
+        mock_cursor.execute.assert_called_once_with(
+            "SELECT set_config(%s, %s, true)", (storage.OWNER_SETTING, "alice")
+        )
+    
+    @patch('storage.DatabaseConnection.get_connection')
+    def test_get_cursor_statement_timeout(self, mock_get_connection):
+        """Тест преобразования отмены по таймауту в DeadlineExceededError."""
+        mock_conn, mock_cursor = self._mock_connection(mock_get_connection)
+        
+        with self.assertRaises(DeadlineExceededError) as context:
+            with DatabaseConnection.get_cursor(deadline="read"):
+                raise psycopg2.errors.QueryCanceled("canceling statement due to statement timeout")
+        
+        self.assertEqual(context.exception.deadline, "read")
+        mock_conn.commit.assert_not_called()
+        
+        with self.assertRaises(DeadlineExceededError):
+            with DatabaseConnection.get_cursor(deadline="write"):
+                raise psycopg2.errors.LockNotAvailable("canceling statement due to lock timeout")
+    
+    @patch('storage.DatabaseConnection.get_connection')
+    def test_get_cursor_user_cancel(self, mock_get_connection):
+        """Тест отмены запроса по Ctrl+C."""
+        self._mock_connection(mock_get_connection)
+        storage._cancel_state.interrupted = True
+        
+        with self.assertRaises(KeyboardInterrupt):
+            with DatabaseConnection.get_cursor(deadline="read"):
+                raise psycopg2.errors.QueryCanceled("canceling statement due to user request")
+        
+        self.assertFalse(storage._cancel_state.interrupted)
+    
+    def test_wait_callback_cancels_on_interrupt(self):
+        """Тест отмены запроса на сервере при Ctrl+C во время ожидания."""
+        mock_conn = Mock()
+        mock_conn.poll.side_effect = [KeyboardInterrupt(), psycopg2.extensions.POLL_OK]
+        
+        storage._wait_select_interruptible(mock_conn)
+        
+        mock_conn.cancel.assert_called_once()
+        self.assertTrue(storage._cancel_state.interrupted)
+        storage._cancel_state.interrupted = False
+    
+    @patch('storage.Config.DB_POOL_TIMEOUT', 0.01)
+    @patch('storage.ThreadedConnectionPool')
+    def test_pool_checkout_timeout(self, mock_pool_class):
+        """Тест ошибки при исчерпании пула соединений."""
+        DatabaseConnection.init_pool(minconn=1, maxconn=1)
+        try:
+            with DatabaseConnection.get_connection():
+                with self.assertRaises(DeadlineExceededError):
+                    with DatabaseConnection.get_connection():
+                        pass
+        finally:
+            DatabaseConnection.close_pool()
+    
+    @patch('storage.psycopg2.connect')
+    @patch('storage.ThreadedConnectionPool')
+    def test_pooled_connection(self, mock_pool_class, mock_connect):
+        """Тест выдачи соединения из пула и возврата его обратно."""
+        mock_pool = mock_pool_class.return_value
+        mock_conn = Mock()
+        mock_conn.closed = 0
+        mock_pool.getconn.return_value = mock_conn
+        
+        DatabaseConnection.init_pool(minconn=1, maxconn=2)
+        try:
+            with DatabaseConnection.get_connection() as conn:
+                self.assertEqual(conn, mock_conn)
+            
+            mock_pool.putconn.assert_called_once_with(mock_conn, close=False)
+            mock_connect.assert_not_called()
+            mock_conn.close.assert_not_called()
+        finally:
+            DatabaseConnection.close_pool()
+        
+        mock_pool.closeall.assert_called_once()
+        self.assertEqual(DatabaseConnection._pools, {})
+    
+    @patch('storage.ThreadedConnectionPool')
+    def test_pooled_connection_returned_on_error(self, mock_pool_class):
+        """Тест возврата соединения в пул при ошибке запроса."""
+        mock_pool = mock_pool_class.return_value
+        mock_conn = Mock()
+        mock_conn.closed = 0
+        mock_pool.getconn.return_value = mock_conn
+        
+        DatabaseConnection.init_pool(minconn=1, maxconn=1)
+        try:
+            with self.assertRaises(ValueError):
+                with DatabaseConnection.get_connection():
+                    raise ValueError("Query failed")
+            
+            # Слот пула освобожден, поэтому повторная выдача не блокируется
+            with DatabaseConnection.get_connection():
+                pass
+            self.assertEqual(mock_pool.putconn.call_count, 2)
+        finally:
+            DatabaseConnection.close_pool()
+
+
+class TestServerSideCursor(unittest.TestCase):
+    """Тесты серверного курсора DatabaseConnection.get_cursor."""
+    
+    @patch('storage.DatabaseConnection.get_connection')
+    def test_named_cursor_after_setup(self, mock_get_connection):
+        """Тест: ограничения транзакции задаются обычным курсором, запрос — именованным."""
+        mock_conn = MagicMock()
+        setup_cursor = MagicMock()
+        named_cursor = MagicMock()
+        mock_conn.cursor.side_effect = [setup_cursor, named_cursor]
+        setup_cursor.__enter__.return_value = setup_cursor
+        named_cursor.__enter__.return_value = named_cursor
+        mock_get_connection.return_value.__enter__.return_value = mock_conn
+        
+        with DatabaseConnection.get_cursor(deadline="bulk", name="task_export") as cursor:
+            self.assertIs(cursor, named_cursor)
+        
+        self.assertEqual(mock_conn.cursor.call_args_list[1][1]['name'], "task_export")
+        self.assertIn("statement_timeout", setup_cursor.execute.call_args[0][0])
+        named_cursor.execute.assert_not_called()
+        mock_conn.commit.assert_called_once()
+
+
+class TestCopyMode(unittest.TestCase):
+    """Тесты для DatabaseConnection.copy_mode."""
+    
+    def test_wait_callback_restored(self):
+        """Тест отключения wait callback на время COPY и его восстановления."""
+        callback = Mock()
+        psycopg2.extensions.set_wait_callback(callback)
+        try:
+            with DatabaseConnection.copy_mode():
+                self.assertIsNone(psycopg2.extensions.get_wait_callback())
+            self.assertIs(psycopg2.extensions.get_wait_callback(), callback)
+        finally:
+            psycopg2.extensions.set_wait_callback(None)
 
 
 class TestTaskStorage(unittest.TestCase):
@@ -87,7 +267,7 @@ class TestTaskStorage(unittest.TestCase):
         self.mock_init = self.patcher_init.start()
         
         # Создаем экземпляр хранилища
-        self.storage = TaskStorage()
+        self.storage = TaskStorage(owner="alice")
     
     def tearDown(self):
         """Очистка тестового окружения."""
@@ -99,7 +279,8 @@ class TestTaskStorage(unittest.TestCase):
         # Мокаем результат запроса
         self.mock_cursor.fetchone.return_value = {
             'id': 1,
-            'created_at': '2024-01-01T10:00:00'
+            'created_at': '2024-01-01T10:00:00',
+            'version': 1
         }
         
         task = Task("New Task", "New Description", Priority.HIGH, "2024-12-31")
@@ -135,6 +316,80 @@ class TestTaskStorage(unittest.TestCase):
         # Проверяем, что это UPDATE запрос
         self.assertIn("UPDATE tasks", sql_query)
     
+    def test_save_task_update_checks_version(self):
+        """Тест условного обновления по версии строки."""
+        self.mock_cursor.rowcount = 1
+        task = Task("Updated Task")
+        task.id = 1
+        task.version = 2
+        
+        self.storage.save_task(task)
+        
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("version = version + 1", sql_query)
+        self.assertIn("WHERE id = %s AND owner = %s AND version = %s", sql_query)
+        self.assertEqual(params[-3:], [1, 'alice', 2])
+        self.assertEqual(task.version, 3)
+    
+    def test_save_task_update_only_dirty_fields(self):
+        """Тест записи только измененных полей."""
+        task = Task.from_dict({
+            'id': 1, 'title': 'Loaded', 'description': 'Long description',
+            'status': 'pending', 'priority': 'medium',
+            'created_at': '2024-01-01T10:00:00', 'version': 1
+        })
+        self.mock_cursor.rowcount = 1
+        task.mark_completed()
+        
+        self.storage.save_task(task)
+        
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("SET status = %s, completed_at = %s, version = version + 1", sql_query)
+        self.assertNotIn("description", sql_query)
+        self.assertNotIn("title", sql_query)
+        self.assertEqual(params[0], 'completed')
+        self.assertEqual(task.dirty_fields, frozenset())
+    
+    def test_save_task_update_noop(self):
+        """Тест отсутствия запроса, если задача не изменялась."""
+        task = Task.from_dict({
+            'id': 1, 'title': 'Loaded', 'status': 'pending',
+            'priority': 'medium', 'created_at': '2024-01-01T10:00:00', 'version': 1
+        })
+        
+        self.storage.save_task(task)
+        
+        self.mock_get_cursor.assert_not_called()
+        self.assertEqual(task.version, 1)
+    
+    def test_save_task_update_conflict(self):
+        """Тест ошибки при конкурентном изменении задачи."""
+        self.mock_cursor.rowcount = 0
+        task = Task("Stale Task")
+        task.id = 1
+        task.version = 2
+        
+        with self.assertRaises(ConcurrentModificationError) as context:
+            self.storage.save_task(task)
+        
+        self.assertEqual(context.exception.task_id, 1)
+        self.assertEqual(task.version, 2)
+    
+    def test_retry_on_conflict(self):
+        """Тест повторения операции после конфликта версий."""
+        operation = Mock(side_effect=[ConcurrentModificationError(1), "done"])
+        
+        self.assertEqual(retry_on_conflict(operation, attempts=3), "done")
+        self.assertEqual(operation.call_count, 2)
+    
+    def test_retry_on_conflict_exhausted(self):
+        """Тест ошибки после исчерпания попыток."""
+        operation = Mock(side_effect=ConcurrentModificationError(1))
+        
+        with self.assertRaises(ConcurrentModificationError):
+            retry_on_conflict(operation, attempts=2)
+        self.assertEqual(operation.call_count, 2)
+    
     def test_get_all_tasks(self):
         """Тест получения всех задач."""
         # Мокаем данные из БД
@@ -287,6 +542,19 @@ class TestTaskStorage(unittest.TestCase):
         self.assertEqual(params[1], 'high')
         self.assertEqual(params[2], '2024-12-31')
     
+    def test_filter_tasks_by_tags(self):
+        """Тест фильтрации по тегам через индексируемые операторы массивов."""
+        self.mock_cursor.fetchall.return_value = []
+        
+        self.storage.filter_tasks(tags=['work', 'urgent'])
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("AND tags && %s::text[]", sql_query)
+        self.assertEqual(params, [81, 'alice', ['work', 'urgent']])
+        
+        self.storage.filter_tasks(tags=['work', 'urgent'], match_all_tags=True)
+        sql_query = self.mock_cursor.execute.call_args[0][0]
+        self.assertIn("AND tags @> %s::text[]", sql_query)
+    
     def test_filter_tasks_no_filters(self):
         """Тест фильтрации задач без фильтров."""
         self.mock_cursor.fetchall.return_value = []
@@ -302,6 +570,29 @@ class TestTaskStorage(unittest.TestCase):
         self.assertNotIn("AND priority = %s", sql_query)
         self.assertNotIn("AND due_date = %s", sql_query)
     
+    def test_filter_tasks_description_preview(self):
+        """Тест загрузки превью описания вместо полного текста в списке."""
+        self.mock_cursor.fetchall.return_value = [{
+            'id': 1, 'title': 'Long', 'description': 'x' * 81, 'status': 'pending',
+            'priority': 'medium', 'created_at': datetime(2024, 1, 1), 'due_date': None,
+            'completed_at': None, 'version': 1, 'tags': [], 'parent_id': None
+        }]
+        
+        with patch('storage.Config.LIST_DESCRIPTION_PREVIEW', 80):
+            task = self.storage.filter_tasks()[0]
+        
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("left(description, %s) AS description", sql_query)
+        self.assertEqual(params[0], 81)
+        self.assertEqual(task.description, 'x' * 80)
+        self.assertTrue(task.description_truncated)
+        self.assertEqual(task.dirty_fields, frozenset())
+        
+        self.storage.filter_tasks(verbose=True)
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertNotIn("left(description", sql_query)
+        self.assertEqual(params, ['alice'])
+    
     def test_get_statistics(self):
         """Тест получения статистики."""
         self.mock_cursor.fetchone.return_value = {
@@ -313,6 +604,7 @@ class TestTaskStorage(unittest.TestCase):
             'low_priority': 3,
             'overdue_tasks': 1
         }
+        self.mock_cursor.fetchall.return_value = [{'tag': 'work', 'task_count': 3}]
         
         stats = self.storage.get_statistics()
         
@@ -324,6 +616,17 @@ class TestTaskStorage(unittest.TestCase):
         self.assertEqual(stats['medium_priority'], 5)
         self.assertEqual(stats['low_priority'], 3)
         self.assertEqual(stats['overdue_tasks'], 1)
+        self.assertEqual(stats['tags'], {'work': 3})
+        
+        # Чтение ничего не изменяет: теги берутся из счетчиков и еще не
+        # свернутых изменений, а не подсчетом по tasks
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any("DELETE" in query for query in queries))
+        tags_query = self.mock_cursor.execute.call_args[0][0]
+        self.assertIn("FROM tag_counts", tags_query)
+        self.assertIn("FROM tag_count_deltas", tags_query)
+        self.assertNotIn("FROM tasks", tags_query)
     
     def test_get_statistics_empty(self):
         """Тест получения статистики для пустой базы."""
@@ -336,12 +639,529 @@ class TestTaskStorage(unittest.TestCase):
             'low_priority': 0,
             'overdue_tasks': 0
         }
+        self.mock_cursor.fetchall.return_value = []
         
         stats = self.storage.get_statistics()
         
         self.assertEqual(stats['total_tasks'], 0)
         self.assertEqual(stats['completion_rate'], 0)
     
+    def test_refresh_stats_rollup(self):
+        """Тест инкрементального пересчета дневных агрегатов."""
+        self.mock_cursor.fetchone.side_effect = [
+            {'last_updated_at': datetime(2024, 1, 1)},
+            {'max_updated_at': datetime(2024, 1, 5)}
+        ]
+        self.mock_cursor.rowcount = 3
+        
+        refreshed = self.storage.refresh_stats_rollup()
+        
+        self.assertEqual(refreshed, 3)
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertIn("INSERT INTO task_stats_watermark (owner)", queries[0])
+        self.assertIn("FOR UPDATE", queries[1])
+        self.assertIn("INSERT INTO task_stats_daily", queries[3])
+        self.assertIn("ON CONFLICT (owner, day) DO UPDATE", queries[3])
+        
+        rollup_params = self.mock_cursor.execute.call_args_list[3][0][1]
+        self.assertEqual(rollup_params['owner'], 'alice')
+        self.assertEqual(rollup_params['last_updated_at'], datetime(2024, 1, 1))
+        self.assertEqual(rollup_params['max_updated_at'], datetime(2024, 1, 5))
+        # Дни пересчитываются по времени изменения, а не по id и completed_at:
+        # задача, выполненная задним числом при воспроизведении журнала, не теряется
+        self.assertIn("updated_at > %(last_updated_at)s", queries[3])
+        
+        # Водяной знак владельца сдвигается на зафиксированные границы
+        self.assertEqual(self.mock_cursor.execute.call_args_list[4][0][1],
+                         (datetime(2024, 1, 5), 'alice'))
+    
+    def test_get_statistics_by_period(self):
+        """Тест статистики по периодам из дневных агрегатов."""
+        self.mock_cursor.fetchall.return_value = [
+            {'period': '2024-01-01', 'created_tasks': 5, 'completed_tasks': 3,
+             'median_lead_seconds': 5400.0},
+            {'period': '2024-01-08', 'created_tasks': 2, 'completed_tasks': 0,
+             'median_lead_seconds': None}
+        ]
+        
+        with patch.object(self.storage, 'refresh_stats_rollup') as mock_refresh:
+            rows = self.storage.get_statistics_by_period('week', since='2024-01-01')
+        
+        mock_refresh.assert_called_once()
+        self.assertEqual(rows[0]['median_lead_hours'], 1.5)
+        self.assertIsNone(rows[1]['median_lead_hours'])
+        
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("FROM task_stats_daily", sql_query)
+        self.assertNotIn("FROM tasks", sql_query)
+        self.assertEqual(params, {'period': 'week', 'since': '2024-01-01', 'owner': 'alice'})
+    
+    def test_get_period_rollup(self):
+        """Тест агрегатов по периодам с временами выполнения для слияния шардов."""
+        self.mock_cursor.fetchall.return_value = [
+            {'period': date(2024, 1, 1), 'created_tasks': 5, 'completed_tasks': 2,
+             'lead_times': [3600.0, 7200.0]},
+            {'period': date(2024, 1, 8), 'created_tasks': 2, 'completed_tasks': 0, 'lead_times': None}
+        ]
+        
+        with patch.object(self.storage, 'refresh_stats_rollup'):
+            rows = self.storage.get_period_rollup('week', since='2024-01-01')
+        
+        self.assertEqual(rows[0]['lead_times'], [3600.0, 7200.0])
+        self.assertEqual(rows[1]['lead_times'], [])
+        self.assertIn("array_agg(lead_time)", self.mock_cursor.execute.call_args[0][0])
+    
+    def test_get_id_ranges(self):
+        """Тест деления диапазона ID на равные части."""
+        self.mock_cursor.fetchone.return_value = {'first_id': 1, 'last_id': 10}
+        self.assertEqual(self.storage.get_id_ranges(3), [(1, 4), (5, 8), (9, 10)])
+        
+        self.mock_cursor.fetchone.return_value = {'first_id': 7, 'last_id': 8}
+        self.assertEqual(self.storage.get_id_ranges(4), [(7, 7), (8, 8)])
+        
+        self.mock_cursor.fetchone.return_value = {'first_id': None, 'last_id': None}
+        self.assertEqual(self.storage.get_id_ranges(4), [])
+    
+    def test_iter_id_range_server_side_cursor(self):
+        """Тест чтения диапазона серверным курсором по возрастанию ID."""
+        self.mock_cursor.__iter__.return_value = iter([{'id': 5}, {'id': 6}])
+        
+        rows = list(TaskStorage.iter_id_range({'dbname': 'tasks'}, 'alice', 5, 9, batch_size=500))
+        
+        self.assertEqual(rows, [{'id': 5}, {'id': 6}])
+        self.mock_get_cursor.assert_called_once_with({'dbname': 'tasks'}, deadline="bulk", owner='alice',
+                                                     name="task_export")
+        self.assertEqual(self.mock_cursor.itersize, 500)
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("id BETWEEN %s AND %s", sql_query)
+        self.assertIn("ORDER BY id", sql_query)
+        self.assertEqual(params, ('alice', 5, 9))
+    
+    def test_dump_tables_consistent_snapshot(self):
+        """Тест выгрузки таблиц в одной транзакции с явным списком столбцов."""
+        self.mock_cursor.fetchall.return_value = [{'column_name': 'id'}, {'column_name': 'title'}]
+        self.mock_cursor.rowcount = 3
+        outputs = []
+        
+        def open_output(table, columns):
+            outputs.append((table, columns))
+            return MagicMock()
+        
+        rows = self.storage.dump_tables(open_output)
+        
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertIn("REPEATABLE READ, READ ONLY", queries[0])
+        self.assertEqual([table for table, _ in outputs], list(TaskStorage.BACKUP_TABLES))
+        self.assertEqual(outputs[0][1], ['id', 'title'])
+        self.assertEqual(rows['tasks'], 3)
+        statement = self.mock_cursor.copy_expert.call_args_list[1][0][0]
+        self.assertIsInstance(statement, storage.sql.Composed)
+    
+    @patch('storage.Config.ROW_LEVEL_SECURITY', True)
+    def test_dump_tables_refused_under_rls(self):
+        """Тест: под политиками RLS без BYPASSRLS копия не снимается."""
+        self.mock_cursor.fetchone.return_value = {'bypass_rls': False}
+        
+        with self.assertRaisesRegex(ValueError, "BYPASSRLS"):
+            self.storage.dump_tables(Mock())
+        self.mock_cursor.copy_expert.assert_not_called()
+        
+        self.mock_cursor.fetchone.return_value = {'bypass_rls': True}
+        self.mock_cursor.fetchall.return_value = [{'column_name': 'id'}]
+        self.storage.dump_tables(MagicMock())
+        self.assertEqual(self.mock_cursor.copy_expert.call_count, len(TaskStorage.BACKUP_TABLES))
+    
+    def test_load_tables_verifies_rows_before_commit(self):
+        """Тест: проверка числа строк вызывается до восстановления ключей."""
+        self.mock_cursor.fetchone.return_value = {'has_data': False}
+        self.mock_cursor.fetchall.return_value = []
+        self.mock_cursor.rowcount = 2
+        verify_rows = Mock(side_effect=ValueError("строк меньше"))
+        
+        with self.assertRaises(ValueError):
+            self.storage.load_tables(iter([('tasks', ['id'], Mock())]), verify_rows=verify_rows)
+        
+        verify_rows.assert_called_once_with({'tasks': 2})
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertFalse(any("ENABLE TRIGGER USER" in query for query in queries))
+    
+    def test_load_tables_rejects_non_empty_database(self):
+        """Тест: без replace задачи в непустой базе не заменяются."""
+        self.mock_cursor.fetchone.return_value = {'has_data': True}
+        
+        with self.assertRaisesRegex(ValueError, "--force"):
+            self.storage.load_tables(iter([]))
+        
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertFalse(any("TRUNCATE" in query for query in queries))
+    
+    def test_load_tables_rebuilds_keys_after_load(self):
+        """Тест загрузки без индексов и ключей с их восстановлением после COPY."""
+        self.mock_cursor.fetchone.return_value = {'has_data': True}
+        self.mock_cursor.fetchall.side_effect = [
+            [{'name': 'idx_tasks_tags', 'definition': 'CREATE INDEX idx_tasks_tags ON tasks USING gin (tags)'}],
+            [{'table_name': 'tasks', 'name': 'tasks_parent_id_fkey',
+              'definition': 'FOREIGN KEY (parent_id) REFERENCES tasks(id) ON DELETE SET NULL'},
+             {'table_name': 'tasks', 'name': 'tasks_pkey', 'definition': 'PRIMARY KEY (id)'}]
+        ]
+        self.mock_cursor.rowcount = 2
+        source = Mock()
+        
+        loaded = self.storage.load_tables(iter([('tasks', ['id', 'title'], source)]), replace=True)
+        
+        self.assertEqual(loaded, {'tasks': 2})
+        self.assertIs(self.mock_cursor.copy_expert.call_args[0][1], source)
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        
+        def position(fragment):
+            return next(i for i, query in enumerate(queries) if fragment in query)
+        
+        self.assertLess(position("TRUNCATE"), position("DROP CONSTRAINT tasks_parent_id_fkey"))
+        self.assertLess(position("DROP CONSTRAINT tasks_parent_id_fkey"), position("DROP CONSTRAINT tasks_pkey"))
+        self.assertLess(position("DROP INDEX idx_tasks_tags"), position("DISABLE TRIGGER USER"))
+        self.assertLess(position("ADD CONSTRAINT tasks_pkey"), position("CREATE INDEX idx_tasks_tags"))
+        self.assertLess(position("CREATE INDEX idx_tasks_tags"), position("ADD CONSTRAINT tasks_parent_id_fkey"))
+        self.assertLess(position("ADD CONSTRAINT tasks_parent_id_fkey"), position("ENABLE TRIGGER USER"))
+        self.assertIn("INSERT INTO tag_counts", queries[position("ENABLE TRIGGER USER") + len(TaskStorage.BACKUP_TABLES)])
+        self.assertIn("setval", queries[position("INSERT INTO tag_counts") + 1])
+    
+    def test_load_tables_unknown_table(self):
+        """Тест отказа загружать таблицу, которой нет в резервной копии."""
+        self.mock_cursor.fetchone.return_value = {'has_data': False}
+        self.mock_cursor.fetchall.return_value = []
+        
+        with self.assertRaisesRegex(ValueError, "pg_authid"):
+            self.storage.load_tables(iter([('pg_authid', ['rolname'], Mock())]))
+        self.mock_cursor.copy_expert.assert_not_called()
+    
+    def test_seed_tasks_in_chunks(self):
+        """Тест генерации задач порциями в отдельных транзакциях."""
+        self.mock_cursor.fetchone.return_value = {'created': 4}
+        
+        created = self.storage.seed_tasks(10, chunk_size=4)
+        
+        self.assertEqual(created, 12)
+        # Три порции и завершающая транзакция
+        self.assertEqual(self.mock_get_cursor.call_count, 4)
+        seeds = [call[0] for call in self.mock_cursor.execute.call_args_list
+                 if "generate_series" in call[0][0]]
+        self.assertEqual([(params['first'], params['last']) for _, params in seeds], [(1, 4), (5, 8), (9, 10)])
+        self.assertEqual(seeds[0][1]['owner'], 'alice')
+        self.assertIn("INSERT INTO tag_count_deltas", seeds[0][0])
+        self.assertNotIn("INSERT INTO tag_counts", seeds[0][0])
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertIn("DISABLE TRIGGER USER", queries[0])
+        self.assertIn("ENABLE TRIGGER USER", queries[2])
+        self.assertIn("ANALYZE tasks", queries[-1])
+        self.assertFalse(any("DROP INDEX" in query for query in queries))
+    
+    def test_seed_tasks_rebuilds_dropped_indexes(self):
+        """Тест: удаленные индексы строятся заново и после ошибки вставки."""
+        self.mock_cursor.fetchall.return_value = [
+            {'name': 'idx_tasks_tags', 'definition': 'CREATE INDEX idx_tasks_tags ON tasks USING gin (tags)'}]
+        
+        def execute(query, params=None):
+            if "generate_series" in query:
+                raise psycopg2.OperationalError("disk full")
+        
+        self.mock_cursor.execute.side_effect = execute
+        
+        with self.assertRaises(psycopg2.OperationalError):
+            self.storage.seed_tasks(5, drop_indexes=True)
+        
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertLess(queries.index("DROP INDEX idx_tasks_tags"),
+                        queries.index("CREATE INDEX idx_tasks_tags ON tasks USING gin (tags)"))
+        self.assertIn("ANALYZE tasks", queries[-1])
+    
+    def test_maintenance_report_flags_indexes(self):
+        """Тест отчета: раздутые, неиспользуемые и избыточные индексы."""
+        def index(name, columns, scans, is_unique=False):
+            return {'table_name': 'tasks', 'name': name, 'bytes': 8192, 'scans': scans,
+                    'is_unique': is_unique, 'is_valid': True, 'method': 'btree', 'columns': columns,
+                    'opclasses': ' '.join(['1978'] * len(columns.split())), 'special': False}
+        
+        self.mock_cursor.fetchall.side_effect = [
+            [{'name': 'tasks', 'total_bytes': 1 << 20, 'table_bytes': 1 << 19, 'live_tuples': 90,
+              'dead_tuples': 10, 'last_vacuum': None, 'last_analyze': None}],
+            [index('tasks_pkey', '1', 500, is_unique=True), index('idx_tasks_owner', '11', 0),
+             index('idx_tasks_owner_status', '11 4', 7)]
+        ]
+        self.mock_cursor.fetchone.side_effect = [
+            {'stats_reset': None}, {'found': True},
+            {'avg_leaf_density': 45.0}, {'avg_leaf_density': 89.0}, {'avg_leaf_density': float('nan')}
+        ]
+        
+        report = self.storage.get_maintenance_report()
+        
+        pkey, owner, owner_status = report['indexes']
+        self.assertEqual(pkey['bloat'], 0.5)
+        self.assertTrue(pkey['bloated'])
+        self.assertFalse(pkey['unused'])
+        self.assertTrue(owner['unused'])
+        self.assertEqual(owner['redundant_of'], 'idx_tasks_owner_status')
+        self.assertIsNone(owner_status['bloat'])
+        self.assertIsNone(owner_status['redundant_of'])
+        self.assertEqual(report['tables'][0]['dead_tuples'], 10)
+    
+    @patch('storage.DatabaseConnection.get_autocommit_cursor')
+    def test_reindex_rejects_foreign_index(self, mock_autocommit):
+        """Тест: перестраиваются только индексы таблиц задач."""
+        mock_autocommit.return_value = self.mock_cursor_context
+        self.mock_cursor.fetchall.return_value = [{'name': 'idx_tasks_tags'}]
+        
+        with self.assertRaisesRegex(ValueError, "pg_class_oid_index"):
+            self.storage.reindex_indexes(['pg_class_oid_index'])
+        self.assertEqual(self.storage.reindex_indexes(['idx_tasks_tags']), ['idx_tasks_tags'])
+        
+        statement = self.mock_cursor.execute.call_args[0][0]
+        self.assertIsInstance(statement, storage.sql.Composed)
+        self.assertIn(storage.sql.SQL("REINDEX INDEX CONCURRENTLY "), statement.seq)
+    
+    @patch('storage.DatabaseConnection.get_autocommit_cursor')
+    def test_vacuum_tables_folds_tag_deltas(self, mock_autocommit):
+        """Тест: изменения счетчиков тегов сворачиваются перед VACUUM."""
+        mock_autocommit.return_value = self.mock_cursor_context
+        
+        tables = self.storage.vacuum_tables()
+        
+        self.assertIn("tag_count_deltas", tables)
+        calls = self.mock_cursor.execute.call_args_list
+        fold_query = calls[0][0][0]
+        self.assertIn("DELETE FROM tag_count_deltas", fold_query)
+        self.assertIn("INSERT INTO tag_counts", fold_query)
+        self.assertEqual(len(calls), 1 + len(tables))
+        self.assertIn(storage.sql.SQL("VACUUM (ANALYZE) "), calls[1][0][0].seq)
+    
+    @patch('storage.DatabaseConnection.get_autocommit_cursor')
+    def test_drop_invalid_indexes(self, mock_autocommit):
+        """Тест удаления невалидных копий _ccnew, оставленных прерванным REINDEX."""
+        mock_autocommit.return_value = self.mock_cursor_context
+        self.mock_cursor.fetchall.return_value = [{'name': 'idx_tasks_tags_ccnew'},
+                                                  {'name': 'tasks_pkey_ccnew1'}]
+        
+        self.assertEqual(self.storage.drop_invalid_indexes(), ['idx_tasks_tags_ccnew', 'tasks_pkey_ccnew1'])
+        
+        select_sql = self.mock_cursor.execute.call_args_list[0][0][0]
+        self.assertIn("NOT i.indisvalid", select_sql)
+        self.assertIn("_ccnew", select_sql)
+        drops = [call[0][0] for call in self.mock_cursor.execute.call_args_list[1:]]
+        self.assertEqual(len(drops), 2)
+        self.assertIn(storage.sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS "), drops[0].seq)
+        self.assertIn(storage.sql.Identifier('tasks_pkey_ccnew1'), drops[1].seq)
+    
+    def test_apply_journal_batch(self):
+        """Тест применения журнала с пропуском уже примененных ключей."""
+        self.mock_cursor.fetchall.return_value = [{'key': 'k1'}, {'key': 'k3'}]
+        entries = [
+            {'key': 'k1', 'op': 'add', 'ts': '2024-01-01T10:00:00',
+             'payload': {'title': 'Offline', 'description': '', 'priority': 'high', 'due_date': None}},
+            {'key': 'k2', 'op': 'done', 'ts': '2024-01-01T10:01:00', 'payload': {'task_id': 5}},
+            {'key': 'k3', 'op': 'delete', 'ts': '2024-01-01T10:02:00', 'payload': {'task_id': 6}}
+        ]
+        
+        applied = self.storage.apply_journal_batch(entries)
+        
+        self.assertEqual(applied, 2)
+        calls = self.mock_cursor.execute.call_args_list
+        self.assertEqual(len(calls), 3)
+        self.assertIn("INSERT INTO journal_applied", calls[0][0][0])
+        self.assertEqual(calls[0][0][1], (['k1', 'k2', 'k3'],))
+        self.assertIn("INSERT INTO tasks", calls[1][0][0])
+        self.assertEqual(calls[1][0][1], ('Offline', '', 'high', None, '2024-01-01T10:00:00', [], None,
+                                          'alice'))
+        self.assertIn("DELETE FROM tasks", calls[2][0][0])
+        self.assertEqual(calls[2][0][1], (6, 'alice'))
+    
+    def test_apply_journal_batch_per_owner(self):
+        """Тест: операции применяются от имени владельца из записи журнала."""
+        self.mock_cursor.fetchall.side_effect = [[{'key': 'k1'}], [{'key': 'k2'}, {'key': 'k3'}]]
+        entries = [
+            {'key': 'k1', 'op': 'done', 'ts': '2024-01-01T10:01:00', 'payload': {'task_id': 5}},
+            {'key': 'k2', 'op': 'delete', 'owner': 'bob', 'ts': '2024-01-01T10:02:00',
+             'payload': {'task_id': 6}},
+            {'key': 'k3', 'op': 'done', 'owner': 'bob', 'ts': '2024-01-01T10:03:00',
+             'payload': {'task_id': 7}}
+        ]
+        
+        applied = self.storage.apply_journal_batch(entries)
+        
+        self.assertEqual(applied, 3)
+        calls = self.mock_cursor.execute.call_args_list
+        # Запись без владельца принадлежит владельцу хранилища
+        self.assertEqual(calls[1][0][1], ('2024-01-01T10:01:00', 5, 'alice'))
+        self.assertEqual(calls[2][0][1], (['k2', 'k3'],))
+        self.assertEqual(calls[3][0][1], (6, 'bob'))
+        self.assertEqual(calls[4][0][1], ('2024-01-01T10:03:00', 7, 'bob'))
+        # Транзакция каждого владельца задает его для политик RLS
+        self.assertEqual([call[1].get('owner') for call in self.mock_get_cursor.call_args_list],
+                         ['alice', 'bob'])
+    
+    def test_apply_journal_batch_rejected(self):
+        """Тест: нарушение ограничения БД сообщается как ValueError."""
+        self.mock_cursor.fetchall.return_value = [{'key': 'k1'}]
+        self.mock_cursor.execute.side_effect = [None, psycopg2.IntegrityError("foreign key violation")]
+        entries = [{'key': 'k1', 'op': 'add', 'ts': '2024-01-01T10:00:00',
+                    'payload': {'title': 'Sub', 'priority': 'high', 'parent_id': 404}}]
+        
+        with self.assertRaises(ValueError):
+            self.storage.apply_journal_batch(entries)
+    
+    def test_get_changes_since(self):
+        """Тест выборки изменений после водяного знака."""
+        since = datetime(2024, 1, 1)
+        self.mock_cursor.fetchall.side_effect = [
+            [{'id': 1, 'title': 'Changed', 'description': '', 'status': 'pending',
+              'priority': 'low', 'created_at': datetime(2023, 12, 1), 'due_date': None,
+              'completed_at': None, 'version': 3, 'updated_at': datetime(2024, 1, 2)}],
+            [{'task_id': 7, 'deleted_at': datetime(2024, 1, 3)}]
+        ]
+        
+        tasks, deleted_ids, watermark = self.storage.get_changes_since(since)
+        
+        self.assertEqual([task.id for task in tasks], [1])
+        self.assertEqual(deleted_ids, [7])
+        self.assertEqual(watermark, datetime(2024, 1, 3))
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertIn("WHERE owner = %s AND updated_at > %s", queries[0])
+        self.assertIn("FROM task_deletions", queries[1])
+    
+    def test_update_tasks(self):
+        """Тест массового изменения одним запросом UPDATE ... RETURNING id."""
+        self.mock_cursor.fetchall.return_value = [{'id': 3}, {'id': 5}]
+        
+        task_ids = self.storage.update_tasks(
+            {'priority': 'high', 'status': 'completed'},
+            status='pending', ids=[3, 5, 8], id_range=(1, None)
+        )
+        
+        self.assertEqual(task_ids, [3, 5])
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertTrue(sql_query.startswith("UPDATE tasks SET status = %s, priority = %s"))
+        self.assertIn("COALESCE(completed_at, CURRENT_TIMESTAMP)", sql_query)
+        self.assertIn("version = version + 1", sql_query)
+        self.assertIn("AND id = ANY(%s) AND id >= %s", sql_query)
+        self.assertIn("status IS DISTINCT FROM %s OR priority IS DISTINCT FROM %s", sql_query)
+        self.assertTrue(sql_query.endswith("RETURNING id"))
+        self.assertEqual(params, ['completed', 'high', 'completed',
+                                  'alice', 'pending', [3, 5, 8], 1, 'completed', 'high'])
+    
+    def test_update_tasks_dry_run(self):
+        """Тест подсчета изменяемых задач без изменения."""
+        self.mock_cursor.fetchall.return_value = [{'id': 1}, {'id': 2}]
+        
+        task_ids = self.storage.update_tasks({'due_date': None}, priority='low', dry_run=True)
+        
+        self.assertEqual(task_ids, [1, 2])
+        sql_query = self.mock_cursor.execute.call_args[0][0]
+        self.assertTrue(sql_query.startswith("SELECT id FROM tasks"))
+        self.assertNotIn("UPDATE", sql_query)
+    
+    def test_update_tasks_rejects_unknown_field(self):
+        """Тест запрета изменения служебных полей."""
+        with self.assertRaises(ValueError):
+            self.storage.update_tasks({'version': 1}, status='pending')
+        self.mock_cursor.execute.assert_not_called()
+    
+    def test_get_task_tree_single_query(self):
+        """Тест загрузки дерева задач одним рекурсивным запросом."""
+        base = {'description': '', 'status': 'pending', 'priority': 'medium',
+                'created_at': datetime(2024, 1, 1), 'due_date': None,
+                'completed_at': None, 'version': 1, 'tags': []}
+        self.mock_cursor.fetchall.return_value = [
+            dict(base, id=1, title='Root', parent_id=None, depth=0, open_blockers=[]),
+            dict(base, id=2, title='Child', parent_id=1, depth=1, open_blockers=[5])
+        ]
+        
+        nodes = self.storage.get_task_tree(1)
+        
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        sql_query = self.mock_cursor.execute.call_args[0][0]
+        self.assertIn("WITH RECURSIVE tree", sql_query)
+        self.assertEqual([(depth, task.id, blockers) for depth, task, blockers in nodes],
+                         [(0, 1, []), (1, 2, [5])])
+        self.assertEqual(nodes[1][1].parent_id, 1)
+    
+    def test_get_ready_tasks(self):
+        """Тест выборки готовых задач одним запросом."""
+        self.mock_cursor.fetchall.return_value = []
+        
+        self.storage.get_ready_tasks()
+        
+        sql_query = self.mock_cursor.execute.call_args[0][0]
+        self.assertIn("WITH RECURSIVE unfinished_ancestors", sql_query)
+        self.assertIn("FROM task_dependencies d", sql_query)
+    
+    def test_set_parent_rejects_cycle(self):
+        """Тест запрета сделать задачу подзадачей своего потомка."""
+        self.mock_cursor.fetchone.return_value = {'parent_found': True, 'cycle': True}
+        
+        with self.assertRaises(ValueError):
+            self.storage.set_parent(1, 3)
+        
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertIn("pg_advisory_xact_lock", queries[0])
+        self.assertFalse(any("UPDATE tasks" in query for query in queries))
+    
+    def test_add_dependency(self):
+        """Тест добавления блокировки с проверкой цикла."""
+        self.mock_cursor.fetchone.return_value = {'cycle': False, 'owned': 2}
+        self.mock_cursor.rowcount = 1
+        
+        self.assertTrue(self.storage.add_dependency(5, 3))
+        
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("INSERT INTO task_dependencies", sql_query)
+        self.assertEqual(params, (5, 3))
+        
+        with self.assertRaises(ValueError):
+            self.storage.add_dependency(4, 4)
+    
+    def test_add_recurrence_rule(self):
+        """Тест создания правила повторения по шаблону задачи."""
+        self.mock_cursor.fetchone.return_value = {'id': 7}
+        template = Task("Standup", priority=Priority.HIGH, tags=["work"])
+        
+        rule_id = self.storage.add_recurrence_rule(template, "daily", 1, "2024-12-02")
+        
+        self.assertEqual(rule_id, 7)
+        params = self.mock_cursor.execute.call_args[0][1]
+        self.assertEqual(params, ("alice", "Standup", "", "high", ["work"], "daily", 1, "2024-12-02", None))
+        
+        with self.assertRaises(ValueError):
+            self.storage.add_recurrence_rule(template, "hourly")
+    
+    def test_materialize_recurrences_single_statement(self):
+        """Тест создания экземпляров одним идемпотентным INSERT ... SELECT."""
+        self.mock_cursor.rowcount = 12
+        
+        created = self.storage.materialize_recurrences(30)
+        
+        self.assertEqual(created, 12)
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("generate_series", sql_query)
+        self.assertIn("ON CONFLICT (recurrence_rule_id, occurrence) DO NOTHING", sql_query)
+        self.assertIn("FOR UPDATE", sql_query)
+        self.assertEqual(params, {'horizon': 30, 'owner': 'alice'})
+    
+    def test_get_pending_due_tasks_range(self):
+        """Тест выборки задач по диапазону сроков с основного сервера."""
+        self.mock_cursor.fetchall.return_value = []
+        
+        self.storage.get_pending_due_tasks(date(2024, 12, 8), date(2024, 12, 7))
+        
+        sql_query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("due_date > COALESCE(%s::date, '-infinity'::date) AND due_date <= %s", sql_query)
+        self.assertEqual(params, ('alice', date(2024, 12, 7), date(2024, 12, 8)))
+    
+    def test_get_statistics_by_period_invalid(self):
+        """Тест ошибки для неподдерживаемого периода."""
+        with self.assertRaises(ValueError):
+            self.storage.get_statistics_by_period('year')
+        self.mock_cursor.execute.assert_not_called()
+    
     def test_init_database(self):
         """Тест инициализации базы данных."""
         # Создаем отдельный мок для проверки SQL запросов
@@ -392,5 +1212,408 @@ class TestTaskStorage(unittest.TestCase):
             self.assertIn("Connection failed", str(context.exception))
 
 
+
+class TestInsertBatcher(unittest.TestCase):
+    """Тесты для объединения вставок в пакеты."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.mock_cursor = MagicMock()
+        mock_cursor_context = MagicMock()
+        mock_cursor_context.__enter__.return_value = self.mock_cursor
+        mock_cursor_context.__exit__.return_value = None
+        
+        self.patcher = patch('storage.DatabaseConnection.get_cursor', return_value=mock_cursor_context)
+        self.patcher.start()
+        self.patcher_values = patch('storage.execute_values')
+        self.mock_execute_values = self.patcher_values.start()
+        self.mock_execute_values.side_effect = lambda cursor, sql, rows, page_size, fetch: [
+            {'id': 100 + i, 'created_at': None, 'version': 1} for i in range(len(rows))
+        ]
+    
+    def tearDown(self):
+        """Очистка тестового окружения."""
+        self.patcher.stop()
+        self.patcher_values.stop()
+    
+    def test_concurrent_inserts_coalesced(self):
+        """Тест объединения конкурентных вставок в один INSERT."""
+        batcher = InsertBatcher(max_batch=3, max_delay=5)
+        tasks = [Task(f"Task {i}") for i in range(3)]
+        threads = [threading.Thread(target=lambda t=t: batcher.submit(t).result()) for t in tasks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        batcher.close()
+        
+        # Пакет отправлен по достижении размера, не дожидаясь задержки
+        self.mock_execute_values.assert_called_once()
+        sql, rows = self.mock_execute_values.call_args[0][1:3]
+        self.assertIn("INSERT INTO tasks", sql)
+        self.assertIn("RETURNING id", sql)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(sorted(task.id for task in tasks), [100, 101, 102])
+    
+    def test_latency_bounded_by_delay(self):
+        """Тест записи неполного пакета по истечении задержки."""
+        batcher = InsertBatcher(max_batch=100, max_delay=0.01)
+        
+        task = batcher.submit(Task("Single")).result(timeout=2)
+        batcher.close()
+        
+        self.assertEqual(task.id, 100)
+        self.assertEqual(len(self.mock_execute_values.call_args[0][2]), 1)
+    
+    def test_error_propagated_to_callers(self):
+        """Тест передачи ошибки БД всем задачам пакета."""
+        self.mock_execute_values.side_effect = Exception("Database error")
+        batcher = InsertBatcher(max_batch=100, max_delay=0.01)
+        
+        future = batcher.submit(Task("Broken"))
+        with self.assertRaises(Exception) as context:
+            future.result(timeout=2)
+        batcher.close()
+        
+        self.assertIn("Database error", str(context.exception))
+    
+    def test_bad_row_fails_only_its_caller(self):
+        """Тест: при ошибке данных строки пакета записываются по одной."""
+        def insert(cursor, sql, rows, page_size, fetch):
+            if any(row[0] == "Bad" for row in rows):
+                raise psycopg2.DataError("value too long")
+            return [{'id': 100, 'created_at': None, 'version': 1} for _ in rows]
+        self.mock_execute_values.side_effect = insert
+        batcher = InsertBatcher(max_batch=3, max_delay=5)
+        
+        futures = [batcher.submit(Task(title)) for title in ("Good", "Bad", "Also good")]
+        batcher.close()
+        
+        self.assertEqual(futures[0].result(timeout=2).id, 100)
+        self.assertEqual(futures[2].result(timeout=2).id, 100)
+        with self.assertRaises(psycopg2.DataError):
+            futures[1].result(timeout=2)
+        # Пакет и затем каждая строка отдельно
+        self.assertEqual(self.mock_execute_values.call_count, 4)
+    
+    def test_connection_error_fails_whole_batch(self):
+        """Тест: ошибка не из-за данных не повторяется по строкам."""
+        self.mock_execute_values.side_effect = psycopg2.OperationalError("connection lost")
+        batcher = InsertBatcher(max_batch=2, max_delay=5)
+        
+        futures = [batcher.submit(Task(title)) for title in ("First", "Second")]
+        batcher.close()
+        
+        for future in futures:
+            with self.assertRaises(psycopg2.OperationalError):
+                future.result(timeout=2)
+        self.mock_execute_values.assert_called_once()
+    
+    def test_submit_after_close(self):
+        """Тест: закрытая очередь не принимает задачи."""
+        batcher = InsertBatcher(max_batch=10, max_delay=0.01)
+        batcher.close()
+        
+        with self.assertRaises(RuntimeError):
+            batcher.submit(Task("Late"))
+        # Повторное закрытие ничего не делает
+        batcher.close()
+    
+    @patch.object(TaskStorage, '_init_database')
+    def test_storage_routes_inserts_to_batcher(self, mock_init):
+        """Тест использования очереди в save_task после включения."""
+        storage = TaskStorage()
+        storage.enable_write_coalescing(max_batch=10, max_delay=0.01)
+        
+        task = storage.save_task(Task("Coalesced"))
+        storage.close()
+        
+        self.assertEqual(task.id, 100)
+        self.mock_cursor.execute.assert_not_called()
+    
+    @patch.object(TaskStorage, '_init_database')
+    def test_for_owner(self, mock_init):
+        """Тест хранилища другого владельца: без проверки схемы и с общей очередью вставок."""
+        storage = TaskStorage(owner="alice")
+        storage.enable_write_coalescing(max_batch=10, max_delay=0.01)
+        
+        bob = storage.for_owner("bob")
+        self.assertIs(bob._insert_batcher, storage._insert_batcher)
+        # Общая очередь закрывается только исходным хранилищем
+        bob.close()
+        task = bob.save_task(Task("Bob's"))
+        storage.close()
+        
+        mock_init.assert_called_once()
+        self.assertEqual(storage.owner, "alice")
+        self.assertEqual(bob.owner, "bob")
+        self.assertEqual(task.id, 100)
+        self.assertEqual(self.mock_execute_values.call_args[0][2][0][-1], "bob")
+    
+    def test_owners_written_in_separate_transactions(self):
+        """Тест: задачи разных владельцев пакета пишутся отдельными INSERT."""
+        batcher = InsertBatcher(max_batch=3, max_delay=5, owner="alice")
+        futures = [batcher.submit(Task("A1")), batcher.submit(Task("B1"), "bob"),
+                   batcher.submit(Task("A2"), "alice")]
+        batcher.close()
+        
+        for future in futures:
+            future.result(timeout=2)
+        owners = [[row[-1] for row in call[0][2]] for call in self.mock_execute_values.call_args_list]
+        self.assertEqual(owners, [["alice", "alice"], ["bob"]])
+        cursor_owners = [call[1]['owner'] for call in storage.DatabaseConnection.get_cursor.call_args_list]
+        self.assertEqual(cursor_owners, ["alice", "bob"])
+
+
+
+class TestSchemaInitialization(unittest.TestCase):
+    """Тесты обновления схемы при создании хранилища."""
+    
+    def setUp(self):
+        """Создает хранилище без обращения к БД."""
+        with patch.object(TaskStorage, '_init_database'):
+            self.storage = TaskStorage()
+    
+    def _init_with_schema_row(self, row):
+        """Вызывает _init_database, когда schema_version содержит row."""
+        mock_cursor = MagicMock()
+        mock_cursor.fetchone.return_value = row
+        mock_cursor_context = MagicMock()
+        mock_cursor_context.__enter__.return_value = mock_cursor
+        
+        with patch('storage.DatabaseConnection.get_cursor', return_value=mock_cursor_context) as mock_get_cursor:
+            with patch.object(self.storage, '_create_database_if_not_exists'):
+                self.storage._init_database()
+        return mock_get_cursor, [str(call[0][0]) for call in mock_cursor.execute.call_args_list], mock_cursor
+    
+    def test_init_database_skips_ddl_for_current_schema(self):
+        """Тест: при текущей версии схемы DDL не выполняется."""
+        row = {'version': TaskStorage.SCHEMA_VERSION, 'row_level_security': Config.ROW_LEVEL_SECURITY}
+        mock_get_cursor, queries, _ = self._init_with_schema_row(row)
+        
+        mock_get_cursor.assert_called_once_with(self.storage._connection_params, deadline="bulk")
+        self.assertIn("pg_advisory_xact_lock", queries[0])
+        self.assertFalse(any('CREATE TRIGGER' in query or 'ALTER TABLE' in query for query in queries))
+        self.assertFalse(any('POLICY' in query for query in queries))
+    
+    def test_init_database_migrates_outdated_schema(self):
+        """Тест: при старой версии схема обновляется и версия записывается."""
+        row = {'version': TaskStorage.SCHEMA_VERSION - 1, 'row_level_security': Config.ROW_LEVEL_SECURITY}
+        _, queries, mock_cursor = self._init_with_schema_row(row)
+        
+        self.assertTrue(any('CREATE TABLE IF NOT EXISTS tasks' in query for query in queries))
+        # Триггер тегов только дописывает изменения, не обновляя счетчики на месте
+        trigger_function, = [query for query in queries if 'CREATE OR REPLACE FUNCTION tasks_count_tags' in query]
+        self.assertIn("INSERT INTO tag_count_deltas", trigger_function)
+        self.assertNotIn("tag_counts ", trigger_function)
+        mock_cursor.execute.assert_any_call(
+            "INSERT INTO schema_version (version, row_level_security) VALUES (%s, %s)",
+            (TaskStorage.SCHEMA_VERSION, Config.ROW_LEVEL_SECURITY)
+        )
+    
+    def _migrate(self, method, column_exists):
+        """Вызывает шаг миграции; column_exists — ответ проверки столбца owner."""
+        mock_cursor = MagicMock()
+        mock_cursor.fetchone.return_value = {'?column?': 1} if column_exists else None
+        getattr(self.storage, method)(mock_cursor)
+        return mock_cursor, [str(call[0][0]) for call in mock_cursor.execute.call_args_list]
+    
+    def test_ownership_added_to_existing_tasks(self):
+        """Тест: существующие задачи получают владельца, индексы начинаются с owner."""
+        mock_cursor, queries = self._migrate('_create_ownership', column_exists=False)
+        
+        mock_cursor.execute.assert_any_call(
+            "ALTER TABLE tasks ADD COLUMN owner VARCHAR(64) NOT NULL DEFAULT %s", (self.storage.owner,)
+        )
+        # Новые строки указывают владельца явно
+        mock_cursor.execute.assert_any_call("ALTER TABLE tasks ALTER COLUMN owner DROP DEFAULT")
+        for column in ("status", "priority", "due_date", "created_at"):
+            mock_cursor.execute.assert_any_call(f"DROP INDEX IF EXISTS idx_tasks_{column}")
+        created = [query for query in queries if 'CREATE INDEX' in query]
+        self.assertEqual(len(created), 4)
+        self.assertTrue(all("ON tasks(owner, " in query for query in created))
+    
+    def test_ownership_column_kept(self):
+        """Тест: повторная миграция не трогает столбец владельца."""
+        _, queries = self._migrate('_create_ownership', column_exists=True)
+        
+        self.assertFalse(any('ALTER TABLE' in query for query in queries))
+    
+    def test_tag_counts_backfilled_per_owner(self):
+        """Тест: счетчики тегов без владельца пересчитываются по задачам."""
+        _, queries = self._migrate('_create_tags', column_exists=False)
+        
+        drop = queries.index("DROP TABLE IF EXISTS tag_counts")
+        create = next(i for i, query in enumerate(queries) if 'CREATE TABLE IF NOT EXISTS tag_counts' in query)
+        backfill = next(i for i, query in enumerate(queries) if 'INSERT INTO tag_counts' in query)
+        self.assertLess(drop, create)
+        self.assertLess(create, backfill)
+        self.assertIn("GROUP BY owner, tag", queries[backfill])
+        
+        _, queries = self._migrate('_create_tags', column_exists=True)
+        self.assertNotIn("DROP TABLE IF EXISTS tag_counts", queries)
+        self.assertFalse(any('INSERT INTO tag_counts' in query for query in queries))
+
+
+class TestReplicaRouting(unittest.TestCase):
+    """Тесты для маршрутизации чтения на реплики."""
+    
+    REPLICAS = [{'host': 'replica1', 'port': '5432'}, {'host': 'replica2', 'port': '5432'}]
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.mock_cursor = MagicMock()
+        self.mock_cursor.fetchone.return_value = {'lag_seconds': 0}
+        self.mock_cursor.fetchall.return_value = []
+        mock_cursor_context = MagicMock()
+        mock_cursor_context.__enter__.return_value = self.mock_cursor
+        mock_cursor_context.__exit__.return_value = None
+        
+        self.patcher = patch('storage.DatabaseConnection.get_cursor', return_value=mock_cursor_context)
+        self.mock_get_cursor = self.patcher.start()
+    
+    def tearDown(self):
+        """Очистка тестового окружения."""
+        self.patcher.stop()
+    
+    def test_round_robin(self):
+        """Тест поочередного выбора реплик."""
+        router = ReplicaRouter(self.REPLICAS, max_lag=5, check_interval=60)
+        
+        chosen = [router.choose()['host'] for _ in range(4)]
+        
+        self.assertEqual(chosen, ['replica1', 'replica2', 'replica1', 'replica2'])
+        # Отставание проверено по разу для каждой реплики и закэшировано
+        self.assertEqual(self.mock_cursor.execute.call_count, 2)
+    
+    def test_lagging_replica_skipped(self):
+        """Тест пропуска отстающей реплики и возврата к основному серверу."""
+        self.mock_cursor.fetchone.side_effect = [{'lag_seconds': 30}, {'lag_seconds': 1}]
+        router = ReplicaRouter(self.REPLICAS, max_lag=5, check_interval=60)
+        
+        self.assertEqual(router.choose()['host'], 'replica2')
+        
+        self.mock_cursor.fetchone.side_effect = None
+        self.mock_cursor.fetchone.return_value = {'lag_seconds': 30}
+        lagging = ReplicaRouter(self.REPLICAS, max_lag=5, check_interval=60)
+        self.assertIsNone(lagging.choose())
+    
+    def test_unreachable_replica_skipped(self):
+        """Тест пропуска недоступной реплики."""
+        self.mock_get_cursor.side_effect = psycopg2.OperationalError("connection refused")
+        router = ReplicaRouter(self.REPLICAS, max_lag=5, check_interval=60)
+        
+        self.assertIsNone(router.choose())
+    
+    def test_slow_replica_skipped(self):
+        """Тест: реплика, не уложившаяся в таймаут, пропускается."""
+        self.mock_get_cursor.side_effect = [
+            DeadlineExceededError("read", 5000, "запрос выполнялся слишком долго"),
+            self.mock_get_cursor.return_value
+        ]
+        router = ReplicaRouter(self.REPLICAS, max_lag=5, check_interval=60)
+        
+        self.assertEqual(router.choose()['host'], 'replica2')
+    
+    @patch('storage.Config.DB_REPLICAS', ['replica1', 'replica2'])
+    @patch.object(TaskStorage, '_init_database')
+    def test_reads_routed_to_replicas_except_after_write(self, mock_init):
+        """Тест чтения с реплики и read-your-writes после записи."""
+        storage = TaskStorage()
+        
+        def session():
+            storage.filter_tasks()
+            self.assertEqual(self.mock_get_cursor.call_args[0][0]['host'], 'replica1')
+            
+            self.mock_cursor.rowcount = 1
+            storage.delete_task(1)
+            storage.filter_tasks()
+            self.assertIsNone(self.mock_get_cursor.call_args[0][0])
+            
+            self.mock_cursor.fetchone.return_value = None
+            storage.get_task_by_id(1, use_primary=True)
+            self.assertIsNone(self.mock_get_cursor.call_args[0][0])
+        
+        contextvars.Context().run(session)
+    
+    @patch('storage.Config.DB_REPLICAS', ['replica1', 'replica2'])
+    @patch.object(TaskStorage, '_init_database')
+    def test_read_your_writes_is_per_session(self, mock_init):
+        """Тест: запись одного сеанса не переводит чтение других на основной сервер."""
+        storage = TaskStorage()
+        self.mock_cursor.rowcount = 1
+        contextvars.Context().run(storage.delete_task, 1)
+        
+        contextvars.Context().run(storage.filter_tasks)
+        
+        self.assertIsNotNone(self.mock_get_cursor.call_args[0][0])
+
+
+
+class TestChangeListener(unittest.TestCase):
+    """Тесты для получения изменений через LISTEN/NOTIFY."""
+    
+    def setUp(self):
+        """Мокирует соединение подписки и ожидание на сокете."""
+        self.conn = MagicMock()
+        self.conn.notifies = []
+        self.patcher_connect = patch('storage.psycopg2.connect', return_value=self.conn)
+        self.mock_connect = self.patcher_connect.start()
+        self.patcher_select = patch('storage.select.select')
+        self.mock_select = self.patcher_select.start()
+    
+    def tearDown(self):
+        """Очистка тестового окружения."""
+        self.patcher_connect.stop()
+        self.patcher_select.stop()
+    
+    def notify(self, **event):
+        """Создает уведомление с событием изменения."""
+        payload = {'op': 'insert', 'id': 1, 'title': 'T', 'status': 'pending',
+                   'priority': 'medium', 'due_date': None, 'version': 1}
+        payload.update(event)
+        return Mock(channel=ChangeListener.CHANNEL, payload=json.dumps(payload))
+    
+    def test_iter_changes_filters_and_stops_when_idle(self):
+        """Тест фильтрации событий и завершения по таймауту простоя."""
+        def poll():
+            self.conn.notifies.extend([self.notify(id=1), self.notify(id=2, priority='high'),
+                                       self.notify(id=3, op='update', status='completed')])
+        self.conn.poll.side_effect = poll
+        self.mock_select.side_effect = [([self.conn], [], []), ([], [], [])]
+        
+        with ChangeListener([{'dbname': 'tasks'}]) as listener:
+            events = list(listener.iter_changes(status='pending', priority='medium', idle_timeout=1))
+        
+        self.assertEqual([event['id'] for event in events], [1])
+        self.assertTrue(self.conn.autocommit)
+        listen_sql = self.conn.cursor.return_value.__enter__.return_value.execute.call_args[0][0]
+        self.assertEqual(listen_sql, "LISTEN task_changes")
+        # В ожидании выполняется только select на сокете, без запросов
+        self.mock_select.assert_called_with([self.conn], [], [], 1)
+        self.conn.close.assert_called_once()
+    
+    def test_wait_timeout_returns_empty(self):
+        """Тест пустого результата по таймауту ожидания."""
+        self.mock_select.return_value = ([], [], [])
+        
+        with ChangeListener([{'dbname': 'tasks'}]) as listener:
+            self.assertEqual(listener.wait(0.1), [])
+        
+        self.conn.poll.assert_not_called()
+    
+    def test_wait_filters_owner(self):
+        """Тест: слушатель владельца получает только события его задач."""
+        def poll():
+            self.conn.notifies.extend([self.notify(id=1, owner='alice'), self.notify(id=2, owner='bob'),
+                                       self.notify(id=3, owner='alice')])
+        self.conn.poll.side_effect = poll
+        self.mock_select.return_value = ([self.conn], [], [])
+        
+        with ChangeListener([{'dbname': 'tasks'}], owner='alice') as listener:
+            self.assertEqual([event['id'] for event in listener.wait(1)], [1, 3])
+        with ChangeListener([{'dbname': 'tasks'}]) as listener:
+            self.assertEqual([event['id'] for event in listener.wait(1)], [1, 2, 3])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
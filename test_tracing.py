@@ -0,0 +1,107 @@
+"""
+Тесты для модуля tracing.py
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import tracing
+from storage import DatabaseConnection, TracedCursor
+
+
+class TestTracing(unittest.TestCase):
+    """Тесты спанов и записи трасс в файл."""
+
+    def setUp(self):
+        """Включает трассировку во временный файл."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "traces.jsonl")
+        tracing.configure(self.path)
+
+    def tearDown(self):
+        """Выключает трассировку и удаляет временный каталог."""
+        tracing.configure(None)
+        shutil.rmtree(self.directory)
+
+    def read_spans(self):
+        """Читает записанные спаны."""
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_nested_spans(self):
+        """Тест вложенности: дочерний спан записывается раньше корня."""
+        with tracing.span("command list", command="list") as root:
+            with tracing.span("db.statement", kind="client") as child:
+                child.set_attribute("rows", 3)
+            self.assertEqual(tracing.current_trace_id(), root.trace_id)
+
+        statement, command = self.read_spans()
+        self.assertEqual(statement['traceId'], command['traceId'])
+        self.assertEqual(statement['parentSpanId'], command['spanId'])
+        self.assertEqual(command['parentSpanId'], "")
+        self.assertEqual(statement['kind'], "SPAN_KIND_CLIENT")
+        self.assertIn({"key": "rows", "value": {"intValue": "3"}}, statement['attributes'])
+        self.assertLessEqual(int(command['startTimeUnixNano']), int(statement['startTimeUnixNano']))
+        self.assertEqual(command['status'], {"code": "STATUS_CODE_OK"})
+        self.assertIn({"key": "service.name", "value": {"stringValue": "task-manager"}},
+                      command['resource']['attributes'])
+        self.assertIsNone(tracing.current_trace_id())
+
+    @patch('tracing.FLUSH_INTERVAL', 0)
+    def test_long_running_root_flushes_children(self):
+        """Тест: спаны долгого корня попадают в файл до его завершения."""
+        with tracing.span("command sync"):
+            with tracing.span("db.statement", kind="client"):
+                pass
+            statement, = self.read_spans()
+            self.assertEqual(statement['name'], "db.statement")
+
+    def test_root_span_starts_new_trace(self):
+        """Тест: root=True начинает новую трассу внутри текущего спана."""
+        with tracing.span("command sync") as command:
+            with tracing.span("sync.replay", root=True) as iteration:
+                self.assertNotEqual(iteration.trace_id, command.trace_id)
+                self.assertEqual(tracing.current_trace_id(), iteration.trace_id)
+            self.assertEqual(tracing.current_trace_id(), command.trace_id)
+
+        replay, sync = self.read_spans()
+        self.assertEqual(replay['parentSpanId'], "")
+        self.assertNotEqual(replay['traceId'], sync['traceId'])
+
+    def test_error_status(self):
+        """Тест: исключение отмечает спан ошибкой и пробрасывается."""
+        with self.assertRaises(ValueError):
+            with tracing.span("command done"):
+                raise ValueError("нет задачи")
+
+        span, = self.read_spans()
+        self.assertEqual(span['status'], {"code": "STATUS_CODE_ERROR", "message": "ValueError: нет задачи"})
+
+    def test_disabled_is_noop(self):
+        """Тест выключенной трассировки: файл не пишется, курсор обычный."""
+        tracing.configure(None)
+
+        with tracing.span("command list") as span:
+            span.set_attribute("rows", 1)
+
+        self.assertFalse(tracing.enabled())
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+    @patch('storage.DatabaseConnection.get_connection')
+    def test_traced_cursor_when_enabled(self, mock_get_connection):
+        """Тест: при включенной трассировке запросы идут через TracedCursor."""
+        mock_conn = MagicMock()
+        mock_get_connection.return_value.__enter__.return_value = mock_conn
+
+        with DatabaseConnection.get_cursor():
+            pass
+
+        mock_conn.cursor.assert_called_once_with(cursor_factory=TracedCursor)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+"""
+Модуль трассировки менеджера задач.
+
+Спан описывает этап выполнения: команду CLI или запрос API, получение
+соединения, SQL запрос, преобразование строк в задачи и формирование
+ответа. Вложенность спанов определяется контекстом выполнения
+(contextvars), поэтому спаны разных потоков не смешиваются; спаны,
+начатые в других потоках (например, в пуле шардов), образуют отдельные
+трассы.
+
+Завершенные спаны пишутся в локальный файл строками JSON в форме
+спана OTLP/JSON (traceId, spanId, parentSpanId, name, kind, время в
+наносекундах, attributes, status, resource) сразу по завершении, а
+файл сбрасывается на диск с завершением корневого спана или не реже
+раза в FLUSH_INTERVAL секунд. Поэтому долгоживущие команды (sync
+--interval, watch, remind) не копят спаны в памяти, а их итерации
+открывают собственные корневые спаны (span(..., root=True)). Пока
+файл не задан (configure), span() ничего не замеряет и почти ничего
+не стоит.
+"""
+
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+SERVICE_NAME = "task-manager"
+# Наибольший интервал между сбросами файла трассировки, секунды
+FLUSH_INTERVAL = 1.0
+# Виды спанов OTLP
+KINDS = {
+    "internal": "SPAN_KIND_INTERNAL",
+    "server": "SPAN_KIND_SERVER",
+    "client": "SPAN_KIND_CLIENT"
+}
+
+_current = contextvars.ContextVar("task_trace_span", default=None)
+_writer = None
+
+
+def _attribute_value(value) -> dict:
+    """Кодирует значение атрибута в форме AnyValue OTLP/JSON."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """Этап выполнения с атрибутами и временем начала и конца.
+
+    Attributes:
+        name (str): Имя спана.
+        trace_id (str): ID трассы (32 шестнадцатеричных символа).
+        span_id (str): ID спана (16 шестнадцатеричных символов).
+        parent (Span): Родительский спан или None для корневого.
+        attributes (dict): Атрибуты спана.
+    """
+
+    def __init__(self, name: str, parent: "Span" = None, kind: str = "internal", attributes: dict = None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.kind = KINDS[kind]
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key: str, value):
+        """Устанавливает атрибут спана."""
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        """Возвращает спан в форме OTLP/JSON."""
+        status = {"code": "STATUS_CODE_OK"}
+        if self.error is not None:
+            status = {"code": "STATUS_CODE_ERROR", "message": self.error}
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent.span_id if self.parent is not None else "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _attribute_value(value)}
+                           for key, value in self.attributes.items() if value is not None],
+            "status": status
+        }
+
+
+class _NoopSpan:
+    """Спан выключенной трассировки: атрибуты отбрасываются."""
+
+    trace_id = None
+
+    def set_attribute(self, key: str, value):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _TraceWriter:
+    """Дописывает завершенные спаны в файл."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self._resource = {"attributes": [
+            {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+            {"key": "process.pid", "value": {"intValue": str(os.getpid())}}
+        ]}
+
+    def record(self, span: Span):
+        record = span.to_dict()
+        record["resource"] = self._resource
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            now = time.monotonic()
+            if span.parent is None or now - self._flushed_at >= FLUSH_INTERVAL:
+                self._file.flush()
+                self._flushed_at = now
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def configure(path: Optional[str]):
+    """Включает запись трасс в файл или выключает трассировку (None)."""
+    global _writer
+    previous, _writer = _writer, (_TraceWriter(path) if path else None)
+    if previous is not None:
+        previous.close()
+
+
+def enabled() -> bool:
+    """Проверяет, включена ли трассировка."""
+    return _writer is not None
+
+
+def current_trace_id() -> Optional[str]:
+    """Возвращает ID текущей трассы или None."""
+    span = _current.get()
+    return span.trace_id if span is not None else None
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", root: bool = False, **attributes):
+    """Открывает дочерний спан текущего (или корневой) на время блока.
+
+    Исключение отмечает спан ошибкой и пробрасывается дальше.
+
+    Args:
+        name (str): Имя спана.
+        kind (str, optional): Вид: internal, server или client.
+        root (bool, optional): Начать новую трассу, даже если есть
+            текущий спан; так итерации долгоживущей команды становятся
+            отдельными трассами.
+        **attributes: Атрибуты спана.
+
+    Yields:
+        Span: Спан; атрибуты можно дополнить через set_attribute.
+    """
+    writer = _writer
+    if writer is None:
+        yield _NOOP
+        return
+
+    current = Span(name, None if root else _current.get(), kind, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current.reset(token)
+        writer.record(current)